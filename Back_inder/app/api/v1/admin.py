@@ -0,0 +1,56 @@
+# ============================================================
+# API: Administración (diagnóstico de rendimiento, solo admin)
+# ============================================================
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.core.consultas_lentas import registro as registro_lentas
+from app.core.dependencies import require_admin
+from app.services.cache_reportes import cache as cache_reportes
+
+router = APIRouter(prefix="/admin", tags=["Administración"])
+
+
+# ── Consultas lentas ──────────────────────────────────────────
+@router.get("/slow-queries")
+def listar_consultas_lentas(
+    orden: str = Query("p95", description="p95 | total | conteo | max"),
+    limite: int = Query(20, ge=1, le=200),
+    _=Depends(require_admin),
+):
+    """Sentencias que superaron el umbral, agrupadas por huella (este proceso)"""
+    try:
+        consultas = registro_lentas.top(orden, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "umbral_ms": registro_lentas.umbral_ms,
+        "muestreo_explain": registro_lentas.muestreo_explain,
+        "consultas": consultas,
+    }
+
+
+@router.get("/slow-queries/{huella}")
+def detalle_consulta_lenta(huella: str, _=Depends(require_admin)):
+    """Una huella con su SQL de ejemplo y el último plan EXPLAIN capturado"""
+    detalle = registro_lentas.detalle(huella)
+    if not detalle:
+        raise HTTPException(status_code=404, detail="Huella no encontrada")
+    return detalle
+
+
+@router.delete("/slow-queries")
+def reiniciar_consultas_lentas(_=Depends(require_admin)):
+    registro_lentas.reiniciar()
+    return {"message": "Registro de consultas lentas reiniciado"}
+
+
+# ── Caché de reportes ─────────────────────────────────────────
+@router.get("/cache-reportes")
+def estado_cache_reportes(_=Depends(require_admin)):
+    return cache_reportes.estadisticas()
+
+
+@router.delete("/cache-reportes")
+def limpiar_cache_reportes(_=Depends(require_admin)):
+    cache_reportes.limpiar()
+    return {"message": "Caché de reportes vaciada"}
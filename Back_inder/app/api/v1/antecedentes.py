@@ -1,10 +1,11 @@
 """
 API endpoints para Historia Clínica - Datos normalizados
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import Session
 from uuid import UUID
-from typing import List
+from typing import List, Optional
 
 from app.core.dependencies import get_db
 from app.schemas.antecedentes import (
@@ -20,9 +21,11 @@ from app.schemas.antecedentes import (
     PruebasComplementariasCreate, PruebasComplementariasResponse,
     DiagnosticosCreate, DiagnosticosResponse,
     PlanTratamientoCreate, PlanTratamientoResponse,
-    RemisionesEspecialistasCreate, RemisionesEspecialistasResponse
+    RemisionesEspecialistasCreate, RemisionesEspecialistasResponse,
+    OperacionesSeccionesRequest
 )
 from app.crud import antecedentes
+from app.services.historia_clinica_service import HistoriaClinicaService
 
 router = APIRouter(prefix="/antecedentes", tags=["Historia Clínica"])
 
@@ -481,3 +484,76 @@ def eliminar_remision(
     """Eliminar una remisión"""
     antecedentes.eliminar_remision(db, remision_id)
     return {"message": "Remisión eliminada"}
+
+
+# ============================================================================
+# SECCIONES EN UNA SOLA PETICIÓN
+# ============================================================================
+
+def _parsear_lista(valor: Optional[str]) -> List[str]:
+    return [v.strip() for v in valor.split(",") if v.strip()] if valor else []
+
+
+def get_historia_service(db: Session = Depends(get_db)) -> HistoriaClinicaService:
+    return HistoriaClinicaService(db)
+
+
+@router.get("/historia/{historia_clinica_id}/secciones")
+def obtener_secciones_historia(
+    historia_clinica_id: UUID,
+    sections: Optional[str] = Query(None, description="Secciones separadas por coma; vacío = todas"),
+    servicio: HistoriaClinicaService = Depends(get_historia_service)
+):
+    """Todas (o algunas) secciones de una historia: {seccion: [filas]}"""
+    try:
+        return servicio.obtener_secciones(historia_clinica_id, _parsear_lista(sections))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/secciones")
+def obtener_secciones_historias(
+    historia_ids: str = Query(..., description="IDs de historia separados por coma"),
+    sections: Optional[str] = Query(None, description="Secciones separadas por coma; vacío = todas"),
+    db: Session = Depends(get_db)
+):
+    """Secciones de varias historias: {historia_id: {seccion: [filas]}}"""
+    try:
+        ids = [UUID(v) for v in _parsear_lista(historia_ids)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ID de historia no válido")
+    try:
+        datos = antecedentes.obtener_secciones(db, ids, _parsear_lista(sections))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {str(hid): secciones for hid, secciones in datos.items()}
+
+
+@router.post("/historia/{historia_clinica_id}/lote")
+def aplicar_operaciones_secciones(
+    historia_clinica_id: UUID,
+    data: OperacionesSeccionesRequest,
+    servicio: HistoriaClinicaService = Depends(get_historia_service)
+):
+    """
+    Crea, actualiza y elimina filas de varias secciones en una sola transacción.
+    Devuelve el id de cada operación (en el mismo orden) y la versión registrada.
+    400: operación o datos no válidos; 409: segunda fila en una sección de fila
+    única o conflicto con lo que ya hay en la BD (p. ej. un id repetido).
+    """
+    try:
+        resultado = servicio.aplicar_operaciones(
+            historia_clinica_id, [op.dict() for op in data.operaciones]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except antecedentes.SeccionYaRegistrada as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DataError as e:
+        raise HTTPException(status_code=400, detail=f"Datos no válidos: {e.orig}".strip())
+    except IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Conflicto de integridad: {e.orig}".strip())
+    return {
+        "resultados": [dict(r, id=str(r["id"])) for r in resultado["resultados"]],
+        "version": resultado["version"],
+    }
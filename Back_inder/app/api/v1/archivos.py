@@ -1,8 +1,16 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, Request, Query
 from sqlalchemy.orm import Session
+from uuid import UUID
 from app.core.database import SessionLocal
-from app.utils.files import save_upload_file
-from app.crud.archivo import crear_archivo, listar_archivos_por_historia
+from app.services.almacenamiento_service import (
+    guardar_upload, ArchivoNoPermitido, ArchivoDemasiadoGrande,
+)
+from app.crud.archivo import crear_archivo, listar_archivos_por_historia, obtener_archivo
+from app.utils.descargas import respuesta_descarga
+from app.services.derivados_service import (
+    encolar_derivados, obtener_derivado, TAMANOS,
+    DerivadoNoDisponible, DerivadoEnProceso, ArchivoIlegible,
+)
 from app.schemas.archivo import ArchivoResponse
 
 router = APIRouter()
@@ -16,26 +24,89 @@ def get_db():
 
 @router.post("/", response_model=ArchivoResponse)
 def subir_archivo(
-    historia_id: str = Form(...),
-    categoria: str = Form(None),
+    historia_id: UUID = Form(...),
+    prueba_complementaria_id: UUID = Form(None),
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
     try:
-        ruta, ext = save_upload_file(file, historia_id)
-    except ValueError as e:
+        guardado = guardar_upload(file)
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchivoNoPermitido as e:
         raise HTTPException(status_code=400, detail=str(e))
 
     data = {
-        "historia_id": historia_id,
-        "nombre_original": file.filename,
-        "tipo_archivo": ext,
-        "categoria": categoria,
-        "ruta": ruta
+        "historia_clinica_id": historia_id,
+        "prueba_complementaria_id": prueba_complementaria_id,
+        "nombre_archivo": file.filename,
+        "tipo_archivo": guardado.extension,
+        "ruta_archivo": guardado.ruta,
+        "hash_sha256": guardado.sha256,
+        "tamano_bytes": guardado.tamano,
     }
 
-    return crear_archivo(db, data)
+    archivo = crear_archivo(db, data)
+    # Miniatura y vista previa en segundo plano
+    encolar_derivados(guardado.ruta, guardado.extension)
+    return archivo
 
 @router.get("/historia/{historia_id}", response_model=list[ArchivoResponse])
-def listar_archivos(historia_id: str, db: Session = Depends(get_db)):
+def listar_archivos(historia_id: UUID, db: Session = Depends(get_db)):
     return listar_archivos_por_historia(db, historia_id)
+
+@router.api_route("/{archivo_id}/descargar", methods=["GET", "HEAD"])
+def descargar_archivo(
+    archivo_id: UUID,
+    request: Request,
+    inline: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Descarga un adjunto clínico. Admite Range (206), If-None-Match (304)
+    y, si está configurado, X-Accel-Redirect hacia nginx.
+    """
+    archivo = obtener_archivo(db, archivo_id)
+    if not archivo:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    return respuesta_descarga(
+        request,
+        archivo.ruta_archivo,
+        archivo.nombre_archivo,
+        archivo.tipo_archivo,
+        hash_sha256=archivo.hash_sha256,
+        inline=inline,
+    )
+
+
+@router.api_route("/{archivo_id}/vista", methods=["GET", "HEAD"])
+def vista_archivo(
+    archivo_id: UUID,
+    request: Request,
+    tamano: str = Query("miniatura", description=f"Opciones: {', '.join(TAMANOS)}"),
+    db: Session = Depends(get_db)
+):
+    """
+    Miniatura o vista previa JPEG de un adjunto (imágenes y primera página de PDF).
+    """
+    archivo = obtener_archivo(db, archivo_id)
+    if not archivo:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    if tamano not in TAMANOS:
+        raise HTTPException(status_code=422, detail=f"Tamaño no válido. Opciones: {', '.join(TAMANOS)}")
+
+    try:
+        ruta = obtener_derivado(archivo.ruta_archivo, archivo.tipo_archivo, tamano)
+    except DerivadoNoDisponible as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ArchivoIlegible as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except DerivadoEnProceso as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    etag = f"{archivo.hash_sha256}-{tamano}" if archivo.hash_sha256 else None
+    return respuesta_descarga(request, ruta, f"{tamano}_{archivo.nombre_archivo}.jpg", "image/jpeg",
+                              hash_sha256=etag, inline=True)
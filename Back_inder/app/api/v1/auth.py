@@ -2,11 +2,14 @@
 # API: Auth + Usuarios + Roles
 # ============================================================
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from uuid import UUID
 from typing import List
 
 from app.core.dependencies import get_db, get_current_user, require_admin
+from app.core.limite_peticiones import exigir_limite, reiniciar as reiniciar_limite
+from app.core.principal import invalidar_rol
 from app.crud.usuario import (
     hay_usuarios, crear_primer_admin, autenticar_usuario, crear_token,
     obtener_usuarios, obtener_usuario, crear_usuario, actualizar_usuario,
@@ -38,8 +41,19 @@ def setup_inicial(data: SetupRequest, db: Session = Depends(get_db)):
 
 # ── Login ────────────────────────────────────────────────────
 @router.post("/auth/login", response_model=TokenResponse)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    usuario = autenticar_usuario(db, data.username, data.password)
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    # Por IP lo aplica LimitePeticionesMiddleware; aquí por usuario y el
+    # tope global de verificaciones bcrypt del proceso
+    clave_usuario = data.username.strip().lower()
+    await exigir_limite("login_usuario", clave_usuario)
+    await exigir_limite("login_global")
+    usuario = await autenticar_usuario(db, data.username, data.password)
+    await run_in_threadpool(reiniciar_limite, "login_usuario", clave_usuario)
+    # Carga perezosa de rol/permisos: en el threadpool, no en el event loop
+    return await run_in_threadpool(_respuesta_login, usuario)
+
+
+def _respuesta_login(usuario) -> TokenResponse:
     token = crear_token({"sub": str(usuario.id), "rol": usuario.rol.nombre})
     return TokenResponse(access_token=token, usuario=usuario)
 
@@ -116,4 +130,5 @@ def actualizar_permisos_rol(
         db.add(nuevo)
     db.commit()
     db.refresh(rol)
+    invalidar_rol(rol_id)
     return {"ok": True, "permisos": len(data.permisos)}
\ No newline at end of file
@@ -10,6 +10,7 @@ from app.core.dependencies import get_db, get_current_user
 from app.models.cita import Cita
 from app.models.usuario import Usuario
 from app.models.catalogo import CatalogoItem
+from app.crud.cita import slots_agenda, disponibilidad_medicos
 
 router = APIRouter(tags=["Citas"])
 
@@ -122,14 +123,7 @@ def agenda_medico(
             detail="Solo puedes consultar tu propia agenda"
         )
 
-    from datetime import datetime, timedelta
-    inicio      = datetime.strptime("07:00", "%H:%M")
-    fin         = datetime.strptime("17:00", "%H:%M")
-    todos_slots = []
-    cur = inicio
-    while cur < fin:
-        todos_slots.append(cur.strftime("%H:%M"))
-        cur += timedelta(minutes=30)
+    todos_slots = slots_agenda()
 
     ocupadas = db.query(Cita).options(
         joinedload(Cita.deportista),
@@ -164,6 +158,58 @@ def agenda_medico(
     }
 
 
+MAX_DIAS_DISPONIBILIDAD   = 31
+MAX_MEDICOS_DISPONIBILIDAD = 50
+
+
+@router.get("/disponibilidad")
+def disponibilidad(
+    medico_ids:   List[UUID] = Query(..., description="IDs de los médicos"),
+    fecha_inicio: date       = Query(..., description="Primer día (YYYY-MM-DD)"),
+    fecha_fin:    date       = Query(..., description="Último día (YYYY-MM-DD)"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Ocupación de varios médicos en un rango de fechas, en un solo request.
+
+    Cada día se codifica como un bitmap entero: el bit i está encendido si
+    el slot `slots[i]` está ocupado. Ej.: 5 (0b101) = slots 0 y 2 ocupados.
+    Médico solo puede consultar su propia agenda; admin cualquiera.
+    """
+    medico_ids = list(dict.fromkeys(medico_ids))
+
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(status_code=422, detail="fecha_fin debe ser mayor o igual a fecha_inicio")
+    if (fecha_fin - fecha_inicio).days + 1 > MAX_DIAS_DISPONIBILIDAD:
+        raise HTTPException(status_code=422, detail=f"El rango máximo es de {MAX_DIAS_DISPONIBILIDAD} días")
+    if len(medico_ids) > MAX_MEDICOS_DISPONIBILIDAD:
+        raise HTTPException(status_code=422, detail=f"Máximo {MAX_MEDICOS_DISPONIBILIDAD} médicos por consulta")
+
+    if not _es_admin(current_user) and any(m != current_user.id for m in medico_ids):
+        raise HTTPException(
+            status_code=403,
+            detail="Solo puedes consultar tu propia agenda"
+        )
+
+    slots = slots_agenda()
+    filas = disponibilidad_medicos(db, medico_ids, fecha_inicio, fecha_fin)
+
+    por_medico = {str(m): {"medico_id": str(m), "dias": {}, "ocupados": 0, "libres": 0} for m in medico_ids}
+    for f in filas:
+        item = por_medico[str(f.medico_id)]
+        item["dias"][str(f.fecha)] = int(f.bitmap)
+        item["ocupados"] += f.ocupados
+        item["libres"]   += len(slots) - f.ocupados
+
+    return {
+        "fecha_inicio": str(fecha_inicio),
+        "fecha_fin":    str(fecha_fin),
+        "slots":        slots,
+        "medicos":      list(por_medico.values()),
+    }
+
+
 @router.get("/medicos")
 def listar_medicos(
     db: Session = Depends(get_db),
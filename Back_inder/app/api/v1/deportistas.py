@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from uuid import UUID
@@ -23,17 +23,20 @@ from app.crud.antecedentes import (
     obtener_vacunas_deportista,
     obtener_vacuna_por_id,
     actualizar_vacuna,
-    eliminar_vacuna,
+    eliminar_vacuna_deportista,
     actualizar_archivo_vacuna,
 )
 from app.models.deportista import Deportista
-from fastapi.responses import FileResponse
+from app.utils.descargas import respuesta_descarga
+from app.services import tendencias_signos_service
+from app.services.almacenamiento_service import (
+    guardar_upload, liberar_archivo, ArchivoNoPermitido, ArchivoDemasiadoGrande,
+)
 
 router = APIRouter()
 
 # Configuración de almacenamiento de archivos
-UPLOAD_DIR = "uploads/vacunas"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+EXTENSIONES_VACUNA = {"pdf", "jpg", "jpeg", "png"}
 
 # ============================================================================
 # ENDPOINTS DE DEPORTISTAS - SIN PARÁMETROS
@@ -57,9 +60,13 @@ def crear(data: DeportistaCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error al crear deportista: {str(e)}")
 
 @router.get("", response_model=list[DeportistaResponse])
-def listar(db: Session = Depends(get_db)):
+def listar(
+    aptitud: str = Query(None, pattern="^(apto|no_apto|sin_valoracion)$",
+                         description="Filtra por aptitud vigente"),
+    db: Session = Depends(get_db),
+):
     """Listar todos los deportistas"""
-    return listar_deportistas(db)
+    return listar_deportistas(db, aptitud)
 
 @router.get("/search", response_model=list[DeportistaResponse])
 def buscar(
@@ -104,6 +111,23 @@ def listar_vacunas(deportista_id: str, db: Session = Depends(get_db)):
     return vacunas
 
 
+@router.get("/{deportista_id}/signos-vitales/tendencia")
+def tendencia_signos_vitales(
+    deportista_id: UUID,
+    ventana: int = Query(tendencias_signos_service.VENTANA_DEFECTO, ge=1, le=20),
+    db: Session = Depends(get_db),
+):
+    """
+    Serie de signos vitales del deportista: IMC, medias móviles de las
+    últimas `ventana` mediciones, z contra su disciplina y fuera de rango.
+
+    GET /api/v1/deportistas/{deportista_id}/signos-vitales/tendencia
+    """
+    if not db.query(Deportista.id).filter(Deportista.id == deportista_id).first():
+        raise HTTPException(status_code=404, detail="Deportista no encontrado")
+    return tendencias_signos_service.tendencia_deportista(db, deportista_id, ventana=ventana)
+
+
 @router.post("/{deportista_id}/vacunas", response_model=VacunaDeportistaResponse)
 def crear_vacuna(
     deportista_id: str,
@@ -159,28 +183,28 @@ def cargar_archivo_vacuna(
         )
     
     try:
-        # Crear directorio si no existe
-        dir_vacunas = f"{UPLOAD_DIR}/{deportista_id}"
-        os.makedirs(dir_vacunas, exist_ok=True)
-        
-        # Guardar archivo
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        extension = archivo.filename.split(".")[-1] if archivo.filename else "pdf"
-        nombre_archivo = f"{timestamp}_{vacuna_id}.{extension}"
-        ruta_archivo = f"{dir_vacunas}/{nombre_archivo}"
-        
-        with open(ruta_archivo, "wb") as f:
-            contenido = archivo.file.read()
-            f.write(contenido)
+        # Guardar por bloques en el almacenamiento por contenido
+        guardado = guardar_upload(archivo, EXTENSIONES_VACUNA)
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ArchivoNoPermitido:
+        raise HTTPException(status_code=400, detail="Solo se permiten archivos PDF, JPG o PNG")
+    
+    try:
+        ruta_anterior = vacuna.ruta_archivo
         
         # Actualizar vacuna con información del archivo
         actualizar_archivo_vacuna(
             db,
             vacuna_id,
-            ruta_archivo,
+            guardado.ruta,
             archivo.filename,
             archivo.content_type,
+            hash_sha256=guardado.sha256,
+            tamano_bytes=guardado.tamano,
         )
+        if ruta_anterior and ruta_anterior != guardado.ruta:
+            liberar_archivo(db, ruta_anterior)
         
         return {
             "success": True,
@@ -189,19 +213,22 @@ def cargar_archivo_vacuna(
         }
     
     except Exception as e:
+        liberar_archivo(db, guardado.ruta)
         raise HTTPException(status_code=500, detail=f"Error al cargar archivo: {str(e)}")
 
 
-@router.get("/{deportista_id}/vacunas/{vacuna_id}/archivo")
+@router.api_route("/{deportista_id}/vacunas/{vacuna_id}/archivo", methods=["GET", "HEAD"])
 def descargar_archivo_vacuna(
     deportista_id: str,
     vacuna_id: str,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     """
     Descargar archivo de una vacuna
     
     GET /api/v1/deportistas/{deportista_id}/vacunas/{vacuna_id}/archivo
+    Admite Range (206) e If-None-Match (304)
     """
     # Verificar que la vacuna existe
     vacuna = obtener_vacuna_por_id(db, vacuna_id)
@@ -209,13 +236,15 @@ def descargar_archivo_vacuna(
         raise HTTPException(status_code=404, detail="Vacuna no encontrada")
     
     # Verificar que tiene archivo
-    if not vacuna.ruta_archivo or not os.path.exists(vacuna.ruta_archivo):
+    if not vacuna.ruta_archivo:
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
-    return FileResponse(
-        path=vacuna.ruta_archivo,
-        filename=vacuna.nombre_archivo,
-        media_type=vacuna.tipo_archivo,
+    return respuesta_descarga(
+        request,
+        vacuna.ruta_archivo,
+        vacuna.nombre_archivo,
+        vacuna.tipo_archivo,
+        hash_sha256=vacuna.hash_sha256,
     )
 
 
@@ -262,7 +291,7 @@ def eliminar_vacuna_endpoint(
         raise HTTPException(status_code=404, detail="Vacuna no encontrada")
     
     try:
-        eliminar_vacuna(db, vacuna_id, eliminar_archivo)
+        eliminar_vacuna_deportista(db, vacuna_id, eliminar_archivo)
         return {
             "success": True,
             "message": "Vacuna eliminada correctamente",
@@ -2,14 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from datetime import datetime, timedelta
 import uuid
 import io
 
-from app.core.database import get_db
-from app.models.token_descarga import TokenDescarga
+from app.core.database import get_db, SessionLocal
 from app.models.historia import HistoriaClinica
 from app.models.deportista import Deportista
+from app.services import documentos_preparados_service, tokens_descarga_service
 from app.services.documento_service import generar_documento_historia_clinica
 
 router = APIRouter(prefix="/descarga-segura", tags=["Descarga Segura"])
@@ -177,56 +176,57 @@ def obtener_historia_completa(db: Session, historia_id: str) -> tuple:
     return historia_data, deportista_data
 
 
+def renderizar_pdf(historia_id: str):
+    """Bytes del PDF de la historia (None si no existe). Abre su propia sesión."""
+    db = SessionLocal()
+    try:
+        historia_data, deportista_data = obtener_historia_completa(db, historia_id)
+        if not historia_data or not deportista_data:
+            return None
+        pdf_buffer = generar_documento_historia_clinica(historia_data, deportista_data)
+        return pdf_buffer.getvalue() if pdf_buffer else None
+    finally:
+        db.close()
+
+
 @router.post("/generar-token/{historia_clinica_id}")
-async def generar_token_descarga(
+def generar_token_descarga(
     historia_clinica_id: str,
     db: Session = Depends(get_db)
 ):
     """Genera un token de descarga segura para enviar por WhatsApp"""
     try:
-        historia = db.query(HistoriaClinica).filter(
-            HistoriaClinica.id == historia_clinica_id
-        ).first()
-        
-        if not historia:
+        try:
+            historia_uuid = uuid.UUID(historia_clinica_id)
+        except ValueError:
             raise HTTPException(status_code=404, detail="Historia clínica no encontrada")
-        
-        deportista = db.query(Deportista).filter(
-            Deportista.id == historia.deportista_id
-        ).first()
-        
-        if not deportista:
-            raise HTTPException(status_code=404, detail="Deportista no encontrado")
-        
-        # Desactivar tokens anteriores
-        db.query(TokenDescarga).filter(
-            TokenDescarga.historia_id == historia_clinica_id,
-            TokenDescarga.bloqueado == False,
-            TokenDescarga.usado == False
-        ).update({"bloqueado": True})
-        
-        # Crear nuevo token
-        nuevo_token = TokenDescarga(
-            historia_id=historia_clinica_id,
-            deportista_id=deportista.id,
-            numero_documento=deportista.numero_documento,
-            fecha_expiracion=datetime.utcnow() + timedelta(hours=2)
+
+        numero_documento = db.query(Deportista.numero_documento).join(
+            HistoriaClinica, HistoriaClinica.deportista_id == Deportista.id
+        ).filter(HistoriaClinica.id == historia_uuid).scalar()
+
+        if numero_documento is None:
+            raise HTTPException(status_code=404, detail="Historia clínica no encontrada")
+
+        # Token firmado (no se guarda); el enlace anterior de la historia queda revocado
+        token, firmado = tokens_descarga_service.emitir_enlace(historia_uuid, numero_documento)
+        tokens_descarga_service.revocar_anteriores(db, firmado)
+
+        # El PDF se prepara ya (cifrado) para que /descargar solo lo envíe
+        documentos_preparados_service.encolar(
+            firmado.id, firmado.historia_id, lambda: renderizar_pdf(str(historia_uuid))
         )
-        
-        db.add(nuevo_token)
-        db.commit()
-        db.refresh(nuevo_token)
-        
-        url_descarga = f"{BASE_URL_FRONTEND}/descargar/{nuevo_token.token}"
-        
+
+        url_descarga = f"{BASE_URL_FRONTEND}/descargar/{token}"
+
         return {
             "success": True,
-            "token": nuevo_token.token,
+            "token": token,
             "url": url_descarga,
             "expira_en": "2 horas",
             "mensaje": "Enlace generado correctamente"
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -235,150 +235,151 @@ async def generar_token_descarga(
         raise HTTPException(status_code=500, detail=f"Error al generar token: {str(e)}")
 
 
+def _decodificar(token: str, tipo: str):
+    try:
+        return tokens_descarga_service.decodificar(token, tipo)
+    except tokens_descarga_service.TokenInvalido:
+        raise HTTPException(status_code=404, detail="Enlace no válido o expirado")
+    except tokens_descarga_service.TokenExpirado:
+        raise HTTPException(status_code=410, detail="El enlace ha expirado")
+
+
 @router.post("/verificar")
-async def verificar_token(
+def verificar_token(
     request: VerificarTokenRequest,
     db: Session = Depends(get_db)
 ):
-    """Verifica el token y la cédula del deportista"""
+    """
+    Verifica el token y la cédula del deportista. Firma, vigencia y cédula
+    se comprueban sin BD; devuelve el token_descarga para /descargar.
+    """
     try:
-        token_db = db.query(TokenDescarga).filter(
-            TokenDescarga.token == request.token,
-            TokenDescarga.bloqueado == False
-        ).first()
-        
-        if not token_db:
+        firmado = _decodificar(request.token, tokens_descarga_service.ENLACE)
+
+        estado = tokens_descarga_service.estado
+        estado.sincronizar(db)
+        if estado.revocado(firmado):
             raise HTTPException(status_code=404, detail="Enlace no válido o expirado")
-        
-        # Verificar expiración
-        if datetime.utcnow() > token_db.fecha_expiracion:
-            token_db.bloqueado = True
-            db.commit()
-            raise HTTPException(status_code=410, detail="El enlace ha expirado")
-        
+
         # Verificar intentos (máximo 3)
-        if token_db.intentos_fallidos >= 3:
-            token_db.bloqueado = True
-            db.commit()
+        if estado.intentos(firmado) >= tokens_descarga_service.MAX_INTENTOS:
             raise HTTPException(status_code=429, detail="Máximo de intentos alcanzado. Solicite un nuevo enlace.")
-        
-        # Verificar cédula
-        cedula_limpia = request.cedula.strip().replace(".", "").replace(",", "").replace(" ", "")
-        cedula_db = token_db.numero_documento.strip().replace(".", "").replace(",", "").replace(" ", "")
-        
-        if cedula_limpia != cedula_db:
-            token_db.intentos_fallidos += 1
-            db.commit()
-            intentos_restantes = 3 - token_db.intentos_fallidos
+
+        if not tokens_descarga_service.cedula_coincide(firmado, request.cedula):
+            intentos = tokens_descarga_service.registrar_fallo(db, firmado)
+            intentos_restantes = max(tokens_descarga_service.MAX_INTENTOS - intentos, 0)
             # IMPORTANTE: Devolver HTTPException con status 401
             raise HTTPException(
-                status_code=401, 
+                status_code=401,
                 detail=f"Cédula incorrecta. Intentos restantes: {intentos_restantes}"
             )
-        
-        # Marcar como verificado (usado=True permite la descarga)
-        token_db.usado = True
-        token_db.fecha_uso = datetime.utcnow()
-        db.commit()
-        
+
         return {
             "success": True,
             "mensaje": "Verificación exitosa",
-            "historia_clinica_id": str(token_db.historia_id)
+            "historia_clinica_id": str(firmado.historia_id),
+            "token_descarga": tokens_descarga_service.emitir_descarga(firmado),
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         print(f"Error verificando token: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al verificar: {str(e)}")
 
 
 @router.get("/descargar/{token}")
-async def descargar_con_token(
+def descargar_con_token(
     token: str,
     db: Session = Depends(get_db)
 ):
-    """Descarga el PDF si el token fue verificado"""
+    """
+    Descarga el PDF con el token_descarga que devuelve /verificar (un solo uso).
+    Es def (no async): esperar el PDF preparado o renderizarlo en vivo bloquea,
+    así que FastAPI lo ejecuta en su threadpool y no detiene el event loop.
+    """
     try:
-        token_db = db.query(TokenDescarga).filter(
-            TokenDescarga.token == token
-        ).first()
-        
-        if not token_db:
+        try:
+            firmado = tokens_descarga_service.decodificar(token)
+        except tokens_descarga_service.TokenInvalido:
             raise HTTPException(status_code=404, detail="Token no encontrado")
-        
-        if token_db.bloqueado:
-            raise HTTPException(status_code=403, detail="Este enlace ya no está disponible")
-        
-        if not token_db.usado:
-            raise HTTPException(status_code=403, detail="Debe verificar su cédula primero")
-        
-        # Verificar expiración
-        if datetime.utcnow() > token_db.fecha_expiracion:
-            token_db.bloqueado = True
-            db.commit()
+        except tokens_descarga_service.TokenExpirado:
             raise HTTPException(status_code=410, detail="El enlace ha expirado")
-        
-        historia_id = str(token_db.historia_id)
-        historia_data, deportista_data = obtener_historia_completa(db, historia_id)
-        
-        if not historia_data or not deportista_data:
+
+        if firmado.tipo != tokens_descarga_service.DESCARGA:
+            raise HTTPException(status_code=403, detail="Debe verificar su cédula primero")
+
+        estado = tokens_descarga_service.estado
+        estado.sincronizar(db)
+        if estado.revocado(firmado):
+            raise HTTPException(status_code=403, detail="Este enlace ya no está disponible")
+
+        numero_documento = db.query(Deportista.numero_documento).join(
+            HistoriaClinica, HistoriaClinica.deportista_id == Deportista.id
+        ).filter(HistoriaClinica.id == firmado.historia_id).scalar()
+
+        if numero_documento is None:
             raise HTTPException(status_code=404, detail="No se encontraron los datos de la historia")
-        
-        pdf_buffer = generar_documento_historia_clinica(historia_data, deportista_data)
-        
-        if not pdf_buffer:
+
+        # Preparado al emitir el enlace; si no está, se genera en vivo
+        pdf = documentos_preparados_service.obtener(firmado.id, firmado.historia_id)
+        if pdf is None:
+            pdf = renderizar_pdf(str(firmado.historia_id))
+
+        if not pdf:
             raise HTTPException(status_code=500, detail="Error generando el PDF")
-        
+
         # Bloquear token después de descarga exitosa
-        token_db.bloqueado = True
-        db.commit()
-        
+        tokens_descarga_service.revocar(db, firmado)
+        documentos_preparados_service.eliminar(firmado.id)
+
         return StreamingResponse(
-            pdf_buffer,
+            io.BytesIO(pdf),
             media_type="application/pdf",
             headers={
-                "Content-Disposition": f"attachment; filename=historia_clinica_{token_db.numero_documento}.pdf"
+                "Content-Disposition": f"attachment; filename=historia_clinica_{numero_documento}.pdf",
+                "Content-Length": str(len(pdf)),
             }
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         print(f"Error descargando PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al descargar: {str(e)}")
 
 
 @router.get("/info/{token}")
-async def obtener_info_token(
+def obtener_info_token(
     token: str,
     db: Session = Depends(get_db)
 ):
     """Obtiene información del token"""
     try:
-        token_db = db.query(TokenDescarga).filter(
-            TokenDescarga.token == token
-        ).first()
-        
-        if not token_db:
+        try:
+            firmado = tokens_descarga_service.decodificar(token, tokens_descarga_service.ENLACE)
+        except tokens_descarga_service.TokenInvalido:
             return {"valido": False, "mensaje": "Enlace no válido"}
-        
-        if token_db.bloqueado:
-            return {"valido": False, "mensaje": "Este enlace ya fue utilizado"}
-        
-        if datetime.utcnow() > token_db.fecha_expiracion:
+        except tokens_descarga_service.TokenExpirado:
             return {"valido": False, "mensaje": "Este enlace ha expirado"}
-        
-        if token_db.intentos_fallidos >= 3:
+
+        estado = tokens_descarga_service.estado
+        estado.sincronizar(db)
+        if estado.revocado(firmado):
+            return {"valido": False, "mensaje": "Este enlace ya fue utilizado"}
+
+        intentos = estado.intentos(firmado)
+        if intentos >= tokens_descarga_service.MAX_INTENTOS:
             return {"valido": False, "mensaje": "Máximo de intentos alcanzado"}
-        
+
         return {
             "valido": True,
-            "intentos_restantes": 3 - token_db.intentos_fallidos,
-            "expira_en": token_db.fecha_expiracion.isoformat()
+            "intentos_restantes": tokens_descarga_service.MAX_INTENTOS - intentos,
+            "expira_en": firmado.fecha_expiracion.isoformat()
         }
-        
+
     except Exception as e:
         print(f"Error obteniendo info: {str(e)}")
-        return {"valido": False, "mensaje": "Error al obtener información"}
\ No newline at end of file
+        return {"valido": False, "mensaje": "Error al obtener información"}
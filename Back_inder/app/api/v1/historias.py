@@ -1,19 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from uuid import UUID
+from uuid import UUID, uuid4
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime
 
 from app.core.dependencies import get_db, get_current_user          # ← MODIFICADO: agrega get_current_user
 from app.models.historia import HistoriaClinica
 from app.models.cita import Cita
-from app.models.catalogo import CatalogoItem
-from app.crud import antecedentes, historia
-from app.crud.historia import listar_todas_historias, eliminar_historia, obtener_motivo_consulta, obtener_exploracion_fisica
+from app.models.antecedentes import (
+    AntecedentesPersonales, AntecedentesFamiliares, LesioneDeportivas,
+    CirugiasPrivas, Alergias, Medicaciones, VacunasAdministradas,
+    RevisionSistemas, SignosVitales, PruebasComplementarias,
+    Diagnosticos, PlanTratamiento, RemisionesEspecialistas,
+    MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas, AptitudMedica
+)
+from app.crud.catalogo import obtener_item_id
+from app.crud.lote import LoteEscritura
+from app.services.revisiones_service import (
+    documento_desde_filas, registrar_revision, listar_revisiones, obtener_version, VersionNoEncontrada,
+)
+from app.crud.historia import (
+    listar_todas_historias, eliminar_historia, obtener_motivo_consulta, obtener_exploracion_fisica,
+    obtener_historia_datos_completos, buscar_historias_en_snapshot,
+)
 from app.schemas.antecedentes import (
     AntecedentesPersonalesCreate, AntecedentesFamiliaresCreate,
-    LesioneDeportavasCreate, CirugiasPrivasCreate, AlergiasCreate,
-    MedicacionesCreate, VacunasAdministradasCreate, RevisionSistemasCreate,
+    CirugiasPrivasCreate, VacunasAdministradasCreate, RevisionSistemasCreate,
     SignosVitalesCreate, PruebasComplementariasCreate, DiagnosticosCreate,
     PlanTratamientoCreate, RemisionesEspecialistasCreate
 )
@@ -142,6 +154,12 @@ class ExploracionFisicaSistemasData(BaseModel):
     extremidades: Optional[str] = None
     observaciones_generales: Optional[str] = None
 
+class AptitudMedicaData(BaseModel):
+    resultado: str                      # apto | no_apto
+    tipo_aptitud: Optional[str] = None
+    observaciones: Optional[str] = None
+    restricciones: Optional[str] = None
+
 class HistoriaClinicaCompletaRequest(BaseModel):
     deportista_id: UUID
     fecha_apertura: date
@@ -161,6 +179,7 @@ class HistoriaClinicaCompletaRequest(BaseModel):
     remisiones_especialistas: Optional[List[RemisionesEspecialistasData]] = None
     motivo_consulta_enfermedad: Optional[MotivoConsultaEnfermedadData] = None
     exploracion_fisica_sistemas: Optional[ExploracionFisicaSistemasData] = None
+    aptitud_medica: Optional[AptitudMedicaData] = None
 
 
 def validar_uuid(valor: str) -> UUID:
@@ -204,148 +223,135 @@ def crear_historia_clinica_completa(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),     # ← NUEVO: lee el usuario del token JWT
 ):
+    """
+    Guarda la historia y todas sus secciones en una sola transacción.
+    Las filas se agrupan por tabla (LoteEscritura): un INSERT por tabla
+    en lugar de un INSERT + COMMIT + SELECT por cada fila.
+    """
     try:
+        lote = LoteEscritura()
+
         # Crear historia clinica base — vinculada al médico logueado
-        historia_record = HistoriaClinica(
+        historia_id = uuid4()
+        created_at = datetime.utcnow()
+        lote.agregar(
+            HistoriaClinica,
+            id=historia_id,
             deportista_id=data.deportista_id,
             fecha_apertura=data.fecha_apertura,
             estado_id=data.estado_id,
             medico_id=current_user.id,          # ← NUEVO: guarda quién creó la historia
+            created_at=created_at,
         )
-        db.add(historia_record)
-        db.flush()
 
         # =====================================================
         # ANTECEDENTES PERSONALES
         # =====================================================
-        if data.antecedentes_personales:
-            for item in data.antecedentes_personales:
-                schema_data = AntecedentesPersonalesCreate(
-                    historia_clinica_id=historia_record.id,
-                    codigo_cie11=item.codigo_cie11,
-                    nombre_enfermedad=item.nombre_enfermedad,
-                    observaciones=item.observaciones
-                )
-                antecedentes.crear_antecedente_personal(db, schema_data)
+        for item in data.antecedentes_personales or []:
+            schema_data = AntecedentesPersonalesCreate(
+                historia_clinica_id=historia_id,
+                codigo_cie11=item.codigo_cie11,
+                nombre_enfermedad=item.nombre_enfermedad,
+                observaciones=item.observaciones
+            )
+            lote.agregar(AntecedentesPersonales, schema_data.dict())
 
         # =====================================================
         # ANTECEDENTES FAMILIARES
         # =====================================================
-        if data.antecedentes_familiares:
-            for item in data.antecedentes_familiares:
-                schema_data = AntecedentesFamiliaresCreate(
-                    historia_clinica_id=historia_record.id,
-                    tipo_familiar=item.tipo_familiar,
-                    codigo_cie11=item.codigo_cie11,
-                    nombre_enfermedad=item.nombre_enfermedad,
-                    observaciones=None
-                )
-                antecedentes.crear_antecedente_familiar(db, schema_data)
+        for item in data.antecedentes_familiares or []:
+            schema_data = AntecedentesFamiliaresCreate(
+                historia_clinica_id=historia_id,
+                tipo_familiar=item.tipo_familiar,
+                codigo_cie11=item.codigo_cie11,
+                nombre_enfermedad=item.nombre_enfermedad,
+                observaciones=None
+            )
+            lote.agregar(AntecedentesFamiliares, schema_data.dict())
 
         # =====================================================
         # LESIONES DEPORTIVAS
+        # Columnas de la tabla: tipo_lesion, fecha_lesion, tratamiento
         # =====================================================
-        if data.lesiones_deportivas:
-            for item in data.lesiones_deportivas:
-                descripcion = item.descripcion or item.tipo_lesion or ""
-                if not item.descripcion and item.tratamiento:
-                    descripcion += f" - Tratamiento: {item.tratamiento}"
-                fecha = item.fecha_ultima_lesion or item.fecha_lesion
-                schema_data = LesioneDeportavasCreate(
-                    historia_clinica_id=historia_record.id,
-                    descripcion=descripcion,
-                    fecha_ultima_lesion=fecha,
-                    observaciones=item.observaciones
-                )
-                antecedentes.crear_lesion_deportiva(db, schema_data)
+        for item in data.lesiones_deportivas or []:
+            lote.agregar(
+                LesioneDeportivas,
+                historia_clinica_id=historia_id,
+                tipo_lesion=item.tipo_lesion or item.descripcion or "",
+                fecha_lesion=item.fecha_lesion or item.fecha_ultima_lesion,
+                tratamiento=item.tratamiento,
+                observaciones=item.observaciones,
+            )
 
         # =====================================================
         # CIRUGIAS PREVIAS
         # =====================================================
-        if data.cirugias_previas:
-            for item in data.cirugias_previas:
-                schema_data = CirugiasPrivasCreate(
-                    historia_clinica_id=historia_record.id,
-                    tipo_cirugia=item.tipo_cirugia,
-                    fecha_cirugia=item.fecha_cirugia,
-                    observaciones=item.observaciones
-                )
-                antecedentes.crear_cirugia(db, schema_data)
+        for item in data.cirugias_previas or []:
+            schema_data = CirugiasPrivasCreate(
+                historia_clinica_id=historia_id,
+                tipo_cirugia=item.tipo_cirugia,
+                fecha_cirugia=item.fecha_cirugia,
+                observaciones=item.observaciones
+            )
+            lote.agregar(CirugiasPrivas, schema_data.dict())
 
         # =====================================================
         # ALERGIAS
+        # Columnas de la tabla: descripcion, reaccion
         # =====================================================
-        if data.alergias:
-            for item in data.alergias:
-                if item.observaciones:
-                    obs = item.observaciones
-                else:
-                    obs = ""
-                    if item.descripcion:
-                        obs += item.descripcion
-                    if item.reaccion:
-                        obs += f" - Reaccion: {item.reaccion}"
-                schema_data = AlergiasCreate(
-                    historia_clinica_id=historia_record.id,
-                    tipo_alergia=item.tipo_alergia,
-                    observaciones=obs if obs else None
-                )
-                antecedentes.crear_alergia(db, schema_data)
+        for item in data.alergias or []:
+            lote.agregar(
+                Alergias,
+                historia_clinica_id=historia_id,
+                tipo_alergia=item.tipo_alergia,
+                descripcion=item.descripcion or item.observaciones,
+                reaccion=item.reaccion,
+            )
 
         # =====================================================
         # MEDICACIONES
+        # Columnas de la tabla: nombre_medicamento, duracion, indicacion
         # =====================================================
-        if data.medicaciones:
-            for item in data.medicaciones:
-                nombre = item.nombre_medicacion or item.nombre_medicamento or ""
-                if item.observaciones:
-                    obs = item.observaciones
-                else:
-                    obs = ""
-                    if item.duracion:
-                        obs += f"Duracion: {item.duracion}"
-                    if item.indicacion:
-                        obs += f" - Indicacion: {item.indicacion}"
-                schema_data = MedicacionesCreate(
-                    historia_clinica_id=historia_record.id,
-                    nombre_medicacion=nombre,
-                    dosis=item.dosis,
-                    frecuencia=item.frecuencia,
-                    observaciones=obs if obs else None
-                )
-                antecedentes.crear_medicacion(db, schema_data)
+        for item in data.medicaciones or []:
+            lote.agregar(
+                Medicaciones,
+                historia_clinica_id=historia_id,
+                nombre_medicamento=item.nombre_medicamento or item.nombre_medicacion or "",
+                dosis=item.dosis,
+                frecuencia=item.frecuencia,
+                duracion=item.duracion,
+                indicacion=item.indicacion or item.observaciones,
+            )
 
         # =====================================================
         # VACUNAS ADMINISTRADAS
         # =====================================================
-        if data.vacunas_administradas:
-            for item in data.vacunas_administradas:
-                observaciones = None
-                if item.proxima_dosis:
-                    observaciones = f"Proxima dosis: {item.proxima_dosis}"
-                schema_data = VacunasAdministradasCreate(
-                    historia_clinica_id=historia_record.id,
-                    nombre_vacuna=item.nombre_vacuna,
-                    fecha_administracion=item.fecha_administracion,
-                    observaciones=observaciones
-                )
-                antecedentes.crear_vacuna(db, schema_data)
+        for item in data.vacunas_administradas or []:
+            observaciones = None
+            if item.proxima_dosis:
+                observaciones = f"Proxima dosis: {item.proxima_dosis}"
+            schema_data = VacunasAdministradasCreate(
+                historia_clinica_id=historia_id,
+                nombre_vacuna=item.nombre_vacuna,
+                fecha_administracion=item.fecha_administracion,
+                observaciones=observaciones
+            )
+            lote.agregar(VacunasAdministradas, schema_data.dict())
 
         # =====================================================
         # REVISION SISTEMAS
         # =====================================================
-        if data.revision_sistemas:
-            for item in data.revision_sistemas:
-                nombre_sistema = item.sistema_nombre or item.sistema or ""
-                estado_sistema = item.estado or item.hallazgos or "normal"
-                schema_data = RevisionSistemasCreate(
-                    historia_clinica_id=historia_record.id,
-                    sistema_nombre=nombre_sistema,
-                    estado=estado_sistema,
-                    observaciones=item.observaciones,
-                    tipo_revision="revision"
-                )
-                antecedentes.crear_revision_sistema(db, schema_data)
+        for item in data.revision_sistemas or []:
+            nombre_sistema = item.sistema_nombre or item.sistema or ""
+            estado_sistema = item.estado or item.hallazgos or "normal"
+            schema_data = RevisionSistemasCreate(
+                historia_clinica_id=historia_id,
+                sistema_nombre=nombre_sistema,
+                estado=estado_sistema,
+                observaciones=item.observaciones,
+                tipo_revision="revision"
+            )
+            lote.agregar(RevisionSistemas, schema_data.dict())
 
         # =====================================================
         # SIGNOS VITALES
@@ -362,7 +368,7 @@ def crear_historia_clinica_completa(
                 except Exception:
                     pass
             schema_data = SignosVitalesCreate(
-                historia_clinica_id=historia_record.id,
+                historia_clinica_id=historia_id,
                 estatura_cm=data.signos_vitales.altura,
                 peso_kg=data.signos_vitales.peso,
                 frecuencia_cardiaca_lpm=data.signos_vitales.frecuencia_cardiaca,
@@ -373,44 +379,42 @@ def crear_historia_clinica_completa(
                 saturacion_oxigeno_percent=float(data.signos_vitales.saturacion_oxigeno) if data.signos_vitales.saturacion_oxigeno else None,
                 imc=data.signos_vitales.imc
             )
-            antecedentes.crear_signos_vitales(db, schema_data)
+            lote.agregar(SignosVitales, schema_data.dict())
 
         # =====================================================
         # PRUEBAS COMPLEMENTARIAS
         # =====================================================
-        if data.pruebas_complementarias:
-            for item in data.pruebas_complementarias:
-                resultado = item.resultado or ""
-                if item.interpretacion:
-                    resultado += f" - Interpretacion: {item.interpretacion}"
-                if item.observaciones:
-                    resultado += f" - {item.observaciones}"
-                schema_data = PruebasComplementariasCreate(
-                    historia_clinica_id=historia_record.id,
-                    categoria=item.tipo_prueba or "General",
-                    nombre_prueba=item.tipo_prueba or "Prueba",
-                    codigo_cups=None,
-                    resultado=resultado if resultado else None
-                )
-                antecedentes.crear_prueba_complementaria(db, schema_data)
+        for item in data.pruebas_complementarias or []:
+            resultado = item.resultado or ""
+            if item.interpretacion:
+                resultado += f" - Interpretacion: {item.interpretacion}"
+            if item.observaciones:
+                resultado += f" - {item.observaciones}"
+            schema_data = PruebasComplementariasCreate(
+                historia_clinica_id=historia_id,
+                categoria=item.tipo_prueba or "General",
+                nombre_prueba=item.tipo_prueba or "Prueba",
+                codigo_cups=None,
+                resultado=resultado if resultado else None
+            )
+            lote.agregar(PruebasComplementarias, schema_data.dict())
 
         # =====================================================
         # DIAGNOSTICOS
         # =====================================================
-        if data.diagnosticos:
-            for item in data.diagnosticos:
-                observaciones = item.observaciones or ""
-                if item.tipo_diagnostico:
-                    observaciones = f"[{item.tipo_diagnostico}] {observaciones}"
-                schema_data = DiagnosticosCreate(
-                    historia_clinica_id=historia_record.id,
-                    codigo_cie11=item.codigo_cie11,
-                    nombre_enfermedad=item.nombre_diagnostico or "",
-                    observaciones=observaciones.strip() if observaciones.strip() else None,
-                    analisis_objetivo=None,
-                    impresion_diagnostica=None
-                )
-                antecedentes.crear_diagnostico(db, schema_data)
+        for item in data.diagnosticos or []:
+            observaciones = item.observaciones or ""
+            if item.tipo_diagnostico:
+                observaciones = f"[{item.tipo_diagnostico}] {observaciones}"
+            schema_data = DiagnosticosCreate(
+                historia_clinica_id=historia_id,
+                codigo_cie11=item.codigo_cie11,
+                nombre_enfermedad=item.nombre_diagnostico or "",
+                observaciones=observaciones.strip() if observaciones.strip() else None,
+                analisis_objetivo=None,
+                impresion_diagnostica=None
+            )
+            lote.agregar(Diagnosticos, schema_data.dict())
 
         # =====================================================
         # PLAN TRATAMIENTO
@@ -437,80 +441,82 @@ def crear_historia_clinica_completa(
                     plan_seg += f"\nFecha seguimiento: {data.plan_tratamiento.fecha_seguimiento}"
                 plan_seg = plan_seg.strip() if plan_seg.strip() else None
             schema_data = PlanTratamientoCreate(
-                historia_clinica_id=historia_record.id,
+                historia_clinica_id=historia_id,
                 indicaciones_medicas=indicaciones,
                 recomendaciones_entrenamiento=recomendaciones_ent,
                 plan_seguimiento=plan_seg
             )
-            antecedentes.crear_plan_tratamiento(db, schema_data)
+            lote.agregar(PlanTratamiento, schema_data.dict())
 
         # =====================================================
         # REMISIONES ESPECIALISTAS
         # =====================================================
-        if data.remisiones_especialistas:
-            for item in data.remisiones_especialistas:
-                nombre_especialista = item.especialista or item.especialidad or ""
-                schema_data = RemisionesEspecialistasCreate(
-                    historia_clinica_id=historia_record.id,
-                    especialista=nombre_especialista,
-                    motivo=item.motivo,
-                    prioridad=item.prioridad,
-                    fecha_remision=item.fecha_remision
-                )
-                antecedentes.crear_remision(db, schema_data)
+        for item in data.remisiones_especialistas or []:
+            nombre_especialista = item.especialista or item.especialidad or ""
+            schema_data = RemisionesEspecialistasCreate(
+                historia_clinica_id=historia_id,
+                especialista=nombre_especialista,
+                motivo=item.motivo,
+                prioridad=item.prioridad,
+                fecha_remision=item.fecha_remision
+            )
+            lote.agregar(RemisionesEspecialistas, schema_data.dict())
 
         # =====================================================
         # MOTIVO CONSULTA Y EXPLORACION FISICA
+        # (agregar() descarta las claves que no son columnas)
         # =====================================================
         if data.motivo_consulta_enfermedad:
-            try:
-                motivo_data = data.motivo_consulta_enfermedad.dict()
-                tipo_consulta = motivo_data.pop('tipo_consulta', None)
-                if tipo_consulta and not motivo_data.get('factor_desencadenante'):
-                    motivo_data['factor_desencadenante'] = f"TIPO_CONSULTA:{tipo_consulta}"
-                campos_validos = {
-                    'motivo_consulta', 'sintomas_principales', 'duracion_sintomas',
-                    'inicio_enfermedad', 'evolucion', 'factor_desencadenante', 'medicamentos_previos'
-                }
-                motivo_data = {k: v for k, v in motivo_data.items() if k in campos_validos}
-                historia.crear_motivo_consulta_enfermedad(db, historia_record.id, motivo_data)
-            except Exception as e:
-                print(f"Advertencia: No se pudo guardar motivo_consulta_enfermedad: {e}")
+            motivo_data = data.motivo_consulta_enfermedad.dict()
+            tipo_consulta = motivo_data.pop('tipo_consulta', None)
+            if tipo_consulta and not motivo_data.get('factor_desencadenante'):
+                motivo_data['factor_desencadenante'] = f"TIPO_CONSULTA:{tipo_consulta}"
+            lote.agregar(MotivoConsultaEnfermedadActual, motivo_data, historia_clinica_id=historia_id)
 
         if data.exploracion_fisica_sistemas:
-            try:
-                historia.crear_exploracion_fisica(db, historia_record.id, data.exploracion_fisica_sistemas.dict())
-            except Exception as e:
-                print(f"Advertencia: No se pudo guardar exploracion_fisica_sistemas: {e}")
-
-        # ── Marcar cita como Atendida ─────────────────────────
-        try:
-            estado_atendida = db.query(CatalogoItem).filter(
-                CatalogoItem.nombre == "Atendida"
-            ).first()
-            if estado_atendida:
-                cita_hoy = db.query(Cita).filter(
-                    Cita.deportista_id == data.deportista_id,
-                    Cita.fecha == data.fecha_apertura,
-                    Cita.estado_cita_id != estado_atendida.id,
-                ).order_by(Cita.hora).first()
-                if cita_hoy:
-                    cita_hoy.estado_cita_id = estado_atendida.id
-                    db.flush()
-        except Exception:
-            pass
+            lote.agregar(
+                ExploracionFisicaSistemas,
+                data.exploracion_fisica_sistemas.dict(),
+                historia_clinica_id=historia_id,
+            )
+
+        # =====================================================
+        # APTITUD MÉDICA
+        # (estado_aptitud_deportista lo actualiza el trigger, migración 013)
+        # =====================================================
+        if data.aptitud_medica and data.aptitud_medica.resultado:
+            lote.agregar(AptitudMedica, data.aptitud_medica.dict(), historia_clinica_id=historia_id)
+
+        # Versión 1 del historial (checkpoint) con las filas tal como se insertaron
+        filas = lote.ejecutar(db, devolver=True)
+        tipo_cita = data.motivo_consulta_enfermedad.tipo_consulta if data.motivo_consulta_enfermedad else None
+        registrar_revision(
+            db, historia_id, documento_desde_filas(filas, tipo_cita),
+            deportista_id=data.deportista_id, usuario_id=current_user.id, nueva=True,
+        )
+
+        # ── Marcar cita como Atendida (un solo UPDATE) ────────
+        estado_atendida_id = obtener_item_id(db, "Atendida")
+        if estado_atendida_id:
+            cita_hoy = db.query(Cita.id).filter(
+                Cita.deportista_id == data.deportista_id,
+                Cita.fecha == data.fecha_apertura,
+                Cita.estado_cita_id != estado_atendida_id,
+            ).order_by(Cita.hora).limit(1).scalar_subquery()
+            db.query(Cita).filter(Cita.id == cita_hoy).update(
+                {Cita.estado_cita_id: estado_atendida_id}, synchronize_session=False
+            )
         # ──────────────────────────────────────────────────────
 
         db.commit()
-        db.refresh(historia_record)
 
         return {
             "status": "success",
-            "historia_clinica_id": str(historia_record.id),
-            "deportista_id": str(historia_record.deportista_id),
-            "fecha_apertura": historia_record.fecha_apertura,
-            "created_at": historia_record.created_at,
-            "medico_id": str(historia_record.medico_id) if historia_record.medico_id else None,
+            "historia_clinica_id": str(historia_id),
+            "deportista_id": str(data.deportista_id),
+            "fecha_apertura": data.fecha_apertura,
+            "created_at": created_at,
+            "medico_id": str(current_user.id) if current_user.id else None,
             "message": "Historia clinica creada exitosamente"
         }
 
@@ -740,4 +746,57 @@ def obtener_historia_completa(historia_clinica_id: str, db: Session = Depends(ge
         ],
         "motivo_consulta_enfermedad": motivo_consulta_data,
         "exploracion_fisica_sistemas": exploracion_fisica_data,
-    }
\ No newline at end of file
+    }
+
+# =====================================================
+# SNAPSHOT JSON (historias_clinicas_json, JSONB)
+# =====================================================
+
+@router.get("/snapshots/buscar")
+def buscar_snapshots(
+    codigo_cie11: Optional[str] = Query(None),
+    tipo_cita: Optional[str] = Query(None),
+    limite: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Historias cuyo snapshot contiene el diagnóstico y/o el tipo de cita."""
+    if not codigo_cie11 and not tipo_cita:
+        raise HTTPException(status_code=400, detail="Indique codigo_cie11 o tipo_cita")
+    ids = buscar_historias_en_snapshot(db, codigo_cie11, tipo_cita, limite)
+    return {"total": len(ids), "historia_ids": [str(i) for i in ids]}
+
+
+@router.get("/{historia_clinica_id}/snapshot")
+def obtener_snapshot(
+    historia_clinica_id: str,
+    rutas: Optional[str] = Query(None, description="Rutas separadas por coma, ej: tipo_cita,signos_vitales.0.peso_kg"),
+    db: Session = Depends(get_db),
+):
+    """Snapshot JSON completo o solo las rutas pedidas (proyección en Postgres)."""
+    historia_uuid = validar_uuid(historia_clinica_id)
+    lista_rutas = [r.strip() for r in rutas.split(",") if r.strip()] if rutas else None
+    try:
+        return obtener_historia_datos_completos(db, historia_uuid, lista_rutas)
+    except ValueError as e:
+        mensaje = str(e)
+        raise HTTPException(status_code=404 if "no encontrada" in mensaje else 400, detail=mensaje)
+
+
+# =====================================================
+# REVISIONES (historial de cambios por sección)
+# =====================================================
+
+@router.get("/{historia_clinica_id}/revisiones")
+def listar_revisiones_historia(historia_clinica_id: str, db: Session = Depends(get_db)):
+    historia_uuid = validar_uuid(historia_clinica_id)
+    return listar_revisiones(db, historia_uuid)
+
+
+@router.get("/{historia_clinica_id}/revisiones/{version}")
+def obtener_revision_historia(historia_clinica_id: str, version: int, db: Session = Depends(get_db)):
+    """Documento completo tal como estaba en `version`."""
+    historia_uuid = validar_uuid(historia_clinica_id)
+    try:
+        return obtener_version(db, historia_uuid, version)
+    except VersionNoEncontrada as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -7,6 +7,7 @@ from pydantic import BaseModel
 from typing import Optional
 from app.core.dependencies import get_db
 from app.models.usuario import Usuario
+from app.core.principal import invalidar_usuario
 
 router = APIRouter()
 
@@ -56,6 +57,7 @@ def actualizar_perfil(
     if data.email is not None:
         usuario.email = data.email
     db.commit()
+    invalidar_usuario(usuario.id)
     return {"message": "Perfil actualizado", "nombre_completo": usuario.nombre_completo}
 
 
@@ -72,6 +74,7 @@ def actualizar_firma(
         raise HTTPException(status_code=400, detail="Imagen demasiado grande (máx 500KB)")
     usuario.firma_imagen = data.firma_imagen
     db.commit()
+    invalidar_usuario(usuario.id)
     return {"message": "Firma guardada", "tiene_firma": True}
 
 
@@ -80,4 +83,5 @@ def eliminar_firma(request: Request, db: Session = Depends(get_db)):
     usuario = _get_usuario(request, db)
     usuario.firma_imagen = None
     db.commit()
+    invalidar_usuario(usuario.id)
     return {"message": "Firma eliminada"}
\ No newline at end of file
@@ -4,17 +4,23 @@ Endpoints para el director: KPIs, historias, citas, deportistas, diagnósticos,
 """
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, and_, or_, text
+from sqlalchemy import func, case, and_, or_, text, select
 from datetime import date, datetime, timedelta
 from typing import Optional
 from uuid import UUID
 
+from app.core.database import SessionLocal
 from app.core.dependencies import get_db, get_current_user
 from app.models.deportista import Deportista
 from app.models.historia import HistoriaClinica
 from app.models.cita import Cita
 from app.models.usuario import Usuario
 from app.models.catalogo import CatalogoItem
+from app.models.antecedentes import AptitudMedica
+from app.models.reporte import EstadoAptitudDeportista
+from app.services import conciliacion_service, tendencias_signos_service
+from app.services.cache_reportes import cache_reporte
+from app.utils.exportacion_tabular import FILAS_POR_LOTE, exportable
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
@@ -43,6 +49,8 @@ def _fin_mes(año: int, mes: int) -> date:
 # =============================================================================
 
 @router.get("/resumen")
+@exportable("resumen")
+@cache_reporte("deportistas", "historias_clinicas", "citas", "catalogo_items", "estado_aptitud_deportista")
 def resumen_general(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -94,15 +102,10 @@ def resumen_general(
         ~func.lower(CatalogoItem.nombre).in_(estados_excluir),
     ).scalar() or 0
 
-    # Deportistas no aptos (diagnóstico con aptitud no apto)
-    # Busca en aptitud_medica si existe, si no aproxima por diagnósticos con "lesion" o "no apto"
-    try:
-        from app.models.antecedentes import AptitudMedica
-        no_aptos = db.query(func.count(func.distinct(AptitudMedica.historia_clinica_id))).filter(
-            func.lower(AptitudMedica.resultado).in_(['no apto', 'no_apto', 'inhabilitado'])
-        ).scalar() or 0
-    except Exception:
-        no_aptos = 0
+    # Deportistas cuya aptitud vigente es no apto (estado_aptitud_deportista)
+    no_aptos = db.query(func.count(EstadoAptitudDeportista.deportista_id)).filter(
+        EstadoAptitudDeportista.no_apto.is_(True)
+    ).scalar() or 0
 
     # Deportistas sin historia clínica
     sin_historia = db.query(func.count(Deportista.id)).filter(
@@ -150,6 +153,8 @@ def resumen_general(
 # =============================================================================
 
 @router.get("/historias/por-mes")
+@exportable("historias-por-mes")
+@cache_reporte("historias_clinicas")
 def historias_por_mes(
     meses: int = Query(6, ge=1, le=24),
     db: Session = Depends(get_db),
@@ -186,55 +191,40 @@ def historias_por_mes(
     return resultado
 
 
+def _filas_sin_realizar(db: Session, fecha_inicio=None, fecha_fin=None, fuente="vivo", **_):
+    return conciliacion_service.iterar_citas_sin_historia(db, fecha_inicio, fecha_fin, fuente)
+
+
 @router.get("/historias/sin-realizar")
+@exportable("historias-sin-realizar", filas=_filas_sin_realizar,
+            columnas=conciliacion_service.COLUMNAS_ITEM)
+@cache_reporte("citas", "historias_clinicas", "deportistas", "usuarios", "catalogo_items", "citas_sin_historia")
 def historias_sin_realizar(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin:    Optional[date] = None,
+    pagina:       int = Query(1, ge=1),
+    por_pagina:   int = Query(50, ge=1, le=500),
+    fuente:       str = Query("vivo", description="vivo | corte (último corte nocturno)"),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
     Citas con fecha pasada que no tienen historia clínica creada
-    (no atendidas, no canceladas).
+    (no atendidas, no canceladas). Paginado, con el total real.
     """
-    hoy = date.today()
-
-    estados_ok = db.query(CatalogoItem).filter(
-        func.lower(CatalogoItem.nombre).in_(['atendida', 'cancelada', 'no presentado', 'no presentada'])
-    ).all()
-    ids_ok = [e.id for e in estados_ok]
-
-    citas_q = db.query(Cita).filter(Cita.fecha < hoy)
-    if ids_ok:
-        citas_q = citas_q.filter(~Cita.estado_cita_id.in_(ids_ok))
-
-    citas = citas_q.order_by(Cita.fecha.desc()).limit(100).all()
-
-    # Verificar cuáles tienen historia ese día
-    resultado = []
-    for c in citas:
-        tiene_historia = db.query(func.count(HistoriaClinica.id)).filter(
-            HistoriaClinica.deportista_id == c.deportista_id,
-            HistoriaClinica.fecha_apertura == c.fecha,
-        ).scalar() or 0
-
-        if not tiene_historia:
-            dep = c.deportista
-            med = c.medico
-            resultado.append({
-                "cita_id":    str(c.id),
-                "fecha":      str(c.fecha),
-                "hora":       str(c.hora),
-                "deportista": f"{dep.nombres} {dep.apellidos}" if dep else "—",
-                "documento":  dep.numero_documento if dep else "—",
-                "medico":     med.nombre_completo if med else "—",
-                "tipo_cita":  c.tipo_cita.nombre if c.tipo_cita else "—",
-                "estado":     c.estado_cita.nombre if c.estado_cita else "—",
-                "dias_vencida": (hoy - c.fecha).days,
-            })
-
-    return {"total": len(resultado), "items": resultado}
+    if fuente not in ("vivo", "corte"):
+        raise HTTPException(status_code=400, detail="fuente debe ser 'vivo' o 'corte'")
+    consultar = conciliacion_service.citas_sin_historia if fuente == "vivo" \
+        else conciliacion_service.leer_corte_sin_historia
+    try:
+        return consultar(db, fecha_inicio, fecha_fin, pagina, por_pagina)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/historias/por-medico")
+@exportable("historias-por-medico", columnas=("medico", "total"))
+@cache_reporte("historias_clinicas", "usuarios")
 def historias_por_medico(
     fecha_inicio: Optional[date] = None,
     fecha_fin:    Optional[date] = None,
@@ -262,6 +252,8 @@ def historias_por_medico(
 
 
 @router.get("/historias/por-tipo-consulta")
+@exportable("historias-por-tipo-consulta", columnas=("tipo", "total"))
+@cache_reporte("citas", "catalogo_items")
 def historias_por_tipo(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -284,6 +276,8 @@ def historias_por_tipo(
 # =============================================================================
 
 @router.get("/deportistas/por-disciplina")
+@exportable("deportistas-por-disciplina", columnas=("disciplina", "total"))
+@cache_reporte("deportistas")
 def deportistas_por_disciplina(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -299,113 +293,145 @@ def deportistas_por_disciplina(
     return [{"disciplina": r.disciplina, "total": r.total} for r in rows]
 
 
+# Listados de deportistas: solo las columnas necesarias (no objetos
+# Deportista), compartidas por el JSON y el export en streaming
+
+_COLUMNAS_DEPORTISTA = (Deportista.id, Deportista.nombres, Deportista.apellidos,
+                        Deportista.numero_documento, Deportista.tipo_deporte)
+
+COLUMNAS_SIN_HISTORIA = ("id", "nombre", "documento", "disciplina", "fecha_registro")
+COLUMNAS_SIN_CITA_RECIENTE = ("id", "nombre", "documento", "disciplina")
+
+
+def _select_sin_historia():
+    return select(*_COLUMNAS_DEPORTISTA, Deportista.created_at).where(
+        ~Deportista.id.in_(select(HistoriaClinica.deportista_id).distinct())
+    ).order_by(Deportista.apellidos)
+
+
+def _item_sin_historia(r) -> dict:
+    return {
+        "id":           str(r.id),
+        "nombre":       f"{r.nombres} {r.apellidos}",
+        "documento":    r.numero_documento,
+        "disciplina":   r.tipo_deporte or "—",
+        "fecha_registro": str(r.created_at.date()) if r.created_at else "—",
+    }
+
+
+def _filas_sin_historia(db: Session, **_):
+    filas = db.execute(_select_sin_historia(), execution_options={"stream_results": True, "yield_per": FILAS_POR_LOTE})
+    return (_item_sin_historia(r) for r in filas)
+
+
+def _select_sin_cita_reciente(dias: int):
+    corte = date.today() - timedelta(days=dias)
+    return select(*_COLUMNAS_DEPORTISTA).where(
+        ~Deportista.id.in_(select(Cita.deportista_id).where(Cita.fecha >= corte).distinct())
+    ).order_by(Deportista.apellidos)
+
+
+def _item_sin_cita_reciente(r) -> dict:
+    return {
+        "id":        str(r.id),
+        "nombre":    f"{r.nombres} {r.apellidos}",
+        "documento": r.numero_documento,
+        "disciplina": r.tipo_deporte or "—",
+    }
+
+
+def _filas_sin_cita_reciente(db: Session, dias: int = 90, **_):
+    filas = db.execute(_select_sin_cita_reciente(dias),
+                       execution_options={"stream_results": True, "yield_per": FILAS_POR_LOTE})
+    return (_item_sin_cita_reciente(r) for r in filas)
+
+
 @router.get("/deportistas/sin-historia")
+@exportable("deportistas-sin-historia", filas=_filas_sin_historia, columnas=COLUMNAS_SIN_HISTORIA)
+@cache_reporte("deportistas", "historias_clinicas")
 def deportistas_sin_historia(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """Deportistas que nunca han tenido una historia clínica."""
-    deps = db.query(Deportista).filter(
-        ~Deportista.id.in_(
-            db.query(HistoriaClinica.deportista_id).distinct()
-        )
-    ).order_by(Deportista.apellidos).all()
-
-    return {
-        "total": len(deps),
-        "items": [
-            {
-                "id":           str(d.id),
-                "nombre":       f"{d.nombres} {d.apellidos}",
-                "documento":    d.numero_documento,
-                "disciplina":   d.tipo_deporte or "—",
-                "fecha_registro": str(d.created_at.date()) if d.created_at else "—",
-            }
-            for d in deps
-        ],
-    }
+    items = [_item_sin_historia(r) for r in db.execute(_select_sin_historia()).all()]
+    return {"total": len(items), "items": items}
 
 
 @router.get("/deportistas/sin-cita-reciente")
+@exportable("deportistas-sin-cita-reciente", filas=_filas_sin_cita_reciente,
+            columnas=COLUMNAS_SIN_CITA_RECIENTE)
+@cache_reporte("deportistas", "citas")
 def deportistas_sin_cita_reciente(
     dias: int = Query(90, ge=1, le=365),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """Deportistas sin cita en los últimos N días."""
-    corte = date.today() - timedelta(days=dias)
+    items = [_item_sin_cita_reciente(r) for r in db.execute(_select_sin_cita_reciente(dias)).all()]
+    return {"dias": dias, "total": len(items), "items": items}
 
-    con_cita_reciente = db.query(Cita.deportista_id).filter(
-        Cita.fecha >= corte
-    ).distinct().subquery()
 
-    deps = db.query(Deportista).filter(
-        ~Deportista.id.in_(con_cita_reciente)
-    ).order_by(Deportista.apellidos).all()
+@router.get("/deportistas/no-aptos")
+@exportable("deportistas-no-aptos",
+            columnas=("nombre", "documento", "disciplina", "resultado", "tipo_aptitud",
+                      "observaciones", "restricciones", "medico", "fecha"))
+@cache_reporte("deportistas", "usuarios", "aptitud_medica", "estado_aptitud_deportista")
+def deportistas_no_aptos(
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Deportistas cuya aptitud vigente (la de su última historia) es no apto.
+    Lee estado_aptitud_deportista: una fila por deportista, no el histórico.
+    """
+    rows = db.query(
+        Deportista.nombres,
+        Deportista.apellidos,
+        Deportista.numero_documento,
+        Deportista.tipo_deporte,
+        EstadoAptitudDeportista.resultado,
+        EstadoAptitudDeportista.tipo_aptitud,
+        EstadoAptitudDeportista.fecha,
+        AptitudMedica.observaciones,
+        AptitudMedica.restricciones,
+        Usuario.nombre_completo.label("medico"),
+    ).join(
+        Deportista, Deportista.id == EstadoAptitudDeportista.deportista_id
+    ).outerjoin(
+        AptitudMedica, AptitudMedica.id == EstadoAptitudDeportista.aptitud_id
+    ).outerjoin(
+        Usuario, Usuario.id == EstadoAptitudDeportista.medico_id
+    ).filter(
+        EstadoAptitudDeportista.no_apto.is_(True)
+    ).order_by(EstadoAptitudDeportista.fecha.desc()).all()
 
     return {
-        "dias":  dias,
-        "total": len(deps),
+        "total": len(rows),
         "items": [
             {
-                "id":        str(d.id),
-                "nombre":    f"{d.nombres} {d.apellidos}",
-                "documento": d.numero_documento,
-                "disciplina": d.tipo_deporte or "—",
+                "nombre":       f"{r.nombres} {r.apellidos}",
+                "documento":    r.numero_documento,
+                "disciplina":   r.tipo_deporte or "—",
+                "resultado":    r.resultado,
+                "tipo_aptitud": r.tipo_aptitud or "—",
+                "observaciones": r.observaciones or "—",
+                "restricciones": r.restricciones or "—",
+                "medico":       r.medico or "—",
+                "fecha":        str(r.fecha),
             }
-            for d in deps
+            for r in rows
         ],
     }
 
 
-@router.get("/deportistas/no-aptos")
-def deportistas_no_aptos(
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user),
-):
-    """Deportistas con aptitud médica 'no apto' en su última historia."""
-    try:
-        from app.models.antecedentes import AptitudMedica
-
-        rows = db.query(
-            Deportista.nombres,
-            Deportista.apellidos,
-            Deportista.numero_documento,
-            Deportista.tipo_deporte,
-            AptitudMedica.resultado,
-            AptitudMedica.observaciones,
-            HistoriaClinica.fecha_apertura,
-        ).join(
-            HistoriaClinica, HistoriaClinica.deportista_id == Deportista.id
-        ).join(
-            AptitudMedica, AptitudMedica.historia_clinica_id == HistoriaClinica.id
-        ).filter(
-            func.lower(AptitudMedica.resultado).in_(['no apto', 'no_apto', 'inhabilitado'])
-        ).order_by(HistoriaClinica.fecha_apertura.desc()).all()
-
-        return {
-            "total": len(rows),
-            "items": [
-                {
-                    "nombre":       f"{r.nombres} {r.apellidos}",
-                    "documento":    r.numero_documento,
-                    "disciplina":   r.tipo_deporte or "—",
-                    "resultado":    r.resultado,
-                    "observaciones": r.observaciones or "—",
-                    "fecha":        str(r.fecha_apertura),
-                }
-                for r in rows
-            ],
-        }
-    except Exception as e:
-        return {"total": 0, "items": [], "nota": f"Tabla aptitud_medica no disponible: {str(e)}"}
-
-
 # =============================================================================
 # 4. CITAS
 # =============================================================================
 
 @router.get("/citas/resumen-estados")
+@exportable("citas-resumen-estados", columnas=("estado", "total", "porcentaje"))
+@cache_reporte("citas", "catalogo_items")
 def citas_resumen_estados(
     fecha_inicio: Optional[date] = None,
     fecha_fin:    Optional[date] = None,
@@ -445,6 +471,8 @@ def citas_resumen_estados(
 
 
 @router.get("/citas/por-mes")
+@exportable("citas-por-mes")
+@cache_reporte("citas", "catalogo_items")
 def citas_por_mes(
     meses: int = Query(6, ge=1, le=24),
     db: Session = Depends(get_db),
@@ -486,6 +514,8 @@ def citas_por_mes(
 
 
 @router.get("/citas/ausentismo-por-medico")
+@exportable("citas-ausentismo-por-medico", columnas=("medico", "total", "no_presentados", "tasa_ausentismo"))
+@cache_reporte("citas", "usuarios", "catalogo_items")
 def ausentismo_por_medico(
     fecha_inicio: Optional[date] = None,
     fecha_fin:    Optional[date] = None,
@@ -532,6 +562,8 @@ def ausentismo_por_medico(
 # =============================================================================
 
 @router.get("/diagnosticos/top")
+@exportable("diagnosticos-top", columnas=("diagnostico", "codigo_cie11", "total"))
+@cache_reporte("diagnosticos")
 def top_diagnosticos(
     limite: int = Query(10, ge=1, le=50),
     db: Session = Depends(get_db),
@@ -560,6 +592,11 @@ def top_diagnosticos(
 
 
 @router.get("/diagnosticos/por-disciplina")
+@exportable("diagnosticos-por-disciplina", columnas=("disciplina", "diagnostico", "total"),
+            desde_resultado=lambda r: (
+                {"disciplina": d["disciplina"], **x} for d in r for x in d["diagnosticos"]
+            ))
+@cache_reporte("diagnosticos", "historias_clinicas", "deportistas")
 def diagnosticos_por_disciplina(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -605,6 +642,8 @@ def diagnosticos_por_disciplina(
 # =============================================================================
 
 @router.get("/medicos/carga-trabajo")
+@exportable("medicos-carga-trabajo", columnas=("medico", "historias", "citas_atendidas"))
+@cache_reporte("historias_clinicas", "citas", "usuarios", "catalogo_items")
 def carga_trabajo_medicos(
     fecha_inicio: Optional[date] = None,
     fecha_fin:    Optional[date] = None,
@@ -677,11 +716,39 @@ def carga_trabajo_medicos(
     }
 
 
+# =============================================================================
+# 6b. TENDENCIAS DE SIGNOS VITALES (ver tendencias_signos_service)
+# =============================================================================
+
+@router.get("/signos-vitales/tendencias")
+@exportable("signos-vitales-alertas", desde_resultado=lambda r: r["alertas"],
+            columnas=("deportista_id", "nombre", "documento", "disciplina", "fecha", "mediciones",
+                      "fuera_de_rango", "z_extremos", "imc", "imc_media_movil", "imc_cambio"))
+@cache_reporte("signos_vitales", "historias_clinicas", "deportistas")
+def tendencias_signos_vitales(
+    disciplina: Optional[str] = None,
+    ventana: int = Query(tendencias_signos_service.VENTANA_DEFECTO, ge=1, le=20),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Por disciplina: media, desviación, percentiles y fuera de rango de la
+    última medición de cada deportista. Alertas: fuera de rango o |z| >= 2
+    frente a su disciplina, con la tendencia del IMC.
+    """
+    return tendencias_signos_service.resumen_por_disciplina(db, disciplina=disciplina, ventana=ventana)
+
+
 # =============================================================================
 # 7. ENDPOINT COMPLETO (un solo request para el dashboard)
 # =============================================================================
 
+DEPENDENCIAS_DASHBOARD = ("deportistas", "historias_clinicas", "citas", "diagnosticos",
+                          "catalogo_items", "usuarios", "estado_aptitud_deportista")
+
+
 @router.get("/dashboard")
+@cache_reporte(*DEPENDENCIAS_DASHBOARD)
 def dashboard_completo(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
@@ -712,4 +779,17 @@ def dashboard_completo(
         }
     except Exception as e:
         import traceback; traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error generando dashboard: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generando dashboard: {str(e)}")
+
+
+def precalcular_dashboard():
+    """
+    Calcula el dashboard con sus parámetros por defecto (y con él cada
+    reporte que lo compone) para dejarlo en caché. Lo ejecuta el hilo de
+    precálculo (settings.REPORTES_PRECALCULO_SEGUNDOS).
+    """
+    db = SessionLocal()
+    try:
+        dashboard_completo(db=db, current_user=None)
+    finally:
+        db.close()
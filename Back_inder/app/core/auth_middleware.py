@@ -1,16 +1,26 @@
 # ============================================================
 # MIDDLEWARE DE AUTENTICACIÓN JWT
+# Middleware ASGI puro: no envuelve el cuerpo de la respuesta, por lo
+# que los StreamingResponse (PDFs) y las descargas pasan sin copias.
 # ============================================================
-from fastapi import Request
-from fastapi.responses import JSONResponse
+import json
+import logging
+import random
+import re
+
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.principal import obtener_principal, usuario_actual
+
+logger = logging.getLogger("auth")
 
 RUTAS_PUBLICAS = {
     "/health",
     "/docs",
     "/openapi.json",
     "/redoc",
+    # Descarga segura: el deportista entra con el enlace y su cédula
+    "/api/v1/descarga-segura/verificar",
 }
 
 PREFIJOS_PUBLICOS = [
@@ -18,6 +28,8 @@ PREFIJOS_PUBLICOS = [
     "/api/v1/catalogos",
     "/api/v1/cie11",
     "/api/v1/cups",
+    "/api/v1/descarga-segura/descargar/",
+    "/api/v1/descarga-segura/info/",
 ]
 
 # Headers CORS que deben estar en TODAS las respuestas incluyendo 401
@@ -28,48 +40,102 @@ CORS_HEADERS = {
 }
 
 
-async def auth_middleware(request: Request, call_next):
-    path = request.url.path
-    auth_header = request.headers.get("Authorization")
-    import logging
-    logging.getLogger("auth").info(f"MW: {request.method} {path} | Auth: {auth_header[:20] if auth_header else 'NONE'}")
-
-    # Preflight OPTIONS — siempre permitir con CORS headers
-    if request.method == "OPTIONS":
-        return JSONResponse(status_code=200, headers=CORS_HEADERS)
-
-    # Rutas exactas públicas
-    if path in RUTAS_PUBLICAS:
-        return await call_next(request)
-
-    # Prefijos públicos
-    for prefijo in PREFIJOS_PUBLICOS:
-        if path.startswith(prefijo):
-            return await call_next(request)
-
-    # Verificar token JWT
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Token de autenticación requerido"},
-            headers=CORS_HEADERS,
-        )
-
-    token = auth_header.split(" ")[1]
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM]
-        )
-        request.state.user_id  = payload.get("sub")
-        request.state.user_rol = payload.get("rol")
-    except JWTError:
-        return JSONResponse(
-            status_code=401,
-            content={"detail": "Token inválido o expirado"},
-            headers=CORS_HEADERS,
-        )
-
-    return await call_next(request)
\ No newline at end of file
+def compilar_rutas_publicas(rutas=RUTAS_PUBLICAS, prefijos=PREFIJOS_PUBLICOS):
+    """Una sola regex para rutas exactas y prefijos públicos."""
+    exactas = "|".join(re.escape(r) for r in sorted(rutas))
+    por_prefijo = "|".join(re.escape(p) for p in sorted(prefijos, key=len, reverse=True))
+    return re.compile(rf"(?:{exactas})\Z|(?:{por_prefijo})")
+
+
+_ES_PUBLICA = compilar_rutas_publicas().match
+
+_CORS_RAW = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in CORS_HEADERS.items()]
+
+
+async def _responder_json(send, status: int, contenido, headers=()) -> None:
+    cuerpo = json.dumps(contenido).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(cuerpo)).encode("latin-1")),
+            *headers,
+            *_CORS_RAW,
+        ],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+def _cabecera(scope, nombre: bytes):
+    for clave, valor in scope["headers"]:
+        if clave == nombre:
+            return valor.decode("latin-1")
+    return None
+
+
+class AuthMiddleware:
+    """
+    Exige un JWT Bearer en las rutas no públicas y deja en request.state:
+    user_id, user_rol, token_payload y principal (si está en caché).
+
+    Registro: DEBUG para cada petición; en INFO solo una muestra
+    (settings.AUTH_LOG_MUESTREO, fracción entre 0 y 1).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MW: %s %s", method, path)
+        elif settings.AUTH_LOG_MUESTREO and random.random() < settings.AUTH_LOG_MUESTREO:
+            logger.info("MW (muestra): %s %s", method, path)
+
+        # Preflight OPTIONS — siempre permitir con CORS headers
+        if method == "OPTIONS":
+            await _responder_json(send, 200, None)
+            return
+
+        # Rutas públicas (exactas y por prefijo)
+        if _ES_PUBLICA(path):
+            await self.app(scope, receive, send)
+            return
+
+        # Verificar token JWT
+        auth_header = _cabecera(scope, b"authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            await _responder_json(send, 401, {"detail": "Token de autenticación requerido"})
+            return
+
+        token = auth_header[7:]
+        try:
+            payload = jwt.decode(
+                token,
+                settings.SECRET_KEY,
+                algorithms=[settings.ALGORITHM]
+            )
+        except JWTError:
+            await _responder_json(send, 401, {"detail": "Token inválido o expirado"})
+            return
+
+        state = scope.setdefault("state", {})
+        state["user_id"] = payload.get("sub")
+        state["user_rol"] = payload.get("rol")
+        # get_current_user reutiliza el payload y el principal en caché
+        state["token_payload"] = payload
+        state["principal"] = obtener_principal(payload)
+
+        # Se propaga a los endpoints síncronos (threadpool copia el contexto)
+        token_ctx = usuario_actual.set(payload.get("sub"))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            usuario_actual.reset(token_ctx)
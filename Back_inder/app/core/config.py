@@ -28,6 +28,65 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Descargas: si se define, los archivos grandes se delegan a nginx con
+    # X-Accel-Redirect. El prefijo es una location "internal" que apunta a UPLOAD_DIR.
+    DESCARGA_X_ACCEL_PREFIJO: str = ""
+    DESCARGA_X_ACCEL_MIN_BYTES: int = 8 * 1024 * 1024
+
+    # Segundos que se reutiliza usuario/rol/permisos sin volver a la BD
+    PRINCIPAL_CACHE_TTL: int = 60
+
+    # Segundos que se reutiliza el id de un item de catálogo resuelto por nombre
+    CATALOGOS_CACHE_TTL: int = 300
+
+    # Fracción de peticiones que el middleware de auth registra en INFO (0 = ninguna)
+    AUTH_LOG_MUESTREO: float = 0.0
+
+    # Hilos para generar miniaturas / vistas previas de adjuntos
+    DERIVADOS_WORKERS: int = 2
+
+    # Consultas lentas: umbral en ms y fracción de ellas a la que se le corre
+    # EXPLAIN (ANALYZE, BUFFERS) en segundo plano (0 = desactivado)
+    CONSULTA_LENTA_MS: int = 500
+    CONSULTA_LENTA_EXPLAIN_MUESTREO: float = 0.0
+
+    # Cada cuántos segundos se precalcula el dashboard de reportes en
+    # segundo plano (0 = desactivado)
+    REPORTES_PRECALCULO_SEGUNDOS: int = 0
+    # Cada cuántos segundos se compactan las filas de cambios_datos en
+    # versiones_datos (migración 017; 0 = desactivado)
+    VERSIONES_DATOS_COMPACTAR_SEGUNDOS: int = 60
+
+    # Exportación incremental a Parquet (scripts/exportar_parquet.py).
+    # Los ids se seudonimizan con HMAC-SHA256; sin clave propia se deriva
+    # de SECRET_KEY (cambiarla cambia todos los seudónimos).
+    EXPORTACION_DIR: str = "exportaciones/parquet"
+    EXPORTACION_SEUDONIMO_CLAVE: str = ""
+
+    # Descarga segura: clave HMAC de los tokens (sin clave propia se deriva
+    # de SECRET_KEY) y cada cuántos segundos se purgan las filas vencidas
+    # de tokens_descarga (0 = desactivado)
+    TOKENS_DESCARGA_CLAVE: str = ""
+    TOKENS_DESCARGA_PURGA_SEGUNDOS: int = 3600
+
+    # Límite de peticiones (token bucket) en rutas públicas y login.
+    # LIMITE_REDIS_URL: baldes compartidos entre workers (requiere redis).
+    # LIMITE_CONFIAR_PROXY: tomar la IP de X-Forwarded-For (solo detrás de nginx).
+    LIMITE_PETICIONES_ACTIVO: bool = True
+    LIMITE_REDIS_URL: str = ""
+    LIMITE_CONFIAR_PROXY: bool = False
+
+    # bcrypt: rondas fijas o 0 = calibrar al arrancar para ~BCRYPT_OBJETIVO_MS
+    # por hash (mínimo 12). Hilos del pool (0 = mitad de los núcleos) y
+    # cuántas peticiones pueden esperar en cola antes de responder 503.
+    BCRYPT_RONDAS: int = 0
+    BCRYPT_OBJETIVO_MS: int = 250
+    BCRYPT_WORKERS: int = 0
+    BCRYPT_COLA_MAX: int = 64
+
+    # Hilos que preparan (render + cifrado) el PDF al emitir un enlace de descarga
+    PDF_PREPARADO_WORKERS: int = 1
+
     @property
     def DATABASE_URL(self) -> str:
         encoded_password = quote_plus(self.DB_PASSWORD)
@@ -0,0 +1,230 @@
+# ============================================================
+# REGISTRO DE CONSULTAS LENTAS
+# Toda sentencia que supera settings.CONSULTA_LENTA_MS se agrupa por
+# huella (el SQL sin literales ni parámetros) con conteo, tiempo total,
+# máximo, p95 (sobre las últimas muestras) y la ruta que la lanzó.
+# Opcional: a una fracción de ellas (CONSULTA_LENTA_EXPLAIN_MUESTREO) se
+# le corre EXPLAIN (ANALYZE, BUFFERS) en un hilo aparte, con otra
+# conexión y en una transacción que se revierte. Solo SELECT: ANALYZE
+# ejecuta la sentencia.
+# En memoria y por proceso; se consulta en GET /api/v1/admin/slow-queries.
+# ============================================================
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metricas import RUTA_DESCONOCIDA, ruta_actual
+
+logger = logging.getLogger(__name__)
+
+MAX_HUELLAS = 200           # se descarta la de menor tiempo total al llenarse
+MUESTRAS_POR_HUELLA = 500   # ventana para el p95
+EXPLAIN_TIMEOUT_MS = 60000
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_PARAMETRO = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")          # IN (?, ?, ?) -> IN (?+)
+_FILAS_VALUES = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")      # VALUES (?+), (?+) -> VALUES (?+)
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_sql(statement: str) -> str:
+    sql = _LITERAL_TEXTO.sub("?", statement)
+    sql = _PARAMETRO.sub("?", sql)
+    sql = _NUMERO.sub("?", sql)
+    sql = _LISTA.sub("(?+)", sql)
+    sql = _FILAS_VALUES.sub("(?+)", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def huella_sql(sql_normalizado: str) -> str:
+    return hashlib.sha1(sql_normalizado.encode("utf-8")).hexdigest()[:16]
+
+
+def _percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+class _ConsultaLenta:
+    def __init__(self, huella: str, sql: str):
+        self.huella = huella
+        self.sql = sql
+        self.total = 0
+        self.suma_ms = 0.0
+        self.max_ms = 0.0
+        self.muestras = deque(maxlen=MUESTRAS_POR_HUELLA)
+        self.rutas = {}
+        self.ultima_vez = None
+        self.ejemplo = None
+        self.plan = None
+        self.plan_fecha = None
+        self.explain_pendiente = False
+
+    def como_dict(self, con_plan: bool = False) -> dict:
+        salida = {
+            "huella": self.huella,
+            "sql": self.sql,
+            "total": self.total,
+            "promedio_ms": round(self.suma_ms / self.total, 1) if self.total else 0.0,
+            "p95_ms": round(_percentil(self.muestras, 0.95), 1),
+            "max_ms": round(self.max_ms, 1),
+            "suma_ms": round(self.suma_ms, 1),
+            "rutas": dict(sorted(self.rutas.items(), key=lambda r: -r[1])),
+            "ultima_vez": self.ultima_vez,
+            "tiene_plan": self.plan is not None,
+        }
+        if con_plan:
+            salida["ejemplo"] = self.ejemplo
+            salida["plan"] = self.plan
+            salida["plan_fecha"] = self.plan_fecha
+        return salida
+
+
+class RegistroConsultasLentas:
+    """
+    Uso:
+        registro.instrumentar(engine)
+        registro.top(orden="p95", limite=20)
+    """
+
+    ORDENES = {
+        "p95": lambda c: _percentil(c.muestras, 0.95),
+        "total": lambda c: c.suma_ms,
+        "conteo": lambda c: c.total,
+        "max": lambda c: c.max_ms,
+    }
+
+    def __init__(self, umbral_ms: Optional[float] = None, muestreo_explain: Optional[float] = None):
+        self.umbral_ms = settings.CONSULTA_LENTA_MS if umbral_ms is None else umbral_ms
+        self.muestreo_explain = (settings.CONSULTA_LENTA_EXPLAIN_MUESTREO
+                                 if muestreo_explain is None else muestreo_explain)
+        self._lock = threading.Lock()
+        self._consultas = {}   # huella -> _ConsultaLenta
+        self._engine = None
+        self._explain_pool = None
+        # Referencias estables para poder quitar los listeners
+        self._antes = self._antes_de_ejecutar
+        self._despues = self._despues_de_ejecutar
+
+    # ── Eventos ──
+
+    def instrumentar(self, engine):
+        self._engine = engine
+        if not event.contains(engine, "before_cursor_execute", self._antes):
+            event.listen(engine, "before_cursor_execute", self._antes)
+            event.listen(engine, "after_cursor_execute", self._despues)
+
+    def desinstrumentar(self):
+        if self._engine is not None and event.contains(self._engine, "before_cursor_execute", self._antes):
+            event.remove(self._engine, "before_cursor_execute", self._antes)
+            event.remove(self._engine, "after_cursor_execute", self._despues)
+        if self._explain_pool is not None:
+            self._explain_pool.shutdown(wait=True)
+            self._explain_pool = None
+
+    def _antes_de_ejecutar(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._lenta_inicio = time.perf_counter()
+
+    def _despues_de_ejecutar(self, conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "_lenta_inicio", None)
+        if inicio is None:
+            return
+        ms = (time.perf_counter() - inicio) * 1000
+        if ms >= self.umbral_ms:
+            self.observar(statement, parameters, ms, executemany)
+
+    # ── Registro ──
+
+    def observar(self, statement: str, parameters, ms: float, executemany: bool = False):
+        if statement.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        sql = normalizar_sql(statement)
+        huella = huella_sql(sql)
+        ruta = ruta_actual() or RUTA_DESCONOCIDA
+        lanzar_explain = False
+        with self._lock:
+            consulta = self._consultas.get(huella)
+            if consulta is None:
+                if len(self._consultas) >= MAX_HUELLAS:
+                    menor = min(self._consultas.values(), key=lambda c: c.suma_ms)
+                    del self._consultas[menor.huella]
+                consulta = self._consultas[huella] = _ConsultaLenta(huella, sql)
+            consulta.total += 1
+            consulta.suma_ms += ms
+            consulta.max_ms = max(consulta.max_ms, ms)
+            consulta.muestras.append(ms)
+            consulta.rutas[ruta] = consulta.rutas.get(ruta, 0) + 1
+            consulta.ultima_vez = datetime.utcnow()
+            if ms >= consulta.max_ms:
+                consulta.ejemplo = statement
+            if (self.muestreo_explain and not executemany and not consulta.explain_pendiente
+                    and statement.lstrip()[:6].upper() == "SELECT"
+                    and random.random() < self.muestreo_explain):
+                consulta.explain_pendiente = True
+                lanzar_explain = True
+        if lanzar_explain:
+            self._pool().submit(self._explicar, huella, statement, parameters)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._explain_pool is None:
+                self._explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+            return self._explain_pool
+
+    def _explicar(self, huella: str, statement: str, parameters):
+        plan = None
+        try:
+            raw = self._engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                cursor.execute(f"SET LOCAL statement_timeout = {EXPLAIN_TIMEOUT_MS}")
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters or None)
+                plan = cursor.fetchone()[0]
+            finally:
+                raw.rollback()
+                raw.close()
+        except Exception as e:
+            logger.warning("EXPLAIN falló para %s: %s", huella, e)
+        with self._lock:
+            consulta = self._consultas.get(huella)
+            if consulta is not None:
+                consulta.explain_pendiente = False
+                if plan is not None:
+                    consulta.plan = plan
+                    consulta.plan_fecha = datetime.utcnow()
+
+    # ── Lectura ──
+
+    def top(self, orden: str = "p95", limite: int = 20) -> list:
+        if orden not in self.ORDENES:
+            raise ValueError(f"Orden no válido: {orden}. Opciones: {', '.join(self.ORDENES)}")
+        with self._lock:
+            consultas = sorted(self._consultas.values(), key=self.ORDENES[orden], reverse=True)[:limite]
+            return [c.como_dict() for c in consultas]
+
+    def detalle(self, huella: str) -> Optional[dict]:
+        with self._lock:
+            consulta = self._consultas.get(huella)
+            return consulta.como_dict(con_plan=True) if consulta else None
+
+    def reiniciar(self):
+        with self._lock:
+            self._consultas.clear()
+
+
+registro = RegistroConsultasLentas()
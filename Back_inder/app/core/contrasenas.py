@@ -0,0 +1,143 @@
+# ============================================================
+# CONTRASEÑAS (bcrypt)
+# El hash y la verificación corren en un pool de hilos propio y acotado
+# (BCRYPT_WORKERS), no en el threadpool de los endpoints: una ráfaga de
+# logins hace cola aquí sin quitarle hilos al resto de peticiones. Si la
+# cola se llena se responde 503 con Retry-After.
+# El costo (rondas) sale de BCRYPT_RONDAS o, si es 0, se calibra al
+# arrancar para que un hash tarde ~BCRYPT_OBJETIVO_MS, nunca menos de
+# MIN_RONDAS. Al iniciar sesión, los hashes con menos rondas (o de un
+# esquema viejo) se vuelven a generar con los parámetros actuales.
+# ============================================================
+import asyncio
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Default anterior de passlib: la calibración nunca baja de aquí
+MIN_RONDAS = 12
+MAX_RONDAS = 16
+_RONDAS_MEDICION = 10
+_RONDAS_HASH = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+_lock = threading.Lock()
+_contexto: Optional[CryptContext] = None
+_rondas = 0
+_hash_ficticio = ""
+_pool: Optional[ThreadPoolExecutor] = None
+_cupos: Optional[threading.BoundedSemaphore] = None
+
+
+class PoolContrasenasSaturado(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Servidor ocupado, intente de nuevo",
+                         headers={"Retry-After": "1"})
+
+
+def calibrar(objetivo_ms: float) -> int:
+    """Rondas para que un hash tarde ~objetivo_ms en esta máquina."""
+    import bcrypt
+    muestras = []
+    for _ in range(2):
+        inicio = time.perf_counter()
+        bcrypt.hashpw(b"calibracion", bcrypt.gensalt(_RONDAS_MEDICION))
+        muestras.append(time.perf_counter() - inicio)
+    # Cada ronda extra duplica el trabajo
+    rondas = _RONDAS_MEDICION + round(math.log2(objetivo_ms / 1000 / min(muestras)))
+    return max(MIN_RONDAS, min(MAX_RONDAS, rondas))
+
+
+def configurar(rondas: Optional[int] = None, workers: Optional[int] = None):
+    """Fija rondas y pool. Sin argumentos usa settings (y calibra si BCRYPT_RONDAS = 0)."""
+    global _contexto, _rondas, _hash_ficticio, _pool, _cupos
+    rondas = rondas or settings.BCRYPT_RONDAS or calibrar(settings.BCRYPT_OBJETIVO_MS)
+    workers = workers or settings.BCRYPT_WORKERS or max(1, (os.cpu_count() or 1) // 2)
+    contexto = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rondas)
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _contexto, _rondas = contexto, rondas
+        _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        _cupos = threading.BoundedSemaphore(workers + settings.BCRYPT_COLA_MAX)
+    # Para verificar usuarios inexistentes con el mismo costo (no revela cuáles existen)
+    _hash_ficticio = contexto.hash(os.urandom(16).hex())
+    logger.info("bcrypt con %s rondas, %s hilos", rondas, workers)
+
+
+def _asegurar_configurado():
+    if _contexto is None:
+        configurar()
+
+
+def cerrar_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def rondas_actuales() -> int:
+    _asegurar_configurado()
+    return _rondas
+
+
+def requiere_rehash(hashed: str) -> bool:
+    """Solo sube el costo: una recalibración con menos rondas no reescribe hashes."""
+    coincidencia = _RONDAS_HASH.match(hashed or "")
+    if coincidencia is None or not hashed.startswith("$2b$"):
+        return True
+    return int(coincidencia.group(1)) < _rondas
+
+
+def _enviar(funcion, *args):
+    _asegurar_configurado()
+    if not _cupos.acquire(blocking=False):
+        raise PoolContrasenasSaturado()
+    try:
+        futuro = _pool.submit(funcion, *args)
+    except Exception:
+        _cupos.release()
+        raise
+    futuro.add_done_callback(lambda _: _cupos.release())
+    return futuro
+
+
+def _verificar(password: str, hashed: Optional[str]) -> tuple:
+    try:
+        valido = _contexto.verify(password, hashed or _hash_ficticio)
+    except ValueError:   # hash con formato desconocido
+        valido = False
+    if not valido or hashed is None:
+        return False, None
+    return True, (_contexto.hash(password) if requiere_rehash(hashed) else None)
+
+
+def _hashear(password: str) -> str:
+    return _contexto.hash(password)
+
+
+def hash_password(password: str) -> str:
+    """Hash con las rondas actuales (en el pool; bloquea al llamador)."""
+    return _enviar(_hashear, password).result()
+
+
+async def verificar(password: str, hashed: Optional[str]) -> tuple:
+    """
+    (válida, hash_nuevo) sin ocupar un hilo del threadpool de la app.
+    hashed=None (usuario inexistente) cuesta lo mismo y devuelve (False, None).
+    hash_nuevo no es None si hay que guardarlo (rehash).
+    """
+    return await asyncio.wrap_future(_enviar(_verificar, password, hashed))
@@ -2,13 +2,12 @@
 # DEPENDENCIES: get_db + get_current_user
 # Reemplaza app/core/dependencies.py
 # ============================================================
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from uuid import UUID
 
 from app.core.database import SessionLocal
-from app.crud.usuario import verificar_token, obtener_usuario
+from app.core.principal import cargar_principal
+from app.crud.usuario import verificar_token
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
@@ -22,25 +21,31 @@ def get_db():
 
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
 ):
-    if not credentials:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token requerido",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    payload = verificar_token(credentials.credentials)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido o expirado",
-        )
-    usuario = obtener_usuario(db, UUID(payload["sub"]))
-    if not usuario or not usuario.activo:
+    # El middleware ya decodificó el token y, si estaba en caché, dejó el principal
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        payload = getattr(request.state, "token_payload", None)
+        if payload is None:
+            if not credentials:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token requerido",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            payload = verificar_token(credentials.credentials)
+            if not payload:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token inválido o expirado",
+                )
+        principal = cargar_principal(payload)
+    if not principal or not principal.activo:
         raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
-    return usuario
+    request.state.principal = principal
+    return principal.usuario
 
 
 def require_admin(current_user=Depends(get_current_user)):
@@ -50,12 +55,16 @@ def require_admin(current_user=Depends(get_current_user)):
 
 
 def require_permiso(modulo: str, accion: str):
-    def _check(current_user=Depends(get_current_user)):
-        permisos = [(p.modulo, p.accion) for p in current_user.rol.permisos]
-        if (modulo, accion) not in permisos:
+    def _check(request: Request, current_user=Depends(get_current_user)):
+        principal = getattr(request.state, "principal", None)
+        if principal is not None:
+            permitido = principal.tiene_permiso(modulo, accion)
+        else:
+            permitido = any(p.modulo == modulo and p.accion == accion for p in current_user.rol.permisos)
+        if not permitido:
             raise HTTPException(
                 status_code=403,
                 detail=f"Sin permiso para {accion} en {modulo}"
             )
         return current_user
-    return _check
\ No newline at end of file
+    return _check
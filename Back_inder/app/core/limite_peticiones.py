@@ -0,0 +1,260 @@
+# ============================================================
+# LÍMITE DE PETICIONES (token bucket)
+# Cada clave (regla + IP, usuario, ...) tiene un balde de `capacidad`
+# fichas que se recarga a `por_segundo`; cada petición gasta una. Sin
+# fichas se responde 429 con Retry-After.
+#   - Por IP, en el middleware: rutas públicas (login, descarga segura,
+#     catálogos, CIE-11, CUPS) antes de tocar la BD o bcrypt
+#   - Por usuario y global, dentro de /auth/login: acota los bcrypt
+#     por segundo de todo el proceso (ver exigir_limite)
+# Almacén en memoria (por proceso, LRU acotada) o Redis si se configura
+# LIMITE_REDIS_URL y está instalado el cliente (compartido entre workers).
+# Redis es una llamada de red: desde código async se consulta en un hilo
+# (consumir_async) para no detener el event loop.
+# ============================================================
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import anyio
+from fastapi import HTTPException
+
+from app.core.auth_middleware import _responder_json
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_DISPONIBLE = True
+except ImportError:
+    REDIS_DISPONIBLE = False
+
+MAX_CLAVES = 100_000
+# Tras un fallo de Redis se usa solo memoria durante este tiempo
+REINTENTO_REDIS_SEGUNDOS = 5
+
+_CPUS = os.cpu_count() or 1
+
+
+@dataclass(frozen=True)
+class Regla:
+    capacidad: int       # ráfaga máxima
+    por_segundo: float   # recarga sostenida
+
+
+REGLAS = {
+    "login_ip":       Regla(10, 10 / 60),
+    "login_usuario":  Regla(5, 5 / 300),
+    # bcrypt: ~4 verificaciones/s por núcleo; sostenido, la mitad de la CPU
+    "login_global":   Regla(10 * _CPUS, 2 * _CPUS),
+    "descarga_ip":    Regla(20, 20 / 60),
+    "consulta_ip":    Regla(120, 4),
+}
+
+# Ruta pública (prefijo) -> regla por IP. Se prueba el prefijo más largo.
+REGLAS_POR_RUTA = {
+    "/api/v1/auth/login": "login_ip",
+    "/api/v1/descarga-segura/": "descarga_ip",
+    "/api/v1/catalogos": "consulta_ip",
+    "/api/v1/cie11": "consulta_ip",
+    "/api/v1/cups": "consulta_ip",
+}
+
+
+class AlmacenMemoria:
+    """Baldes en un dict (LRU acotada). Por proceso."""
+
+    bloqueante = False
+
+    def __init__(self, max_claves: int = MAX_CLAVES, reloj=time.monotonic):
+        self.max_claves = max_claves
+        self.reloj = reloj
+        self._baldes: "OrderedDict[str, list]" = OrderedDict()  # clave -> [fichas, actualizado]
+        self._lock = threading.Lock()
+
+    def consumir(self, clave: str, regla: Regla) -> float:
+        """0 si se permitió; si no, segundos hasta que haya una ficha."""
+        ahora = self.reloj()
+        with self._lock:
+            balde = self._baldes.get(clave)
+            if balde is None:
+                balde = self._baldes[clave] = [float(regla.capacidad), ahora]
+                while len(self._baldes) > self.max_claves:
+                    self._baldes.popitem(last=False)
+            else:
+                self._baldes.move_to_end(clave)
+                balde[0] = min(regla.capacidad, balde[0] + (ahora - balde[1]) * regla.por_segundo)
+                balde[1] = ahora
+            if balde[0] >= 1:
+                balde[0] -= 1
+                return 0.0
+            return (1 - balde[0]) / regla.por_segundo
+
+    def reiniciar(self, clave: str):
+        with self._lock:
+            self._baldes.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._baldes.clear()
+
+
+# Mismo algoritmo que AlmacenMemoria, atómico en Redis
+_LUA_CONSUMIR = """
+local capacidad = tonumber(ARGV[1])
+local tasa = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local datos = redis.call('HMGET', KEYS[1], 'f', 't')
+local fichas = tonumber(datos[1]) or capacidad
+local antes = tonumber(datos[2]) or ahora
+fichas = math.min(capacidad, fichas + math.max(ahora - antes, 0) * tasa)
+local espera = 0
+if fichas >= 1 then fichas = fichas - 1 else espera = (1 - fichas) / tasa end
+redis.call('HSET', KEYS[1], 'f', fichas, 't', ahora)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacidad / tasa * 1000))
+return tostring(espera)
+"""
+
+
+class AlmacenRedis:
+    """
+    Baldes en Redis, compartidos entre workers. Si Redis falla, usa memoria
+    durante REINTENTO_REDIS_SEGUNDOS (sin esperar el timeout en cada
+    petición) y avisa una sola vez por caída.
+    """
+
+    bloqueante = True
+
+    def __init__(self, url: str, prefijo: str = "limite:", reloj=time.monotonic):
+        self.prefijo = prefijo
+        self.reloj = reloj
+        self._cliente = redis.Redis.from_url(url, socket_timeout=0.2)
+        self._consumir = self._cliente.register_script(_LUA_CONSUMIR)
+        self._respaldo = AlmacenMemoria()
+        self._caido = False
+        self._reintentar_en = 0.0
+
+    def consumir(self, clave: str, regla: Regla) -> float:
+        if self._caido and self.reloj() < self._reintentar_en:
+            return self._respaldo.consumir(clave, regla)
+        try:
+            espera = float(self._consumir(keys=[self.prefijo + clave],
+                                          args=[regla.capacidad, regla.por_segundo, time.time()]))
+        except redis.RedisError as e:
+            if not self._caido:
+                logger.warning("Redis no disponible, se usa memoria (reintento cada %ss): %s",
+                               REINTENTO_REDIS_SEGUNDOS, e)
+            self._caido = True
+            self._reintentar_en = self.reloj() + REINTENTO_REDIS_SEGUNDOS
+            return self._respaldo.consumir(clave, regla)
+        if self._caido:
+            self._caido = False
+            logger.info("Redis disponible de nuevo para el límite de peticiones")
+        return espera
+
+    def reiniciar(self, clave: str):
+        self._respaldo.reiniciar(clave)
+        try:
+            self._cliente.delete(self.prefijo + clave)
+        except redis.RedisError:
+            pass
+
+    def limpiar(self):
+        self._respaldo.limpiar()
+
+
+def _crear_almacen():
+    if settings.LIMITE_REDIS_URL:
+        if REDIS_DISPONIBLE:
+            return AlmacenRedis(settings.LIMITE_REDIS_URL)
+        logger.warning("LIMITE_REDIS_URL definido pero el paquete redis no está instalado; se usa memoria")
+    return AlmacenMemoria()
+
+
+almacen = _crear_almacen()
+
+
+def consumir(regla: str, clave: str) -> float:
+    """0 si se permitió; si no, segundos de espera (para Retry-After)."""
+    if not settings.LIMITE_PETICIONES_ACTIVO:
+        return 0.0
+    return almacen.consumir(f"{regla}:{clave}", REGLAS[regla])
+
+
+async def consumir_async(regla: str, clave: str) -> float:
+    """consumir() para código async: si el almacén hace E/S corre en un hilo."""
+    if almacen.bloqueante:
+        return await anyio.to_thread.run_sync(consumir, regla, clave)
+    return consumir(regla, clave)
+
+
+def reiniciar(regla: str, clave: str):
+    almacen.reiniciar(f"{regla}:{clave}")
+
+
+def _reintentar(espera: float) -> str:
+    return str(max(1, math.ceil(espera)))
+
+
+async def exigir_limite(regla: str, clave: str = ""):
+    """Para usar dentro de un endpoint: HTTPException 429 + Retry-After si no hay fichas."""
+    espera = await consumir_async(regla, clave)
+    if espera:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados intentos. Intente de nuevo más tarde.",
+            headers={"Retry-After": _reintentar(espera)},
+        )
+
+
+# ── Middleware (por IP) ──────────────────────────────────────
+
+def compilar_reglas_por_ruta(reglas=REGLAS_POR_RUTA):
+    prefijos = sorted(reglas, key=len, reverse=True)
+    return re.compile("|".join(f"({re.escape(p)})" for p in prefijos)), prefijos
+
+
+def ip_cliente(scope) -> str:
+    if settings.LIMITE_CONFIAR_PROXY:
+        for clave, valor in scope["headers"]:
+            if clave == b"x-forwarded-for":
+                # La última IP la agregó nuestro proxy; las anteriores las manda el cliente
+                return valor.decode("latin-1").split(",")[-1].strip()
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "desconocido"
+
+
+class LimitePeticionesMiddleware:
+    """
+    Aplica REGLAS_POR_RUTA por IP. Middleware ASGI puro, como el de auth:
+    la respuesta 429 lleva Retry-After y los headers CORS.
+    """
+
+    def __init__(self, app, reglas_por_ruta=REGLAS_POR_RUTA):
+        self.app = app
+        self._regex, self._prefijos = compilar_reglas_por_ruta(reglas_por_ruta)
+        self._reglas = reglas_por_ruta
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        coincidencia = self._regex.match(scope["path"])
+        if coincidencia:
+            regla = self._reglas[self._prefijos[coincidencia.lastindex - 1]]
+            espera = await consumir_async(regla, ip_cliente(scope))
+            if espera:
+                await _responder_json(
+                    send, 429, {"detail": "Demasiadas peticiones. Intente de nuevo más tarde."},
+                    headers=[(b"retry-after", _reintentar(espera).encode("latin-1"))],
+                )
+                return
+
+        await self.app(scope, receive, send)
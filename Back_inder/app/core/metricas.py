@@ -0,0 +1,229 @@
+# ============================================================
+# MÉTRICAS POR RUTA (formato de texto de Prometheus, GET /metrics)
+# Por método + plantilla de ruta (/api/v1/deportistas/{deportista_id}):
+#   - histograma de latencia de la petición
+#   - peticiones por código de estado
+#   - sentencias SQL, tiempo SQL y filas devueltas (eventos de SQLAlchemy)
+#   - histograma de sentencias por petición: un N+1 sube las colas de inmediato
+# Fuera de producción cada respuesta lleva la cabecera X-Debug-Metricas.
+# Los contadores son por proceso; con varios workers Prometheus los suma.
+# ============================================================
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_SENTENCIAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Peticiones que no llegan a una ruta (404, 401 del middleware): una sola
+# etiqueta para no crear una serie por URL
+RUTA_DESCONOCIDA = "sin_ruta"
+
+CABECERA_DEBUG = b"x-debug-metricas"
+
+
+@dataclass
+class MedicionPeticion:
+    sql_sentencias: int = 0
+    sql_segundos: float = 0.0
+    sql_filas: int = 0
+    scope: Optional[dict] = None
+
+
+# Medición de la petición en curso. El threadpool de los endpoints
+# síncronos copia el contexto, así que comparten el mismo objeto.
+medicion_actual: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_actual", default=None)
+
+
+def ruta_actual() -> Optional[str]:
+    """Plantilla de ruta de la petición en curso (None fuera de una petición o antes del routing)."""
+    medicion = medicion_actual.get()
+    ruta = medicion.scope.get("route") if medicion and medicion.scope else None
+    return getattr(ruta, "path", None)
+
+
+class _Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)   # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.cuentas[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        acumulado = 0
+        for limite, cuenta in zip(self.limites + ("+Inf",), self.cuentas):
+            acumulado += cuenta
+            yield limite, acumulado
+
+
+class _MetricasRuta:
+    def __init__(self):
+        self.latencia = _Histograma(BUCKETS_LATENCIA)
+        self.sentencias_por_peticion = _Histograma(BUCKETS_SENTENCIAS)
+        self.por_estado = {}
+        self.sql_sentencias = 0
+        self.sql_segundos = 0.0
+        self.sql_filas = 0
+
+
+def _etiqueta(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rutas = {}   # (metodo, ruta) -> _MetricasRuta
+
+    def observar(self, metodo: str, ruta: str, estado: int, segundos: float, medicion: MedicionPeticion):
+        with self._lock:
+            m = self._rutas.get((metodo, ruta))
+            if m is None:
+                m = self._rutas[(metodo, ruta)] = _MetricasRuta()
+            m.latencia.observar(segundos)
+            m.sentencias_por_peticion.observar(medicion.sql_sentencias)
+            m.por_estado[estado] = m.por_estado.get(estado, 0) + 1
+            m.sql_sentencias += medicion.sql_sentencias
+            m.sql_segundos += medicion.sql_segundos
+            m.sql_filas += medicion.sql_filas
+
+    def reiniciar(self):
+        with self._lock:
+            self._rutas.clear()
+
+    def exportar(self) -> str:
+        """Formato de exposición de texto de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            rutas = sorted(self._rutas.items())
+            lineas = []
+
+            def histograma(nombre, ayuda, atributo):
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} histogram")
+                for (metodo, ruta), m in rutas:
+                    h = getattr(m, atributo)
+                    base = f'metodo="{_etiqueta(metodo)}",ruta="{_etiqueta(ruta)}"'
+                    for limite, acumulado in h.acumulados():
+                        lineas.append(f'{nombre}_bucket{{{base},le="{limite}"}} {acumulado}')
+                    lineas.append(f"{nombre}_sum{{{base}}} {h.suma}")
+                    lineas.append(f"{nombre}_count{{{base}}} {h.total}")
+
+            def contador(nombre, ayuda, atributo):
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} counter")
+                for (metodo, ruta), m in rutas:
+                    lineas.append(
+                        f'{nombre}{{metodo="{_etiqueta(metodo)}",ruta="{_etiqueta(ruta)}"}} {getattr(m, atributo)}'
+                    )
+
+            histograma("inder_http_duracion_segundos", "Latencia de la petición por ruta.", "latencia")
+            lineas.append("# HELP inder_http_peticiones_total Peticiones por ruta y código de estado.")
+            lineas.append("# TYPE inder_http_peticiones_total counter")
+            for (metodo, ruta), m in rutas:
+                for estado, n in sorted(m.por_estado.items()):
+                    lineas.append(
+                        f'inder_http_peticiones_total{{metodo="{_etiqueta(metodo)}",ruta="{_etiqueta(ruta)}",'
+                        f'estado="{estado}"}} {n}'
+                    )
+            histograma("inder_sql_sentencias_por_peticion", "Sentencias SQL ejecutadas por petición.",
+                       "sentencias_por_peticion")
+            contador("inder_sql_sentencias_total", "Sentencias SQL ejecutadas.", "sql_sentencias")
+            contador("inder_sql_duracion_segundos_total", "Tiempo total en sentencias SQL.", "sql_segundos")
+            contador("inder_sql_filas_total", "Filas devueltas por las sentencias SQL.", "sql_filas")
+        return "\n".join(lineas) + "\n"
+
+
+registro = RegistroMetricas()
+
+
+# ── Eventos de SQLAlchemy ────────────────────────────────────
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and medicion_actual.get() is not None:
+        context._metricas_inicio = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    medicion = medicion_actual.get()
+    inicio = getattr(context, "_metricas_inicio", None)
+    if medicion is None or inicio is None:
+        return
+    medicion.sql_sentencias += 1
+    medicion.sql_segundos += time.perf_counter() - inicio
+    # Solo sentencias que devuelven filas (SELECT, ... RETURNING)
+    if cursor.description is not None and cursor.rowcount > 0:
+        medicion.sql_filas += cursor.rowcount
+
+
+def instrumentar_engine(engine):
+    """Registra los eventos de conteo/tiempo SQL en el engine (idempotente)."""
+    if not event.contains(engine, "before_cursor_execute", _antes_de_ejecutar):
+        event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+        event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+
+# ── Middleware ASGI ──────────────────────────────────────────
+
+def cabecera_debug_activa() -> bool:
+    return settings.APP_ENV.lower() not in ("production", "produccion", "prod")
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición HTTP y la registra con la plantilla de ruta que
+    resolvió FastAPI (scope["route"]). No envuelve el cuerpo: solo
+    observa http.response.start para el estado y la cabecera de debug
+    (que refleja el SQL hecho hasta que empieza la respuesta).
+    """
+
+    def __init__(self, app, registro: RegistroMetricas = registro, cabecera_debug: Optional[bool] = None):
+        self.app = app
+        self.registro = registro
+        self.cabecera_debug = cabecera_debug_activa() if cabecera_debug is None else cabecera_debug
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionPeticion(scope=scope)
+        token_ctx = medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        estado = 500
+
+        async def send_medido(message):
+            nonlocal estado
+            if message["type"] == "http.response.start":
+                estado = message["status"]
+                if self.cabecera_debug:
+                    valor = (
+                        f"sql={medicion.sql_sentencias}; sql_ms={medicion.sql_segundos * 1000:.1f}; "
+                        f"filas={medicion.sql_filas}; ms={(time.perf_counter() - inicio) * 1000:.1f}"
+                    )
+                    message["headers"] = [*message.get("headers", []), (CABECERA_DEBUG, valor.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            medicion_actual.reset(token_ctx)
+            ruta = scope.get("route")
+            self.registro.observar(
+                scope["method"],
+                getattr(ruta, "path", None) or RUTA_DESCONOCIDA,
+                estado,
+                time.perf_counter() - inicio,
+                medicion,
+            )
@@ -0,0 +1,129 @@
+"""
+Ejecutor de migraciones SQL versionadas.
+
+Aplica en orden los archivos migrations/NNN_nombre.sql que aún no estén
+registrados en la tabla schema_migraciones.
+
+- Por defecto cada archivo se ejecuta completo dentro de una transacción
+  (admite bloques DO $$ ... $$).
+- Si la primera línea es "-- migracion: sin-transaccion" se ejecuta en
+  autocommit, sentencia por sentencia. Es obligatorio para
+  CREATE INDEX CONCURRENTLY.
+
+Los archivos .py de migrations/ son históricos (solo documentación) y se ignoran.
+"""
+import re
+from pathlib import Path
+from typing import List, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent.parent / "migrations"
+MARCA_SIN_TRANSACCION = "-- migracion: sin-transaccion"
+
+_PATRON_ARCHIVO = re.compile(r"^(\d{3})_(.+)\.sql$")
+
+_SQL_TABLA_CONTROL = """
+CREATE TABLE IF NOT EXISTS schema_migraciones (
+    version     VARCHAR(10) PRIMARY KEY,
+    nombre      VARCHAR(255) NOT NULL,
+    aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migracion(NamedTuple):
+    version: str
+    nombre: str
+    ruta: Path
+
+    @property
+    def sin_transaccion(self) -> bool:
+        with open(self.ruta, encoding="utf-8") as f:
+            return f.readline().strip().lower() == MARCA_SIN_TRANSACCION
+
+
+def listar_migraciones(directorio: Path = MIGRATIONS_DIR) -> List[Migracion]:
+    """Migraciones .sql del directorio, ordenadas por versión."""
+    migraciones = []
+    for ruta in sorted(directorio.glob("*.sql")):
+        m = _PATRON_ARCHIVO.match(ruta.name)
+        if m:
+            migraciones.append(Migracion(m.group(1), m.group(2), ruta))
+    return migraciones
+
+
+def dividir_sentencias(sql: str) -> List[str]:
+    """
+    Divide un script en sentencias por ';'. Solo se usa para migraciones
+    sin transacción, que no deben contener bloques DO $$ ni funciones.
+    """
+    sin_comentarios = "\n".join(
+        linea for linea in sql.splitlines() if not linea.strip().startswith("--")
+    )
+    return [s.strip() for s in sin_comentarios.split(";") if s.strip()]
+
+
+def versiones_aplicadas(engine: Engine) -> set:
+    with engine.begin() as conn:
+        conn.execute(text(_SQL_TABLA_CONTROL))
+        return {r[0] for r in conn.execute(text("SELECT version FROM schema_migraciones"))}
+
+
+def _indices_invalidos(conn) -> List[str]:
+    # Un CREATE INDEX CONCURRENTLY interrumpido deja el índice marcado como inválido;
+    # IF NOT EXISTS lo daría por creado en el siguiente intento.
+    filas = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+    """))
+    return [r[0] for r in filas]
+
+
+def aplicar_migracion(engine: Engine, migracion: Migracion) -> None:
+    with open(migracion.ruta, encoding="utf-8") as f:
+        sql = f.read()
+
+    if migracion.sin_transaccion:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # CONCURRENTLY puede tardar bastante más que el statement_timeout del pool
+            conn.execute(text("SET statement_timeout = 0"))
+            for sentencia in dividir_sentencias(sql):
+                conn.exec_driver_sql(sentencia)
+            invalidos = _indices_invalidos(conn)
+            if invalidos:
+                raise RuntimeError(
+                    f"Índices inválidos tras {migracion.ruta.name}: {', '.join(invalidos)}. "
+                    "Eliminarlos con DROP INDEX CONCURRENTLY y volver a ejecutar."
+                )
+            conn.execute(
+                text("INSERT INTO schema_migraciones (version, nombre) VALUES (:v, :n)"),
+                {"v": migracion.version, "n": migracion.nombre},
+            )
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+            conn.execute(
+                text("INSERT INTO schema_migraciones (version, nombre) VALUES (:v, :n)"),
+                {"v": migracion.version, "n": migracion.nombre},
+            )
+
+
+def migraciones_pendientes(engine: Engine, directorio: Path = MIGRATIONS_DIR) -> List[Migracion]:
+    aplicadas = versiones_aplicadas(engine)
+    return [m for m in listar_migraciones(directorio) if m.version not in aplicadas]
+
+
+def aplicar_pendientes(engine: Engine, directorio: Path = MIGRATIONS_DIR) -> List[Migracion]:
+    """Aplica las migraciones pendientes en orden. Se detiene en el primer error."""
+    aplicadas = []
+    for migracion in migraciones_pendientes(engine, directorio):
+        print(f"[MIGRACION] Aplicando {migracion.ruta.name}...")
+        aplicar_migracion(engine, migracion)
+        aplicadas.append(migracion)
+        print(f"[MIGRACION] {migracion.ruta.name} OK")
+    return aplicadas
@@ -0,0 +1,132 @@
+# ============================================================
+# CACHÉ DEL USUARIO AUTENTICADO (principal)
+# Evita decodificar el JWT dos veces y consultar Usuario/Rol/Permisos
+# en cada petición. Clave: (user_id, iat del token). TTL corto e
+# invalidación explícita al modificar usuarios, roles o permisos.
+# La caché es por proceso: con varios workers el TTL acota el desfase.
+# ============================================================
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy.orm import joinedload
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+MAX_ENTRADAS = 5000
+
+# Id (sub del JWT) del usuario de la petición en curso. Lo fija el
+# AuthMiddleware; lo leen los registros de auditoría (revisiones).
+usuario_actual: ContextVar[Optional[str]] = ContextVar("usuario_actual", default=None)
+
+
+@dataclass(frozen=True)
+class Principal:
+    usuario_id: str
+    rol_id: Optional[str]
+    rol: Optional[str]
+    permisos: frozenset  # {(modulo, accion), ...}
+    activo: bool
+    usuario: object      # Usuario desvinculado de la sesión, con rol y permisos cargados
+
+    def tiene_permiso(self, modulo: str, accion: str) -> bool:
+        return (modulo, accion) in self.permisos
+
+
+_cache: dict = {}  # (usuario_id, iat) -> (expira_en, Principal)
+_lock = threading.Lock()
+
+
+def _clave(payload: dict) -> Optional[tuple]:
+    sub = payload.get("sub") if payload else None
+    if not sub:
+        return None
+    # Tokens emitidos antes de incluir "iat": se usa "exp", también único por token
+    return (str(sub), payload.get("iat") or payload.get("exp"))
+
+
+def obtener_principal(payload: dict) -> Optional[Principal]:
+    """Solo memoria, sin BD. Seguro de llamar desde el middleware async."""
+    clave = _clave(payload)
+    if clave is None:
+        return None
+    with _lock:
+        entrada = _cache.get(clave)
+        if entrada is None:
+            return None
+        if entrada[0] < time.monotonic():
+            del _cache[clave]
+            return None
+        return entrada[1]
+
+
+def cargar_principal(payload: dict) -> Optional[Principal]:
+    """Busca en caché y, si no está, carga usuario + rol + permisos de la BD."""
+    principal = obtener_principal(payload)
+    if principal is not None:
+        return principal
+
+    clave = _clave(payload)
+    if clave is None:
+        return None
+    try:
+        usuario_id = UUID(clave[0])
+    except ValueError:
+        return None
+
+    from app.models.usuario import Usuario, Rol
+
+    # Sesión propia: al cerrarse, los objetos quedan desvinculados con todo cargado
+    with SessionLocal() as db:
+        usuario = (
+            db.query(Usuario)
+            .options(joinedload(Usuario.rol).selectinload(Rol.permisos))
+            .filter(Usuario.id == usuario_id)
+            .first()
+        )
+        if usuario is None:
+            return None
+        rol = usuario.rol
+        principal = Principal(
+            usuario_id=str(usuario.id),
+            rol_id=str(rol.id) if rol else None,
+            rol=rol.nombre if rol else None,
+            permisos=frozenset((p.modulo, p.accion) for p in rol.permisos) if rol else frozenset(),
+            activo=bool(usuario.activo),
+            usuario=usuario,
+        )
+
+    with _lock:
+        if len(_cache) >= MAX_ENTRADAS:
+            ahora = time.monotonic()
+            for k in [k for k, (exp, _) in _cache.items() if exp < ahora]:
+                del _cache[k]
+            if len(_cache) >= MAX_ENTRADAS:
+                _cache.pop(next(iter(_cache)))
+        _cache[clave] = (time.monotonic() + settings.PRINCIPAL_CACHE_TTL, principal)
+    return principal
+
+
+# ── Invalidación ─────────────────────────────────────────────
+
+def invalidar_usuario(usuario_id) -> None:
+    usuario_id = str(usuario_id)
+    with _lock:
+        for k in [k for k in _cache if k[0] == usuario_id]:
+            del _cache[k]
+
+
+def invalidar_rol(rol_id) -> None:
+    rol_id = str(rol_id)
+    with _lock:
+        for k in [k for k, (_, p) in _cache.items() if p.rol_id == rol_id]:
+            del _cache[k]
+
+
+def invalidar_todo() -> None:
+    with _lock:
+        _cache.clear()
@@ -1,13 +1,18 @@
 """
 CRUD operations para Historia Clínica - Datos normalizados
 """
+from functools import lru_cache
+from typing import Annotated, Any, Optional
+from sqlalchemy import String, bindparam
 from sqlalchemy.orm import Session
 from uuid import UUID
+from pydantic import ConfigDict, StringConstraints, ValidationError, create_model
 from app.models.antecedentes import (
     AntecedentesPersonales, AntecedentesFamiliares, LesioneDeportivas,
     CirugiasPrivas, Alergias, Medicaciones, VacunasAdministradas,
     RevisionSistemas, SignosVitales, PruebasComplementarias,
-    Diagnosticos, PlanTratamiento, RemisionesEspecialistas, VacunasDeportista
+    Diagnosticos, PlanTratamiento, RemisionesEspecialistas, VacunasDeportista,
+    MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas
 )
 from app.schemas.antecedentes import (
     AntecedentesPersonalesCreate, AntecedentesFamiliaresCreate,
@@ -18,6 +23,12 @@ from app.schemas.antecedentes import (
 )
 from datetime import datetime
 import os
+from app.services.almacenamiento_service import liberar_archivo
+from app.services.revisiones_service import (
+    registrar_cambio_seccion, registrar_revision, leer_seccion, SECCIONES
+)
+from app.crud.lote import LoteEscritura
+from app.models.historia import HistoriaClinica
 
 
 
@@ -29,6 +40,7 @@ import os
 def crear_antecedente_personal(db: Session, data: AntecedentesPersonalesCreate):
     db_obj = AntecedentesPersonales(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, AntecedentesPersonales)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -41,7 +53,10 @@ def obtener_antecedentes_personales(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_antecedente_personal(db: Session, antecedente_id: UUID):
+    historia_id = db.query(AntecedentesPersonales.historia_clinica_id).filter(AntecedentesPersonales.id == antecedente_id).scalar()
     db.query(AntecedentesPersonales).filter(AntecedentesPersonales.id == antecedente_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, AntecedentesPersonales)
     db.commit()
 
 
@@ -52,6 +67,7 @@ def eliminar_antecedente_personal(db: Session, antecedente_id: UUID):
 def crear_antecedente_familiar(db: Session, data: AntecedentesFamiliaresCreate):
     db_obj = AntecedentesFamiliares(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, AntecedentesFamiliares)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -64,7 +80,10 @@ def obtener_antecedentes_familiares(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_antecedente_familiar(db: Session, antecedente_id: UUID):
+    historia_id = db.query(AntecedentesFamiliares.historia_clinica_id).filter(AntecedentesFamiliares.id == antecedente_id).scalar()
     db.query(AntecedentesFamiliares).filter(AntecedentesFamiliares.id == antecedente_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, AntecedentesFamiliares)
     db.commit()
 
 
@@ -75,6 +94,7 @@ def eliminar_antecedente_familiar(db: Session, antecedente_id: UUID):
 def crear_lesion_deportiva(db: Session, data: LesioneDeportavasCreate):
     db_obj = LesioneDeportivas(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, LesioneDeportivas)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -87,7 +107,10 @@ def obtener_lesiones_deportivas(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_lesion_deportiva(db: Session, lesion_id: UUID):
+    historia_id = db.query(LesioneDeportivas.historia_clinica_id).filter(LesioneDeportivas.id == lesion_id).scalar()
     db.query(LesioneDeportivas).filter(LesioneDeportivas.id == lesion_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, LesioneDeportivas)
     db.commit()
 
 
@@ -98,6 +121,7 @@ def eliminar_lesion_deportiva(db: Session, lesion_id: UUID):
 def crear_cirugia(db: Session, data: CirugiasPrivasCreate):
     db_obj = CirugiasPrivas(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, CirugiasPrivas)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -110,7 +134,10 @@ def obtener_cirugias(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_cirugia(db: Session, cirugia_id: UUID):
+    historia_id = db.query(CirugiasPrivas.historia_clinica_id).filter(CirugiasPrivas.id == cirugia_id).scalar()
     db.query(CirugiasPrivas).filter(CirugiasPrivas.id == cirugia_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, CirugiasPrivas)
     db.commit()
 
 
@@ -121,6 +148,7 @@ def eliminar_cirugia(db: Session, cirugia_id: UUID):
 def crear_alergia(db: Session, data: AlergiasCreate):
     db_obj = Alergias(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, Alergias)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -133,7 +161,10 @@ def obtener_alergias(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_alergia(db: Session, alergia_id: UUID):
+    historia_id = db.query(Alergias.historia_clinica_id).filter(Alergias.id == alergia_id).scalar()
     db.query(Alergias).filter(Alergias.id == alergia_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, Alergias)
     db.commit()
 
 
@@ -156,13 +187,16 @@ def crear_vacuna_deportista(db: Session, deportista_id: UUID, data: VacunaDeport
     return db_obj
 
 
-def actualizar_archivo_vacuna(db: Session, vacuna_id: UUID, ruta_archivo: str, nombre_archivo: str, tipo_archivo: str):
+def actualizar_archivo_vacuna(db: Session, vacuna_id: UUID, ruta_archivo: str, nombre_archivo: str, tipo_archivo: str,
+                              hash_sha256: str = None, tamano_bytes: int = None):
     """Actualizar la información del archivo en la vacuna"""
     vacuna = db.query(VacunasDeportista).filter(VacunasDeportista.id == vacuna_id).first()
     if vacuna:
         vacuna.ruta_archivo = ruta_archivo
         vacuna.nombre_archivo = nombre_archivo
         vacuna.tipo_archivo = tipo_archivo
+        vacuna.hash_sha256 = hash_sha256
+        vacuna.tamano_bytes = tamano_bytes
         vacuna.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(vacuna)
@@ -216,20 +250,16 @@ def actualizar_vacuna(db: Session, vacuna_id: UUID, data: VacunaDeportistaCreate
 # ELIMINAR VACUNA
 # ============================================================================
 
-def eliminar_vacuna(db: Session, vacuna_id: UUID, eliminar_archivo: bool = True):
+def eliminar_vacuna_deportista(db: Session, vacuna_id: UUID, eliminar_archivo: bool = True):
     """Eliminar una vacuna y opcionalmente su archivo"""
     vacuna = obtener_vacuna_por_id(db, vacuna_id)
     if vacuna:
-        # Eliminar archivo si existe
-        if eliminar_archivo and vacuna.ruta_archivo:
-            try:
-                if os.path.exists(vacuna.ruta_archivo):
-                    os.remove(vacuna.ruta_archivo)
-            except Exception as e:
-                print(f"Error eliminando archivo: {e}")
-        
+        ruta = vacuna.ruta_archivo
         db.delete(vacuna)
         db.commit()
+        # El objeto puede estar compartido con otros registros (mismo hash)
+        if eliminar_archivo and ruta:
+            liberar_archivo(db, ruta)
         return True
     return False
 
@@ -254,6 +284,7 @@ def obtener_vacunas_predefinidas():
 def crear_medicacion(db: Session, data: MedicacionesCreate):
     db_obj = Medicaciones(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, Medicaciones)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -266,7 +297,10 @@ def obtener_medicaciones(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_medicacion(db: Session, medicacion_id: UUID):
+    historia_id = db.query(Medicaciones.historia_clinica_id).filter(Medicaciones.id == medicacion_id).scalar()
     db.query(Medicaciones).filter(Medicaciones.id == medicacion_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, Medicaciones)
     db.commit()
 
 
@@ -277,6 +311,7 @@ def eliminar_medicacion(db: Session, medicacion_id: UUID):
 def crear_vacuna(db: Session, data: VacunasAdministradasCreate):
     db_obj = VacunasAdministradas(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, VacunasAdministradas)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -289,7 +324,10 @@ def obtener_vacunas(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_vacuna(db: Session, vacuna_id: UUID):
+    historia_id = db.query(VacunasAdministradas.historia_clinica_id).filter(VacunasAdministradas.id == vacuna_id).scalar()
     db.query(VacunasAdministradas).filter(VacunasAdministradas.id == vacuna_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, VacunasAdministradas)
     db.commit()
 
 
@@ -300,6 +338,7 @@ def eliminar_vacuna(db: Session, vacuna_id: UUID):
 def crear_revision_sistema(db: Session, data: RevisionSistemasCreate):
     db_obj = RevisionSistemas(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, RevisionSistemas)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -312,7 +351,10 @@ def obtener_revision_sistemas(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_revision_sistema(db: Session, revision_id: UUID):
+    historia_id = db.query(RevisionSistemas.historia_clinica_id).filter(RevisionSistemas.id == revision_id).scalar()
     db.query(RevisionSistemas).filter(RevisionSistemas.id == revision_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, RevisionSistemas)
     db.commit()
 
 
@@ -323,6 +365,7 @@ def eliminar_revision_sistema(db: Session, revision_id: UUID):
 def crear_signos_vitales(db: Session, data: SignosVitalesCreate):
     db_obj = SignosVitales(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, SignosVitales)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -339,6 +382,7 @@ def actualizar_signos_vitales(db: Session, historia_clinica_id: UUID, data: Sign
     if sv:
         for key, value in data.dict().items():
             setattr(sv, key, value)
+        registrar_cambio_seccion(db, sv.historia_clinica_id, SignosVitales)
         db.commit()
         db.refresh(sv)
         return sv
@@ -353,6 +397,7 @@ def actualizar_signos_vitales(db: Session, historia_clinica_id: UUID, data: Sign
 def crear_prueba_complementaria(db: Session, data: PruebasComplementariasCreate):
     db_obj = PruebasComplementarias(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, PruebasComplementarias)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -375,13 +420,17 @@ def actualizar_prueba_complementaria(db: Session, prueba_id: UUID, data: Pruebas
     if prueba:
         for key, value in data.dict(exclude_unset=True).items():
             setattr(prueba, key, value)
+        registrar_cambio_seccion(db, prueba.historia_clinica_id, PruebasComplementarias)
         db.commit()
         db.refresh(prueba)
     return prueba
 
 
 def eliminar_prueba_complementaria(db: Session, prueba_id: UUID):
+    historia_id = db.query(PruebasComplementarias.historia_clinica_id).filter(PruebasComplementarias.id == prueba_id).scalar()
     db.query(PruebasComplementarias).filter(PruebasComplementarias.id == prueba_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, PruebasComplementarias)
     db.commit()
 
 
@@ -392,6 +441,7 @@ def eliminar_prueba_complementaria(db: Session, prueba_id: UUID):
 def crear_diagnostico(db: Session, data: DiagnosticosCreate):
     db_obj = Diagnosticos(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, Diagnosticos)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -404,7 +454,10 @@ def obtener_diagnosticos(db: Session, historia_clinica_id: UUID):
 
 
 def eliminar_diagnostico(db: Session, diagnostico_id: UUID):
+    historia_id = db.query(Diagnosticos.historia_clinica_id).filter(Diagnosticos.id == diagnostico_id).scalar()
     db.query(Diagnosticos).filter(Diagnosticos.id == diagnostico_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, Diagnosticos)
     db.commit()
 
 
@@ -415,6 +468,7 @@ def eliminar_diagnostico(db: Session, diagnostico_id: UUID):
 def crear_plan_tratamiento(db: Session, data: PlanTratamientoCreate):
     db_obj = PlanTratamiento(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, PlanTratamiento)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -431,6 +485,7 @@ def actualizar_plan_tratamiento(db: Session, historia_clinica_id: UUID, data: Pl
     if plan:
         for key, value in data.dict(exclude_unset=True).items():
             setattr(plan, key, value)
+        registrar_cambio_seccion(db, plan.historia_clinica_id, PlanTratamiento)
         db.commit()
         db.refresh(plan)
         return plan
@@ -445,6 +500,7 @@ def actualizar_plan_tratamiento(db: Session, historia_clinica_id: UUID, data: Pl
 def crear_remision(db: Session, data: RemisionesEspecialistasCreate):
     db_obj = RemisionesEspecialistas(**data.dict())
     db.add(db_obj)
+    registrar_cambio_seccion(db, db_obj.historia_clinica_id, RemisionesEspecialistas)
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -466,5 +522,223 @@ def obtener_remisiones_urgentes(db: Session, historia_clinica_id: UUID = None):
 
 
 def eliminar_remision(db: Session, remision_id: UUID):
+    historia_id = db.query(RemisionesEspecialistas.historia_clinica_id).filter(RemisionesEspecialistas.id == remision_id).scalar()
     db.query(RemisionesEspecialistas).filter(RemisionesEspecialistas.id == remision_id).delete()
+    if historia_id:
+        registrar_cambio_seccion(db, historia_id, RemisionesEspecialistas)
     db.commit()
+
+
+# ============================================================================
+# LECTURA COMPUESTA DE SECCIONES
+# ============================================================================
+
+MAX_HISTORIAS_SECCIONES = 200
+
+
+def obtener_secciones(db: Session, historia_ids: list, secciones: list = None) -> dict:
+    """
+    Devuelve {historia_id: {seccion: [filas]}} para varias historias con una
+    sola consulta IN por sección (en lugar de una petición por sección e
+    historia). Las filas se leen como columnas, sin instanciar objetos ORM.
+
+    secciones: nombres de SECCIONES (revisiones_service); None = todas.
+    """
+    nombres = list(secciones) if secciones else list(SECCIONES)
+    invalidas = [s for s in nombres if s not in SECCIONES]
+    if invalidas:
+        raise ValueError(f"Secciones no válidas: {', '.join(invalidas)}")
+    if len(historia_ids) > MAX_HISTORIAS_SECCIONES:
+        raise ValueError(f"Máximo {MAX_HISTORIAS_SECCIONES} historias por consulta")
+
+    resultado = {hid: {s: [] for s in nombres} for hid in historia_ids}
+    if not historia_ids:
+        return resultado
+
+    for seccion in nombres:
+        modelo = SECCIONES[seccion]
+        filas = db.query(*modelo.__table__.columns).filter(
+            modelo.historia_clinica_id.in_(historia_ids)
+        ).order_by(modelo.historia_clinica_id, modelo.created_at, modelo.id).all()
+        for fila in filas:
+            datos = dict(fila._mapping)
+            resultado[datos.pop("historia_clinica_id")][seccion].append(datos)
+    return resultado
+
+
+# ============================================================================
+# ESCRITURA POR LOTES DE SECCIONES
+# ============================================================================
+
+MAX_OPERACIONES_LOTE = 500
+ACCIONES_LOTE = ("crear", "actualizar", "eliminar")
+
+# Las pone el servidor; no se aceptan en los datos de una operación
+_COLUMNAS_PROTEGIDAS = {"id", "historia_clinica_id", "created_at"}
+
+# Una sola fila por historia: un segundo "crear" se rechaza (usar "actualizar")
+SECCIONES_UNICAS = {
+    "signos_vitales": SignosVitales,
+    "plan_tratamiento": PlanTratamiento,
+    "motivo_consulta_enfermedad": MotivoConsultaEnfermedadActual,
+    "exploracion_fisica_sistemas": ExploracionFisicaSistemas,
+}
+
+
+class SeccionYaRegistrada(Exception):
+    """Se intentó crear una segunda fila en una sección de fila única."""
+    pass
+
+
+@lru_cache(maxsize=None)
+def _esquema_datos(seccion: str, al_crear: bool):
+    """
+    Modelo pydantic de los datos de una operación, derivado de las columnas de
+    la tabla: tipo de cada columna, longitud de los String y, al crear, las
+    columnas NOT NULL sin default son obligatorias. Las NOT NULL no aceptan null.
+    """
+    campos = {}
+    for columna in SECCIONES[seccion].__table__.columns:
+        if columna.name in _COLUMNAS_PROTEGIDAS:
+            continue
+        try:
+            tipo = columna.type.python_type
+        except NotImplementedError:
+            tipo = Any
+        if isinstance(columna.type, String) and columna.type.length:
+            tipo = Annotated[str, StringConstraints(max_length=columna.type.length)]
+        if columna.nullable:
+            campos[columna.name] = (Optional[tipo], None)
+        elif al_crear and columna.default is None and columna.server_default is None:
+            campos[columna.name] = (tipo, ...)
+        else:
+            campos[columna.name] = (tipo, None)
+    return create_model(
+        f"Datos_{seccion}_{'crear' if al_crear else 'actualizar'}",
+        __config__=ConfigDict(extra="forbid"),
+        **campos,
+    )
+
+
+def _validar_datos(i: int, seccion: str, accion: str, datos: dict) -> dict:
+    """Valida y convierte los datos de la operación i; ValueError si no encajan con la tabla."""
+    try:
+        valido = _esquema_datos(seccion, accion == "crear").model_validate(datos)
+    except ValidationError as e:
+        errores = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        raise ValueError(f"Operación {i}: datos no válidos para {seccion}: {errores}")
+    return valido.model_dump(exclude_unset=True)
+
+
+def aplicar_operaciones_secciones(db: Session, historia_clinica_id: UUID, operaciones: list) -> dict:
+    """
+    Aplica altas, ediciones y bajas sobre cualquier sección de una historia en
+    una sola transacción:
+      - altas: un INSERT por tabla (LoteEscritura)
+      - ediciones: un UPDATE executemany por tabla y conjunto de campos
+      - bajas: un DELETE ... WHERE id IN (...) por tabla
+    y registra una única revisión con todas las secciones tocadas.
+
+    operaciones: [{"seccion", "accion", "id"?, "datos"?}] en el orden recibido;
+    en "crear" el id es opcional (si falta se genera aquí).
+    Devuelve {"resultados": [{"seccion", "accion", "id"}], "version"}.
+    Cualquier error revierte el lote completo: ValueError si una operación no es
+    válida, SeccionYaRegistrada si crea una segunda fila en SECCIONES_UNICAS.
+    """
+    if len(operaciones) > MAX_OPERACIONES_LOTE:
+        raise ValueError(f"Máximo {MAX_OPERACIONES_LOTE} operaciones por lote")
+    # FOR UPDATE: los lotes de una misma historia se aplican uno tras otro, así
+    # la comprobación de SECCIONES_UNICAS no compite con otro lote en curso.
+    if not db.query(HistoriaClinica.id).filter(
+        HistoriaClinica.id == historia_clinica_id
+    ).with_for_update().scalar():
+        raise ValueError("Historia clínica no encontrada")
+
+    # ── Validación (antes de escribir nada) ──
+    for i, op in enumerate(operaciones):
+        seccion, accion = op.get("seccion"), op.get("accion")
+        if seccion not in SECCIONES:
+            raise ValueError(f"Operación {i}: sección no válida '{seccion}'")
+        if accion not in ACCIONES_LOTE:
+            raise ValueError(f"Operación {i}: acción no válida '{accion}'")
+        if accion != "crear" and not op.get("id"):
+            raise ValueError(f"Operación {i}: '{accion}' requiere id")
+        columnas = SECCIONES[seccion].__table__.columns
+        desconocidos = [c for c in (op.get("datos") or {}) if c not in columnas or c in _COLUMNAS_PROTEGIDAS]
+        if desconocidos:
+            raise ValueError(f"Operación {i}: campos no válidos para {seccion}: {', '.join(desconocidos)}")
+        if accion != "eliminar":
+            op["datos"] = _validar_datos(i, seccion, accion, op.get("datos") or {})
+
+    # Los ids a editar o borrar deben pertenecer a esta historia (un SELECT por sección)
+    ids_por_seccion = {}
+    for op in operaciones:
+        if op["accion"] != "crear":
+            ids_por_seccion.setdefault(op["seccion"], set()).add(op["id"])
+    for seccion, ids in ids_por_seccion.items():
+        modelo = SECCIONES[seccion]
+        existentes = {fila.id for fila in db.query(modelo.id).filter(
+            modelo.id.in_(ids), modelo.historia_clinica_id == historia_clinica_id
+        )}
+        faltantes = ids - existentes
+        if faltantes:
+            raise ValueError(f"No existen en {seccion} para esta historia: {', '.join(sorted(map(str, faltantes)))}")
+
+    # Secciones de fila única: a lo sumo una fila tras aplicar el lote
+    for seccion in {op["seccion"] for op in operaciones if op["accion"] == "crear"} & SECCIONES_UNICAS.keys():
+        modelo = SECCIONES_UNICAS[seccion]
+        eliminadas = {op["id"] for op in operaciones if op["seccion"] == seccion and op["accion"] == "eliminar"}
+        existentes = {fila.id for fila in db.query(modelo.id).filter(
+            modelo.historia_clinica_id == historia_clinica_id
+        )} - eliminadas
+        altas = sum(1 for op in operaciones if op["seccion"] == seccion and op["accion"] == "crear")
+        if existentes or altas > 1:
+            raise SeccionYaRegistrada(
+                f"La historia ya tiene {seccion}; use 'actualizar' sobre la fila existente"
+            )
+
+    # ── Escritura ──
+    lote = LoteEscritura()
+    ediciones = {}   # (seccion, campos) -> [filas]
+    bajas = {}       # seccion -> [ids]
+    resultados = []
+    for op in operaciones:
+        seccion, accion, datos = op["seccion"], op["accion"], op.get("datos") or {}
+        if accion == "crear":
+            # El id puede venir del cliente (p. ej. una unidad de trabajo que ya lo devolvió)
+            op_id = lote.agregar(SECCIONES[seccion], datos, historia_clinica_id=historia_clinica_id,
+                                 id=op.get("id"))
+        elif accion == "actualizar":
+            op_id = op["id"]
+            if datos:
+                ediciones.setdefault((seccion, frozenset(datos)), []).append(dict(datos, _id=op_id))
+        else:
+            op_id = op["id"]
+            bajas.setdefault(seccion, []).append(op_id)
+        resultados.append({"seccion": seccion, "accion": accion, "id": op_id})
+
+    try:
+        lote.ejecutar(db)
+        for (seccion, _), filas in ediciones.items():
+            tabla = SECCIONES[seccion].__table__
+            db.execute(
+                tabla.update()
+                .where(tabla.c.id == bindparam("_id"))
+                .where(tabla.c.historia_clinica_id == historia_clinica_id),
+                filas,
+            )
+        for seccion, ids in bajas.items():
+            tabla = SECCIONES[seccion].__table__
+            db.execute(tabla.delete().where(
+                tabla.c.id.in_(ids), tabla.c.historia_clinica_id == historia_clinica_id
+            ))
+
+        tocadas = {r["seccion"] for r in resultados}
+        version = registrar_revision(
+            db, historia_clinica_id, {s: leer_seccion(db, historia_clinica_id, s) for s in tocadas}
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"resultados": resultados, "version": version}
@@ -9,5 +9,8 @@ def crear_archivo(db, data):
 
 def listar_archivos_por_historia(db, historia_id):
     return db.query(ArchivoClinico).filter(
-        ArchivoClinico.historia_id == historia_id
-    ).order_by(ArchivoClinico.fecha_subida.desc()).all()
+        ArchivoClinico.historia_clinica_id == historia_id
+    ).order_by(ArchivoClinico.created_at.desc()).all()
+
+def obtener_archivo(db, archivo_id):
+    return db.query(ArchivoClinico).filter(ArchivoClinico.id == archivo_id).first()
@@ -1,3 +1,12 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+
+
 def listar_catalogos(db):
     """
     Lista todos los catálogos disponibles desde la base de datos.
@@ -59,3 +68,81 @@ def obtener_items_catalogo(db, nombre: str):
         }
         for item in items
     ]
+
+
+# ============================================================================
+# CACHÉ DE IDS DE ITEMS
+# Los catálogos son datos de referencia que casi no cambian: los ids se
+# resuelven una vez y se reutilizan CATALOGOS_CACHE_TTL segundos. Solo se
+# guardan aciertos, así un item creado después (seed/migración) se
+# encuentra en la siguiente consulta. Las escrituras por ORM vacían la
+# caché al confirmar la transacción; las que llegan por SQL directo u otro
+# proceso se ven como máximo tras el TTL.
+# ============================================================================
+_cache_items = {}  # (catalogo, nombre_item) -> (UUID, expira)
+_cache_lock = threading.Lock()
+
+
+def obtener_item_id(db, nombre_item: str, catalogo: str = None):
+    """
+    Id del item `nombre_item` (opcionalmente dentro del catálogo `catalogo`),
+    o None si no existe.
+    """
+    from app.models import Catalogo, CatalogoItem
+
+    clave = (catalogo, nombre_item)
+    ahora = time.monotonic()
+    with _cache_lock:
+        guardado = _cache_items.get(clave)
+        if guardado is not None and guardado[1] > ahora:
+            return guardado[0]
+
+    query = db.query(CatalogoItem.id).filter(CatalogoItem.nombre == nombre_item)
+    if catalogo:
+        query = query.join(Catalogo, Catalogo.id == CatalogoItem.catalogo_id).filter(
+            Catalogo.nombre == catalogo
+        )
+    fila = query.first()
+    if fila is None:
+        return None
+
+    with _cache_lock:
+        _cache_items[clave] = (fila.id, ahora + settings.CATALOGOS_CACHE_TTL)
+    return fila.id
+
+
+def invalidar_cache_catalogos():
+    """Vacía la caché (se llama sola al confirmar cambios en catálogos por ORM)."""
+    with _cache_lock:
+        _cache_items.clear()
+
+
+# ── Invalidación al confirmar ────────────────────────────────
+_MARCA_SESION = "catalogos_modificados"
+
+
+def _marcar_sesion(mapper, connection, target):
+    sesion = object_session(target)
+    if sesion is not None:
+        sesion.info[_MARCA_SESION] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _al_confirmar(sesion):
+    if sesion.info.pop(_MARCA_SESION, False):
+        invalidar_cache_catalogos()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _al_revertir(sesion, transaccion_previa):
+    sesion.info.pop(_MARCA_SESION, None)
+
+
+def _registrar_eventos():
+    from app.models import Catalogo, CatalogoItem
+    for modelo in (Catalogo, CatalogoItem):
+        for evento in ("after_insert", "after_update", "after_delete"):
+            event.listen(modelo, evento, _marcar_sesion)
+
+
+_registrar_eventos()
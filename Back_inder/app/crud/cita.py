@@ -1,8 +1,8 @@
 from app.models.cita import Cita
 from app.models.deportista import Deportista
-from sqlalchemy import desc
+from sqlalchemy import desc, text
 from sqlalchemy.orm import joinedload
-from datetime import date
+from datetime import date, datetime, time, timedelta
 
 def crear_cita(db, data):
     """Crear una nueva cita"""
@@ -86,3 +86,70 @@ def obtener_deportistas_con_citas_hoy(db):
     ).distinct().order_by(Deportista.apellidos, Deportista.nombres).all()
     
     return deportistas
+
+
+# ============================================================================
+# DISPONIBILIDAD (varios médicos, rango de fechas)
+# ============================================================================
+
+HORA_INICIO_AGENDA = time(7, 0)
+HORA_FIN_AGENDA    = time(17, 0)
+DURACION_SLOT_MIN  = 30
+
+
+def slots_agenda():
+    """Horas de inicio ("HH:MM") de los slots de la jornada, en orden."""
+    inicio = datetime.combine(date.today(), HORA_INICIO_AGENDA)
+    fin    = datetime.combine(date.today(), HORA_FIN_AGENDA)
+    slots  = []
+    cur = inicio
+    while cur < fin:
+        slots.append(cur.strftime("%H:%M"))
+        cur += timedelta(minutes=DURACION_SLOT_MIN)
+    return slots
+
+
+_SQL_DISPONIBILIDAD = text("""
+    WITH grilla AS (
+        SELECT m.medico_id, CAST(d AS date) AS fecha, s.idx
+        FROM unnest(CAST(:medico_ids AS uuid[])) AS m(medico_id)
+        CROSS JOIN generate_series(CAST(:fecha_inicio AS date), CAST(:fecha_fin AS date), interval '1 day') AS d
+        CROSS JOIN generate_series(0, :n_slots - 1) AS s(idx)
+    ),
+    ocupacion AS (
+        SELECT g.medico_id, g.fecha, g.idx, count(c.id) AS citas
+        FROM grilla g
+        LEFT JOIN citas c
+               ON c.medico_id = g.medico_id
+              AND c.fecha     = g.fecha
+              AND c.hora >= CAST(:hora_inicio AS time) + g.idx       * make_interval(mins => :duracion)
+              AND c.hora <  CAST(:hora_inicio AS time) + (g.idx + 1) * make_interval(mins => :duracion)
+        GROUP BY g.medico_id, g.fecha, g.idx
+    )
+    SELECT medico_id,
+           fecha,
+           BIT_OR(CASE WHEN citas > 0 THEN CAST(1 AS bigint) << idx ELSE 0 END) AS bitmap,
+           COUNT(*) FILTER (WHERE citas > 0)                                    AS ocupados
+    FROM ocupacion
+    GROUP BY medico_id, fecha
+    ORDER BY medico_id, fecha
+""")
+
+
+def disponibilidad_medicos(db, medico_ids, fecha_inicio: date, fecha_fin: date):
+    """
+    Ocupación de la agenda de varios médicos en un rango de fechas,
+    calculada en una sola consulta (grilla generate_series LEFT JOIN citas).
+
+    Returns:
+        Lista de filas (medico_id, fecha, bitmap, ocupados). En `bitmap`
+        el bit i está encendido si el slot i de slots_agenda() está ocupado.
+    """
+    return db.execute(_SQL_DISPONIBILIDAD, {
+        "medico_ids":   [str(m) for m in medico_ids],
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin":    fecha_fin,
+        "n_slots":      len(slots_agenda()),
+        "hora_inicio":  HORA_INICIO_AGENDA,
+        "duracion":     DURACION_SLOT_MIN,
+    }).all()
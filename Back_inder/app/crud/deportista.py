@@ -1,6 +1,7 @@
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.models.deportista import Deportista
+from app.models.reporte import EstadoAptitudDeportista
 
 def crear_deportista(db: Session, data):
     """Crear nuevo deportista con validaciones previas"""
@@ -30,8 +31,21 @@ def crear_deportista(db: Session, data):
         db.rollback()
         raise
 
-def listar_deportistas(db):
-    return db.query(Deportista).all()
+def listar_deportistas(db, aptitud: str = None):
+    """
+    aptitud: 'apto' | 'no_apto' | 'sin_valoracion', según la aptitud vigente
+    en estado_aptitud_deportista (mantenida por trigger, migración 013).
+    """
+    consulta = db.query(Deportista)
+    if aptitud:
+        consulta = consulta.outerjoin(
+            EstadoAptitudDeportista, EstadoAptitudDeportista.deportista_id == Deportista.id
+        )
+        if aptitud == "sin_valoracion":
+            consulta = consulta.filter(EstadoAptitudDeportista.deportista_id.is_(None))
+        else:
+            consulta = consulta.filter(EstadoAptitudDeportista.no_apto.is_(aptitud == "no_apto"))
+    return consulta.all()
 
 def obtener_deportista(db, deportista_id):
     return db.query(Deportista).filter(Deportista.id == deportista_id).first()
@@ -65,7 +79,7 @@ def eliminar_deportista(db: Session, deportista_id: str):
                 CirugiasPrivas, Alergias, Medicaciones, VacunasAdministradas,
                 RevisionSistemas, SignosVitales, PruebasComplementarias,
                 Diagnosticos, PlanTratamiento, RemisionesEspecialistas,
-                MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas
+                MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas, AptitudMedica
             )
             
             tablas_historia = [
@@ -73,7 +87,7 @@ def eliminar_deportista(db: Session, deportista_id: str):
                 CirugiasPrivas, Alergias, Medicaciones, VacunasAdministradas,
                 RevisionSistemas, SignosVitales, PruebasComplementarias,
                 Diagnosticos, PlanTratamiento, RemisionesEspecialistas,
-                MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas
+                MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas, AptitudMedica
             ]
             
             for tabla in tablas_historia:
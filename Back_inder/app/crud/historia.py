@@ -1,3 +1,5 @@
+import re
+
 from sqlalchemy.orm import Session
 from app.models.historia import HistoriaClinica, HistoriaClinicaJSON
 from app.models.formulario import RespuestaGrupo, FormularioRespuesta
@@ -11,6 +13,11 @@ from app.models.antecedentes import (
     Diagnosticos, PlanTratamiento, RemisionesEspecialistas
 )
 from app.models.cita import Cita
+from app.crud.catalogo import obtener_item_id
+from app.crud.lote import LoteEscritura
+from app.services.revisiones_service import (
+    registrar_cambio_seccion, registrar_revision, documento_desde_filas, TIPO_CITA,
+)
 from datetime import date
 from uuid import uuid4
 
@@ -99,52 +106,41 @@ def crear_historia_completa(db, data):
     """
     try:
         # 1. Crear historia clínica básica
-        print(f"📝 Buscando catálogo 'estado_historia'...")
-        estado_catalogo = db.query(Catalogo).filter(
-            Catalogo.nombre == "estado_historia"
-        ).first()
-        
-        if not estado_catalogo:
-            raise ValueError("Catálogo 'estado_historia' no encontrado")
-        
-        print(f"📝 Buscando estado 'Abierta'...")
-        estado_abierta = db.query(CatalogoItem).filter(
-            CatalogoItem.catalogo_id == estado_catalogo.id,
-            CatalogoItem.nombre == "Abierta"
-        ).first()
+        estado_abierta_id = obtener_item_id(db, "Abierta", "estado_historia")
+        if not estado_abierta_id:
+            raise ValueError("Estado 'Abierta' no encontrado en el catálogo 'estado_historia'")
         
-        if not estado_abierta:
-            raise ValueError("Estado 'Abierta' no encontrado en el catálogo")
-        
-        print(f"📝 Creando historia clínica...")
+        # Todas las filas se insertan al final, agrupadas por tabla
+        lote = LoteEscritura()
         historia = HistoriaClinica(
+            id=uuid4(),
             deportista_id=data.deportista_id,
             fecha_apertura=date.today(),
-            estado_id=estado_abierta.id
+            estado_id=estado_abierta_id
         )
         db.add(historia)
-        db.flush()  # Obtener el ID generado
+        db.flush()
         
         # 2. Guardar datos en tablas normalizadas
         print(f"📝 Guardando antecedentes personales...")
         for ant in data.antecedentesPersonales:
-            ap = AntecedentesPersonales(
+            lote.agregar(
+                AntecedentesPersonales,
                 historia_clinica_id=historia.id,
                 codigo_cie11=ant.codigoCIE11,
                 nombre_enfermedad=ant.nombreEnfermedad,
-                observaciones=ant.observaciones
+                observaciones=ant.observaciones,
             )
-            db.add(ap)
         
         print(f"📝 Guardando antecedentes familiares...")
         for ant in data.antecedentesFamiliares:
-            af = AntecedentesFamiliares(
+            lote.agregar(
+                AntecedentesFamiliares,
                 historia_clinica_id=historia.id,
                 tipo_familiar=ant.familiar,
                 codigo_cie11=ant.codigoCIE11,
-                nombre_enfermedad=ant.nombreEnfermedad
+                nombre_enfermedad=ant.nombreEnfermedad,
             )
-            db.add(af)
         
         # Lesiones deportivas
         if data.lesionesDeportivas and data.descripcionLesiones:
@@ -156,57 +152,57 @@ def crear_historia_completa(db, data):
                 except (ValueError, TypeError):
                     fecha_lesion = date.today()
             
-            ld = LesioneDeportivas(
+            lote.agregar(
+                LesioneDeportivas,
                 historia_clinica_id=historia.id,
                 tipo_lesion=data.descripcionLesiones,
                 fecha_lesion=fecha_lesion,
                 tratamiento="",
-                observaciones=""
+                observaciones="",
             )
-            db.add(ld)
         
         # Cirugías previas
         if data.cirugiasPrevias and data.detalleCirugias:
-            cp = CirugiasPrivas(
+            lote.agregar(
+                CirugiasPrivas,
                 historia_clinica_id=historia.id,
                 tipo_cirugia=data.detalleCirugias,
                 fecha_cirugia=date.today(),
-                observaciones=""
+                observaciones="",
             )
-            db.add(cp)
         
         # Alergias
         if data.tieneAlergias and data.alergias:
-            alergia = Alergias(
+            lote.agregar(
+                Alergias,
                 historia_clinica_id=historia.id,
                 tipo_alergia="General",
                 descripcion=data.alergias,
-                reaccion=""
+                reaccion="",
             )
-            db.add(alergia)
         
         # Medicaciones
         if data.tomaMedicacion and data.medicacionActual:
-            med = Medicaciones(
+            lote.agregar(
+                Medicaciones,
                 historia_clinica_id=historia.id,
                 nombre_medicamento=data.medicacionActual,
                 dosis="",
                 frecuencia="",
                 duracion="",
-                indicacion=""
+                indicacion="",
             )
-            db.add(med)
         
         # Vacunas
         print(f"📝 Guardando vacunas...")
         for vacuna in data.vacunas:
-            vac = VacunasAdministradas(
+            lote.agregar(
+                VacunasAdministradas,
                 historia_clinica_id=historia.id,
                 nombre_vacuna=vacuna,
                 fecha_administracion=date.today(),
-                observaciones=""
+                observaciones="",
             )
-            db.add(vac)
         
         # Revisión por sistemas
         print(f"📝 Guardando revisión por sistemas...")
@@ -223,13 +219,13 @@ def crear_historia_completa(db, data):
         
         for nombre_sistema, revision in sistemas:
             if revision.estado or revision.observaciones:
-                rs = RevisionSistemas(
+                lote.agregar(
+                    RevisionSistemas,
                     historia_clinica_id=historia.id,
                     sistema_nombre=nombre_sistema,
                     estado=revision.estado or "",
-                    observaciones=revision.observaciones or ""
+                    observaciones=revision.observaciones or "",
                 )
-                db.add(rs)
         
         # Signos vitales
         print(f"📝 Guardando signos vitales...")
@@ -244,7 +240,8 @@ def crear_historia_completa(db, data):
             except (ValueError, IndexError):
                 pass
         
-        sv = SignosVitales(
+        lote.agregar(
+            SignosVitales,
             historia_clinica_id=historia.id,
             presion_arterial_sistolica=presion_sistolica,
             presion_arterial_diastolica=presion_diastolica,
@@ -254,42 +251,41 @@ def crear_historia_completa(db, data):
             peso_kg=float(data.peso) if data.peso else 0,
             estatura_cm=float(data.estatura) if data.estatura else 0,
             imc=0,
-            saturacion_oxigeno_percent=float(data.saturacionOxigeno) if data.saturacionOxigeno else 98
+            saturacion_oxigeno_percent=float(data.saturacionOxigeno) if data.saturacionOxigeno else 98,
         )
-        db.add(sv)
         
         # Pruebas complementarias
         print(f"📝 Guardando pruebas complementarias...")
         for prueba in data.ayudasDiagnosticas:
-            pc = PruebasComplementarias(
+            lote.agregar(
+                PruebasComplementarias,
                 historia_clinica_id=historia.id,
                 categoria=prueba.categoria,
                 nombre_prueba=prueba.nombrePrueba,
                 codigo_cups=prueba.codigoCUPS,
-                resultado=prueba.resultado or ""
+                resultado=prueba.resultado or "",
             )
-            db.add(pc)
         
         # Diagnósticos
         print(f"📝 Guardando diagnósticos...")
         for diag in data.diagnosticos:
-            d = Diagnosticos(
+            lote.agregar(
+                Diagnosticos,
                 historia_clinica_id=historia.id,
                 codigo_cie11=diag.codigo,
                 nombre_enfermedad=diag.nombre,
-                observaciones=diag.observaciones or ""
+                observaciones=diag.observaciones or "",
             )
-            db.add(d)
         
         # Plan de tratamiento
         print(f"📝 Guardando plan de tratamiento...")
-        pt = PlanTratamiento(
+        lote.agregar(
+            PlanTratamiento,
             historia_clinica_id=historia.id,
             indicaciones_medicas=data.indicacionesMedicas or "",
             recomendaciones_entrenamiento=data.recomendacionesEntrenamiento or "",
-            plan_seguimiento=data.planSeguimiento or ""
+            plan_seguimiento=data.planSeguimiento or "",
         )
-        db.add(pt)
         
         # Remisiones a especialistas
         print(f"📝 Guardando remisiones...")
@@ -302,50 +298,34 @@ def crear_historia_completa(db, data):
                 except (ValueError, TypeError):
                     fecha_remision = date.today()
             
-            re = RemisionesEspecialistas(
+            lote.agregar(
+                RemisionesEspecialistas,
                 historia_clinica_id=historia.id,
                 especialista=remision.especialista,
                 motivo=remision.motivo,
                 prioridad=remision.prioridad or "Normal",
-                fecha_remision=fecha_remision
+                fecha_remision=fecha_remision,
             )
-            db.add(re)
         
-        # 3. Guardar datos completos como JSON (backup)
-        datos_json = HistoriaClinicaJSON(
-            historia_clinica_id=str(historia.id),
-            deportista_id=str(data.deportista_id),
-            datos_completos=data.model_dump(mode='json')
+        filas = lote.ejecutar(db, devolver=True)
+        
+        # 3. Datos completos como JSON: versión 1 (checkpoint) del historial,
+        #    con el mismo esquema por secciones que el resto de revisiones
+        registrar_revision(
+            db, historia.id, documento_desde_filas(filas, data.tipoCita),
+            deportista_id=data.deportista_id, nueva=True,
         )
-        db.add(datos_json)
         
-        # 4. Actualizar estado de cita a "Realizada"
-        print(f"📝 Actualizando estado de cita a 'Realizada'...")
-        try:
-            # Obtener el estado "Realizada" del catálogo
-            estado_catalogo = db.query(Catalogo).filter(
-                Catalogo.nombre == "estados_cita"
-            ).first()
-            
-            if estado_catalogo:
-                estado_realizada = db.query(CatalogoItem).filter(
-                    CatalogoItem.catalogo_id == estado_catalogo.id,
-                    CatalogoItem.nombre == "Realizada"
-                ).first()
-                
-                if estado_realizada:
-                    # Buscar la cita del deportista de hoy
-                    cita = db.query(Cita).filter(
-                        Cita.deportista_id == data.deportista_id,
-                        Cita.fecha == date.today()
-                    ).first()
-                    
-                    if cita:
-                        cita.estado_cita_id = estado_realizada.id
-                        db.add(cita)
-                        print(f"✅ Cita actualizada a 'Realizada'")
-        except Exception as e:
-            print(f"⚠️ Error al actualizar cita (no es crítico): {str(e)}")
+        # 4. Actualizar estado de cita a "Realizada" (un solo UPDATE)
+        estado_realizada_id = obtener_item_id(db, "Realizada", "estados_cita")
+        if estado_realizada_id:
+            cita_hoy = db.query(Cita.id).filter(
+                Cita.deportista_id == data.deportista_id,
+                Cita.fecha == date.today()
+            ).limit(1).scalar_subquery()
+            db.query(Cita).filter(Cita.id == cita_hoy).update(
+                {Cita.estado_cita_id: estado_realizada_id}, synchronize_session=False
+            )
         
         # 5. Commit
         db.commit()
@@ -365,25 +345,67 @@ def crear_historia_completa(db, data):
         traceback.print_exc()
         raise ValueError(f"Error al crear historia clínica: {str(e)}")
 
-def obtener_historia_datos_completos(db, historia_id: str) -> dict:
+# Rutas de la proyección: "diagnosticos", "revisionSistemas.cardiovascular",
+# "diagnosticos.0.codigo" (los índices de lista también son segmentos)
+MAX_RUTAS_PROYECCION = 20
+_SEGMENTO_RUTA = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def _parsear_ruta(ruta: str) -> tuple:
+    segmentos = tuple(ruta.split("."))
+    if not all(_SEGMENTO_RUTA.match(s) for s in segmentos):
+        raise ValueError(f"Ruta no válida: {ruta}")
+    return segmentos
+
+
+def obtener_historia_datos_completos(db, historia_id: str, rutas: list = None) -> dict:
     """
     Obtener historia clínica completa con todos los datos
     
     Args:
         db: Sesión de base de datos
         historia_id: ID de la historia clínica
+        rutas: Si se indica, solo esas rutas del JSON, extraídas en Postgres
+               (#>) sin traer el documento completo. Devuelve {ruta: valor}.
     
     Returns:
-        Datos completos de la historia clínica
+        Datos completos de la historia clínica (o las rutas pedidas)
     """
-    historia_json = db.query(HistoriaClinicaJSON).filter(
+    columna = HistoriaClinicaJSON.datos_completos
+    if rutas:
+        if len(rutas) > MAX_RUTAS_PROYECCION:
+            raise ValueError(f"Máximo {MAX_RUTAS_PROYECCION} rutas por consulta")
+        segmentos = [_parsear_ruta(r) for r in rutas]
+        columnas = [columna[s].label(f"r{i}") for i, s in enumerate(segmentos)]
+    else:
+        columnas = [columna]
+
+    fila = db.query(*columnas).filter(
         HistoriaClinicaJSON.historia_clinica_id == historia_id
-    ).first()
+    ).order_by(HistoriaClinicaJSON.created_at.desc()).first()
     
-    if not historia_json:
+    if not fila:
         raise ValueError(f"Historia clínica con ID {historia_id} no encontrada")
     
-    return historia_json.datos_completos
+    if not rutas:
+        return fila[0]
+    return {ruta: valor for ruta, valor in zip(rutas, fila)}
+
+
+def buscar_historias_en_snapshot(db, codigo_cie11: str = None, tipo_cita: str = None, limite: int = 100) -> list:
+    """
+    IDs de historias cuyo snapshot incluye el diagnóstico y/o el tipo de cita.
+    El filtro se resuelve en Postgres con los índices de la migración 007.
+    """
+    query = db.query(HistoriaClinicaJSON.historia_clinica_id)
+    if codigo_cie11:
+        query = query.filter(
+            HistoriaClinicaJSON.datos_completos["diagnosticos"].contains([{"codigo_cie11": codigo_cie11}])
+        )
+    if tipo_cita:
+        query = query.filter(HistoriaClinicaJSON.datos_completos[TIPO_CITA].astext == tipo_cita)
+    filas = query.distinct().limit(limite).all()
+    return [f.historia_clinica_id for f in filas]
 
 def listar_todas_historias(db):
     """Listar todas las historias clínicas con información del deportista"""
@@ -437,6 +459,7 @@ def crear_motivo_consulta_enfermedad(db: Session, historia_id, data: dict):
         **data
     )
     db.add(motivo)
+    registrar_cambio_seccion(db, historia_id, MotivoConsultaEnfermedadActual)
     db.commit()
     db.refresh(motivo)
     return motivo
@@ -461,6 +484,7 @@ def actualizar_motivo_consulta(db: Session, motivo_id, data: dict):
     if motivo:
         for key, value in data.items():
             setattr(motivo, key, value)
+        registrar_cambio_seccion(db, motivo.historia_clinica_id, MotivoConsultaEnfermedadActual)
         db.commit()
         db.refresh(motivo)
     return motivo
@@ -476,6 +500,7 @@ def eliminar_motivo_consulta(db: Session, motivo_id):
     
     if motivo:
         db.delete(motivo)
+        registrar_cambio_seccion(db, motivo.historia_clinica_id, MotivoConsultaEnfermedadActual)
         db.commit()
     return motivo
 
@@ -493,6 +518,7 @@ def crear_exploracion_fisica(db: Session, historia_id, data: dict):
         **data
     )
     db.add(exploracion)
+    registrar_cambio_seccion(db, historia_id, ExploracionFisicaSistemas)
     db.commit()
     db.refresh(exploracion)
     return exploracion
@@ -517,6 +543,7 @@ def actualizar_exploracion_fisica(db: Session, exploracion_id, data: dict):
     if exploracion:
         for key, value in data.items():
             setattr(exploracion, key, value)
+        registrar_cambio_seccion(db, exploracion.historia_clinica_id, ExploracionFisicaSistemas)
         db.commit()
         db.refresh(exploracion)
     return exploracion
@@ -532,5 +559,6 @@ def eliminar_exploracion_fisica(db: Session, exploracion_id):
     
     if exploracion:
         db.delete(exploracion)
+        registrar_cambio_seccion(db, exploracion.historia_clinica_id, ExploracionFisicaSistemas)
         db.commit()
     return exploracion
@@ -0,0 +1,81 @@
+"""
+Escritura por lotes: agrupa las filas por tabla y las inserta con un solo
+executemany por tabla (psycopg2 usa execute_values: un INSERT ... VALUES
+con muchas filas por viaje). Todo queda en la transacción de la sesión;
+el commit lo hace quien llama.
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+
+class LoteEscritura:
+    """
+    Uso:
+        lote = LoteEscritura()
+        lote.agregar(Alergias, historia_clinica_id=hid, tipo_alergia="Polen")
+        ...
+        lote.ejecutar(db)   # un INSERT por tabla
+        db.commit()
+    """
+
+    def __init__(self):
+        # Se conserva el orden de llegada de las tablas: las filas padre
+        # (p. ej. historias_clinicas) deben agregarse antes que las hijas.
+        self._filas: Dict[object, List[dict]] = {}
+        self._ultimo_created_at: Optional[datetime] = None
+
+    def agregar(self, modelo, valores: Optional[dict] = None, **campos) -> uuid.UUID:
+        """Agrega una fila y devuelve su id (generado aquí si no viene)."""
+        fila = dict(valores or {}, **campos)
+        columnas = modelo.__table__.columns
+        # Solo columnas reales de la tabla
+        fila = {k: v for k, v in fila.items() if k in columnas}
+        if "id" in columnas and fila.get("id") is None:
+            fila["id"] = uuid.uuid4()
+        if "created_at" in columnas and fila.get("created_at") is None:
+            fila["created_at"] = self._siguiente_created_at()
+        self._filas.setdefault(modelo, []).append(fila)
+        return fila.get("id")
+
+    def _siguiente_created_at(self) -> datetime:
+        # Estrictamente creciente: las secciones se leen ORDER BY created_at y
+        # deben conservar el orden en que llegaron en el formulario.
+        ahora = datetime.utcnow()
+        if self._ultimo_created_at is not None and ahora <= self._ultimo_created_at:
+            ahora = self._ultimo_created_at + timedelta(microseconds=1)
+        self._ultimo_created_at = ahora
+        return ahora
+
+    def filas(self, modelo) -> List[dict]:
+        """Filas pendientes de una tabla (copia)."""
+        return list(self._filas.get(modelo, []))
+
+    def total(self) -> int:
+        return sum(len(filas) for filas in self._filas.values())
+
+    def ejecutar(self, db: Session, devolver: bool = False) -> dict:
+        """
+        Inserta todo el lote. Devuelve {tabla: filas insertadas}; con
+        devolver=True, {modelo: filas tal como quedaron en la BD} (defaults y
+        tipos ya aplicados) leídas con RETURNING, sin un SELECT adicional.
+        """
+        insertadas = {}
+        for modelo, filas in self._filas.items():
+            tabla = modelo.__table__
+            # executemany exige el mismo conjunto de claves en todas las filas;
+            # las claves ausentes quedan con el default de la columna.
+            por_claves: Dict[frozenset, List[dict]] = {}
+            for fila in filas:
+                por_claves.setdefault(frozenset(fila), []).append(fila)
+            if not devolver:
+                for grupo in por_claves.values():
+                    db.execute(tabla.insert(), grupo)
+                insertadas[tabla.name] = len(filas)
+                continue
+            sentencia = tabla.insert().returning(*tabla.columns, sort_by_parameter_order=True)
+            insertadas[modelo] = [f for grupo in por_claves.values() for f in db.execute(sentencia, grupo)]
+        self._filas.clear()
+        return insertadas
@@ -3,7 +3,7 @@
 # ============================================================
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
@@ -12,8 +12,8 @@ from uuid import UUID
 from app.models.usuario import Usuario, Rol, Permiso
 from app.schemas.usuario import UsuarioCreate, UsuarioUpdate, RolCreate
 from app.core.config import settings
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.principal import invalidar_usuario
+from app.core import contrasenas
 
 PERMISOS_ADMIN = [
     ("deportistas", "ver"), ("deportistas", "crear"), ("deportistas", "editar"), ("deportistas", "eliminar"),
@@ -35,18 +35,17 @@ PERMISOS_MEDICO = [
 
 
 # ── Password ─────────────────────────────────────────────────
+# bcrypt corre en el pool acotado de app/core/contrasenas.py
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return contrasenas.hash_password(password)
 
 
 # ── JWT ──────────────────────────────────────────────────────
 def crear_token(data: dict) -> str:
     payload = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    payload.update({"exp": expire})
+    ahora = datetime.utcnow()
+    expire = ahora + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    payload.update({"exp": expire, "iat": ahora})
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 def verificar_token(token: str) -> Optional[dict]:
@@ -132,6 +131,7 @@ def actualizar_usuario(db: Session, usuario_id: UUID, data: UsuarioUpdate):
         usuario.activo = data.activo
     db.commit()
     db.refresh(usuario)
+    invalidar_usuario(usuario.id)
     return usuario
 
 def eliminar_usuario(db: Session, usuario_id: UUID):
@@ -140,18 +140,32 @@ def eliminar_usuario(db: Session, usuario_id: UUID):
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     db.delete(usuario)
     db.commit()
+    invalidar_usuario(usuario_id)
 
 
 # ── Login ────────────────────────────────────────────────────
-def autenticar_usuario(db: Session, username: str, password: str):
-    usuario = obtener_usuario_por_username(db, username)
-    if not usuario or not verify_password(password, usuario.hashed_password):
+def _guardar_hash(db: Session, usuario: Usuario, nuevo_hash: str):
+    usuario.hashed_password = nuevo_hash
+    db.commit()
+
+
+async def autenticar_usuario(db: Session, username: str, password: str):
+    """
+    Async: la consulta va al threadpool y bcrypt al pool de contraseñas,
+    así la espera de un login no ocupa un hilo. Un usuario inexistente
+    también paga un bcrypt. Si el hash usa parámetros viejos se reemplaza.
+    """
+    usuario = await run_in_threadpool(obtener_usuario_por_username, db, username)
+    valido, nuevo_hash = await contrasenas.verificar(password, usuario.hashed_password if usuario else None)
+    if not valido:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos"
         )
     if not usuario.activo:
         raise HTTPException(status_code=403, detail="Usuario desactivado")
+    if nuevo_hash:
+        await run_in_threadpool(_guardar_hash, db, usuario, nuevo_hash)
     return usuario
 
 
@@ -1,14 +1,22 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
 
 from app.core.config import settings
-from app.core.database import Base, engine
-from app.core.auth_middleware import auth_middleware
+from app.core.database import Base, engine, SessionLocal
+from app.core.auth_middleware import AuthMiddleware
+from app.core.dependencies import require_admin
+from app.core.limite_peticiones import LimitePeticionesMiddleware
+from app.core import contrasenas
+from app.core.metricas import MetricasMiddleware, instrumentar_engine, registro as registro_metricas
+from app.core.consultas_lentas import registro as registro_consultas_lentas
+from app.services.cache_reportes import (
+    iniciar_precalculo, detener_precalculo, iniciar_compactacion, detener_compactacion
+)
+from app.services.tokens_descarga_service import iniciar_purga, detener_purga
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,6 +28,7 @@ from app.api.v1 import perfil as perfil_router
 from app.api.v1.descarga_segura import router as descarga_segura_router
 from app.api.v1.auth import router as auth_router
 from app.api.v1 import reportes
+from app.api.v1 import admin
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -29,7 +38,17 @@ app = FastAPI(
 
 # ── MIDDLEWARE JWT ────────────────────────────────────────────
 # Se agrega PRIMERO para que se ejecute DESPUÉS de CORS
-app.add_middleware(BaseHTTPMiddleware, dispatch=auth_middleware)
+app.add_middleware(AuthMiddleware)
+
+# ── LÍMITE DE PETICIONES ──────────────────────────────────────
+# Antes que auth (429 sin tocar JWT, BD ni bcrypt); dentro de métricas
+app.add_middleware(LimitePeticionesMiddleware)
+
+# ── MÉTRICAS ──────────────────────────────────────────────────
+# Envuelve al de auth para medir también los 401
+instrumentar_engine(engine)
+registro_consultas_lentas.instrumentar(engine)
+app.add_middleware(MetricasMiddleware)
 
 # ── CORS ──────────────────────────────────────────────────────
 # Se agrega DESPUÉS para que se ejecute PRIMERO (intercepta preflight)
@@ -59,12 +78,38 @@ def startup_event():
         logger.info("Tablas OK")
     except Exception as e:
         logger.warning(f"No se pudieron crear las tablas: {str(e)}")
+    # Calibra las rondas de bcrypt (si BCRYPT_RONDAS = 0) y crea su pool
+    contrasenas.configurar()
+    if settings.REPORTES_PRECALCULO_SEGUNDOS:
+        iniciar_precalculo(reportes.precalcular_dashboard, settings.REPORTES_PRECALCULO_SEGUNDOS)
+    if settings.VERSIONES_DATOS_COMPACTAR_SEGUNDOS:
+        iniciar_compactacion(SessionLocal, settings.VERSIONES_DATOS_COMPACTAR_SEGUNDOS)
+    if settings.TOKENS_DESCARGA_PURGA_SEGUNDOS:
+        iniciar_purga(SessionLocal, settings.TOKENS_DESCARGA_PURGA_SEGUNDOS)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    from app.services.derivados_service import cerrar_pool
+    from app.services import documentos_preparados_service
+    cerrar_pool()
+    documentos_preparados_service.cerrar_pool()
+    contrasenas.cerrar_pool()
+    registro_consultas_lentas.desinstrumentar()
+    detener_precalculo()
+    detener_compactacion()
+    detener_purga()
 
 # ── HEALTH CHECK ──────────────────────────────────────────────
 @app.get("/health", tags=["Health"])
 def health_check():
     return {"status": "ok", "app": settings.APP_NAME}
 
+# ── MÉTRICAS (Prometheus) ─────────────────────────────────────
+# Rutas, tráfico y tiempos SQL del sistema: solo admin (token Bearer)
+@app.get("/metrics", include_in_schema=False)
+def metrics(current_user=Depends(require_admin)):
+    return PlainTextResponse(registro_metricas.exportar(), media_type="text/plain; version=0.0.4")
+
 # ── ROUTERS ───────────────────────────────────────────────────
 app.include_router(auth_router,              prefix="/api/v1")
 app.include_router(deportistas.router,       prefix="/api/v1/deportistas")
@@ -78,4 +123,5 @@ app.include_router(antecedentes.router,      prefix="/api/v1")
 app.include_router(documentos.router,        prefix="/api/v1")
 app.include_router(descarga_segura_router,   prefix="/api/v1")
 app.include_router(perfil_router.router,       prefix="/api/v1/perfil")
-app.include_router(reportes.router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(reportes.router, prefix="/api/v1")
+app.include_router(admin.router,             prefix="/api/v1")
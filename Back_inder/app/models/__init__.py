@@ -1,5 +1,5 @@
 from app.models.deportista import Deportista
-from app.models.historia import HistoriaClinica, HistoriaClinicaJSON
+from app.models.historia import HistoriaClinica, HistoriaClinicaJSON, HistoriaRevision
 from app.models.formulario import RespuestaGrupo, FormularioRespuesta, Formulario, FormularioCampo
 from app.models.archivo import ArchivoClinico
 from app.models.cita import Cita
@@ -10,14 +10,16 @@ from app.models.antecedentes import (
     AntecedentesPersonales, AntecedentesFamiliares, LesioneDeportivas,
     CirugiasPrivas, Alergias, Medicaciones, VacunasAdministradas,
     RevisionSistemas, SignosVitales, PruebasComplementarias,
-    Diagnosticos, PlanTratamiento, RemisionesEspecialistas
+    Diagnosticos, PlanTratamiento, RemisionesEspecialistas, AptitudMedica
 )
 from app.models.token_descarga import TokenDescarga
+from app.models.reporte import CitaSinHistoria, EstadoAptitudDeportista
 
 __all__ = [
     "Deportista",
     "HistoriaClinica",
     "HistoriaClinicaJSON",
+    "HistoriaRevision",
     "RespuestaGrupo",
     "FormularioRespuesta",
     "Formulario",
@@ -40,5 +42,8 @@ __all__ = [
     "Diagnosticos",
     "PlanTratamiento",
     "RemisionesEspecialistas",
-    "TokenDescarga"
+    "AptitudMedica",
+    "TokenDescarga",
+    "CitaSinHistoria",
+    "EstadoAptitudDeportista",
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Date, Integer, Numeric
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Date, Integer, Numeric, Index, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -8,6 +8,7 @@ import uuid
 
 class AntecedentesPersonales(Base):
     __tablename__ = "antecedentes_personales"
+    __table_args__ = (Index("idx_antecedentes_personales_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -21,6 +22,7 @@ class AntecedentesPersonales(Base):
 
 class AntecedentesFamiliares(Base):
     __tablename__ = "antecedentes_familiares"
+    __table_args__ = (Index("idx_antecedentes_familiares_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -35,6 +37,7 @@ class AntecedentesFamiliares(Base):
 
 class LesioneDeportivas(Base):
     __tablename__ = "lesiones_deportivas"
+    __table_args__ = (Index("idx_lesiones_deportivas_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -49,6 +52,7 @@ class LesioneDeportivas(Base):
 
 class CirugiasPrivas(Base):
     __tablename__ = "cirugias_previas"
+    __table_args__ = (Index("idx_cirugias_previas_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -62,6 +66,7 @@ class CirugiasPrivas(Base):
 
 class Alergias(Base):
     __tablename__ = "alergias"
+    __table_args__ = (Index("idx_alergias_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -83,6 +88,8 @@ class VacunasDeportista(Base):
     ruta_archivo = Column(Text)  # Ruta del archivo adjunto
     nombre_archivo = Column(String(255))  # Nombre del archivo original
     tipo_archivo = Column(String(50))  # pdf, jpg, png, etc.
+    hash_sha256 = Column(String(64))  # SHA-256 del contenido
+    tamano_bytes = Column(BigInteger)
     observaciones = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -92,6 +99,7 @@ class VacunasDeportista(Base):
 
 class Medicaciones(Base):
     __tablename__ = "medicaciones"
+    __table_args__ = (Index("idx_medicaciones_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -107,6 +115,7 @@ class Medicaciones(Base):
 
 class VacunasAdministradas(Base):
     __tablename__ = "vacunas_administradas"
+    __table_args__ = (Index("idx_vacunas_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -120,6 +129,7 @@ class VacunasAdministradas(Base):
 
 class RevisionSistemas(Base):
     __tablename__ = "revision_sistemas"
+    __table_args__ = (Index("idx_revision_sistemas_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -134,6 +144,10 @@ class RevisionSistemas(Base):
 
 class SignosVitales(Base):
     __tablename__ = "signos_vitales"
+    __table_args__ = (
+        Index("idx_signos_vitales_historia", "historia_clinica_id"),
+        Index("ix_signos_vitales_created_at", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -153,6 +167,7 @@ class SignosVitales(Base):
 
 class PruebasComplementarias(Base):
     __tablename__ = "pruebas_complementarias"
+    __table_args__ = (Index("idx_pruebas_complementarias_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -168,6 +183,10 @@ class PruebasComplementarias(Base):
 
 class Diagnosticos(Base):
     __tablename__ = "diagnosticos"
+    __table_args__ = (
+        Index("idx_diagnosticos_historia", "historia_clinica_id"),
+        Index("ix_diagnosticos_created_at", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -183,6 +202,7 @@ class Diagnosticos(Base):
 
 class PlanTratamiento(Base):
     __tablename__ = "plan_tratamiento"
+    __table_args__ = (Index("idx_plan_tratamiento_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -196,6 +216,7 @@ class PlanTratamiento(Base):
 
 class RemisionesEspecialistas(Base):
     __tablename__ = "remisiones_especialistas"
+    __table_args__ = (Index("idx_remisiones_especialistas_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -210,6 +231,7 @@ class RemisionesEspecialistas(Base):
 
 class MotivoConsultaEnfermedadActual(Base):
     __tablename__ = "motivo_consulta_enfermedad_actual"
+    __table_args__ = (Index("idx_motivo_consulta_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -227,6 +249,7 @@ class MotivoConsultaEnfermedadActual(Base):
 
 class ExploracionFisicaSistemas(Base):
     __tablename__ = "exploracion_fisica_sistemas"
+    __table_args__ = (Index("idx_exploracion_fisica_historia", "historia_clinica_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
@@ -244,3 +267,22 @@ class ExploracionFisicaSistemas(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     historia_clinica = relationship("HistoriaClinica")
+
+
+class AptitudMedica(Base):
+    """
+    Paso final de la historia: apto / no_apto. El estado vigente por
+    deportista lo mantiene un trigger en estado_aptitud_deportista (migración 013).
+    """
+    __tablename__ = "aptitud_medica"
+    __table_args__ = (Index("idx_aptitud_medica_historia", "historia_clinica_id"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    historia_clinica_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id", ondelete="CASCADE"), nullable=False)
+    resultado = Column(String(30), nullable=False)
+    tipo_aptitud = Column(String(150))
+    observaciones = Column(Text)
+    restricciones = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    historia_clinica = relationship("HistoriaClinica")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -16,10 +16,16 @@ class ArchivoClinico(Base):
     nombre_archivo = Column(String(255), nullable=False)
     ruta_archivo = Column(Text, nullable=False)
     tipo_archivo = Column(String(50), nullable=False)
+    hash_sha256 = Column(String(64))
+    tamano_bytes = Column(BigInteger)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relaciones
     historia_clinica = relationship("HistoriaClinica")
     formulario = relationship("Formulario")
     grupo = relationship("RespuestaGrupo")
-    prueba = relationship("PruebasComplementarias", back_populates="archivos")
\ No newline at end of file
+    prueba = relationship("PruebasComplementarias", back_populates="archivos")
+
+    __table_args__ = (
+        Index("idx_archivos_clinicos_historia", "historia_clinica_id"),
+    )
\ No newline at end of file
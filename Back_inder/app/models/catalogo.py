@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Boolean, ForeignKey
+from sqlalchemy import Column, String, Text, Boolean, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -7,7 +7,8 @@ import uuid
 class Catalogo(Base):
     __tablename__ = "catalogos"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # server_default: la migración 002 inserta sin id (ver migración 015)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
     nombre = Column(String(50), nullable=False, unique=True)
     descripcion = Column(Text)
 
@@ -18,11 +19,16 @@ class Catalogo(Base):
 class CatalogoItem(Base):
     __tablename__ = "catalogo_items"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # server_default: la migración 002 inserta sin id (ver migración 015)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
     catalogo_id = Column(UUID(as_uuid=True), ForeignKey("catalogos.id"), nullable=False)
     codigo = Column(String(30))
     nombre = Column(String(100), nullable=False)
     activo = Column(Boolean, default=True)
 
     # Relaciones
-    catalogo = relationship("Catalogo", back_populates="items")
\ No newline at end of file
+    catalogo = relationship("Catalogo", back_populates="items")
+
+    __table_args__ = (
+        Index("ix_catalogo_items_catalogo_nombre", "catalogo_id", "nombre"),
+    )
\ No newline at end of file
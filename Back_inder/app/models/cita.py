@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Date, Time, ForeignKey, String
+from sqlalchemy import Column, Date, DateTime, Time, ForeignKey, String, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 import uuid
+from datetime import datetime
 
 class Cita(Base):
     __tablename__ = "citas"
@@ -15,8 +16,17 @@ class Cita(Base):
     tipo_cita_id    = Column(UUID(as_uuid=True), ForeignKey("catalogo_items.id"), nullable=False)
     estado_cita_id  = Column(UUID(as_uuid=True), ForeignKey("catalogo_items.id"), nullable=False)
     observaciones   = Column(String, nullable=True)
+    created_at      = Column(DateTime, default=datetime.utcnow)
 
     deportista      = relationship("Deportista", back_populates="citas")
     medico          = relationship("Usuario", foreign_keys=[medico_id])                       # ← NUEVO
     tipo_cita       = relationship("CatalogoItem", foreign_keys=[tipo_cita_id])
-    estado_cita     = relationship("CatalogoItem", foreign_keys=[estado_cita_id])
\ No newline at end of file
+    estado_cita     = relationship("CatalogoItem", foreign_keys=[estado_cita_id])
+
+    __table_args__ = (
+        Index("ix_citas_fecha_hora",         "fecha", "hora"),
+        Index("ix_citas_medico_fecha_hora",  "medico_id", "fecha", "hora"),
+        Index("ix_citas_deportista_fecha",   "deportista_id", "fecha"),
+        Index("ix_citas_estado_fecha",       "estado_cita_id", "fecha"),
+        Index("ix_citas_created_at",         "created_at"),
+    )
\ No newline at end of file
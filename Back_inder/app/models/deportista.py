@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Date, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Date, Text, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -28,4 +28,10 @@ class Deportista(Base):
     estado = relationship("CatalogoItem", foreign_keys=[estado_id])
     historias = relationship("HistoriaClinica", back_populates="deportista")
     citas = relationship("Cita", back_populates="deportista")
-    vacunas = relationship("VacunasDeportista", back_populates="deportista", cascade="all, delete-orphan")
\ No newline at end of file
+    vacunas = relationship("VacunasDeportista", back_populates="deportista", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_deportistas_estado", "estado_id"),
+        Index("ix_deportistas_tipo_deporte", "tipo_deporte"),
+        Index("ix_deportistas_created_at", "created_at"),
+    )
\ No newline at end of file
@@ -3,8 +3,8 @@
 # Archivo: Back_inder/app/models/historia.py
 # Solo agregar las líneas marcadas con # ← NUEVO
 # ============================================================
-from sqlalchemy import Column, Date, DateTime, ForeignKey, String, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Date, DateTime, ForeignKey, String, Index, Integer, Boolean, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from datetime import datetime
@@ -27,6 +27,7 @@ class HistoriaClinica(Base):
     archivos     = relationship("ArchivoClinico", back_populates="historia_clinica", cascade="all, delete-orphan")
     grupos       = relationship("RespuestaGrupo", back_populates="historia_clinica", cascade="all, delete-orphan")
     historia_json= relationship("HistoriaClinicaJSON", back_populates="historia_clinica", cascade="all, delete-orphan")
+    revisiones   = relationship("HistoriaRevision", cascade="all, delete-orphan", passive_deletes=True)
 
     # Tablas normalizadas
     antecedentes_personales    = relationship("AntecedentesPersonales",    back_populates="historia_clinica", cascade="all, delete-orphan")
@@ -44,6 +45,14 @@ class HistoriaClinica(Base):
     remisiones_especialistas   = relationship("RemisionesEspecialistas",   back_populates="historia_clinica", cascade="all, delete-orphan")
     motivo_consulta_enfermedad = relationship("MotivoConsultaEnfermedadActual", back_populates="historia_clinica", cascade="all, delete-orphan")
     exploracion_fisica_sistemas= relationship("ExploracionFisicaSistemas", back_populates="historia_clinica", cascade="all, delete-orphan")
+    aptitud_medica             = relationship("AptitudMedica",             back_populates="historia_clinica", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_historias_deportista_fecha", "deportista_id", "fecha_apertura"),
+        Index("ix_historias_medico_fecha",     "medico_id", "fecha_apertura"),
+        Index("ix_historias_fecha_apertura",   "fecha_apertura"),
+        Index("ix_historias_created_at",       "created_at"),
+    )
 
 
 class HistoriaClinicaJSON(Base):
@@ -52,7 +61,38 @@ class HistoriaClinicaJSON(Base):
     id                 = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     historia_clinica_id= Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
     deportista_id      = Column(UUID(as_uuid=True), ForeignKey("deportistas.id"), nullable=False)
-    datos_completos    = Column(JSON, nullable=False)
+    datos_completos    = Column(JSONB, nullable=False)
+    # Cabeza materializada de historias_revisiones: versión que contiene datos_completos
+    version            = Column(Integer, nullable=True)
+    created_at         = Column(DateTime, default=datetime.utcnow)
+
+    historia_clinica   = relationship("HistoriaClinica", back_populates="historia_json")
+
+    __table_args__ = (
+        Index("idx_historia_clinica_json_historia_id", "historia_clinica_id"),
+        # Rutas consultadas dentro del snapshot (ver migraciones 007 y 016)
+        Index("ix_historias_json_diagnosticos",
+              text("(datos_completos -> 'diagnosticos') jsonb_path_ops"), postgresql_using="gin"),
+        Index("ix_historias_json_tipo_cita", text("(datos_completos ->> 'tipo_cita')")),
+    )
+
+
+class HistoriaRevision(Base):
+    """
+    Revisión append-only de una historia. Las revisiones checkpoint guardan el
+    documento completo; las demás solo las secciones que cambiaron.
+    """
+    __tablename__ = "historias_revisiones"
+
+    id                 = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    historia_clinica_id= Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id", ondelete="CASCADE"), nullable=False)
+    version            = Column(Integer, nullable=False)
+    es_checkpoint      = Column(Boolean, nullable=False, default=False)
+    datos              = Column(JSONB, nullable=False)   # checkpoint: documento; delta: {seccion: valor}
+    secciones          = Column(JSONB, nullable=False)   # nombres de las secciones modificadas
+    usuario_id         = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=True)
     created_at         = Column(DateTime, default=datetime.utcnow)
 
-    historia_clinica   = relationship("HistoriaClinica", back_populates="historia_json")
\ No newline at end of file
+    __table_args__ = (
+        Index("ix_historias_revisiones_historia_version", "historia_clinica_id", "version", unique=True),
+    )
@@ -0,0 +1,57 @@
+"""
+Resultados precalculados de reportes (los escriben jobs nocturnos o triggers)
+"""
+from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Index, String, Time
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+
+from app.core.database import Base
+
+
+class CitaSinHistoria(Base):
+    """
+    Corte de la conciliación citas ↔ historias: citas pasadas, no cerradas
+    y sin historia del deportista ese día. Se reemplaza completo en cada
+    ejecución de conciliacion_service.generar_corte_sin_historia.
+    """
+    __tablename__ = "citas_sin_historia"
+
+    cita_id       = Column(UUID(as_uuid=True), ForeignKey("citas.id", ondelete="CASCADE"), primary_key=True)
+    deportista_id = Column(UUID(as_uuid=True), nullable=False)
+    medico_id     = Column(UUID(as_uuid=True), nullable=True)
+    fecha         = Column(Date, nullable=False)
+    hora          = Column(Time, nullable=False)
+    deportista    = Column(String(201))
+    documento     = Column(String(30))
+    medico        = Column(String(150))
+    tipo_cita     = Column(String(255))
+    estado        = Column(String(255))
+    generado_en   = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_citas_sin_historia_fecha", "fecha"),
+    )
+
+
+class EstadoAptitudDeportista(Base):
+    """
+    Aptitud vigente de cada deportista: la de su historia más reciente
+    (fecha_apertura, luego created_at). Solo la escribe el trigger de
+    aptitud_medica / historias_clinicas (migración 013); una fila por
+    deportista valorado.
+    """
+    __tablename__ = "estado_aptitud_deportista"
+
+    deportista_id       = Column(UUID(as_uuid=True), ForeignKey("deportistas.id", ondelete="CASCADE"), primary_key=True)
+    aptitud_id          = Column(UUID(as_uuid=True), nullable=False)
+    historia_clinica_id = Column(UUID(as_uuid=True), nullable=False)
+    resultado           = Column(String(30), nullable=False)
+    tipo_aptitud        = Column(String(150))
+    no_apto             = Column(Boolean, nullable=False)
+    fecha               = Column(Date, nullable=False)
+    medico_id           = Column(UUID(as_uuid=True), nullable=True)
+    actualizado_en      = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_estado_aptitud_no_apto_fecha", "no_apto", "fecha"),
+    )
@@ -1,42 +1,39 @@
 """
-Modelo para tokens de descarga segura de historias clínicas
+Modelo para el estado de los tokens de descarga segura de historias clínicas
 INDERHUILA - Instituto Departamental de Recreación y Deportes del Huila
+
+Los tokens son firmados (app/services/tokens_descarga_service.py) y no se
+guardan. Esta tabla solo tiene filas para los tokens con intentos fallidos
+o revocados, y una fila por historia cuando se emite un enlace nuevo
+(revoca los emitidos antes). Las filas vencidas las borra el barrido periódico.
 """
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
-from datetime import datetime, timedelta
-import uuid
+from datetime import datetime
 
 from app.core.database import Base
 
 
 class TokenDescarga(Base):
     """
-    Token temporal para descarga segura de historia clínica.
-    - Expira en 2 horas
+    - id: id del token (hex) o "h:<historia>" para la fila de la historia
     - Máximo 3 intentos fallidos
     """
     __tablename__ = "tokens_descarga"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    token = Column(String(64), unique=True, nullable=False, index=True)
-    historia_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id"), nullable=False)
-    deportista_id = Column(UUID(as_uuid=True), ForeignKey("deportistas.id"), nullable=False)
-    numero_documento = Column(String(20), nullable=False)
-    
+    id = Column(String(40), primary_key=True)
+    historia_id = Column(UUID(as_uuid=True), ForeignKey("historias_clinicas.id", ondelete="CASCADE"), nullable=False)
+
     # Control de seguridad
-    intentos_fallidos = Column(Integer, default=0)
-    bloqueado = Column(Boolean, default=False)
-    
-    # Control de tiempo
-    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    intentos_fallidos = Column(Integer, nullable=False, default=0)
+    revocado = Column(Boolean, nullable=False, default=False)
+    # Fila de historia: los tokens emitidos antes de esta fecha quedan revocados
+    revocar_emitidos_antes = Column(DateTime, nullable=True)
+
+    # Control de tiempo: pasada esta fecha la fila ya no afecta a ningún token
     fecha_expiracion = Column(DateTime, nullable=False)
-    usado = Column(Boolean, default=False)
-    fecha_uso = Column(DateTime, nullable=True)
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        if not self.token:
-            self.token = uuid.uuid4().hex
-        if not self.fecha_expiracion:
-            self.fecha_expiracion = datetime.utcnow() + timedelta(hours=2)
+    actualizado_en = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_tokens_descarga_expiracion", "fecha_expiracion"),
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Literal
 from datetime import date, datetime
 from uuid import UUID
 
@@ -362,3 +362,18 @@ class RemisionesEspecialistasResponse(RemisionesEspecialistasBase):
 
     class Config:
         from_attributes = True
+
+
+# ============================================================================
+# OPERACIONES POR LOTE SOBRE SECCIONES
+# ============================================================================
+
+class OperacionSeccion(BaseModel):
+    seccion: str                                        # nombre de sección (p. ej. "alergias")
+    accion: Literal["crear", "actualizar", "eliminar"]
+    id: Optional[UUID] = None                           # requerido para actualizar/eliminar; opcional al crear
+    datos: Optional[dict] = None                        # columnas de la tabla de la sección
+
+
+class OperacionesSeccionesRequest(BaseModel):
+    operaciones: List[OperacionSeccion] = Field(..., min_length=1)
@@ -4,9 +4,13 @@ from datetime import datetime
 
 class ArchivoResponse(BaseModel):
     id: UUID
-    historia_id: UUID
-    nombre_original: str
+    historia_clinica_id: UUID
+    prueba_complementaria_id: UUID | None = None
+    nombre_archivo: str
     tipo_archivo: str
-    categoria: str | None
-    ruta: str
-    fecha_subida: datetime
+    hash_sha256: str | None = None
+    tamano_bytes: int | None = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
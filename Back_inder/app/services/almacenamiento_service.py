@@ -0,0 +1,144 @@
+# ============================================================
+# SERVICIO DE ALMACENAMIENTO DE ARCHIVOS CLÍNICOS
+# Guarda uploads por bloques, con límite de tamaño por tipo,
+# SHA-256 calculado al vuelo y ruta direccionada por contenido.
+# Archivo: app/services/almacenamiento_service.py
+# ============================================================
+import hashlib
+import logging
+import os
+import tempfile
+from typing import NamedTuple, Optional
+
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+
+from app.core.config import UPLOAD_DIR
+from app.services.derivados_service import eliminar_derivados
+
+logger = logging.getLogger(__name__)
+
+# ── Configuración ────────────────────────────────────────────
+TAMANO_BLOQUE = 1024 * 1024  # 1 MiB por lectura
+
+MB = 1024 * 1024
+LIMITE_POR_EXTENSION = {
+    "pdf":  25 * MB,
+    "jpg":  15 * MB,
+    "jpeg": 15 * MB,
+    "png":  15 * MB,
+    "dcm":  1024 * MB,   # estudios DICOM
+}
+
+# Objetos: uploads/objetos/ab/cd/<sha256>.<ext>
+OBJETOS_DIR = os.path.join(UPLOAD_DIR, "objetos")
+# Temporales en el mismo sistema de archivos para que os.replace sea atómico
+TEMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+
+class ArchivoNoPermitido(ValueError):
+    pass
+
+
+class ArchivoDemasiadoGrande(ValueError):
+    def __init__(self, limite: int):
+        self.limite = limite
+        super().__init__(f"El archivo supera el tamaño máximo permitido ({limite // MB} MB)")
+
+
+class ArchivoGuardado(NamedTuple):
+    ruta: str
+    sha256: str
+    tamano: int
+    extension: str
+
+
+def extension_de(nombre: Optional[str]) -> str:
+    if not nombre or "." not in nombre:
+        return ""
+    return nombre.rsplit(".", 1)[-1].lower()
+
+
+def ruta_objeto(sha256: str, extension: str) -> str:
+    return os.path.join(OBJETOS_DIR, sha256[:2], sha256[2:4], f"{sha256}.{extension}")
+
+
+def guardar_upload(file: UploadFile, extensiones: Optional[set] = None) -> ArchivoGuardado:
+    """
+    Copia el upload a disco por bloques de TAMANO_BLOQUE sin cargarlo en memoria.
+
+    - Rechaza extensiones fuera de `extensiones` (por defecto LIMITE_POR_EXTENSION).
+    - Corta la copia en cuanto se supera el límite de la extensión.
+    - Si ya existe un objeto con el mismo hash se reutiliza (se guarda una sola vez).
+    """
+    extension = extension_de(file.filename)
+    permitidas = extensiones or set(LIMITE_POR_EXTENSION)
+    if extension not in permitidas or extension not in LIMITE_POR_EXTENSION:
+        raise ArchivoNoPermitido("Tipo de archivo no permitido")
+
+    limite = LIMITE_POR_EXTENSION[extension]
+    # Starlette informa el tamaño cuando el cliente envía Content-Length por parte
+    tamano_declarado = getattr(file, "size", None)
+    if tamano_declarado is not None and tamano_declarado > limite:
+        raise ArchivoDemasiadoGrande(limite)
+
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    fd, ruta_temp = tempfile.mkstemp(dir=TEMP_DIR, suffix=".part")
+    digest = hashlib.sha256()
+    tamano = 0
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            while True:
+                bloque = file.file.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                tamano += len(bloque)
+                if tamano > limite:
+                    raise ArchivoDemasiadoGrande(limite)
+                digest.update(bloque)
+                destino.write(bloque)
+            destino.flush()
+            os.fsync(destino.fileno())
+
+        sha256 = digest.hexdigest()
+        ruta_final = ruta_objeto(sha256, extension)
+        if os.path.exists(ruta_final):
+            os.remove(ruta_temp)
+        else:
+            os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+            os.replace(ruta_temp, ruta_final)
+        return ArchivoGuardado(ruta_final, sha256, tamano, extension)
+    except BaseException:
+        if os.path.exists(ruta_temp):
+            os.remove(ruta_temp)
+        raise
+
+
+def liberar_archivo(db: Session, ruta: Optional[str]) -> bool:
+    """
+    Elimina el archivo del disco solo si ningún registro lo sigue referenciando
+    (con deduplicación varios registros pueden compartir el mismo objeto).
+    Llamar después de borrar/actualizar el registro propio en la sesión.
+    """
+    if not ruta:
+        return False
+
+    from app.models.archivo import ArchivoClinico
+    from app.models.antecedentes import VacunasDeportista
+
+    db.flush()
+    en_uso = (
+        db.query(ArchivoClinico.id).filter(ArchivoClinico.ruta_archivo == ruta).first()
+        or db.query(VacunasDeportista.id).filter(VacunasDeportista.ruta_archivo == ruta).first()
+    )
+    if en_uso:
+        return False
+
+    try:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+            eliminar_derivados(ruta)
+            return True
+    except Exception as e:
+        logger.warning("Error eliminando %s: %s", ruta, e)
+    return False
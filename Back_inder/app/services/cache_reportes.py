@@ -0,0 +1,242 @@
+# ============================================================
+# CACHÉ DE RESULTADOS DE REPORTES
+# Clave: (reporte, parámetros normalizados, versión de los datos, fecha).
+# La versión de los datos son los contadores de versiones_datos_vigentes
+# (migraciones 010 y 017) de las tablas de las que depende el reporte;
+# los incrementa un trigger en cada INSERT/UPDATE/DELETE, así que un
+# resultado sigue siendo válido hasta que cambian sus datos. La fecha
+# entra en la clave porque casi todos los reportes usan date.today().
+# Una transacción con escrituras sin confirmar no usa la caché: vería
+# versiones y datos que quizá nunca se confirmen.
+# La caché es por proceso (LRU + TTL de seguridad).
+# Archivo: app/services/cache_reportes.py
+# ============================================================
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Optional
+
+from fastapi.params import Depends as _Depends
+from psycopg2 import errors as pg_errors
+from pydantic.fields import FieldInfo
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRADAS = 512
+TTL_SEGUNDOS = 3600
+
+# Argumentos del endpoint que no forman parte de la clave
+_EXCLUIDOS = {"db", "current_user"}
+
+# Una fila por tabla más la marca de escrituras pendientes (LEFT JOIN: la
+# marca llega aunque todavía no haya versiones).
+_SQL_VERSIONES = text(
+    "SELECT pg_current_xact_id_if_assigned() IS NOT NULL AS escribiendo, v.tabla, v.version "
+    "FROM (SELECT 1) AS uno LEFT JOIN versiones_datos_vigentes v ON true"
+)
+_SQL_COMPACTAR = text("SELECT compactar_versiones_datos()")
+_sin_contadores = False   # la vista no existe (migraciones 010/017 sin aplicar): caché desactivada
+
+
+class CacheReportes:
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, ttl: float = TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos: "OrderedDict[tuple, tuple]" = OrderedDict()   # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self.aciertos = self.fallos = 0
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"entradas": len(self._datos), "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+cache = CacheReportes()
+
+
+def _leer_versiones(db: Session) -> Optional[tuple]:
+    """({tabla: version}, escribiendo) o None si no hay contadores."""
+    global _sin_contadores
+    if _sin_contadores:
+        return None
+    try:
+        with db.begin_nested():
+            filas = db.execute(_SQL_VERSIONES).all()
+    except DBAPIError as e:
+        if isinstance(e.orig, pg_errors.UndefinedTable):
+            logger.warning("versiones_datos_vigentes no existe, caché de reportes desactivada: %s", e.orig)
+            _sin_contadores = True
+        else:
+            logger.warning("No se pudieron leer las versiones de datos, reporte sin caché: %s", e)
+        return None
+    versiones = {fila.tabla: fila.version for fila in filas if fila.tabla is not None}
+    return versiones, filas[0].escribiendo
+
+
+def versiones_datos(db: Session) -> Optional[dict]:
+    """
+    {tabla: version} tal como los ve la transacción de la sesión. None si
+    no hay contadores. No se memoriza por transacción: si la transacción
+    escribe entre dos reportes, el segundo tiene que enterarse.
+    """
+    leidas = _leer_versiones(db)
+    return leidas[0] if leidas else None
+
+
+def compactar_contadores(db: Session) -> int:
+    """Pasa las filas confirmadas de cambios_datos a versiones_datos (la versión no cambia)."""
+    try:
+        movidas = db.execute(_SQL_COMPACTAR).scalar()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return movidas
+
+
+def _valor(v):
+    # Defaults de Query(...) cuando el reporte se llama como función (dashboard)
+    return v.default if isinstance(v, FieldInfo) else v
+
+
+def cache_reporte(*tablas: str) -> Callable:
+    """
+    Decorador para endpoints de reportes. `tablas`: de las que depende el
+    resultado (deben tener trigger de versión, ver migraciones 010 y 017).
+
+        @router.get("/citas/por-mes")
+        @cache_reporte("citas", "catalogo_items")
+        def citas_por_mes(meses: int = Query(6), db=Depends(get_db), ...):
+    """
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            ligado = firma.bind(*args, **kwargs)
+            ligado.apply_defaults()
+            argumentos = {
+                k: (v if k in _EXCLUIDOS or isinstance(v, _Depends) else _valor(v))
+                for k, v in ligado.arguments.items()
+            }
+            db = argumentos["db"]
+
+            leidas = _leer_versiones(db)
+            if leidas is None or leidas[1]:
+                return funcion(**argumentos)
+            versiones = leidas[0]
+
+            clave = (
+                funcion.__name__,
+                tuple(sorted((k, str(v)) for k, v in argumentos.items() if k not in _EXCLUIDOS)),
+                tuple(versiones.get(t, 0) for t in tablas),
+                date.today(),
+            )
+            resultado = cache.obtener(clave)
+            if resultado is None:
+                resultado = funcion(**argumentos)
+                cache.guardar(clave, resultado)
+            return resultado
+
+        envoltura.tablas_cache = tablas
+        return envoltura
+    return decorador
+
+
+# ── Precálculo en segundo plano ──────────────────────────────
+
+_hilo_precalculo: Optional[threading.Thread] = None
+_detener_precalculo = threading.Event()
+
+
+def iniciar_precalculo(tarea: Callable[[], None], intervalo_segundos: float):
+    """
+    Ejecuta `tarea` (p. ej. reportes.precalcular_dashboard) cada
+    `intervalo_segundos` en un hilo daemon. Si los datos no cambiaron la
+    tarea solo lee versiones_datos y acierta en caché.
+    """
+    global _hilo_precalculo
+    if _hilo_precalculo is not None and _hilo_precalculo.is_alive():
+        return
+    _detener_precalculo.clear()
+
+    def bucle():
+        while not _detener_precalculo.is_set():
+            try:
+                tarea()
+            except Exception as e:
+                logger.exception("Error en precálculo: %s", e)
+            _detener_precalculo.wait(intervalo_segundos)
+
+    _hilo_precalculo = threading.Thread(target=bucle, name="precalculo-reportes", daemon=True)
+    _hilo_precalculo.start()
+
+
+def detener_precalculo():
+    _detener_precalculo.set()
+
+
+# ── Compactación de contadores ───────────────────────────────
+
+_hilo_compactacion: Optional[threading.Thread] = None
+_detener_compactacion = threading.Event()
+
+
+def iniciar_compactacion(abrir_sesion: Callable[[], Session], intervalo_segundos: float):
+    """
+    Cada `intervalo_segundos`, en un hilo daemon: compactar_contadores, para
+    que cambios_datos (una fila por transacción de escritura) no crezca.
+    """
+    global _hilo_compactacion
+    if _hilo_compactacion is not None and _hilo_compactacion.is_alive():
+        return
+    _detener_compactacion.clear()
+
+    def bucle():
+        while not _detener_compactacion.wait(intervalo_segundos):
+            if _sin_contadores:
+                continue
+            db = abrir_sesion()
+            try:
+                compactar_contadores(db)
+            except Exception as e:
+                logger.exception("Error al compactar versiones de datos: %s", e)
+            finally:
+                db.close()
+
+    _hilo_compactacion = threading.Thread(target=bucle, name="compactar-versiones-datos", daemon=True)
+    _hilo_compactacion.start()
+
+
+def detener_compactacion():
+    _detener_compactacion.set()
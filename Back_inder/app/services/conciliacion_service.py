@@ -0,0 +1,198 @@
+# ============================================================
+# CONCILIACIÓN CITAS ↔ HISTORIAS CLÍNICAS
+# "Citas sin realizar": citas pasadas, no cerradas (atendida, cancelada,
+# no presentado) y sin historia del deportista con fecha_apertura = fecha.
+# Se resuelve con un solo anti-join NOT EXISTS (índice
+# ix_historias_deportista_fecha) y los nombres en el mismo SELECT.
+#   - citas_sin_historia: en vivo, paginado y con ventana de fechas
+#   - generar_corte_sin_historia: reescribe la tabla citas_sin_historia
+#     con INSERT ... SELECT (job nocturno: scripts/conciliacion_nocturna.py)
+#   - leer_corte_sin_historia: misma respuesta leyendo el último corte
+#   - iterar_citas_sin_historia: todas las filas con cursor del lado del
+#     servidor, para exportar (?format=csv|xlsx)
+# Archivo: app/services/conciliacion_service.py
+# ============================================================
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import exists, func, insert, literal, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models.catalogo import CatalogoItem
+from app.models.cita import Cita
+from app.models.deportista import Deportista
+from app.models.historia import HistoriaClinica
+from app.models.reporte import CitaSinHistoria
+from app.models.usuario import Usuario
+
+ESTADOS_CERRADOS = ("atendida", "cancelada", "no presentado", "no presentada")
+MAX_POR_PAGINA = 500
+FILAS_POR_LOTE = 1000
+
+COLUMNAS_ITEM = ("cita_id", "fecha", "hora", "deportista", "documento", "medico",
+                 "tipo_cita", "estado", "dias_vencida")
+
+
+def _select_sin_historia(desde: Optional[date], hasta: Optional[date]):
+    """SELECT base (sin orden ni paginado) de citas sin historia en [desde, hasta]."""
+    hoy = date.today()
+    # Solo citas ya pasadas: el límite superior nunca llega a hoy
+    limite = min(hasta + timedelta(days=1), hoy) if hasta else hoy
+
+    tipo = aliased(CatalogoItem)
+    estado = aliased(CatalogoItem)
+    tiene_historia = exists().where(
+        HistoriaClinica.deportista_id == Cita.deportista_id,
+        HistoriaClinica.fecha_apertura == Cita.fecha,
+    )
+
+    consulta = (
+        select(
+            Cita.id.label("cita_id"),
+            Cita.deportista_id,
+            Cita.medico_id,
+            Cita.fecha,
+            Cita.hora,
+            (Deportista.nombres + literal(" ") + Deportista.apellidos).label("deportista"),
+            Deportista.numero_documento.label("documento"),
+            Usuario.nombre_completo.label("medico"),
+            tipo.nombre.label("tipo_cita"),
+            estado.nombre.label("estado"),
+        )
+        .join(Deportista, Deportista.id == Cita.deportista_id)
+        .outerjoin(Usuario, Usuario.id == Cita.medico_id)
+        .outerjoin(tipo, tipo.id == Cita.tipo_cita_id)
+        .outerjoin(estado, estado.id == Cita.estado_cita_id)
+        .where(
+            Cita.fecha < limite,
+            # estado IS NULL: cita con un estado que ya no existe en el catálogo
+            (estado.id.is_(None)) | (func.lower(estado.nombre).notin_(ESTADOS_CERRADOS)),
+            ~tiene_historia,
+        )
+    )
+    if desde:
+        consulta = consulta.where(Cita.fecha >= desde)
+    return consulta
+
+
+def _item(fila, hoy: date) -> dict:
+    return {
+        "cita_id":      str(fila.cita_id),
+        "fecha":        str(fila.fecha),
+        "hora":         str(fila.hora),
+        "deportista":   fila.deportista or "—",
+        "documento":    fila.documento or "—",
+        "medico":       fila.medico or "—",
+        "tipo_cita":    fila.tipo_cita or "—",
+        "estado":       fila.estado or "—",
+        "dias_vencida": (hoy - fila.fecha).days,
+    }
+
+
+def _validar_paginado(pagina: int, por_pagina: int):
+    if pagina < 1:
+        raise ValueError("pagina debe ser >= 1")
+    if not 1 <= por_pagina <= MAX_POR_PAGINA:
+        raise ValueError(f"por_pagina debe estar entre 1 y {MAX_POR_PAGINA}")
+
+
+def citas_sin_historia(db: Session, desde: Optional[date] = None, hasta: Optional[date] = None,
+                       pagina: int = 1, por_pagina: int = 50) -> dict:
+    """
+    Página de citas sin historia (más recientes primero) con el total real.
+    Una sola consulta: el total sale de COUNT(*) OVER (); solo si la página
+    queda fuera de rango se hace un COUNT aparte.
+    """
+    _validar_paginado(pagina, por_pagina)
+    base = _select_sin_historia(desde, hasta)
+    filas = db.execute(
+        base.add_columns(func.count().over().label("total"))
+        .order_by(Cita.fecha.desc(), Cita.hora.desc(), Cita.id)
+        .limit(por_pagina).offset((pagina - 1) * por_pagina)
+    ).all()
+
+    if filas:
+        total = filas[0].total
+    else:
+        total = db.execute(select(func.count()).select_from(base.subquery())).scalar() if pagina > 1 else 0
+
+    hoy = date.today()
+    return {
+        "total": total,
+        "pagina": pagina,
+        "por_pagina": por_pagina,
+        "items": [_item(f, hoy) for f in filas],
+    }
+
+
+# ── Corte nocturno ───────────────────────────────────────────
+
+def generar_corte_sin_historia(db: Session) -> int:
+    """
+    Reemplaza el contenido de citas_sin_historia con la conciliación
+    completa (todas las citas pasadas) en una transacción. Devuelve las filas.
+    """
+    base = _select_sin_historia(None, None).subquery()
+    ahora = datetime.utcnow()
+    columnas = ["cita_id", "deportista_id", "medico_id", "fecha", "hora",
+                "deportista", "documento", "medico", "tipo_cita", "estado"]
+    try:
+        db.query(CitaSinHistoria).delete(synchronize_session=False)
+        resultado = db.execute(
+            insert(CitaSinHistoria).from_select(
+                columnas + ["generado_en"],
+                select(*[base.c[c] for c in columnas], literal(ahora)),
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return resultado.rowcount
+
+
+def leer_corte_sin_historia(db: Session, desde: Optional[date] = None, hasta: Optional[date] = None,
+                            pagina: int = 1, por_pagina: int = 50) -> dict:
+    """Como citas_sin_historia pero sobre el último corte (incluye generado_en)."""
+    _validar_paginado(pagina, por_pagina)
+    consulta = db.query(CitaSinHistoria)
+    if desde:
+        consulta = consulta.filter(CitaSinHistoria.fecha >= desde)
+    if hasta:
+        consulta = consulta.filter(CitaSinHistoria.fecha <= hasta)
+    total = consulta.count()
+    filas = consulta.order_by(
+        CitaSinHistoria.fecha.desc(), CitaSinHistoria.hora.desc(), CitaSinHistoria.cita_id
+    ).limit(por_pagina).offset((pagina - 1) * por_pagina).all()
+    generado_en = db.query(func.max(CitaSinHistoria.generado_en)).scalar()
+
+    hoy = date.today()
+    return {
+        "total": total,
+        "pagina": pagina,
+        "por_pagina": por_pagina,
+        "generado_en": generado_en,
+        "items": [_item(f, hoy) for f in filas],
+    }
+
+
+# ── Exportación ──────────────────────────────────────────────
+
+def iterar_citas_sin_historia(db: Session, desde: Optional[date] = None, hasta: Optional[date] = None,
+                              fuente: str = "vivo"):
+    """Todas las citas sin historia de la ventana (sin paginar), de a FILAS_POR_LOTE por fetch."""
+    if fuente == "corte":
+        consulta = select(CitaSinHistoria).order_by(
+            CitaSinHistoria.fecha.desc(), CitaSinHistoria.hora.desc(), CitaSinHistoria.cita_id
+        )
+        if desde:
+            consulta = consulta.where(CitaSinHistoria.fecha >= desde)
+        if hasta:
+            consulta = consulta.where(CitaSinHistoria.fecha <= hasta)
+        filas = db.execute(consulta, execution_options={"yield_per": FILAS_POR_LOTE}).scalars()
+    else:
+        consulta = _select_sin_historia(desde, hasta).order_by(Cita.fecha.desc(), Cita.hora.desc(), Cita.id)
+        filas = db.execute(consulta, execution_options={"stream_results": True, "yield_per": FILAS_POR_LOTE})
+    hoy = date.today()
+    for fila in filas:
+        yield _item(fila, hoy)
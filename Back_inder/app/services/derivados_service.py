@@ -0,0 +1,217 @@
+# ============================================================
+# SERVICIO DE DERIVADOS (miniaturas y vistas previas)
+# JPG/PNG → miniatura y vista web; PDF → render de la primera página.
+# Se generan en un pool de hilos al subir el archivo y se guardan
+# junto al original: <sha256>.<tamano>.jpg
+# Archivo: app/services/derivados_service.py
+# ============================================================
+import glob
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TiempoAgotado
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+    PIL_DISPONIBLE = True
+except ImportError:
+    PIL_DISPONIBLE = False
+
+try:
+    import pymupdf
+    PYMUPDF_DISPONIBLE = True
+except ImportError:
+    PYMUPDF_DISPONIBLE = False
+
+# ── Configuración ────────────────────────────────────────────
+# Lado mayor en píxeles
+TAMANOS = {
+    "miniatura": 256,
+    "vista":     1280,
+}
+CALIDAD_JPEG = 80
+# Espera máxima de una petición por un derivado que aún no existe
+ESPERA_MAX_SEGUNDOS = 60
+
+EXTENSIONES_IMAGEN = {"jpg", "jpeg", "png"}
+EXTENSIONES_PDF = {"pdf"}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_en_proceso: set = set()
+_en_proceso_lock = threading.Lock()
+
+
+class DerivadoNoDisponible(Exception):
+    """El tipo de archivo no admite vista previa."""
+
+
+class DerivadoEnProceso(Exception):
+    """El derivado no se terminó de generar dentro de ESPERA_MAX_SEGUNDOS."""
+
+
+class ArchivoIlegible(Exception):
+    """El original no se pudo decodificar (imagen o PDF dañado)."""
+
+
+def _obtener_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(settings.DERIVADOS_WORKERS, 1),
+                thread_name_prefix="derivados",
+            )
+        return _pool
+
+
+def cerrar_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def soporta_derivados(extension: str) -> bool:
+    extension = (extension or "").lower()
+    if extension in EXTENSIONES_IMAGEN:
+        return PIL_DISPONIBLE
+    if extension in EXTENSIONES_PDF:
+        return PIL_DISPONIBLE and (PYMUPDF_DISPONIBLE or shutil.which("pdftoppm") is not None)
+    return False
+
+
+def ruta_derivado(ruta_original: str, tamano: str) -> str:
+    base, _ = os.path.splitext(ruta_original)
+    return f"{base}.{tamano}.jpg"
+
+
+# ── Render ───────────────────────────────────────────────────
+
+def _abrir_imagen(ruta: str, lado: int) -> "Image.Image":
+    img = Image.open(ruta)
+    # JPEG: decodifica directamente a una escala reducida
+    img.draft("RGB", (lado, lado))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        fondo = Image.new("RGB", img.size, (255, 255, 255))
+        img = img.convert("RGBA")
+        fondo.paste(img, mask=img.split()[-1])
+        img = fondo
+    return img
+
+
+def _render_pdf(ruta: str, lado: int) -> "Image.Image":
+    if PYMUPDF_DISPONIBLE:
+        with pymupdf.open(ruta) as doc:
+            if doc.page_count == 0:
+                raise ArchivoIlegible("PDF sin páginas")
+            pagina = doc[0]
+            escala = lado / max(pagina.rect.width, pagina.rect.height)
+            pix = pagina.get_pixmap(matrix=pymupdf.Matrix(escala, escala), alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    # Alternativa: poppler-utils
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = os.path.join(tmp, "pagina")
+        subprocess.run(
+            ["pdftoppm", "-jpeg", "-f", "1", "-l", "1", "-scale-to", str(lado), "-singlefile", ruta, salida],
+            check=True, capture_output=True, timeout=60,
+        )
+        with Image.open(salida + ".jpg") as img:
+            return img.convert("RGB")
+
+
+def _generar(ruta_original: str, extension: str, tamano: str) -> str:
+    destino = ruta_derivado(ruta_original, tamano)
+    if os.path.exists(destino):
+        return destino
+
+    lado = TAMANOS[tamano]
+    try:
+        if extension in EXTENSIONES_PDF:
+            img = _render_pdf(ruta_original, lado)
+        else:
+            img = _abrir_imagen(ruta_original, lado)
+        img.thumbnail((lado, lado), Image.LANCZOS)
+    except (FileNotFoundError, ArchivoIlegible):
+        raise
+    except Exception as e:
+        # Pillow (UnidentifiedImageError, OSError de archivo truncado), pymupdf o pdftoppm
+        raise ArchivoIlegible(f"No se pudo leer el archivo: {e}") from e
+
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            img.convert("RGB").save(f, "JPEG", quality=CALIDAD_JPEG, optimize=True, progressive=True)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return destino
+
+
+def generar_derivados(ruta_original: str, extension: str) -> None:
+    """Genera todos los tamaños. Se ejecuta en el pool; los errores solo se registran."""
+    extension = (extension or "").lower()
+    with _en_proceso_lock:
+        if ruta_original in _en_proceso:
+            return
+        _en_proceso.add(ruta_original)
+    try:
+        for tamano in TAMANOS:
+            _generar(ruta_original, extension, tamano)
+    except Exception as e:
+        logger.exception("Error generando derivados de %s: %s", ruta_original, e)
+    finally:
+        with _en_proceso_lock:
+            _en_proceso.discard(ruta_original)
+
+
+def encolar_derivados(ruta_original: str, extension: str) -> bool:
+    """Programa la generación en segundo plano tras un upload."""
+    if not soporta_derivados(extension):
+        return False
+    _obtener_pool().submit(generar_derivados, ruta_original, extension)
+    return True
+
+
+def obtener_derivado(ruta_original: str, extension: str, tamano: str) -> str:
+    """
+    Ruta del derivado pedido. Si aún no existe (cola pendiente, archivo
+    anterior al pipeline) se genera en el pool y se espera el resultado.
+    """
+    extension = (extension or "").lower()
+    if tamano not in TAMANOS:
+        raise DerivadoNoDisponible(f"Tamaño no válido. Opciones: {', '.join(TAMANOS)}")
+    if not soporta_derivados(extension):
+        raise DerivadoNoDisponible("Este tipo de archivo no tiene vista previa")
+
+    destino = ruta_derivado(ruta_original, tamano)
+    if os.path.exists(destino):
+        return destino
+    futuro = _obtener_pool().submit(_generar, ruta_original, extension, tamano)
+    try:
+        return futuro.result(timeout=ESPERA_MAX_SEGUNDOS)
+    except TiempoAgotado:
+        # Sigue generándose en el pool; el siguiente intento lo encontrará en disco
+        raise DerivadoEnProceso("La vista previa aún se está generando")
+
+
+def eliminar_derivados(ruta_original: str) -> None:
+    base, _ = os.path.splitext(ruta_original)
+    for ruta in glob.glob(glob.escape(base) + ".*.jpg"):
+        try:
+            os.remove(ruta)
+        except Exception as e:
+            logger.warning("Error eliminando %s: %s", ruta, e)
@@ -0,0 +1,150 @@
+# ============================================================
+# PDF PREPARADOS PARA LA DESCARGA SEGURA
+# Al emitir un enlace de descarga se encola el render del PDF de la
+# historia tal como está en ese momento; /descargar solo descifra y
+# envía el archivo. Se guarda cifrado (AES-256-GCM, el id del token y la
+# historia como datos asociados) en uploads/descargas/<id del token>.enc
+# y se borra al descargarlo o al vencer el enlace (barrido de
+# tokens_descarga_service). Si no está listo, /descargar lo genera en vivo.
+# Archivo: app/services/documentos_preparados_service.py
+# ============================================================
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from datetime import timedelta
+from typing import Callable, Optional
+
+from app.core.config import UPLOAD_DIR, settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    CIFRADO_DISPONIBLE = True
+except ImportError:
+    CIFRADO_DISPONIBLE = False
+
+PREPARADOS_DIR = os.path.join(UPLOAD_DIR, "descargas")
+# Segundos que /descargar espera un render que sigue en curso en este proceso
+ESPERA_SEGUNDOS = 20
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pendientes: dict = {}   # id del token -> Future
+_pendientes_lock = threading.Lock()
+
+
+def _obtener_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(settings.PDF_PREPARADO_WORKERS, 1),
+                thread_name_prefix="pdf-preparado",
+            )
+        return _pool
+
+
+def cerrar_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _clave() -> bytes:
+    return hashlib.sha256(b"pdf-preparado:" + settings.SECRET_KEY.encode("utf-8")).digest()
+
+
+def _asociados(token_id: str, historia_id) -> bytes:
+    return f"{token_id}:{historia_id}".encode("ascii")
+
+
+def ruta_preparado(token_id: str) -> str:
+    return os.path.join(PREPARADOS_DIR, f"{token_id}.enc")
+
+
+def _preparar(token_id: str, historia_id, renderizar: Callable[[], Optional[bytes]]) -> bool:
+    try:
+        pdf = renderizar()
+        if not pdf:
+            return False
+        nonce = os.urandom(12)
+        cifrado = AESGCM(_clave()).encrypt(nonce, pdf, _asociados(token_id, historia_id))
+        os.makedirs(PREPARADOS_DIR, exist_ok=True)
+        temporal = ruta_preparado(token_id) + ".tmp"
+        with open(temporal, "wb") as f:
+            f.write(nonce + cifrado)
+        os.replace(temporal, ruta_preparado(token_id))
+        return True
+    except Exception as e:
+        logger.warning("No se pudo preparar %s: %s", token_id, e)
+        return False
+    finally:
+        with _pendientes_lock:
+            _pendientes.pop(token_id, None)
+
+
+def encolar(token_id: str, historia_id, renderizar: Callable[[], Optional[bytes]]) -> bool:
+    """
+    Encola el render. `renderizar` abre su propia sesión y devuelve los
+    bytes del PDF. Sin cryptography no se guarda nada (no en claro).
+    """
+    if not CIFRADO_DISPONIBLE:
+        return False
+    with _pendientes_lock:
+        if token_id in _pendientes:
+            return True
+        # _preparar saca la entrada al terminar, tomando este mismo lock
+        _pendientes[token_id] = _obtener_pool().submit(_preparar, token_id, historia_id, renderizar)
+    return True
+
+
+def obtener(token_id: str, historia_id, espera: float = ESPERA_SEGUNDOS) -> Optional[bytes]:
+    """PDF descifrado, o None si no hay (o no es válido) y hay que generarlo en vivo."""
+    if not CIFRADO_DISPONIBLE:
+        return None
+    with _pendientes_lock:
+        futuro: Optional[Future] = _pendientes.get(token_id)
+    if futuro is not None:
+        try:
+            futuro.result(timeout=espera)
+        except FuturoTimeout:
+            return None
+    try:
+        with open(ruta_preparado(token_id), "rb") as f:
+            datos = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        return AESGCM(_clave()).decrypt(datos[:12], datos[12:], _asociados(token_id, historia_id))
+    except (InvalidTag, ValueError):
+        logger.warning("Archivo inválido para %s, se genera en vivo", token_id)
+        return None
+
+
+def eliminar(token_id: str) -> None:
+    try:
+        os.remove(ruta_preparado(token_id))
+    except FileNotFoundError:
+        pass
+
+
+def purgar_vencidos(vigencia: timedelta) -> int:
+    """Borra los preparados (y temporales) más viejos que `vigencia`."""
+    limite = time.time() - vigencia.total_seconds()
+    borrados = 0
+    for ruta in glob.glob(os.path.join(PREPARADOS_DIR, "*.enc*")):
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+                borrados += 1
+        except FileNotFoundError:
+            pass
+    return borrados
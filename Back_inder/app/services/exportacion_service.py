@@ -0,0 +1,295 @@
+# ============================================================
+# EXPORTACIÓN INCREMENTAL A PARQUET (análisis local con DuckDB/pandas)
+# Tablas: deportistas, historias_clinicas, citas, diagnosticos y
+# signos_vitales, seudonimizadas:
+#   - todos los ids (y FKs) -> HMAC-SHA256 con una clave fija, así los
+#     joins entre tablas siguen funcionando pero no se vuelve al UUID
+#   - sin nombres, documento, contacto ni texto libre (observaciones);
+#     de la fecha de nacimiento solo el año
+# Incremental por marca de agua: cada tabla exporta las filas con
+# created_at en (marca anterior, hasta]; `hasta` queda un margen por
+# detrás de ahora para no perder transacciones que aún no confirman.
+# Solo capta altas: created_at no cambia con un UPDATE (para reexportar
+# todo: completo=True sobre un destino vacío).
+# Se lee con cursor del lado del servidor (stream_results) y se escribe
+# por grupos de filas en particiones Hive:
+#   <destino>/<tabla>/anio=YYYY/mes=MM/part-<corrida>.parquet
+# Las marcas van en <destino>/_marcas.json y se actualizan después de
+# cerrar y renombrar los archivos de la tabla.
+# Archivo: app/services/exportacion_service.py
+# ============================================================
+import hashlib
+import hmac
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Float, Integer, cast, extract, select
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.antecedentes import Diagnosticos, SignosVitales
+from app.models.catalogo import CatalogoItem
+from app.models.cita import Cita
+from app.models.deportista import Deportista
+from app.models.historia import HistoriaClinica
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_DISPONIBLE = True
+except ImportError:
+    PYARROW_DISPONIBLE = False
+
+FILAS_POR_LOTE = 10000               # filas por fetch del cursor y por grupo de filas
+MARGEN_CONFIRMACION = timedelta(minutes=5)
+ARCHIVO_MARCAS = "_marcas.json"
+
+
+# ── Seudonimización ──────────────────────────────────────────
+
+def _clave_seudonimo() -> bytes:
+    if settings.EXPORTACION_SEUDONIMO_CLAVE:
+        return settings.EXPORTACION_SEUDONIMO_CLAVE.encode("utf-8")
+    return hashlib.sha256(b"exportacion:" + settings.SECRET_KEY.encode("utf-8")).digest()
+
+
+def seudonimo(valor, clave: Optional[bytes] = None) -> Optional[str]:
+    """Seudónimo estable (32 hex) de un id; None se conserva."""
+    if valor is None:
+        return None
+    return hmac.new(clave or _clave_seudonimo(), str(valor).encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+# ── Tablas ───────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class _TablaExportacion:
+    nombre: str
+    modelo: type
+    consulta: Callable[[], object]          # SELECT con las columnas ya etiquetadas
+    columnas: Tuple[Tuple[str, str], ...]   # (nombre, tipo) en el orden del SELECT
+    seudonimos: Tuple[str, ...]             # columnas que se pasan por seudonimo()
+
+
+def _consulta_deportistas():
+    sexo, estado = aliased(CatalogoItem), aliased(CatalogoItem)
+    return (
+        select(
+            Deportista.id.label("deportista_id"),
+            cast(extract("year", Deportista.fecha_nacimiento), Integer).label("anio_nacimiento"),
+            sexo.nombre.label("sexo"),
+            Deportista.tipo_deporte,
+            estado.nombre.label("estado"),
+            Deportista.created_at,
+        )
+        .outerjoin(sexo, sexo.id == Deportista.sexo_id)
+        .outerjoin(estado, estado.id == Deportista.estado_id)
+    )
+
+
+def _consulta_historias():
+    estado = aliased(CatalogoItem)
+    return (
+        select(
+            HistoriaClinica.id.label("historia_clinica_id"),
+            HistoriaClinica.deportista_id,
+            HistoriaClinica.medico_id,
+            HistoriaClinica.fecha_apertura,
+            estado.nombre.label("estado"),
+            HistoriaClinica.created_at,
+        )
+        .outerjoin(estado, estado.id == HistoriaClinica.estado_id)
+    )
+
+
+def _consulta_citas():
+    tipo, estado = aliased(CatalogoItem), aliased(CatalogoItem)
+    return (
+        select(
+            Cita.id.label("cita_id"),
+            Cita.deportista_id,
+            Cita.medico_id,
+            Cita.fecha,
+            Cita.hora,
+            tipo.nombre.label("tipo_cita"),
+            estado.nombre.label("estado"),
+            Cita.created_at,
+        )
+        .outerjoin(tipo, tipo.id == Cita.tipo_cita_id)
+        .outerjoin(estado, estado.id == Cita.estado_cita_id)
+    )
+
+
+def _consulta_diagnosticos():
+    return select(
+        Diagnosticos.id.label("diagnostico_id"),
+        Diagnosticos.historia_clinica_id,
+        Diagnosticos.codigo_cie11,
+        Diagnosticos.nombre_enfermedad,
+        Diagnosticos.created_at,
+    )
+
+
+_SIGNOS_REALES = ("estatura_cm", "peso_kg", "temperatura_celsius", "saturacion_oxigeno_percent", "imc")
+_SIGNOS_ENTEROS = ("frecuencia_cardiaca_lpm", "presion_arterial_sistolica",
+                   "presion_arterial_diastolica", "frecuencia_respiratoria_rpm")
+
+
+def _consulta_signos():
+    return select(
+        SignosVitales.id.label("signos_vitales_id"),
+        SignosVitales.historia_clinica_id,
+        # Numeric -> float: Parquet/DuckDB no necesitan el Decimal
+        *[cast(getattr(SignosVitales, c), Float).label(c) for c in _SIGNOS_REALES],
+        *[getattr(SignosVitales, c) for c in _SIGNOS_ENTEROS],
+        SignosVitales.created_at,
+    )
+
+
+TABLAS: Dict[str, _TablaExportacion] = {t.nombre: t for t in (
+    _TablaExportacion(
+        "deportistas", Deportista, _consulta_deportistas,
+        (("deportista_id", "texto"), ("anio_nacimiento", "entero"), ("sexo", "texto"),
+         ("tipo_deporte", "texto"), ("estado", "texto"), ("created_at", "marca")),
+        ("deportista_id",),
+    ),
+    _TablaExportacion(
+        "historias_clinicas", HistoriaClinica, _consulta_historias,
+        (("historia_clinica_id", "texto"), ("deportista_id", "texto"), ("medico_id", "texto"),
+         ("fecha_apertura", "fecha"), ("estado", "texto"), ("created_at", "marca")),
+        ("historia_clinica_id", "deportista_id", "medico_id"),
+    ),
+    _TablaExportacion(
+        "citas", Cita, _consulta_citas,
+        (("cita_id", "texto"), ("deportista_id", "texto"), ("medico_id", "texto"),
+         ("fecha", "fecha"), ("hora", "hora"), ("tipo_cita", "texto"), ("estado", "texto"),
+         ("created_at", "marca")),
+        ("cita_id", "deportista_id", "medico_id"),
+    ),
+    _TablaExportacion(
+        "diagnosticos", Diagnosticos, _consulta_diagnosticos,
+        (("diagnostico_id", "texto"), ("historia_clinica_id", "texto"), ("codigo_cie11", "texto"),
+         ("nombre_enfermedad", "texto"), ("created_at", "marca")),
+        ("diagnostico_id", "historia_clinica_id"),
+    ),
+    _TablaExportacion(
+        "signos_vitales", SignosVitales, _consulta_signos,
+        (("signos_vitales_id", "texto"), ("historia_clinica_id", "texto"),
+         *[(c, "real") for c in _SIGNOS_REALES], *[(c, "entero") for c in _SIGNOS_ENTEROS],
+         ("created_at", "marca")),
+        ("signos_vitales_id", "historia_clinica_id"),
+    ),
+)}
+
+
+def _esquema(tabla: _TablaExportacion):
+    tipos = {
+        "texto": pa.string(), "entero": pa.int32(), "real": pa.float64(),
+        "fecha": pa.date32(), "hora": pa.time64("us"), "marca": pa.timestamp("us"),
+    }
+    return pa.schema([(nombre, tipos[tipo]) for nombre, tipo in tabla.columnas])
+
+
+# ── Marcas de agua ───────────────────────────────────────────
+
+def leer_marcas(destino: str) -> Dict[str, datetime]:
+    ruta = os.path.join(destino, ARCHIVO_MARCAS)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return {tabla: datetime.fromisoformat(marca) for tabla, marca in json.load(f).items()}
+
+
+def _guardar_marcas(destino: str, marcas: Dict[str, datetime]):
+    ruta = os.path.join(destino, ARCHIVO_MARCAS)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({t: m.isoformat() for t, m in sorted(marcas.items())}, f, indent=2)
+    os.replace(temporal, ruta)
+
+
+# ── Exportación ──────────────────────────────────────────────
+
+def _exportar_tabla(db: Session, tabla: _TablaExportacion, destino: str, corrida: str,
+                    desde: Optional[datetime], hasta: datetime, clave: bytes) -> dict:
+    modelo = tabla.modelo
+    consulta = tabla.consulta().where(modelo.created_at.is_not(None), modelo.created_at <= hasta)
+    if desde is not None:
+        consulta = consulta.where(modelo.created_at > desde)
+    consulta = consulta.order_by(modelo.created_at)
+
+    esquema = _esquema(tabla)
+    nombres = esquema.names
+    escritores = {}   # (anio, mes) -> (ParquetWriter, ruta temporal)
+    filas_total = 0
+    try:
+        resultado = db.execute(consulta, execution_options={"stream_results": True,
+                                                            "yield_per": FILAS_POR_LOTE})
+        for lote in resultado.partitions():
+            por_particion: Dict[Tuple[int, int], list] = {}
+            for fila in lote:
+                creado = fila.created_at
+                por_particion.setdefault((creado.year, creado.month), []).append(fila)
+
+            for (anio, mes), filas in por_particion.items():
+                columnas = {n: [getattr(f, n) for f in filas] for n in nombres}
+                for n in tabla.seudonimos:
+                    columnas[n] = [seudonimo(v, clave) for v in columnas[n]]
+                escritor = escritores.get((anio, mes))
+                if escritor is None:
+                    carpeta = os.path.join(destino, tabla.nombre, f"anio={anio}", f"mes={mes:02d}")
+                    os.makedirs(carpeta, exist_ok=True)
+                    temporal = os.path.join(carpeta, f"part-{corrida}.parquet.tmp")
+                    escritor = escritores[(anio, mes)] = (pq.ParquetWriter(temporal, esquema), temporal)
+                escritor[0].write_table(pa.Table.from_pydict(columnas, schema=esquema))
+                filas_total += len(filas)
+    except Exception:
+        for escritor, temporal in escritores.values():
+            escritor.close()
+            os.remove(temporal)
+        raise
+
+    archivos = []
+    for escritor, temporal in escritores.values():
+        escritor.close()
+        final = temporal[:-len(".tmp")]
+        os.replace(temporal, final)
+        archivos.append(os.path.relpath(final, destino))
+    return {"filas": filas_total, "archivos": sorted(archivos),
+            "desde": desde.isoformat() if desde else None, "hasta": hasta.isoformat()}
+
+
+def exportar(db: Session, destino: Optional[str] = None, tablas: Optional[Iterable[str]] = None,
+             hasta: Optional[datetime] = None, completo: bool = False) -> Dict[str, dict]:
+    """
+    Exporta lo nuevo de cada tabla desde su última marca. completo=True
+    ignora las marcas (no borra lo ya exportado: usar un destino vacío).
+    Devuelve {tabla: {"filas", "archivos", "desde", "hasta"}}.
+    """
+    if not PYARROW_DISPONIBLE:
+        raise RuntimeError("pyarrow no está instalado (pip install pyarrow)")
+    destino = destino or settings.EXPORTACION_DIR
+    nombres = list(tablas) if tablas else list(TABLAS)
+    desconocidas = [n for n in nombres if n not in TABLAS]
+    if desconocidas:
+        raise ValueError(f"Tablas no exportables: {', '.join(desconocidas)}. Opciones: {', '.join(TABLAS)}")
+
+    os.makedirs(destino, exist_ok=True)
+    hasta = hasta or (datetime.utcnow() - MARGEN_CONFIRMACION)
+    corrida = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    clave = _clave_seudonimo()
+    marcas = leer_marcas(destino)
+
+    resumen = {}
+    for nombre in nombres:
+        desde = None if completo else marcas.get(nombre)
+        if desde is not None and desde >= hasta:
+            resumen[nombre] = {"filas": 0, "archivos": [], "desde": desde.isoformat(), "hasta": hasta.isoformat()}
+            continue
+        resumen[nombre] = _exportar_tabla(db, TABLAS[nombre], destino, corrida, desde, hasta, clave)
+        marcas[nombre] = hasta
+        _guardar_marcas(destino, marcas)
+    return resumen
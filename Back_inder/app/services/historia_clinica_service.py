@@ -1,362 +1,265 @@
-"""
-Servicio para Historia Clínica con endpoints normalizados
-Reemplazar el actual por este para usar la BD normalizada
-"""
-
-from typing import Optional, List
+# ============================================================
+# SERVICIO DE HISTORIA CLÍNICA (datos normalizados)
+# Capa de dominio en proceso sobre app.crud.antecedentes: usa la
+# sesión de quien llama, sin serializar ni pasar por la red.
+#   - HistoriaClinicaService: en proceso (lo normal dentro del backend)
+#   - HistoriaClinicaRemota:  misma interfaz por HTTP, solo para procesos
+#     que no tienen acceso a la BD (scripts, otro servidor). Reutiliza
+#     una sesión HTTP con pool y keep-alive por URL base.
+# Varias escrituras de secciones se agrupan con unidad_de_trabajo():
+# se aplican juntas en una transacción y una sola revisión.
+# Archivo: app/services/historia_clinica_service.py
+# ============================================================
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
 from uuid import UUID
-import httpx
-
-BASE_URL = "http://localhost:8000/api/v1"
-
-
-class HistoriaClinicaService:
-    """Servicio para gestionar historia clínica normalizada"""
-    
-    @staticmethod
-    async def crear_antecedente_personal(
-        historia_clinica_id: UUID,
-        codigo_cie11: str,
-        nombre_enfermedad: str,
-        observaciones: Optional[str] = None
-    ):
-        """Crear antecedente personal"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/personales",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "codigo_cie11": codigo_cie11,
-                    "nombre_enfermedad": nombre_enfermedad,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_antecedente_familiar(
-        historia_clinica_id: UUID,
-        relacion: str,
-        codigo_cie11: str,
-        nombre_enfermedad: str
-    ):
-        """Crear antecedente familiar"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/familiares",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "relacion": relacion,
-                    "codigo_cie11": codigo_cie11,
-                    "nombre_enfermedad": nombre_enfermedad
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_lesion_deportiva(
-        historia_clinica_id: UUID,
-        tipo_lesion: str,
-        fecha_lesion: str,
-        tratamiento: str,
-        observaciones: Optional[str] = None
-    ):
-        """Crear lesión deportiva"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/lesiones-deportivas",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "tipo_lesion": tipo_lesion,
-                    "fecha_lesion": fecha_lesion,
-                    "tratamiento": tratamiento,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_cirugia(
-        historia_clinica_id: UUID,
-        tipo_cirugia: str,
-        fecha_cirugia: str,
-        observaciones: Optional[str] = None
-    ):
-        """Crear cirugía previa"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/cirugias",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "tipo_cirugia": tipo_cirugia,
-                    "fecha_cirugia": fecha_cirugia,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_alergia(
-        historia_clinica_id: UUID,
-        tipo_alergia: str,
-        descripcion: str,
-        reaccion: Optional[str] = None
-    ):
-        """Crear alergia"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/alergias",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "tipo_alergia": tipo_alergia,
-                    "descripcion": descripcion,
-                    "reaccion": reaccion
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_medicacion(
-        historia_clinica_id: UUID,
-        nombre_medicamento: str,
-        dosis: str,
-        frecuencia: str,
-        duracion: str,
-        indicacion: Optional[str] = None
-    ):
-        """Crear medicación"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/medicaciones",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "nombre_medicamento": nombre_medicamento,
-                    "dosis": dosis,
-                    "frecuencia": frecuencia,
-                    "duracion": duracion,
-                    "indicacion": indicacion
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_vacuna(
-        historia_clinica_id: UUID,
-        nombre_vacuna: str,
-        fecha_administracion: str,
-        proxima_dosis: Optional[str] = None
-    ):
-        """Crear vacuna administrada"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/vacunas",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "nombre_vacuna": nombre_vacuna,
-                    "fecha_administracion": fecha_administracion,
-                    "proxima_dosis": proxima_dosis
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_revision_sistema(
-        historia_clinica_id: UUID,
-        sistema: str,
-        hallazgos: str,
-        observaciones: Optional[str] = None
-    ):
-        """Crear revisión por sistemas"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/revision-sistemas",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "sistema": sistema,
-                    "hallazgos": hallazgos,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_signos_vitales(
-        historia_clinica_id: UUID,
-        presion_arterial: str,
-        frecuencia_cardiaca: int,
-        frecuencia_respiratoria: int,
-        temperatura: float,
-        peso: float,
-        altura: float,
-        imc: float,
-        saturacion_oxigeno: int
-    ):
-        """Crear signos vitales"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/signos-vitales",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "presion_arterial": presion_arterial,
-                    "frecuencia_cardiaca": frecuencia_cardiaca,
-                    "frecuencia_respiratoria": frecuencia_respiratoria,
-                    "temperatura": temperatura,
-                    "peso": peso,
-                    "altura": altura,
-                    "imc": imc,
-                    "saturacion_oxigeno": saturacion_oxigeno
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_prueba_complementaria(
-        historia_clinica_id: UUID,
-        tipo_prueba: str,
-        resultado: str,
-        fecha_prueba: str,
-        interpretacion: Optional[str] = None,
-        observaciones: Optional[str] = None
-    ):
-        """Crear prueba complementaria"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/pruebas-complementarias",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "tipo_prueba": tipo_prueba,
-                    "resultado": resultado,
-                    "fecha_prueba": fecha_prueba,
-                    "interpretacion": interpretacion,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_diagnostico(
-        historia_clinica_id: UUID,
-        codigo_cie11: str,
-        nombre_diagnostico: str,
-        tipo_diagnostico: str = "principal",
-        observaciones: Optional[str] = None
-    ):
-        """Crear diagnóstico"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/diagnosticos",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "codigo_cie11": codigo_cie11,
-                    "nombre_diagnostico": nombre_diagnostico,
-                    "tipo_diagnostico": tipo_diagnostico,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_plan_tratamiento(
-        historia_clinica_id: UUID,
-        recomendaciones: str,
-        medicamentos_prescritos: Optional[str] = None,
-        procedimientos: Optional[str] = None,
-        rehabilitacion: Optional[str] = None,
-        fecha_seguimiento: Optional[str] = None,
-        observaciones: Optional[str] = None
-    ):
-        """Crear plan de tratamiento"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/plan-tratamiento",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "recomendaciones": recomendaciones,
-                    "medicamentos_prescritos": medicamentos_prescritos,
-                    "procedimientos": procedimientos,
-                    "rehabilitacion": rehabilitacion,
-                    "fecha_seguimiento": fecha_seguimiento,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def crear_remision(
-        historia_clinica_id: UUID,
-        especialidad: str,
-        razon_remision: str,
-        prioridad: str = "Normal",
-        fecha_remision: Optional[str] = None,
-        institucion: Optional[str] = None,
-        observaciones: Optional[str] = None
-    ):
-        """Crear remisión a especialista"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{BASE_URL}/antecedentes/remisiones",
-                json={
-                    "historia_clinica_id": str(historia_clinica_id),
-                    "especialidad": especialidad,
-                    "razon_remision": razon_remision,
-                    "prioridad": prioridad,
-                    "fecha_remision": fecha_remision,
-                    "institucion": institucion,
-                    "observaciones": observaciones
-                }
-            )
-            return response.json()
-    
-    @staticmethod
-    async def obtener_historia_completa(historia_clinica_id: UUID):
-        """Obtener toda la historia clínica normalizada"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BASE_URL}/historias-clinicas/{historia_clinica_id}/completa"
-            )
-            return response.json()
-    
-    @staticmethod
-    async def obtener_antecedentes_personales(historia_clinica_id: UUID):
-        """Obtener antecedentes personales"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BASE_URL}/antecedentes/personales/historia/{historia_clinica_id}"
-            )
-            return response.json()
-    
-    @staticmethod
-    async def obtener_alergias(historia_clinica_id: UUID):
-        """Obtener alergias"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BASE_URL}/antecedentes/alergias/historia/{historia_clinica_id}"
-            )
-            return response.json()
-    
-    @staticmethod
-    async def obtener_medicaciones(historia_clinica_id: UUID):
-        """Obtener medicaciones"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BASE_URL}/antecedentes/medicaciones/historia/{historia_clinica_id}"
-            )
-            return response.json()
-    
-    @staticmethod
-    async def obtener_diagnosticos(historia_clinica_id: UUID):
-        """Obtener diagnósticos"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BASE_URL}/antecedentes/diagnosticos/historia/{historia_clinica_id}"
-            )
-            return response.json()
-    
-    @staticmethod
-    async def obtener_remisiones(historia_clinica_id: UUID):
-        """Obtener remisiones"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BASE_URL}/antecedentes/remisiones/historia/{historia_clinica_id}"
-            )
-            return response.json()
+
+import requests
+from fastapi.encoders import jsonable_encoder
+from requests.adapters import HTTPAdapter
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.crud import antecedentes
+
+
+class UnidadDeTrabajo:
+    """
+    Acumula operaciones sobre las secciones de una historia y las aplica
+    todas al salir del bloque (o con confirmar()). Si el bloque lanza una
+    excepción no se aplica nada. Los ids de las altas se generan al
+    encolarlas, así que se conocen antes de confirmar.
+
+        with servicio.unidad_de_trabajo(historia_id) as uow:
+            alergia_id = uow.crear("alergias", tipo_alergia="Polen")
+            uow.eliminar("diagnosticos", diagnostico_id)
+    """
+
+    def __init__(self, historia_clinica_id: UUID, aplicar: Callable[[UUID, list], dict]):
+        self.historia_clinica_id = historia_clinica_id
+        self._aplicar = aplicar
+        self.operaciones: List[dict] = []
+        self.resultado: Optional[dict] = None
+
+    def crear(self, seccion: str, **datos) -> UUID:
+        nuevo_id = uuid.uuid4()
+        self.operaciones.append({"seccion": seccion, "accion": "crear", "id": nuevo_id, "datos": datos})
+        return nuevo_id
+
+    def actualizar(self, seccion: str, fila_id: UUID, **datos) -> UUID:
+        self.operaciones.append({"seccion": seccion, "accion": "actualizar", "id": fila_id, "datos": datos})
+        return fila_id
+
+    def eliminar(self, seccion: str, fila_id: UUID) -> UUID:
+        self.operaciones.append({"seccion": seccion, "accion": "eliminar", "id": fila_id})
+        return fila_id
+
+    def confirmar(self) -> Optional[dict]:
+        """Aplica las operaciones pendientes. Devuelve {"resultados", "version"}."""
+        if self.operaciones:
+            operaciones, self.operaciones = self.operaciones, []
+            self.resultado = self._aplicar(self.historia_clinica_id, operaciones)
+        return self.resultado
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.confirmar()
+        else:
+            self.operaciones.clear()
+        return False
+
+
+class _OperacionesHistoria(ABC):
+    """
+    Interfaz común. Las subclases implementan _aplicar (escritura por lotes)
+    y obtener_secciones (lectura); todo lo demás se apoya en esas dos.
+    """
+
+    @abstractmethod
+    def _aplicar(self, historia_clinica_id: UUID, operaciones: list) -> dict:
+        ...
+
+    @abstractmethod
+    def obtener_secciones(self, historia_clinica_id: UUID, secciones: Optional[List[str]] = None) -> Dict[str, list]:
+        ...
+
+    def aplicar_operaciones(self, historia_clinica_id: UUID, operaciones: list) -> dict:
+        """Lote ya armado ([{"seccion", "accion", "id"?, "datos"?}]) en una transacción."""
+        return self._aplicar(historia_clinica_id, operaciones)
+
+    def unidad_de_trabajo(self, historia_clinica_id: UUID) -> UnidadDeTrabajo:
+        return UnidadDeTrabajo(historia_clinica_id, self._aplicar)
+
+    # ── Escritura de una sola fila (una transacción cada una) ──
+
+    def crear(self, historia_clinica_id: UUID, seccion: str, **datos) -> UUID:
+        with self.unidad_de_trabajo(historia_clinica_id) as uow:
+            return uow.crear(seccion, **datos)
+
+    def actualizar(self, historia_clinica_id: UUID, seccion: str, fila_id: UUID, **datos) -> UUID:
+        with self.unidad_de_trabajo(historia_clinica_id) as uow:
+            return uow.actualizar(seccion, fila_id, **datos)
+
+    def eliminar(self, historia_clinica_id: UUID, seccion: str, fila_id: UUID) -> UUID:
+        with self.unidad_de_trabajo(historia_clinica_id) as uow:
+            return uow.eliminar(seccion, fila_id)
+
+    # ── Atajos por sección (columnas del modelo como kwargs) ──
+
+    def crear_antecedente_personal(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "antecedentes_personales", **datos)
+
+    def crear_antecedente_familiar(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "antecedentes_familiares", **datos)
+
+    def crear_lesion_deportiva(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "lesiones_deportivas", **datos)
+
+    def crear_cirugia(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "cirugias_previas", **datos)
+
+    def crear_alergia(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "alergias", **datos)
+
+    def crear_medicacion(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "medicaciones", **datos)
+
+    def crear_vacuna(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "vacunas_administradas", **datos)
+
+    def crear_revision_sistema(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "revision_sistemas", **datos)
+
+    def crear_signos_vitales(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "signos_vitales", **datos)
+
+    def crear_prueba_complementaria(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "pruebas_complementarias", **datos)
+
+    def crear_diagnostico(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "diagnosticos", **datos)
+
+    def crear_plan_tratamiento(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "plan_tratamiento", **datos)
+
+    def crear_remision(self, historia_clinica_id: UUID, **datos) -> UUID:
+        return self.crear(historia_clinica_id, "remisiones_especialistas", **datos)
+
+    # ── Lectura ──
+
+    def obtener_historia_completa(self, historia_clinica_id: UUID) -> Dict[str, list]:
+        """Todas las secciones de la historia: {seccion: [filas]}"""
+        return self.obtener_secciones(historia_clinica_id)
+
+    def obtener_antecedentes_personales(self, historia_clinica_id: UUID) -> list:
+        return self.obtener_secciones(historia_clinica_id, ["antecedentes_personales"])["antecedentes_personales"]
+
+    def obtener_alergias(self, historia_clinica_id: UUID) -> list:
+        return self.obtener_secciones(historia_clinica_id, ["alergias"])["alergias"]
+
+    def obtener_medicaciones(self, historia_clinica_id: UUID) -> list:
+        return self.obtener_secciones(historia_clinica_id, ["medicaciones"])["medicaciones"]
+
+    def obtener_diagnosticos(self, historia_clinica_id: UUID) -> list:
+        return self.obtener_secciones(historia_clinica_id, ["diagnosticos"])["diagnosticos"]
+
+    def obtener_remisiones(self, historia_clinica_id: UUID) -> list:
+        return self.obtener_secciones(historia_clinica_id, ["remisiones_especialistas"])["remisiones_especialistas"]
+
+
+# ── En proceso ───────────────────────────────────────────────
+
+class HistoriaClinicaService(_OperacionesHistoria):
+    """
+    Servicio en proceso sobre la sesión recibida (la del endpoint, de un
+    job, etc.). Cada unidad de trabajo hace commit de esa sesión. Los
+    endpoints de /antecedentes/historia/{id} lo reciben con get_historia_service.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @classmethod
+    @contextmanager
+    def abrir(cls):
+        """Para código fuera de una petición: abre y cierra su propia sesión."""
+        db = SessionLocal()
+        try:
+            yield cls(db)
+        finally:
+            db.close()
+
+    def _aplicar(self, historia_clinica_id: UUID, operaciones: list) -> dict:
+        return antecedentes.aplicar_operaciones_secciones(self.db, historia_clinica_id, operaciones)
+
+    def obtener_secciones(self, historia_clinica_id: UUID, secciones: Optional[List[str]] = None) -> Dict[str, list]:
+        return antecedentes.obtener_secciones(self.db, [historia_clinica_id], secciones)[historia_clinica_id]
+
+
+# ── Remoto (HTTP) ────────────────────────────────────────────
+
+HTTP_TIMEOUT = 15          # segundos
+HTTP_POOL_MAXSIZE = 10     # conexiones keep-alive por URL base
+
+_sesiones_http: Dict[str, requests.Session] = {}
+_sesiones_lock = threading.Lock()
+
+
+def _sesion_http(base_url: str) -> requests.Session:
+    """Una requests.Session compartida por URL base (pool de conexiones keep-alive)."""
+    with _sesiones_lock:
+        sesion = _sesiones_http.get(base_url)
+        if sesion is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+            sesion.mount("http://", adaptador)
+            sesion.mount("https://", adaptador)
+            _sesiones_http[base_url] = sesion
+        return sesion
+
+
+def cerrar_sesiones_http():
+    with _sesiones_lock:
+        for sesion in _sesiones_http.values():
+            sesion.close()
+        _sesiones_http.clear()
+
+
+class HistoriaClinicaRemota(_OperacionesHistoria):
+    """
+    Misma interfaz contra otro servidor del backend, por ejemplo
+    HistoriaClinicaRemota("https://inder.example/api/v1", token).
+    No usar desde el propio backend: ahí va HistoriaClinicaService.
+    """
+
+    def __init__(self, base_url: str, token: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.http = _sesion_http(self.base_url)
+
+    def _aplicar(self, historia_clinica_id: UUID, operaciones: list) -> dict:
+        respuesta = self.http.post(
+            f"{self.base_url}/antecedentes/historia/{historia_clinica_id}/lote",
+            json=jsonable_encoder({"operaciones": operaciones}),
+            headers=self.headers,
+            timeout=HTTP_TIMEOUT,
+        )
+        respuesta.raise_for_status()
+        return respuesta.json()
+
+    def obtener_secciones(self, historia_clinica_id: UUID, secciones: Optional[List[str]] = None) -> Dict[str, list]:
+        params = {"sections": ",".join(secciones)} if secciones else None
+        respuesta = self.http.get(
+            f"{self.base_url}/antecedentes/historia/{historia_clinica_id}/secciones",
+            params=params,
+            headers=self.headers,
+            timeout=HTTP_TIMEOUT,
+        )
+        respuesta.raise_for_status()
+        return respuesta.json()
@@ -0,0 +1,247 @@
+# ============================================================
+# SERVICIO DE REVISIONES DE LA HISTORIA CLÍNICA
+# Historial append-only por historia (historias_revisiones):
+#   - delta: solo las secciones que cambiaron {seccion: valor nuevo}
+#   - checkpoint: documento completo, en la versión 1 y cada CHECKPOINT_CADA
+# historias_clinicas_json guarda la última versión (cabeza materializada),
+# así que leer la versión actual no reconstruye nada.
+# Documento: {seccion: [filas]} con todas las SECCIONES (filas con las
+# columnas de la tabla, ver serializar_filas) más "tipo_cita" (texto).
+# Las cabezas del formulario anterior (camelCase) las convierte la
+# migración 016.
+# Archivo: app/services/revisiones_service.py
+# ============================================================
+from typing import Optional
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.core.principal import usuario_actual
+from app.models.historia import HistoriaClinica, HistoriaClinicaJSON, HistoriaRevision
+from app.models.antecedentes import (
+    AntecedentesPersonales, AntecedentesFamiliares, LesioneDeportivas,
+    CirugiasPrivas, Alergias, Medicaciones, VacunasAdministradas,
+    RevisionSistemas, SignosVitales, PruebasComplementarias,
+    Diagnosticos, PlanTratamiento, RemisionesEspecialistas,
+    MotivoConsultaEnfermedadActual, ExploracionFisicaSistemas, AptitudMedica
+)
+
+CHECKPOINT_CADA = 20
+
+# Clave del documento con el tipo de cita/consulta (índice de la migración 016)
+TIPO_CITA = "tipo_cita"
+
+# Sección del documento -> tabla normalizada (mismos nombres que las
+# relaciones de HistoriaClinica)
+SECCIONES = {
+    "antecedentes_personales":     AntecedentesPersonales,
+    "antecedentes_familiares":     AntecedentesFamiliares,
+    "lesiones_deportivas":         LesioneDeportivas,
+    "cirugias_previas":            CirugiasPrivas,
+    "alergias":                    Alergias,
+    "medicaciones":                Medicaciones,
+    "vacunas_administradas":       VacunasAdministradas,
+    "revision_sistemas":           RevisionSistemas,
+    "signos_vitales":              SignosVitales,
+    "pruebas_complementarias":     PruebasComplementarias,
+    "diagnosticos":                Diagnosticos,
+    "plan_tratamiento":            PlanTratamiento,
+    "remisiones_especialistas":    RemisionesEspecialistas,
+    "motivo_consulta_enfermedad":  MotivoConsultaEnfermedadActual,
+    "exploracion_fisica_sistemas": ExploracionFisicaSistemas,
+    "aptitud_medica":              AptitudMedica,
+}
+SECCION_DE_MODELO = {modelo: seccion for seccion, modelo in SECCIONES.items()}
+
+# No forman parte del contenido clínico de la sección
+_COLUMNAS_EXCLUIDAS = {"historia_clinica_id", "created_at"}
+
+
+class VersionNoEncontrada(Exception):
+    pass
+
+
+# ── Serialización de secciones ───────────────────────────────
+
+def serializar_filas(modelo, filas) -> list:
+    """Filas ORM o dicts (p. ej. las de LoteEscritura) -> lista JSON."""
+    columnas = [c.key for c in modelo.__table__.columns if c.key not in _COLUMNAS_EXCLUIDAS]
+    salida = []
+    for fila in filas:
+        if isinstance(fila, dict):
+            salida.append({c: fila.get(c) for c in columnas})
+        else:
+            salida.append({c: getattr(fila, c) for c in columnas})
+    return jsonable_encoder(salida)
+
+
+def leer_seccion(db: Session, historia_id, seccion: str) -> list:
+    modelo = SECCIONES[seccion]
+    filas = db.query(modelo).filter(
+        modelo.historia_clinica_id == historia_id
+    ).order_by(modelo.created_at, modelo.id).all()
+    return serializar_filas(modelo, filas)
+
+
+def leer_documento(db: Session, historia_id) -> dict:
+    """Documento completo (todas las secciones) leído de las tablas normalizadas."""
+    return {seccion: leer_seccion(db, historia_id, seccion) for seccion in SECCIONES}
+
+
+def documento_desde_filas(filas_por_modelo: dict, tipo_cita: Optional[str] = None) -> dict:
+    """
+    Documento completo a partir de las filas insertadas por
+    LoteEscritura.ejecutar(db, devolver=True): mismo resultado que
+    leer_documento sin volver a consultar.
+    """
+    documento = {}
+    for seccion, modelo in SECCIONES.items():
+        filas = sorted(filas_por_modelo.get(modelo, []), key=lambda f: (f.created_at, f.id))
+        documento[seccion] = serializar_filas(modelo, filas)
+    if tipo_cita:
+        documento[TIPO_CITA] = tipo_cita
+    return documento
+
+
+# ── Escritura ────────────────────────────────────────────────
+
+def _usuario_id(usuario_id) -> Optional[UUID]:
+    valor = usuario_id or usuario_actual.get()
+    if not valor:
+        return None
+    try:
+        return valor if isinstance(valor, UUID) else UUID(str(valor))
+    except ValueError:
+        return None
+
+
+def registrar_revision(db: Session, historia_id, cambios: dict, deportista_id=None,
+                       usuario_id=None, nueva: bool = False) -> Optional[int]:
+    """
+    Registra una revisión con las secciones de `cambios` que difieren de la
+    cabeza. Un valor None elimina la sección. No hace commit: queda en la
+    transacción de quien llama. Devuelve la versión nueva o None si no hubo cambios.
+
+    nueva=True: la historia se acaba de crear en esta transacción y no hay
+    cabeza que bloquear; `cambios` debe ser el documento completo.
+    """
+    cabeza = None
+    if not nueva:
+        # FOR UPDATE serializa las versiones de una misma historia
+        cabeza = db.query(HistoriaClinicaJSON).filter(
+            HistoriaClinicaJSON.historia_clinica_id == historia_id
+        ).order_by(HistoriaClinicaJSON.created_at.desc()).with_for_update().first()
+        if cabeza is None:
+            # Historia sin versiones: la 1 (checkpoint) lleva todas las secciones
+            cambios = {**leer_documento(db, historia_id), **cambios}
+
+    documento = dict(cabeza.datos_completos) if cabeza else {}
+    delta = {}
+    for seccion, valor in jsonable_encoder(cambios).items():
+        if valor is None:
+            if seccion in documento:
+                delta[seccion] = None
+        elif documento.get(seccion) != valor:
+            delta[seccion] = valor
+    if not delta:
+        return None
+
+    for seccion, valor in delta.items():
+        if valor is None:
+            documento.pop(seccion, None)
+        else:
+            documento[seccion] = valor
+
+    version = ((cabeza.version or 0) if cabeza else 0) + 1
+    es_checkpoint = version == 1 or version % CHECKPOINT_CADA == 0
+    db.add(HistoriaRevision(
+        historia_clinica_id=historia_id,
+        version=version,
+        es_checkpoint=es_checkpoint,
+        datos=documento if es_checkpoint else delta,
+        secciones=sorted(delta),
+        usuario_id=_usuario_id(usuario_id),
+    ))
+
+    if cabeza:
+        cabeza.datos_completos = documento
+        cabeza.version = version
+    else:
+        if deportista_id is None:
+            deportista_id = db.query(HistoriaClinica.deportista_id).filter(
+                HistoriaClinica.id == historia_id
+            ).scalar()
+        db.add(HistoriaClinicaJSON(
+            historia_clinica_id=historia_id,
+            deportista_id=deportista_id,
+            datos_completos=documento,
+            version=version,
+        ))
+    return version
+
+
+def registrar_cambio_seccion(db: Session, historia_id, modelo) -> Optional[int]:
+    """Relee la sección de `modelo` tras un alta/edición/baja y la versiona."""
+    seccion = SECCION_DE_MODELO[modelo]
+    db.flush()
+    return registrar_revision(db, historia_id, {seccion: leer_seccion(db, historia_id, seccion)})
+
+
+# ── Lectura ──────────────────────────────────────────────────
+
+def listar_revisiones(db: Session, historia_id) -> list:
+    filas = db.query(
+        HistoriaRevision.version, HistoriaRevision.es_checkpoint, HistoriaRevision.secciones,
+        HistoriaRevision.usuario_id, HistoriaRevision.created_at,
+    ).filter(
+        HistoriaRevision.historia_clinica_id == historia_id
+    ).order_by(HistoriaRevision.version.desc()).all()
+    return [
+        {
+            "version": f.version,
+            "es_checkpoint": f.es_checkpoint,
+            "secciones": f.secciones,
+            "usuario_id": str(f.usuario_id) if f.usuario_id else None,
+            "created_at": f.created_at,
+        }
+        for f in filas
+    ]
+
+
+def obtener_version(db: Session, historia_id, version: Optional[int] = None) -> dict:
+    """
+    Documento de la historia en `version`. Sin versión: la cabeza materializada.
+    Con versión: último checkpoint <= version más los deltas posteriores.
+    """
+    if version is None:
+        cabeza = db.query(HistoriaClinicaJSON).filter(
+            HistoriaClinicaJSON.historia_clinica_id == historia_id
+        ).order_by(HistoriaClinicaJSON.created_at.desc()).first()
+        if not cabeza:
+            raise VersionNoEncontrada("La historia no tiene revisiones")
+        return {"version": cabeza.version, "datos": cabeza.datos_completos}
+
+    checkpoint = db.query(HistoriaRevision.version).filter(
+        HistoriaRevision.historia_clinica_id == historia_id,
+        HistoriaRevision.es_checkpoint.is_(True),
+        HistoriaRevision.version <= version,
+    ).order_by(HistoriaRevision.version.desc()).limit(1).scalar_subquery()
+
+    revisiones = db.query(HistoriaRevision).filter(
+        HistoriaRevision.historia_clinica_id == historia_id,
+        HistoriaRevision.version >= checkpoint,
+        HistoriaRevision.version <= version,
+    ).order_by(HistoriaRevision.version).all()
+
+    if not revisiones or revisiones[-1].version != version:
+        raise VersionNoEncontrada(f"Versión {version} no encontrada")
+
+    documento = dict(revisiones[0].datos)
+    for revision in revisiones[1:]:
+        for seccion, valor in revision.datos.items():
+            if valor is None:
+                documento.pop(seccion, None)
+            else:
+                documento[seccion] = valor
+    return {"version": version, "datos": documento}
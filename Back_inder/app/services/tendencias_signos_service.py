@@ -0,0 +1,320 @@
+# ============================================================
+# TENDENCIAS DE SIGNOS VITALES (NumPy)
+# Carga en una sola consulta las series de signos_vitales de un
+# deportista (con su cohorte: misma disciplina) o de toda una
+# disciplina, y calcula todo sobre arreglos, sin recorrer filas:
+#   - IMC: el registrado o peso / estatura² si falta
+#   - media móvil de las últimas N mediciones de cada deportista
+#   - puntaje z contra la cohorte (última medición de cada deportista
+#     de la misma disciplina)
+#   - banderas fuera de rango (RANGOS_REFERENCIA)
+# La fecha de cada medición es la fecha_apertura de su historia.
+# Archivo: app/services/tendencias_signos_service.py
+# ============================================================
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import Float, cast, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.antecedentes import SignosVitales
+from app.models.deportista import Deportista
+from app.models.historia import HistoriaClinica
+
+VARIABLES = (
+    "peso_kg", "estatura_cm", "imc",
+    "frecuencia_cardiaca_lpm", "presion_arterial_sistolica", "presion_arterial_diastolica",
+    "frecuencia_respiratoria_rpm", "temperatura_celsius", "saturacion_oxigeno_percent",
+)
+_I = {v: i for i, v in enumerate(VARIABLES)}
+
+# Rangos de referencia en reposo (adulto). Peso y estatura no tienen rango.
+RANGOS_REFERENCIA = {
+    "imc":                         (18.5, 30.0),
+    "frecuencia_cardiaca_lpm":     (40, 100),    # bradicardia del deportista entrenado hasta 40
+    "presion_arterial_sistolica":  (90, 140),
+    "presion_arterial_diastolica": (60, 90),
+    "frecuencia_respiratoria_rpm": (12, 20),
+    "temperatura_celsius":         (35.5, 37.5),
+    "saturacion_oxigeno_percent":  (94, 100),
+}
+Z_ALERTA = 2.0
+VENTANA_DEFECTO = 3
+SIN_DISCIPLINA = "Sin disciplina"
+
+
+@dataclass
+class SeriesSignos:
+    """Mediciones ordenadas por deportista y fecha; una fila por medición."""
+    deportistas: np.ndarray   # (n,) object: UUID
+    nombres: np.ndarray       # (n,) object
+    documentos: np.ndarray    # (n,) object
+    disciplinas: np.ndarray   # (n,) object
+    fechas: np.ndarray        # (n,) datetime64[D]
+    valores: np.ndarray       # (n, len(VARIABLES)) float, NaN = sin dato
+
+    def __len__(self):
+        return len(self.fechas)
+
+    @property
+    def inicio_grupo(self) -> np.ndarray:
+        """Índice de la primera medición del deportista de cada fila."""
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        cambio = np.r_[True, self.deportistas[1:] != self.deportistas[:-1]]
+        return np.maximum.accumulate(np.where(cambio, np.arange(n), 0))
+
+    @property
+    def es_ultima(self) -> np.ndarray:
+        """True en la última medición de cada deportista."""
+        n = len(self)
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        return np.r_[self.deportistas[1:] != self.deportistas[:-1], True]
+
+
+# ── Carga ────────────────────────────────────────────────────
+
+def cargar_series(db: Session, deportista_id: Optional[UUID] = None,
+                  disciplina: Optional[str] = None) -> SeriesSignos:
+    """
+    deportista_id: ese deportista y su cohorte (misma disciplina).
+    disciplina: todos los deportistas de la disciplina. Sin filtros: todos.
+    """
+    disciplina_col = func.coalesce(Deportista.tipo_deporte, SIN_DISCIPLINA)
+    consulta = (
+        select(
+            Deportista.id,
+            (Deportista.nombres + " " + Deportista.apellidos).label("nombre"),
+            Deportista.numero_documento,
+            disciplina_col.label("disciplina"),
+            HistoriaClinica.fecha_apertura,
+            *[cast(getattr(SignosVitales, v), Float) for v in VARIABLES],
+        )
+        .join(HistoriaClinica, HistoriaClinica.id == SignosVitales.historia_clinica_id)
+        .join(Deportista, Deportista.id == HistoriaClinica.deportista_id)
+        .order_by(Deportista.id, HistoriaClinica.fecha_apertura, SignosVitales.created_at)
+    )
+    if deportista_id is not None:
+        suya = select(disciplina_col).where(Deportista.id == deportista_id).scalar_subquery()
+        consulta = consulta.where(or_(Deportista.id == deportista_id, disciplina_col == suya))
+    elif disciplina:
+        consulta = consulta.where(disciplina_col == disciplina)
+
+    filas = db.execute(consulta).all()
+    if not filas:
+        vacio = np.array([], dtype=object)
+        return SeriesSignos(vacio, vacio, vacio, vacio, np.array([], dtype="datetime64[D]"),
+                            np.empty((0, len(VARIABLES))))
+    columnas = list(zip(*filas))
+    return SeriesSignos(
+        deportistas=np.array(columnas[0], dtype=object),
+        nombres=np.array(columnas[1], dtype=object),
+        documentos=np.array(columnas[2], dtype=object),
+        disciplinas=np.array(columnas[3], dtype=object),
+        fechas=np.array(columnas[4], dtype="datetime64[D]"),
+        valores=_completar_imc(np.array(columnas[5:], dtype=float).T),
+    )
+
+
+def _completar_imc(valores: np.ndarray) -> np.ndarray:
+    peso, estatura, imc = valores[:, _I["peso_kg"]], valores[:, _I["estatura_cm"]], valores[:, _I["imc"]]
+    metros = np.where(estatura > 0, estatura / 100, np.nan)
+    with np.errstate(invalid="ignore"):
+        valores[:, _I["imc"]] = np.where(np.isnan(imc), peso / metros ** 2, imc)
+    return valores
+
+
+# ── Cálculos ─────────────────────────────────────────────────
+
+def medias_moviles(series: SeriesSignos, ventana: int = VENTANA_DEFECTO) -> np.ndarray:
+    """Media de las últimas `ventana` mediciones del mismo deportista (ignora NaN)."""
+    valores = series.valores
+    presentes = ~np.isnan(valores)
+    suma = np.vstack([np.zeros(valores.shape[1]), np.cumsum(np.where(presentes, valores, 0.0), axis=0)])
+    cuenta = np.vstack([np.zeros(valores.shape[1]), np.cumsum(presentes, axis=0)])
+    fin = np.arange(len(series)) + 1
+    inicio = np.maximum(fin - ventana, series.inicio_grupo)
+    n = cuenta[fin] - cuenta[inicio]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (suma[fin] - suma[inicio]) / n, np.nan)
+
+
+def ultimos_valores(series: SeriesSignos) -> np.ndarray:
+    """
+    (n, variables): en cada fila, el último valor no nulo de cada variable
+    del deportista hasta esa medición (forward fill por grupo).
+    """
+    valores = series.valores
+    filas = np.arange(len(series))[:, None]
+    con_dato = np.where(~np.isnan(valores), filas, -1)
+    ultimo = np.maximum.accumulate(con_dato, axis=0)
+    # No arrastrar datos de otro deportista
+    ultimo = np.where(ultimo >= series.inicio_grupo[:, None], ultimo, -1)
+    columnas = np.arange(valores.shape[1])[None, :]
+    return np.where(ultimo >= 0, valores[np.maximum(ultimo, 0), columnas], np.nan)
+
+
+def referencia_cohortes(series: SeriesSignos):
+    """
+    Media y desviación (muestral) por disciplina y variable sobre el último
+    valor de cada deportista. Devuelve (disciplinas, indice_por_fila, media, desviacion, n).
+    """
+    ultima = series.es_ultima
+    actuales = ultimos_valores(series)[ultima]
+    disciplinas, indice = np.unique(series.disciplinas.astype(str), return_inverse=True)
+    grupos = len(disciplinas)
+    presentes = ~np.isnan(actuales)
+    x = np.where(presentes, actuales, 0.0)
+    cohorte = indice[ultima]
+
+    n = np.zeros((grupos, len(VARIABLES)))
+    suma = np.zeros_like(n)
+    suma2 = np.zeros_like(n)
+    np.add.at(n, cohorte, presentes)
+    np.add.at(suma, cohorte, x)
+    np.add.at(suma2, cohorte, x ** 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(n > 0, suma / n, np.nan)
+        varianza = np.where(n > 1, (suma2 - n * media ** 2) / (n - 1), np.nan)
+    desviacion = np.sqrt(np.clip(varianza, 0, None))
+    return disciplinas, indice, media, desviacion, n
+
+
+def puntajes_z(valores: np.ndarray, cohorte: np.ndarray, media: np.ndarray, desviacion: np.ndarray) -> np.ndarray:
+    """
+    z de cada fila de `valores` contra su cohorte (`cohorte`: índice de
+    disciplina por fila). NaN si la desviación es 0 o hay < 2 deportistas.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = desviacion[cohorte]
+        return np.where(sd > 0, (valores - media[cohorte]) / sd, np.nan)
+
+
+def fuera_de_rango(valores: np.ndarray) -> np.ndarray:
+    """Banderas (n, variables); NaN y variables sin rango no se marcan."""
+    minimos = np.array([RANGOS_REFERENCIA.get(v, (-np.inf, np.inf))[0] for v in VARIABLES])
+    maximos = np.array([RANGOS_REFERENCIA.get(v, (-np.inf, np.inf))[1] for v in VARIABLES])
+    with np.errstate(invalid="ignore"):
+        return (valores < minimos) | (valores > maximos)
+
+
+# ── Respuestas ───────────────────────────────────────────────
+
+def _numero(valor, decimales: int = 2):
+    return None if valor is None or np.isnan(valor) else round(float(valor), decimales)
+
+
+def _por_variable(fila: np.ndarray, decimales: int = 2) -> Dict[str, Optional[float]]:
+    return {v: _numero(x, decimales) for v, x in zip(VARIABLES, fila)}
+
+
+def tendencia_deportista(db: Session, deportista_id: UUID, ventana: int = VENTANA_DEFECTO) -> dict:
+    """Serie del deportista con IMC, medias móviles, z contra su disciplina y banderas."""
+    series = cargar_series(db, deportista_id=deportista_id)
+    disciplinas, indice, media, desviacion, n = referencia_cohortes(series)
+    moviles = medias_moviles(series, ventana)
+    z = puntajes_z(series.valores, indice, media, desviacion)
+    banderas = fuera_de_rango(series.valores)
+
+    propias = np.flatnonzero(series.deportistas == deportista_id)
+    mediciones = [
+        {
+            "fecha": str(series.fechas[i]),
+            "valores": _por_variable(series.valores[i]),
+            "media_movil": _por_variable(moviles[i]),
+            "z": _por_variable(z[i]),
+            "fuera_de_rango": [v for v, b in zip(VARIABLES, banderas[i]) if b],
+        }
+        for i in propias
+    ]
+    if len(propias):
+        g = indice[propias[0]]
+        disciplina = str(disciplinas[g])
+        cohorte = {
+            "deportistas": int(np.sum(series.es_ultima & (indice == g))),
+            "variables": {
+                v: {"media": _numero(media[g, j]), "desviacion": _numero(desviacion[g, j]), "n": int(n[g, j])}
+                for j, v in enumerate(VARIABLES)
+            },
+        }
+    else:
+        disciplina, cohorte = None, None
+    return {
+        "deportista_id": str(deportista_id),
+        "disciplina": disciplina,
+        "ventana": ventana,
+        "mediciones": mediciones,
+        "cohorte": cohorte,
+    }
+
+
+def resumen_por_disciplina(db: Session, disciplina: Optional[str] = None,
+                           ventana: int = VENTANA_DEFECTO) -> dict:
+    """
+    Por disciplina: estadísticos de la última medición de cada deportista y
+    conteo fuera de rango. Alertas: deportistas cuya última medición está
+    fuera de rango o a |z| >= Z_ALERTA de su cohorte, con la tendencia del IMC.
+    """
+    series = cargar_series(db, disciplina=disciplina)
+    if not len(series):
+        return {"disciplinas": [], "alertas": [], "ventana": ventana}
+    disciplinas, indice, media, desviacion, n = referencia_cohortes(series)
+
+    ultima = np.flatnonzero(series.es_ultima)
+    inicio = series.inicio_grupo[ultima]
+    cohorte = indice[ultima]
+    actuales = ultimos_valores(series)[ultima]
+    moviles = medias_moviles(series, ventana)[ultima]
+    z = puntajes_z(actuales, cohorte, media, desviacion)
+    banderas = fuera_de_rango(actuales)
+    with np.errstate(invalid="ignore"):
+        z_alta = np.abs(z) >= Z_ALERTA
+    imc = series.valores[:, _I["imc"]]
+    cambio_imc = imc[ultima] - imc[inicio]
+
+    resumen = []
+    for g, nombre in enumerate(disciplinas):
+        miembros = cohorte == g
+        bloque = actuales[miembros]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # variables sin ningún dato
+            p10, p50, p90 = np.nanpercentile(bloque, (10, 50, 90), axis=0)
+        fuera = banderas[miembros].sum(axis=0)
+        resumen.append({
+            "disciplina": str(nombre),
+            "deportistas": int(miembros.sum()),
+            "variables": {
+                v: {
+                    "n": int(n[g, j]),
+                    "media": _numero(media[g, j]),
+                    "desviacion": _numero(desviacion[g, j]),
+                    "p10": _numero(p10[j]), "p50": _numero(p50[j]), "p90": _numero(p90[j]),
+                    "fuera_de_rango": int(fuera[j]),
+                }
+                for j, v in enumerate(VARIABLES)
+            },
+        })
+
+    alertas = []
+    for k in np.flatnonzero(banderas.any(axis=1) | z_alta.any(axis=1)):
+        i = ultima[k]
+        alertas.append({
+            "deportista_id": str(series.deportistas[i]),
+            "nombre": series.nombres[i],
+            "documento": series.documentos[i],
+            "disciplina": series.disciplinas[i],
+            "fecha": str(series.fechas[i]),
+            "mediciones": int(i - inicio[k] + 1),
+            "fuera_de_rango": {v: _numero(actuales[k, j]) for j, v in enumerate(VARIABLES) if banderas[k, j]},
+            "z_extremos": {v: _numero(z[k, j]) for j, v in enumerate(VARIABLES) if z_alta[k, j]},
+            "imc": _numero(actuales[k, _I["imc"]]),
+            "imc_media_movil": _numero(moviles[k, _I["imc"]]),
+            "imc_cambio": _numero(cambio_imc[k]),
+        })
+    alertas.sort(key=lambda a: (-len(a["fuera_de_rango"]) - len(a["z_extremos"]), a["nombre"]))
+    return {"disciplinas": resumen, "alertas": alertas, "ventana": ventana}
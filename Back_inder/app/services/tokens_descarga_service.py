@@ -0,0 +1,307 @@
+# ============================================================
+# TOKENS DE DESCARGA SEGURA (enlace por WhatsApp)
+# El token es firmado con HMAC-SHA256 y lleva dentro la historia, la
+# emisión, la expiración y un hash de la cédula del deportista, así que
+# verificar firma, vigencia y cédula no consulta la BD.
+#   - tipo "enlace": el que va en la URL; con la cédula se canjea por
+#   - tipo "descarga": mismo id, vida corta, habilita /descargar una vez
+# tokens_descarga solo guarda intentos fallidos y revocaciones (por token
+# o por historia al emitir un enlace nuevo). Se replica en memoria y se
+# relee cada REFRESCO_SEGUNDOS; las escrituras de este proceso se ven de
+# inmediato. Con varios workers el refresco acota el desfase.
+# Archivo: app/services/tokens_descarga_service.py
+# ============================================================
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.token_descarga import TokenDescarga
+from app.services import documentos_preparados_service
+
+logger = logging.getLogger(__name__)
+
+VIGENCIA_ENLACE = timedelta(hours=2)
+VIGENCIA_DESCARGA = timedelta(minutes=10)
+MAX_INTENTOS = 3
+REFRESCO_SEGUNDOS = 15
+
+ENLACE, DESCARGA = "enlace", "descarga"
+_TIPOS = {ENLACE: 1, DESCARGA: 2}
+_VERSION = 1
+# versión, tipo, historia, emitido (ms), expira (s), hash de cédula, id
+_FORMATO = struct.Struct(">BB16sQI8s6s")
+_LARGO_FIRMA = 16
+
+
+class TokenInvalido(Exception):
+    """Firma, formato o tipo incorrectos."""
+
+
+class TokenExpirado(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class TokenFirmado:
+    id: str
+    tipo: str
+    historia_id: UUID
+    emitido_ms: int
+    expira: int
+    hash_cedula: bytes
+
+    @property
+    def fecha_expiracion(self) -> datetime:
+        return datetime.utcfromtimestamp(self.expira)
+
+
+def _clave() -> bytes:
+    if settings.TOKENS_DESCARGA_CLAVE:
+        return settings.TOKENS_DESCARGA_CLAVE.encode("utf-8")
+    return hashlib.sha256(b"descarga-segura:" + settings.SECRET_KEY.encode("utf-8")).digest()
+
+
+def normalizar_cedula(cedula: str) -> str:
+    return (cedula or "").strip().replace(".", "").replace(",", "").replace(" ", "")
+
+
+def _hash_cedula(cedula: str) -> bytes:
+    return hmac.new(_clave(), b"cedula:" + normalizar_cedula(cedula).encode("utf-8"), hashlib.sha256).digest()[:8]
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode("ascii")
+
+
+def _firmar(historia_id: UUID, tipo: str, emitido_ms: int, expira: int,
+            hash_cedula: bytes, id_token: bytes) -> str:
+    cuerpo = _FORMATO.pack(_VERSION, _TIPOS[tipo], historia_id.bytes, emitido_ms, expira, hash_cedula, id_token)
+    firma = hmac.new(_clave(), cuerpo, hashlib.sha256).digest()[:_LARGO_FIRMA]
+    return _b64(cuerpo + firma)
+
+
+def emitir_enlace(historia_id: UUID, numero_documento: str) -> tuple[str, TokenFirmado]:
+    """Token de enlace nuevo. No escribe en la BD (ver revocar_anteriores)."""
+    emitido_ms = int(time.time() * 1000)
+    expira = emitido_ms // 1000 + int(VIGENCIA_ENLACE.total_seconds())
+    token = _firmar(historia_id, ENLACE, emitido_ms, expira, _hash_cedula(numero_documento), os.urandom(6))
+    return token, decodificar(token, comprobar_vigencia=False)
+
+
+def emitir_descarga(enlace: TokenFirmado) -> str:
+    """Token de descarga para un enlace ya verificado: mismo id, vence antes."""
+    expira = min(enlace.expira, int(time.time() + VIGENCIA_DESCARGA.total_seconds()))
+    return _firmar(enlace.historia_id, DESCARGA, enlace.emitido_ms, expira,
+                   enlace.hash_cedula, bytes.fromhex(enlace.id))
+
+
+def decodificar(token: str, tipo: Optional[str] = None, comprobar_vigencia: bool = True) -> TokenFirmado:
+    """Valida firma (y tipo / vigencia). Solo CPU, sin BD."""
+    try:
+        datos = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise TokenInvalido("formato")
+    if len(datos) != _FORMATO.size + _LARGO_FIRMA:
+        raise TokenInvalido("formato")
+    cuerpo, firma = datos[:_FORMATO.size], datos[_FORMATO.size:]
+    if not hmac.compare_digest(firma, hmac.new(_clave(), cuerpo, hashlib.sha256).digest()[:_LARGO_FIRMA]):
+        raise TokenInvalido("firma")
+
+    version, codigo, historia, emitido_ms, expira, hash_cedula, id_token = _FORMATO.unpack(cuerpo)
+    tipos = {v: k for k, v in _TIPOS.items()}
+    if version != _VERSION or codigo not in tipos:
+        raise TokenInvalido("version")
+    firmado = TokenFirmado(id_token.hex(), tipos[codigo], UUID(bytes=historia), emitido_ms, expira, hash_cedula)
+    if tipo and firmado.tipo != tipo:
+        raise TokenInvalido("tipo")
+    if comprobar_vigencia and time.time() > expira:
+        raise TokenExpirado()
+    return firmado
+
+
+def cedula_coincide(token: TokenFirmado, cedula: str) -> bool:
+    return hmac.compare_digest(token.hash_cedula, _hash_cedula(cedula))
+
+
+# ── Estado (intentos y revocaciones) ─────────────────────────
+
+def _clave_historia(historia_id: UUID) -> str:
+    return f"h:{historia_id.hex}"
+
+
+class EstadoTokens:
+    """Réplica en memoria de tokens_descarga (solo filas vigentes)."""
+
+    def __init__(self, refresco: float = REFRESCO_SEGUNDOS):
+        self.refresco = refresco
+        self._intentos: dict = {}     # id -> intentos fallidos
+        self._revocados: set = set()  # ids
+        self._historias: dict = {}    # "h:<historia>" -> emitidos antes de (ms) quedan revocados
+        self._leido_en = None
+        self._lock = threading.Lock()
+
+    def sincronizar(self, db: Session, forzar: bool = False):
+        with self._lock:
+            if not forzar and self._leido_en is not None and time.monotonic() - self._leido_en < self.refresco:
+                return
+        filas = db.execute(
+            select(TokenDescarga.id, TokenDescarga.intentos_fallidos, TokenDescarga.revocado,
+                   TokenDescarga.revocar_emitidos_antes)
+            .where(TokenDescarga.fecha_expiracion > datetime.utcnow())
+        ).all()
+        intentos, revocados, historias = {}, set(), {}
+        for fila in filas:
+            if fila.revocar_emitidos_antes is not None:
+                historias[fila.id] = _a_ms(fila.revocar_emitidos_antes)
+            if fila.intentos_fallidos:
+                intentos[fila.id] = fila.intentos_fallidos
+            if fila.revocado:
+                revocados.add(fila.id)
+        with self._lock:
+            self._intentos, self._revocados, self._historias = intentos, revocados, historias
+            self._leido_en = time.monotonic()
+
+    def revocado(self, token: TokenFirmado) -> bool:
+        with self._lock:
+            if token.id in self._revocados:
+                return True
+            return token.emitido_ms < self._historias.get(_clave_historia(token.historia_id), 0)
+
+    def intentos(self, token: TokenFirmado) -> int:
+        with self._lock:
+            return self._intentos.get(token.id, 0)
+
+    def _anotar(self, clave: str, intentos: int = 0, revocado: bool = False, emitidos_antes_ms: int = 0):
+        with self._lock:
+            if intentos:
+                self._intentos[clave] = intentos
+            if revocado:
+                self._revocados.add(clave)
+            if emitidos_antes_ms:
+                self._historias[clave] = max(self._historias.get(clave, 0), emitidos_antes_ms)
+
+    def limpiar(self):
+        with self._lock:
+            self._intentos, self._revocados, self._historias = {}, set(), {}
+            self._leido_en = None
+
+
+estado = EstadoTokens()
+
+
+def _a_ms(fecha: datetime) -> int:
+    return int((fecha - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _insert(clave: str, historia_id: UUID, fecha_expiracion: datetime, **valores):
+    return insert(TokenDescarga).values(
+        id=clave, historia_id=historia_id, fecha_expiracion=fecha_expiracion,
+        actualizado_en=datetime.utcnow(), **valores,
+    )
+
+
+def registrar_fallo(db: Session, token: TokenFirmado) -> int:
+    """Suma un intento fallido (un solo UPSERT) y devuelve el total."""
+    sentencia = _insert(token.id, token.historia_id, token.fecha_expiracion, intentos_fallidos=1)
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=[TokenDescarga.id],
+        set_={"intentos_fallidos": TokenDescarga.intentos_fallidos + 1,
+              "actualizado_en": sentencia.excluded.actualizado_en},
+    ).returning(TokenDescarga.intentos_fallidos)
+    intentos = db.execute(sentencia).scalar()
+    db.commit()
+    estado._anotar(token.id, intentos=intentos)
+    return intentos
+
+
+def revocar(db: Session, token: TokenFirmado):
+    """Revoca el token (enlace y descarga comparten id). Se usa tras descargar."""
+    sentencia = _insert(token.id, token.historia_id, token.fecha_expiracion, revocado=True)
+    db.execute(sentencia.on_conflict_do_update(
+        index_elements=[TokenDescarga.id],
+        set_={"revocado": True, "actualizado_en": sentencia.excluded.actualizado_en},
+    ))
+    db.commit()
+    estado._anotar(token.id, revocado=True)
+
+
+def revocar_anteriores(db: Session, token: TokenFirmado):
+    """Revoca los enlaces de la historia emitidos antes de `token` (una fila por historia)."""
+    clave = _clave_historia(token.historia_id)
+    corte = datetime(1970, 1, 1) + timedelta(milliseconds=token.emitido_ms)
+    sentencia = _insert(clave, token.historia_id, token.fecha_expiracion, revocar_emitidos_antes=corte)
+    db.execute(sentencia.on_conflict_do_update(
+        index_elements=[TokenDescarga.id],
+        set_={
+            "revocar_emitidos_antes": func.greatest(TokenDescarga.revocar_emitidos_antes, corte),
+            "fecha_expiracion": func.greatest(TokenDescarga.fecha_expiracion, sentencia.excluded.fecha_expiracion),
+            "actualizado_en": sentencia.excluded.actualizado_en,
+        },
+    ))
+    db.commit()
+    estado._anotar(clave, emitidos_antes_ms=token.emitido_ms)
+
+
+# ── Barrido de filas vencidas ────────────────────────────────
+
+def purgar_vencidos(db: Session) -> int:
+    """Borra las filas que ya no afectan a ningún token vigente."""
+    try:
+        borradas = db.query(TokenDescarga).filter(
+            TokenDescarga.fecha_expiracion <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return borradas
+
+
+_hilo_purga: Optional[threading.Thread] = None
+_detener_purga = threading.Event()
+
+
+def iniciar_purga(abrir_sesion: Callable[[], Session], intervalo_segundos: float):
+    """
+    Cada `intervalo_segundos`, en un hilo daemon: purgar_vencidos y borra
+    los PDF preparados de enlaces ya vencidos.
+    """
+    global _hilo_purga
+    if _hilo_purga is not None and _hilo_purga.is_alive():
+        return
+    _detener_purga.clear()
+
+    def bucle():
+        while not _detener_purga.wait(intervalo_segundos):
+            db = abrir_sesion()
+            try:
+                borradas = purgar_vencidos(db)
+                borrados = documentos_preparados_service.purgar_vencidos(VIGENCIA_ENLACE)
+                if borradas or borrados:
+                    logger.info("%s filas y %s PDF preparados vencidos eliminados", borradas, borrados)
+            except Exception as e:
+                logger.exception("Error en la purga: %s", e)
+            finally:
+                db.close()
+
+    _hilo_purga = threading.Thread(target=bucle, name="purga-tokens-descarga", daemon=True)
+    _hilo_purga.start()
+
+
+def detener_purga():
+    _detener_purga.set()
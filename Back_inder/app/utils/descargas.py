@@ -0,0 +1,193 @@
+"""
+Respuestas de descarga para archivos almacenados (adjuntos clínicos, vacunas).
+
+- Range / 206 de un solo rango (reanudar descargas, saltar dentro de PDFs y DICOM)
+- ETag a partir del SHA-256 guardado, con If-None-Match (304) e If-Range
+- Envío sin copia con la extensión ASGI "http.response.zerocopysend" si el
+  servidor la ofrece; si no, lectura por bloques solo del rango pedido
+- X-Accel-Redirect opcional para que nginx sirva los archivos grandes
+"""
+import os
+import re
+import stat
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+import anyio.to_thread
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+
+from app.core.config import UPLOAD_DIR, settings
+
+TAMANO_BLOQUE = 256 * 1024
+
+_PATRON_RANGO = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangoArchivoResponse(Response):
+    """Envía los bytes [inicio, fin] de un archivo ya validado."""
+
+    def __init__(self, ruta: str, inicio: int, fin: int, status_code: int,
+                 headers: dict, media_type: str, solo_cabeceras: bool = False):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.ruta = ruta
+        self.inicio = inicio
+        self.longitud = max(fin - inicio + 1, 0)
+        self.solo_cabeceras = solo_cabeceras
+        self.headers["content-length"] = str(self.longitud)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.solo_cabeceras or self.longitud == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            # open/close pueden bloquear (NFS, disco lento): fuera del event loop
+            f = await anyio.to_thread.run_sync(open, self.ruta, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.inicio,
+                    "count": self.longitud,
+                    "more_body": False,
+                })
+            finally:
+                await anyio.to_thread.run_sync(f.close)
+            return
+
+        async with await anyio.open_file(self.ruta, mode="rb") as f:
+            await f.seek(self.inicio)
+            restante = self.longitud
+            while restante > 0:
+                bloque = await f.read(min(TAMANO_BLOQUE, restante))
+                if not bloque:
+                    break
+                restante -= len(bloque)
+                await send({"type": "http.response.body", "body": bloque, "more_body": restante > 0})
+            if restante > 0:
+                # El archivo se truncó mientras se enviaba
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _etag(hash_sha256: Optional[str], st: os.stat_result) -> str:
+    if hash_sha256:
+        return f'"{hash_sha256}"'
+    # Archivos anteriores al almacenamiento por hash: ETag débil por tamaño/fecha
+    return f'W/"{st.st_size:x}-{int(st.st_mtime):x}"'
+
+
+def _coincide_etag(cabecera: Optional[str], etag: str) -> bool:
+    if not cabecera:
+        return False
+    if cabecera.strip() == "*":
+        return True
+    fuerte = etag[2:] if etag.startswith("W/") else etag
+    for valor in cabecera.split(","):
+        valor = valor.strip()
+        if valor.startswith("W/"):
+            valor = valor[2:]
+        if valor == fuerte:
+            return True
+    return False
+
+
+def _coincide_if_range(cabecera: str, etag: str) -> bool:
+    """
+    If-Range usa comparación fuerte (RFC 9110 §13.1.5): un solo ETag, ninguno
+    de los dos débil. Una fecha en If-Range no se valida: se envía completo.
+    """
+    valor = cabecera.strip()
+    return not valor.startswith("W/") and not etag.startswith("W/") and valor == etag
+
+
+def _parsear_rango(cabecera: Optional[str], tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    Devuelve (inicio, fin) inclusivo, None si no hay rango utilizable (se envía
+    el archivo completo) o lanza 416 si el rango no se puede satisfacer.
+    Varios rangos (multipart/byteranges) no se soportan: se responde 200 completo.
+    """
+    if not cabecera:
+        return None
+    m = _PATRON_RANGO.match(cabecera.strip())
+    if not m:
+        return None
+    desde, hasta = m.groups()
+    if desde == "" and hasta == "":
+        return None
+
+    if desde == "":
+        sufijo = int(hasta)
+        if sufijo == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{tamano}"})
+        return max(tamano - sufijo, 0), tamano - 1
+
+    inicio = int(desde)
+    fin = int(hasta) if hasta else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{tamano}"})
+    return inicio, min(fin, tamano - 1)
+
+
+def _x_accel(ruta: str) -> Optional[str]:
+    prefijo = settings.DESCARGA_X_ACCEL_PREFIJO
+    if not prefijo:
+        return None
+    relativa = os.path.relpath(os.path.abspath(ruta), UPLOAD_DIR)
+    if relativa.startswith(".."):
+        return None
+    return prefijo.rstrip("/") + "/" + quote(relativa.replace(os.sep, "/"))
+
+
+def respuesta_descarga(request: Request, ruta: Optional[str], nombre_archivo: Optional[str],
+                       media_type: Optional[str], hash_sha256: Optional[str] = None,
+                       inline: bool = False) -> Response:
+    """Construye la respuesta de descarga para un archivo almacenado en disco."""
+    try:
+        st = os.stat(ruta) if ruta else None
+    except FileNotFoundError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+
+    tamano = st.st_size
+    etag = _etag(hash_sha256, st)
+    nombre = nombre_archivo or os.path.basename(ruta)
+    disposicion = "inline" if inline else "attachment"
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Content-Disposition": f"{disposicion}; filename*=utf-8''{quote(nombre)}",
+    }
+    media_type = media_type or "application/octet-stream"
+    if "/" not in media_type:
+        # tipo_archivo a veces guarda solo la extensión
+        media_type = {
+            "pdf": "application/pdf", "jpg": "image/jpeg", "jpeg": "image/jpeg",
+            "png": "image/png", "dcm": "application/dicom",
+        }.get(media_type.lower(), "application/octet-stream")
+
+    if _coincide_etag(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+
+    # nginx resuelve Range, ETag y sendfile por su cuenta
+    destino_interno = _x_accel(ruta) if tamano >= settings.DESCARGA_X_ACCEL_MIN_BYTES else None
+    if destino_interno:
+        headers["X-Accel-Redirect"] = destino_interno
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    rango = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or _coincide_if_range(if_range, etag):
+        rango = _parsear_rango(request.headers.get("range"), tamano)
+
+    solo_cabeceras = request.method == "HEAD"
+    if rango is None:
+        return RangoArchivoResponse(ruta, 0, tamano - 1, 200, headers, media_type, solo_cabeceras)
+
+    inicio, fin = rango
+    headers["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+    return RangoArchivoResponse(ruta, inicio, fin, 206, headers, media_type, solo_cabeceras)
@@ -0,0 +1,297 @@
+"""
+Exportación de reportes a CSV / XLSX en streaming (?format=csv|xlsx).
+
+- Escritores incrementales: cada bloque de filas se convierte a bytes y
+  se entrega de inmediato; la memoria no crece con el número de filas.
+- XLSX sin dependencias: el libro se arma con zipfile sobre un flujo no
+  buscable (entradas con data descriptor) y celdas inlineStr, así la
+  hoja se escribe a medida que llegan las filas.
+- @exportable añade el parámetro `format` a un endpoint de reportes:
+  con `filas` el export sale de un cursor del lado del servidor (sesión
+  propia, porque el cuerpo se genera después de que el endpoint retorna);
+  sin `filas` se exporta el resultado JSON del reporte (agregados, pocas filas).
+"""
+import csv
+import functools
+import inspect
+import io
+import json
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from fastapi import Query
+from pydantic.fields import FieldInfo
+from starlette.responses import StreamingResponse
+
+from app.core.database import SessionLocal
+
+FILAS_POR_BLOQUE = 500      # filas por trozo enviado
+FILAS_POR_LOTE = 1000       # filas por fetch del cursor (yield_per)
+
+FORMATOS = {
+    "csv": "text/csv",   # Starlette añade charset=utf-8
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Argumentos del endpoint que no se pasan a la función de filas
+_EXCLUIDOS = {"db", "current_user"}
+
+
+def _valor(v):
+    # Defaults de Query(...) cuando el reporte se llama como función (dashboard)
+    return v.default if isinstance(v, FieldInfo) else v
+
+
+# Excel (y LibreOffice) interpretan como fórmula el texto que empieza por
+# estos caracteres: "=HYPERLINK(...)" en un nombre o diagnóstico se
+# ejecutaría al abrir el archivo. Se antepone ' para que quede como texto.
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, float) and math.isnan(valor):
+        return ""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return str(valor)
+
+
+def columnas_de(filas: Sequence[dict]) -> List[str]:
+    """Unión de claves en orden de aparición (reportes con columnas dinámicas)."""
+    columnas = {}
+    for fila in filas:
+        columnas.update(dict.fromkeys(fila))
+    return list(columnas)
+
+
+def filas_de_resultado(resultado) -> list:
+    """Filas exportables del JSON de un reporte: la lista, sus "items" o una sola fila."""
+    if isinstance(resultado, list):
+        return resultado
+    if isinstance(resultado, dict) and isinstance(resultado.get("items"), list):
+        return resultado["items"]
+    return [resultado]
+
+
+# ── CSV ──────────────────────────────────────────────────────
+
+def generar_csv(columnas: Sequence[str], filas: Iterable[dict]) -> Iterator[bytes]:
+    # BOM: Excel abre el UTF-8 con tildes sin preguntar
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write("\ufeff")
+    escritor.writerow(columnas)
+    for n, fila in enumerate(filas, 1):
+        escritor.writerow([_texto(fila.get(c)) for c in columnas])
+        if n % FILAS_POR_BLOQUE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+# ── XLSX ─────────────────────────────────────────────────────
+
+class _Sumidero(io.RawIOBase):
+    """Flujo no buscable: zipfile escribe aquí y los bytes se retiran por bloques."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def retirar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_ESTATICOS = {
+    "[Content_Types].xml": (
+        _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        _XML + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        _XML + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    # Estilos: 0 normal, 1 fecha, 2 fecha y hora, 3 encabezado en negrita
+    "xl/styles.xml": (
+        _XML + f'<styleSheet {_NS}>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+_CONTROL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _letra_columna(indice: int) -> str:
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _celda(ref: str, valor, estilo: int = 0) -> str:
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return f'<c r="{ref}" t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        if isinstance(valor, float) and not math.isfinite(valor):
+            return ""
+        return f'<c r="{ref}"><v>{valor}</v></c>'
+    if isinstance(valor, datetime):
+        serial = (valor.replace(tzinfo=None) - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c r="{ref}" s="2"><v>{serial:.6f}</v></c>'
+    if isinstance(valor, date):
+        return f'<c r="{ref}" s="1"><v>{(valor - _EPOCA_EXCEL.date()).days}</v></c>'
+    texto = escape(_CONTROL_XML.sub("", _texto(valor)))
+    s = f' s="{estilo}"' if estilo else ""
+    return f'<c r="{ref}" t="inlineStr"{s}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def generar_xlsx(columnas: Sequence[str], filas: Iterable[dict], hoja: str = "Reporte") -> Iterator[bytes]:
+    sumidero = _Sumidero()
+    letras = [_letra_columna(i) for i in range(len(columnas))]
+    with zipfile.ZipFile(sumidero, "w", zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _ESTATICOS.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr(
+            "xl/workbook.xml",
+            _XML + f'<workbook {_NS} {_NS_R}><sheets>'
+            f'<sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        yield sumidero.retirar()
+
+        with libro.open("xl/worksheets/sheet1.xml", "w") as hoja_xml:
+            encabezado = "".join(_celda(f"{l}1", c, estilo=3) for l, c in zip(letras, columnas))
+            hoja_xml.write((
+                _XML + f'<worksheet {_NS}><sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                f'</sheetView></sheetViews><sheetData><row r="1">{encabezado}</row>'
+            ).encode("utf-8"))
+            partes = []
+            for n, fila in enumerate(filas, 2):
+                celdas = "".join(_celda(f"{l}{n}", fila.get(c)) for l, c in zip(letras, columnas))
+                partes.append(f'<row r="{n}">{celdas}</row>')
+                if len(partes) == FILAS_POR_BLOQUE:
+                    hoja_xml.write("".join(partes).encode("utf-8"))
+                    partes.clear()
+                    yield sumidero.retirar()
+            hoja_xml.write(("".join(partes) + "</sheetData></worksheet>").encode("utf-8"))
+    yield sumidero.retirar()
+
+
+# ── Respuesta ────────────────────────────────────────────────
+
+def respuesta_tabular(formato: str, nombre: str, columnas: Sequence[str], filas: Iterable[dict]) -> StreamingResponse:
+    generador = generar_csv(columnas, filas) if formato == "csv" else generar_xlsx(columnas, filas)
+    archivo = f"{nombre}-{date.today():%Y%m%d}.{formato}"
+    return StreamingResponse(
+        generador,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
+
+
+def _filas_con_sesion(filas: Callable, parametros: dict) -> Iterator[dict]:
+    db = SessionLocal()
+    try:
+        yield from filas(db, **parametros)
+    finally:
+        db.close()
+
+
+def exportable(nombre: str, filas: Optional[Callable] = None, columnas: Optional[Sequence[str]] = None,
+               desde_resultado: Callable = filas_de_resultado) -> Callable:
+    """
+    Decorador para endpoints de reportes (encima de @cache_reporte):
+
+        @router.get("/deportistas/sin-historia")
+        @exportable("deportistas-sin-historia", filas=_filas_sin_historia, columnas=COLUMNAS)
+        @cache_reporte("deportistas", "historias_clinicas")
+        def deportistas_sin_historia(...):
+
+    filas(db, **parametros) -> iterable de dicts leído con yield_per.
+    Sin `filas`: desde_resultado(json del reporte) -> filas.
+    """
+    def decorador(funcion):
+        firma = inspect.signature(funcion)
+
+        @functools.wraps(funcion)
+        def envoltura(*args, formato: Optional[str] = None, **kwargs):
+            formato = _valor(formato)
+            if formato is None:
+                return funcion(*args, **kwargs)
+
+            ligado = firma.bind(*args, **kwargs)
+            ligado.apply_defaults()
+            argumentos = {k: _valor(v) for k, v in ligado.arguments.items()}
+            if filas is not None:
+                parametros = {k: v for k, v in argumentos.items() if k not in _EXCLUIDOS}
+                return respuesta_tabular(formato, nombre, columnas, _filas_con_sesion(filas, parametros))
+
+            datos = list(desde_resultado(funcion(**argumentos)))
+            return respuesta_tabular(formato, nombre, columnas or columnas_de(datos), datos)
+
+        parametro = inspect.Parameter(
+            "formato", inspect.Parameter.KEYWORD_ONLY, annotation=Optional[str],
+            default=Query(None, alias="format", pattern="^(csv|xlsx)$",
+                          description="Exportar en vez de JSON: csv | xlsx"),
+        )
+        envoltura.__signature__ = firma.replace(parameters=[*firma.parameters.values(), parametro])
+        return envoltura
+    return decorador
@@ -1,21 +1,12 @@
-import os
-import shutil
 from fastapi import UploadFile
-from app.core.config import UPLOAD_DIR
+from app.services.almacenamiento_service import guardar_upload, LIMITE_POR_EXTENSION
 
-ALLOWED_EXTENSIONS = {"pdf", "jpg", "jpeg", "png", "dcm"}
+ALLOWED_EXTENSIONS = set(LIMITE_POR_EXTENSION)
 
-def save_upload_file(file: UploadFile, historia_id: str) -> tuple[str, str]:
-    ext = file.filename.split(".")[-1].lower()
-    if ext not in ALLOWED_EXTENSIONS:
-        raise ValueError("Tipo de archivo no permitido")
-
-    historia_path = os.path.join(UPLOAD_DIR, historia_id)
-    os.makedirs(historia_path, exist_ok=True)
-
-    file_path = os.path.join(historia_path, file.filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    return file_path, ext
+def save_upload_file(file: UploadFile, historia_id: str = None) -> tuple[str, str]:
+    """
+    Guarda el upload en el almacenamiento por contenido (ver almacenamiento_service).
+    historia_id se conserva por compatibilidad; la ruta ya no depende de la historia.
+    """
+    guardado = guardar_upload(file, ALLOWED_EXTENSIONS)
+    return guardado.ruta, guardado.extension
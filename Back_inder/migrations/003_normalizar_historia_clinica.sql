@@ -1,6 +1,7 @@
 -- ============================================================================
 -- SCRIPT DE MIGRACIÓN - INDER BASE DE DATOS
 -- Fecha: 2025-12-30
+-- Antes: migration_script.sql (run_migration.py)
 -- Propósito: Normalizar la estructura de la Historia Clínica
 -- ============================================================================
 
@@ -168,28 +169,11 @@ ALTER TABLE archivos_clinicos
 ADD COLUMN IF NOT EXISTS prueba_complementaria_id UUID REFERENCES pruebas_complementarias(id) ON DELETE SET NULL;
 
 -- ============================================================================
--- PASO 9: Crear índices para optimizar búsquedas
--- ============================================================================
-
-CREATE INDEX IF NOT EXISTS idx_antecedentes_personales_historia ON antecedentes_personales(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_antecedentes_familiares_historia ON antecedentes_familiares(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_lesiones_deportivas_historia ON lesiones_deportivas(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_cirugias_previas_historia ON cirugias_previas(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_alergias_historia ON alergias(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_medicaciones_historia ON medicaciones(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_vacunas_historia ON vacunas_administradas(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_revision_sistemas_historia ON revision_sistemas(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_signos_vitales_historia ON signos_vitales(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_pruebas_complementarias_historia ON pruebas_complementarias(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_diagnosticos_historia ON diagnosticos(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_plan_tratamiento_historia ON plan_tratamiento(historia_clinica_id);
-CREATE INDEX IF NOT EXISTS idx_remisiones_especialistas_historia ON remisiones_especialistas(historia_clinica_id);
-
--- Índices por código
-CREATE INDEX IF NOT EXISTS idx_antecedentes_personales_cie11 ON antecedentes_personales(codigo_cie11);
-CREATE INDEX IF NOT EXISTS idx_antecedentes_familiares_cie11 ON antecedentes_familiares(codigo_cie11);
-CREATE INDEX IF NOT EXISTS idx_diagnosticos_cie11 ON diagnosticos(codigo_cie11);
-CREATE INDEX IF NOT EXISTS idx_pruebas_complementarias_cups ON pruebas_complementarias(codigo_cups);
+-- PASO 9: Índices
+-- ============================================================================
+
+-- Los índices de esta sección se crean ahora en 005_indices_consultas_frecuentes.sql
+-- con CREATE INDEX CONCURRENTLY, para no bloquear escrituras en tablas con datos.
 
 -- ============================================================================
 -- PASO 10: Ver estructura final
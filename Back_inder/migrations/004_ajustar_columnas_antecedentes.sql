@@ -0,0 +1,24 @@
+-- ============================================================================
+-- MIGRACIÓN 004 - Ajuste de columnas en antecedentes y deportistas
+-- Antes: migrate_schema.py, migrations.sql y add_column.py
+-- ============================================================================
+
+-- Alergias
+ALTER TABLE alergias ADD COLUMN IF NOT EXISTS descripcion TEXT;
+ALTER TABLE alergias ADD COLUMN IF NOT EXISTS reaccion TEXT;
+
+-- Medicaciones
+ALTER TABLE medicaciones DROP COLUMN IF EXISTS nombre_medicacion;
+ALTER TABLE medicaciones ADD COLUMN IF NOT EXISTS nombre_medicamento VARCHAR(255);
+ALTER TABLE medicaciones ADD COLUMN IF NOT EXISTS duracion VARCHAR(100);
+ALTER TABLE medicaciones ADD COLUMN IF NOT EXISTS indicacion TEXT;
+
+-- Lesiones deportivas: se reemplazan columnas antiguas
+ALTER TABLE lesiones_deportivas DROP COLUMN IF EXISTS descripcion;
+ALTER TABLE lesiones_deportivas DROP COLUMN IF EXISTS fecha_ultima_lesion;
+ALTER TABLE lesiones_deportivas ADD COLUMN IF NOT EXISTS tipo_lesion VARCHAR(255);
+ALTER TABLE lesiones_deportivas ADD COLUMN IF NOT EXISTS fecha_lesion DATE;
+ALTER TABLE lesiones_deportivas ADD COLUMN IF NOT EXISTS tratamiento TEXT;
+
+-- Deportistas
+ALTER TABLE deportistas ADD COLUMN IF NOT EXISTS tipo_deporte VARCHAR(100) NULL;
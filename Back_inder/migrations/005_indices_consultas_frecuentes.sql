@@ -0,0 +1,49 @@
+-- migracion: sin-transaccion
+-- ============================================================================
+-- MIGRACIÓN 005 - Índices para las consultas frecuentes
+-- Se crean con CONCURRENTLY para no bloquear escrituras en producción, por eso
+-- esta migración se ejecuta fuera de transacción (una sentencia a la vez).
+-- Los nombres coinciden con los Index(...) declarados en app/models, de modo
+-- que create_all y esta migración producen el mismo esquema.
+-- ============================================================================
+
+-- Citas: agenda por médico, historial por deportista, listados y reportes por fecha/estado
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_citas_fecha_hora ON citas (fecha, hora);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_citas_medico_fecha_hora ON citas (medico_id, fecha, hora);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_citas_deportista_fecha ON citas (deportista_id, fecha);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_citas_estado_fecha ON citas (estado_cita_id, fecha);
+
+-- Historias clínicas: por deportista, por médico y por rango de fechas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_deportista_fecha ON historias_clinicas (deportista_id, fecha_apertura);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_medico_fecha ON historias_clinicas (medico_id, fecha_apertura);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_fecha_apertura ON historias_clinicas (fecha_apertura);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historia_clinica_json_historia_id ON historias_clinicas_json (historia_clinica_id);
+
+-- Catálogos y deportistas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_catalogo_items_catalogo_nombre ON catalogo_items (catalogo_id, nombre);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_deportistas_estado ON deportistas (estado_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_deportistas_tipo_deporte ON deportistas (tipo_deporte);
+
+-- Tablas normalizadas de la historia: FK historia_clinica_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_antecedentes_personales_historia ON antecedentes_personales (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_antecedentes_familiares_historia ON antecedentes_familiares (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_lesiones_deportivas_historia ON lesiones_deportivas (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cirugias_previas_historia ON cirugias_previas (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alergias_historia ON alergias (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_medicaciones_historia ON medicaciones (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vacunas_historia ON vacunas_administradas (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_revision_sistemas_historia ON revision_sistemas (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_signos_vitales_historia ON signos_vitales (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pruebas_complementarias_historia ON pruebas_complementarias (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_diagnosticos_historia ON diagnosticos (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_plan_tratamiento_historia ON plan_tratamiento (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_remisiones_especialistas_historia ON remisiones_especialistas (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_motivo_consulta_historia ON motivo_consulta_enfermedad_actual (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_exploracion_fisica_historia ON exploracion_fisica_sistemas (historia_clinica_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_archivos_clinicos_historia ON archivos_clinicos (historia_clinica_id);
+
+-- Búsquedas por código CIE-11 / CUPS
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_antecedentes_personales_cie11 ON antecedentes_personales (codigo_cie11);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_antecedentes_familiares_cie11 ON antecedentes_familiares (codigo_cie11);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_diagnosticos_cie11 ON diagnosticos (codigo_cie11);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pruebas_complementarias_cups ON pruebas_complementarias (codigo_cups);
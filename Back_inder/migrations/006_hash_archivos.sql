@@ -0,0 +1,10 @@
+-- ============================================================================
+-- MIGRACIÓN 006 - Hash y tamaño de archivos almacenados
+-- Los uploads se guardan en uploads/objetos/ por SHA-256 (almacenamiento_service)
+-- ============================================================================
+
+ALTER TABLE archivos_clinicos ADD COLUMN IF NOT EXISTS hash_sha256 VARCHAR(64);
+ALTER TABLE archivos_clinicos ADD COLUMN IF NOT EXISTS tamano_bytes BIGINT;
+
+ALTER TABLE vacunas_deportista ADD COLUMN IF NOT EXISTS hash_sha256 VARCHAR(64);
+ALTER TABLE vacunas_deportista ADD COLUMN IF NOT EXISTS tamano_bytes BIGINT;
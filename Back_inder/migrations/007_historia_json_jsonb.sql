@@ -0,0 +1,18 @@
+-- migracion: sin-transaccion
+-- ============================================================================
+-- MIGRACIÓN 007 - historias_clinicas_json.datos_completos a JSONB
+-- JSON se guarda como texto y hay que parsearlo entero en cada lectura;
+-- JSONB permite proyectar rutas (#>) y filtrar con @> usando índices GIN.
+-- El ALTER reescribe la tabla (bloqueo exclusivo mientras dura); los índices
+-- se crean después con CONCURRENTLY.
+-- ============================================================================
+
+ALTER TABLE historias_clinicas_json
+    ALTER COLUMN datos_completos TYPE JSONB USING datos_completos::jsonb;
+
+-- Búsqueda de historias por código de diagnóstico:
+--   datos_completos -> 'diagnosticos' @> '[{"codigo": "FA00"}]'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_json_diagnosticos ON historias_clinicas_json USING GIN ((datos_completos -> 'diagnosticos') jsonb_path_ops);
+
+-- Agrupación/filtro por tipo de cita
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_json_tipo_cita ON historias_clinicas_json ((datos_completos ->> 'tipoCita'));
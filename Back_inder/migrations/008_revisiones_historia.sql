@@ -0,0 +1,21 @@
+-- ============================================================================
+-- MIGRACIÓN 008 - Revisiones versionadas de la historia clínica
+-- historias_revisiones es append-only: cada cambio guarda solo las secciones
+-- modificadas (delta) y cada N versiones un documento completo (checkpoint).
+-- historias_clinicas_json pasa a ser la cabeza materializada (última versión).
+-- ============================================================================
+
+ALTER TABLE historias_clinicas_json ADD COLUMN IF NOT EXISTS version INTEGER;
+
+CREATE TABLE IF NOT EXISTS historias_revisiones (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    historia_clinica_id UUID NOT NULL REFERENCES historias_clinicas(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    es_checkpoint BOOLEAN NOT NULL DEFAULT FALSE,
+    datos JSONB NOT NULL,
+    secciones JSONB NOT NULL,
+    usuario_id UUID REFERENCES usuarios(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ix_historias_revisiones_historia_version ON historias_revisiones (historia_clinica_id, version);
@@ -0,0 +1,22 @@
+-- ============================================================================
+-- MIGRACIÓN 009 - Corte nocturno de citas sin historia clínica
+-- Lo reescribe completo conciliacion_service.generar_corte_sin_historia
+-- (scripts/conciliacion_nocturna.py). El reporte en vivo usa el índice
+-- ix_historias_deportista_fecha para el anti-join NOT EXISTS.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS citas_sin_historia (
+    cita_id UUID PRIMARY KEY REFERENCES citas(id) ON DELETE CASCADE,
+    deportista_id UUID NOT NULL,
+    medico_id UUID,
+    fecha DATE NOT NULL,
+    hora TIME NOT NULL,
+    deportista VARCHAR(201),
+    documento VARCHAR(30),
+    medico VARCHAR(150),
+    tipo_cita VARCHAR(255),
+    estado VARCHAR(255),
+    generado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_citas_sin_historia_fecha ON citas_sin_historia (fecha);
@@ -0,0 +1,47 @@
+-- ============================================================================
+-- MIGRACIÓN 010 - Contadores de versión por tabla para la caché de reportes
+-- Un trigger por sentencia incrementa versiones_datos.version de la tabla
+-- modificada, en la misma transacción que el cambio: la versión nueva se
+-- ve exactamente cuando se ven los datos nuevos (también entre procesos).
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    tabla VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION incrementar_version_datos() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO versiones_datos (tabla, version) VALUES (TG_TABLE_NAME, 1)
+    ON CONFLICT (tabla) DO UPDATE SET version = versiones_datos.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_version_datos ON deportistas;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON deportistas
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON historias_clinicas;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON historias_clinicas
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON citas;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON citas
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON diagnosticos;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON diagnosticos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON catalogo_items;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON catalogo_items
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON usuarios;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON usuarios
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON citas_sin_historia;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON citas_sin_historia
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
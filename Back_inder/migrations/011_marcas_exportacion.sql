@@ -0,0 +1,15 @@
+-- migracion: sin-transaccion
+-- ============================================================================
+-- MIGRACIÓN 011 - Columnas marca (created_at) para la exportación incremental
+-- La exportación a Parquet (exportacion_service) lee por ventanas de
+-- created_at; citas no tenía la columna. Las filas existentes quedan con la
+-- hora de la migración y salen en la primera exportación completa.
+-- ============================================================================
+
+ALTER TABLE citas ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_citas_created_at ON citas (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_created_at ON historias_clinicas (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_deportistas_created_at ON deportistas (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_diagnosticos_created_at ON diagnosticos (created_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_signos_vitales_created_at ON signos_vitales (created_at);
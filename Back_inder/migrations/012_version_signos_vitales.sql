@@ -0,0 +1,9 @@
+-- ============================================================================
+-- MIGRACIÓN 012 - Contador de versión para signos_vitales
+-- El reporte de tendencias de signos vitales se cachea con cache_reporte
+-- (ver migración 010), así que la tabla necesita su trigger de versión.
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS trg_version_datos ON signos_vitales;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON signos_vitales
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
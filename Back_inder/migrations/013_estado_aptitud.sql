@@ -0,0 +1,126 @@
+-- ============================================================================
+-- MIGRACIÓN 013 - Aptitud médica y estado de aptitud vigente por deportista
+-- aptitud_medica guarda el paso final de la historia (apto / no_apto).
+-- estado_aptitud_deportista tiene una fila por deportista con la aptitud de
+-- su historia más reciente; la mantienen los triggers de abajo en la misma
+-- transacción que la escritura, así que el KPI, el reporte de no aptos y el
+-- filtro de deportistas leen una fila por deportista en vez de recorrer
+-- todas las aptitudes históricas.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS aptitud_medica (
+    id UUID PRIMARY KEY,
+    historia_clinica_id UUID NOT NULL REFERENCES historias_clinicas(id) ON DELETE CASCADE,
+    resultado VARCHAR(30) NOT NULL,
+    tipo_aptitud VARCHAR(150),
+    observaciones TEXT,
+    restricciones TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_aptitud_medica_historia ON aptitud_medica (historia_clinica_id);
+
+CREATE TABLE IF NOT EXISTS estado_aptitud_deportista (
+    deportista_id UUID PRIMARY KEY REFERENCES deportistas(id) ON DELETE CASCADE,
+    aptitud_id UUID NOT NULL,
+    historia_clinica_id UUID NOT NULL,
+    resultado VARCHAR(30) NOT NULL,
+    tipo_aptitud VARCHAR(150),
+    no_apto BOOLEAN NOT NULL,
+    fecha DATE NOT NULL,
+    medico_id UUID,
+    actualizado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_estado_aptitud_no_apto_fecha ON estado_aptitud_deportista (no_apto, fecha);
+
+-- Recalcula la fila de un deportista (índices: ix_historias_deportista_fecha
+-- e idx_aptitud_medica_historia). Sin aptitudes, la fila se borra.
+CREATE OR REPLACE FUNCTION recalcular_estado_aptitud(p_deportista UUID) RETURNS void AS $$
+BEGIN
+    INSERT INTO estado_aptitud_deportista AS e
+        (deportista_id, aptitud_id, historia_clinica_id, resultado, tipo_aptitud,
+         no_apto, fecha, medico_id, actualizado_en)
+    SELECT h.deportista_id, a.id, a.historia_clinica_id, a.resultado, a.tipo_aptitud,
+           lower(replace(trim(a.resultado), ' ', '_')) IN ('no_apto', 'inhabilitado'),
+           h.fecha_apertura, h.medico_id, now()
+    FROM historias_clinicas h
+    JOIN aptitud_medica a ON a.historia_clinica_id = h.id
+    WHERE h.deportista_id = p_deportista
+    ORDER BY h.fecha_apertura DESC, h.created_at DESC, a.created_at DESC
+    LIMIT 1
+    ON CONFLICT (deportista_id) DO UPDATE SET
+        aptitud_id = EXCLUDED.aptitud_id,
+        historia_clinica_id = EXCLUDED.historia_clinica_id,
+        resultado = EXCLUDED.resultado,
+        tipo_aptitud = EXCLUDED.tipo_aptitud,
+        no_apto = EXCLUDED.no_apto,
+        fecha = EXCLUDED.fecha,
+        medico_id = EXCLUDED.medico_id,
+        actualizado_en = EXCLUDED.actualizado_en;
+    IF NOT FOUND THEN
+        DELETE FROM estado_aptitud_deportista WHERE deportista_id = p_deportista;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_aptitud_medica_estado() RETURNS trigger AS $$
+DECLARE
+    v_deportista UUID;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Si la historia ya no existe (borrado en cascada) la recalcula su propio trigger
+        SELECT deportista_id INTO v_deportista FROM historias_clinicas WHERE id = OLD.historia_clinica_id;
+        IF v_deportista IS NOT NULL THEN
+            PERFORM recalcular_estado_aptitud(v_deportista);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT deportista_id INTO v_deportista FROM historias_clinicas WHERE id = NEW.historia_clinica_id;
+        IF v_deportista IS NOT NULL THEN
+            PERFORM recalcular_estado_aptitud(v_deportista);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_historia_estado_aptitud() RETURNS trigger AS $$
+BEGIN
+    PERFORM recalcular_estado_aptitud(OLD.deportista_id);
+    IF TG_OP = 'UPDATE' AND NEW.deportista_id IS DISTINCT FROM OLD.deportista_id THEN
+        PERFORM recalcular_estado_aptitud(NEW.deportista_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_estado_aptitud ON aptitud_medica;
+CREATE TRIGGER trg_estado_aptitud AFTER INSERT OR UPDATE OR DELETE ON aptitud_medica
+    FOR EACH ROW EXECUTE FUNCTION trg_aptitud_medica_estado();
+
+DROP TRIGGER IF EXISTS trg_estado_aptitud ON historias_clinicas;
+CREATE TRIGGER trg_estado_aptitud
+    AFTER DELETE OR UPDATE OF deportista_id, fecha_apertura, medico_id ON historias_clinicas
+    FOR EACH ROW EXECUTE FUNCTION trg_historia_estado_aptitud();
+
+-- Contadores de versión para la caché de reportes (migración 010)
+DROP TRIGGER IF EXISTS trg_version_datos ON aptitud_medica;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON aptitud_medica
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+DROP TRIGGER IF EXISTS trg_version_datos ON estado_aptitud_deportista;
+CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON estado_aptitud_deportista
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos();
+
+-- Carga inicial (aptitudes que ya existieran)
+INSERT INTO estado_aptitud_deportista
+    (deportista_id, aptitud_id, historia_clinica_id, resultado, tipo_aptitud, no_apto, fecha, medico_id)
+SELECT DISTINCT ON (h.deportista_id)
+       h.deportista_id, a.id, a.historia_clinica_id, a.resultado, a.tipo_aptitud,
+       lower(replace(trim(a.resultado), ' ', '_')) IN ('no_apto', 'inhabilitado'),
+       h.fecha_apertura, h.medico_id
+FROM historias_clinicas h
+JOIN aptitud_medica a ON a.historia_clinica_id = h.id
+ORDER BY h.deportista_id, h.fecha_apertura DESC, h.created_at DESC, a.created_at DESC
+ON CONFLICT (deportista_id) DO NOTHING;
@@ -0,0 +1,23 @@
+-- ============================================================================
+-- MIGRACIÓN 014 - Tokens de descarga segura firmados
+-- Los tokens pasan a ser HMAC firmados (historia, expiración y hash de la
+-- cédula van dentro) y se verifican sin consultar la BD. tokens_descarga
+-- queda solo para intentos fallidos y revocaciones; las filas vencidas las
+-- borra el barrido periódico (tokens_descarga_service.purgar_vencidos).
+-- Los enlaces emitidos antes de esta migración dejan de ser válidos
+-- (duraban 2 horas).
+-- ============================================================================
+
+DROP TABLE IF EXISTS tokens_descarga;
+
+CREATE TABLE tokens_descarga (
+    id VARCHAR(40) PRIMARY KEY,
+    historia_id UUID NOT NULL REFERENCES historias_clinicas(id) ON DELETE CASCADE,
+    intentos_fallidos INTEGER NOT NULL DEFAULT 0,
+    revocado BOOLEAN NOT NULL DEFAULT FALSE,
+    revocar_emitidos_antes TIMESTAMP,
+    fecha_expiracion TIMESTAMP NOT NULL,
+    actualizado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_tokens_descarga_expiracion ON tokens_descarga (fecha_expiracion);
@@ -0,0 +1,36 @@
+-- ============================================================================
+-- MIGRACIÓN 015 - id por defecto en catalogos / catalogo_items
+-- La 002 inserta los catálogos de citas sin id, pero las tablas creadas con
+-- create_all no tenían DEFAULT en la columna (el uuid lo genera el ORM), así
+-- que en esas bases la 002 fallaba. Aquí se agrega el DEFAULT y se vuelven a
+-- sembrar, sin duplicar, los catálogos de citas que falten.
+-- ============================================================================
+
+ALTER TABLE catalogos      ALTER COLUMN id SET DEFAULT gen_random_uuid();
+ALTER TABLE catalogo_items ALTER COLUMN id SET DEFAULT gen_random_uuid();
+
+INSERT INTO catalogos (nombre, descripcion)
+VALUES ('Tipos de Cita',   'Tipos de citas médicas para deportistas'),
+       ('Estados de Cita', 'Estados posibles de una cita médica')
+ON CONFLICT (nombre) DO NOTHING;
+
+INSERT INTO catalogo_items (catalogo_id, codigo, nombre, activo)
+SELECT c.id, v.codigo, v.nombre, true
+FROM (VALUES
+        ('Tipos de Cita',   'primera_cita', 'Primera Cita'),
+        ('Tipos de Cita',   'control',      'Control'),
+        ('Tipos de Cita',   'novedad',      'Novedad'),
+        ('Tipos de Cita',   'seguimiento',  'Seguimiento'),
+        ('Tipos de Cita',   'evaluacion',   'Evaluación Inicial'),
+        ('Estados de Cita', 'programada',   'Programada'),
+        ('Estados de Cita', 'confirmada',   'Confirmada'),
+        ('Estados de Cita', 'realizada',    'Realizada'),
+        ('Estados de Cita', 'cancelada',    'Cancelada'),
+        ('Estados de Cita', 'no_asistio',   'No Asistió'),
+        ('Estados de Cita', 'reprogramada', 'Reprogramada')
+     ) AS v(catalogo, codigo, nombre)
+JOIN catalogos c ON c.nombre = v.catalogo
+WHERE NOT EXISTS (
+    SELECT 1 FROM catalogo_items ci
+    WHERE ci.catalogo_id = c.id AND ci.codigo = v.codigo
+);
@@ -0,0 +1,53 @@
+-- migracion: sin-transaccion
+-- ============================================================================
+-- MIGRACIÓN 016 - Un solo esquema para historias_clinicas_json
+-- Las cabezas escritas por el formulario anterior (camelCase: tipoCita,
+-- antecedentesPersonales, diagnosticos con "codigo") se reconstruyen desde
+-- las tablas normalizadas con el esquema de las revisiones: una clave por
+-- sección (filas con las columnas de la tabla) más "tipo_cita".
+-- Son las cabezas sin versión (anteriores a la migración 008); la siguiente
+-- edición de la historia crea su versión 1 (checkpoint) a partir de ellas.
+-- El índice de tipo de cita pasa de 'tipoCita' a 'tipo_cita'.
+-- ============================================================================
+
+UPDATE historias_clinicas_json h
+SET datos_completos = jsonb_build_object(
+        'tipo_cita', h.datos_completos ->> 'tipoCita',
+        'antecedentes_personales', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM antecedentes_personales t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'antecedentes_familiares', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM antecedentes_familiares t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'lesiones_deportivas', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM lesiones_deportivas t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'cirugias_previas', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM cirugias_previas t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'alergias', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM alergias t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'medicaciones', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM medicaciones t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'vacunas_administradas', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM vacunas_administradas t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'revision_sistemas', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM revision_sistemas t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'signos_vitales', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM signos_vitales t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'pruebas_complementarias', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM pruebas_complementarias t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'diagnosticos', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM diagnosticos t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'plan_tratamiento', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM plan_tratamiento t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'remisiones_especialistas', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM remisiones_especialistas t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'motivo_consulta_enfermedad', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM motivo_consulta_enfermedad_actual t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'exploracion_fisica_sistemas', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM exploracion_fisica_sistemas t WHERE t.historia_clinica_id = h.historia_clinica_id),
+        'aptitud_medica', (SELECT COALESCE(jsonb_agg(to_jsonb(t) - 'historia_clinica_id' - 'created_at' ORDER BY t.created_at, t.id), '[]')
+                 FROM aptitud_medica t WHERE t.historia_clinica_id = h.historia_clinica_id)
+    )
+WHERE h.version IS NULL;
+
+DROP INDEX CONCURRENTLY IF EXISTS ix_historias_json_tipo_cita;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_historias_json_tipo_cita ON historias_clinicas_json ((datos_completos ->> 'tipo_cita'));
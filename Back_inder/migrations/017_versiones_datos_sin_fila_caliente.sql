@@ -0,0 +1,63 @@
+-- ============================================================================
+-- MIGRACIÓN 017 - Versiones de datos sin fila caliente
+-- En 010 cada escritura hacía UPSERT sobre la fila de su tabla en
+-- versiones_datos: todos los escritores de una tabla esperaban el mismo
+-- lock de fila hasta el commit (y dos transacciones que tocan dos tablas
+-- en orden distinto podían bloquearse entre sí).
+-- Ahora el trigger inserta una fila propia por transacción y tabla en
+-- cambios_datos (clave tabla + id de transacción): escritores distintos
+-- nunca comparten fila. La versión de una tabla es
+--     versiones_datos.version + filas de cambios_datos de esa tabla
+-- y, como las filas nuevas se ven al confirmarse, sigue cambiando
+-- exactamente cuando se ven los datos nuevos. compactar_versiones_datos()
+-- (hilo de la app, VERSIONES_DATOS_COMPACTAR_SEGUNDOS) mueve las filas
+-- confirmadas al contador base en una transacción: la suma no cambia.
+-- Los triggers trg_version_datos de 010 y 013 no cambian; solo la función.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS cambios_datos (
+    tabla VARCHAR(63) NOT NULL,
+    transaccion BIGINT NOT NULL,
+    PRIMARY KEY (tabla, transaccion)
+);
+
+CREATE OR REPLACE FUNCTION incrementar_version_datos() RETURNS trigger AS $$
+BEGIN
+    -- Una fila por transacción: las sentencias siguientes de la misma
+    -- transacción chocan con su propia fila y no esperan a nadie.
+    INSERT INTO cambios_datos (tabla, transaccion)
+    VALUES (TG_TABLE_NAME, pg_current_xact_id()::text::bigint)
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE VIEW versiones_datos_vigentes AS
+SELECT tabla, SUM(n)::bigint AS version
+FROM (
+    SELECT tabla, version AS n FROM versiones_datos
+    UNION ALL
+    SELECT tabla, COUNT(*) AS n FROM cambios_datos GROUP BY tabla
+) t
+GROUP BY tabla;
+
+CREATE OR REPLACE FUNCTION compactar_versiones_datos() RETURNS integer AS $$
+DECLARE
+    movidas integer;
+BEGIN
+    -- Otro proceso ya está compactando
+    IF NOT pg_try_advisory_xact_lock(hashtext('compactar_versiones_datos')) THEN
+        RETURN 0;
+    END IF;
+    WITH borradas AS (
+        DELETE FROM cambios_datos RETURNING tabla
+    ), por_tabla AS (
+        SELECT tabla, COUNT(*) AS n FROM borradas GROUP BY tabla
+    )
+    INSERT INTO versiones_datos (tabla, version)
+    SELECT tabla, n FROM por_tabla
+    ON CONFLICT (tabla) DO UPDATE SET version = versiones_datos.version + EXCLUDED.version;
+    GET DIAGNOSTICS movidas = ROW_COUNT;
+    RETURN movidas;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,28 +1,39 @@
 #!/usr/bin/env python
 """
-Script para ejecutar la migración de la BD
+Ejecuta las migraciones pendientes de migrations/ (ver app/core/migraciones.py).
+
+Uso:
+    python run_migration.py            # crea tablas base y aplica pendientes
+    python run_migration.py --estado   # lista aplicadas / pendientes
 """
-from sqlalchemy import text
-from app.core.database import engine
-
-# Leer el script SQL
-with open('migration_script.sql', 'r', encoding='utf-8') as f:
-    sql_script = f.read()
-
-# Ejecutar cada sentencia SQL
-with engine.begin() as conn:
-    # Dividir por sentencias (;)
-    statements = [s.strip() for s in sql_script.split(';') if s.strip() and not s.strip().startswith('--')]
-    
-    for i, statement in enumerate(statements, 1):
-        try:
-            conn.execute(text(statement))
-            print(f"✅ Sentencia {i}/{len(statements)}: OK")
-        except Exception as e:
-            error_msg = str(e)[:150]
-            if 'already exists' in error_msg.lower():
-                print(f"ℹ️  Sentencia {i}/{len(statements)}: Ya existe (skipped)")
-            else:
-                print(f"⚠️  Sentencia {i}/{len(statements)}: {error_msg}")
-
-print("\n🎉 Script SQL ejecutado!")
+import sys
+
+from app.core.database import engine, Base
+from app.core import migraciones
+import app.models  # noqa: F401  registra los modelos en Base.metadata
+
+
+def mostrar_estado():
+    aplicadas = migraciones.versiones_aplicadas(engine)
+    for m in migraciones.listar_migraciones():
+        marca = "✅" if m.version in aplicadas else "⏳"
+        print(f"{marca} {m.ruta.name}")
+
+
+def main():
+    if "--estado" in sys.argv:
+        mostrar_estado()
+        return
+
+    # Las migraciones asumen que las tablas base existen
+    Base.metadata.create_all(bind=engine)
+
+    aplicadas = migraciones.aplicar_pendientes(engine)
+    if aplicadas:
+        print(f"\n🎉 {len(aplicadas)} migración(es) aplicada(s)")
+    else:
+        print("ℹ️  No hay migraciones pendientes")
+
+
+if __name__ == "__main__":
+    main()
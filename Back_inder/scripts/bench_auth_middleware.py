@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Benchmark del middleware de autenticación: costo por petición del
+BaseHTTPMiddleware anterior frente al middleware ASGI puro actual.
+
+Llama a la app ASGI directamente (sin red ni servidor) para medir solo el
+overhead del middleware, con una respuesta JSON y un StreamingResponse de
+64 bloques (como los PDFs de documentos).
+
+Uso (desde Back_inder/, con las variables de entorno de la app):
+    python scripts/bench_auth_middleware.py [n_peticiones]
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from app.core.auth_middleware import AuthMiddleware, CORS_HEADERS, RUTAS_PUBLICAS, PREFIJOS_PUBLICOS
+from app.core.config import settings
+from app.crud.usuario import crear_token
+
+logging.basicConfig(level=logging.INFO)
+
+
+# ── Implementación anterior (referencia) ─────────────────────
+async def auth_middleware_anterior(request: Request, call_next):
+    path = request.url.path
+    auth_header = request.headers.get("Authorization")
+    logging.getLogger("auth.anterior").info(f"MW: {request.method} {path} | Auth: {auth_header[:20] if auth_header else 'NONE'}")
+
+    if request.method == "OPTIONS":
+        return JSONResponse(status_code=200, headers=CORS_HEADERS)
+    if path in RUTAS_PUBLICAS:
+        return await call_next(request)
+    for prefijo in PREFIJOS_PUBLICOS:
+        if path.startswith(prefijo):
+            return await call_next(request)
+
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return JSONResponse(status_code=401, content={"detail": "Token de autenticación requerido"}, headers=CORS_HEADERS)
+    token = auth_header.split(" ")[1]
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        request.state.user_id = payload.get("sub")
+        request.state.user_rol = payload.get("rol")
+    except JWTError:
+        return JSONResponse(status_code=401, content={"detail": "Token inválido o expirado"}, headers=CORS_HEADERS)
+    return await call_next(request)
+
+
+# ── App de prueba ────────────────────────────────────────────
+BLOQUE = b"x" * 16384
+
+
+async def json_endpoint(request):
+    return JSONResponse({"ok": True})
+
+
+async def stream_endpoint(request):
+    async def gen():
+        for _ in range(64):
+            yield BLOQUE
+    return StreamingResponse(gen(), media_type="application/pdf")
+
+
+RUTAS = [Route("/api/v1/json", json_endpoint), Route("/api/v1/stream", stream_endpoint)]
+
+
+def construir(middleware):
+    return Starlette(routes=RUTAS, middleware=middleware)
+
+
+APPS = {
+    "sin middleware": construir([]),
+    "BaseHTTPMiddleware (anterior)": construir([Middleware(BaseHTTPMiddleware, dispatch=auth_middleware_anterior)]),
+    "ASGI puro (actual)": construir([Middleware(AuthMiddleware)]),
+}
+
+
+async def una_peticion(app, path, token):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("127.0.0.1", 1),
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+    }
+    recibido = False
+
+    async def receive():
+        nonlocal recibido
+        if not recibido:
+            recibido = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def medir(app, path, token, n):
+    for _ in range(min(n, 200)):
+        await una_peticion(app, path, token)
+    inicio = time.perf_counter()
+    for _ in range(n):
+        await una_peticion(app, path, token)
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+async def main(n):
+    token = crear_token({"sub": "00000000-0000-0000-0000-000000000000", "rol": "admin"})
+    print(f"{n} peticiones por caso, µs/petición\n")
+    print(f"{'configuración':32} {'json':>10} {'stream 1MiB':>12}")
+    for nombre, app in APPS.items():
+        t_json = await medir(app, "/api/v1/json", token, n)
+        t_stream = await medir(app, "/api/v1/stream", token, n)
+        print(f"{nombre:32} {t_json:10.1f} {t_stream:12.1f}")
+    print("\n(el overhead del middleware es la diferencia con 'sin middleware')")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
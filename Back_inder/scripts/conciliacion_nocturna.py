@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Job nocturno: regenera el corte de citas sin historia clínica
+(tabla citas_sin_historia, ver app/services/conciliacion_service.py).
+GET /api/v1/reportes/historias/sin-realizar?fuente=corte lo lee sin recalcular.
+
+Uso (desde Back_inder/, con las variables de entorno de la app):
+    python scripts/conciliacion_nocturna.py
+
+Cron de ejemplo (02:30 todos los días):
+    30 2 * * *  cd /srv/inder/Back_inder && python scripts/conciliacion_nocturna.py >> logs/conciliacion.log 2>&1
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.conciliacion_service import generar_corte_sin_historia
+
+
+def main():
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        filas = generar_corte_sin_historia(db)
+    finally:
+        db.close()
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] citas_sin_historia: {filas} filas "
+          f"en {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Exportación incremental a Parquet (seudonimizada) para análisis local
+con DuckDB o pandas. Ver app/services/exportacion_service.py.
+
+Uso (desde Back_inder/, con las variables de entorno de la app):
+    python scripts/exportar_parquet.py                       # todo lo nuevo desde la última marca
+    python scripts/exportar_parquet.py --tablas citas,diagnosticos
+    python scripts/exportar_parquet.py --destino /tmp/export --completo
+
+Cron de ejemplo (03:00 todos los días):
+    0 3 * * *  cd /srv/inder/Back_inder && python scripts/exportar_parquet.py >> logs/exportacion.log 2>&1
+
+Lectura con DuckDB:
+    SELECT * FROM read_parquet('exportaciones/parquet/citas/*/*/*.parquet', hive_partitioning = true);
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services.exportacion_service import TABLAS, exportar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación incremental a Parquet")
+    parser.add_argument("--destino", help="Carpeta de salida (por defecto EXPORTACION_DIR)")
+    parser.add_argument("--tablas", help=f"Separadas por coma: {','.join(TABLAS)}")
+    parser.add_argument("--completo", action="store_true", help="Ignora las marcas y exporta todo")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        resumen = exportar(
+            db,
+            destino=args.destino,
+            tablas=args.tablas.split(",") if args.tablas else None,
+            completo=args.completo,
+        )
+    finally:
+        db.close()
+    for tabla, r in resumen.items():
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {tabla}: {r['filas']} filas, "
+              f"{len(r['archivos'])} archivo(s), ({r['desde']}, {r['hasta']}]")
+    print(f"Total {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
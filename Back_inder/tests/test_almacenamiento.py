@@ -0,0 +1,51 @@
+"""
+Tests del almacenamiento por contenido de archivos clínicos
+Ejecutar con: python -m pytest tests/test_almacenamiento.py -v
+"""
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from app.services import almacenamiento_service as alm
+
+
+@pytest.fixture(autouse=True)
+def directorios(tmp_path, monkeypatch):
+    monkeypatch.setattr(alm, "OBJETOS_DIR", str(tmp_path / "objetos"))
+    monkeypatch.setattr(alm, "TEMP_DIR", str(tmp_path / "tmp"))
+    monkeypatch.setattr(alm, "TAMANO_BLOQUE", 1024)
+    return tmp_path
+
+
+def _upload(nombre, contenido):
+    return UploadFile(file=io.BytesIO(contenido), filename=nombre)
+
+
+def test_guarda_por_hash_y_deduplica():
+    contenido = os.urandom(10_000)
+    primero = alm.guardar_upload(_upload("examen.pdf", contenido))
+    segundo = alm.guardar_upload(_upload("copia.pdf", contenido))
+
+    assert primero.sha256 == hashlib.sha256(contenido).hexdigest()
+    assert primero.tamano == len(contenido)
+    assert primero.ruta == segundo.ruta
+    with open(primero.ruta, "rb") as f:
+        assert f.read() == contenido
+    assert os.listdir(alm.TEMP_DIR) == []
+
+
+def test_rechaza_archivo_que_supera_el_limite(monkeypatch):
+    monkeypatch.setitem(alm.LIMITE_POR_EXTENSION, "png", 4096)
+    with pytest.raises(alm.ArchivoDemasiadoGrande):
+        alm.guardar_upload(_upload("foto.png", b"x" * 5000))
+    assert os.listdir(alm.TEMP_DIR) == []
+
+
+def test_rechaza_extension_no_permitida():
+    with pytest.raises(alm.ArchivoNoPermitido):
+        alm.guardar_upload(_upload("script.exe", b"MZ"))
+    with pytest.raises(alm.ArchivoNoPermitido):
+        alm.guardar_upload(_upload("estudio.dcm", b"DICM"), {"pdf"})
@@ -0,0 +1,23 @@
+"""
+Tests del emparejador de rutas públicas del middleware de autenticación
+Ejecutar con: python -m pytest tests/test_auth_middleware.py -v
+"""
+from app.core.auth_middleware import compilar_rutas_publicas
+
+
+def test_rutas_publicas():
+    es_publica = compilar_rutas_publicas().match
+    assert es_publica("/health")
+    assert es_publica("/docs")
+    assert es_publica("/api/v1/auth/login")
+    assert es_publica("/api/v1/catalogos/tipos")
+    assert es_publica("/api/v1/cie11/buscar")
+    assert es_publica("/api/v1/descarga-segura/verificar")
+    assert es_publica("/api/v1/descarga-segura/info/abc")
+    assert not es_publica("/api/v1/descarga-segura/generar-token/abc")
+
+    # Las rutas exactas no funcionan como prefijo
+    assert not es_publica("/healthz")
+    assert not es_publica("/docs/extra")
+    assert not es_publica("/api/v1/deportistas/")
+    assert not es_publica("/api/v1/auth")
@@ -0,0 +1,83 @@
+"""
+Tests de la caché de ids de items de catálogo (obtener_item_id)
+Ejecutar con: python -m pytest tests/test_cache_catalogos.py -v
+"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.crud import catalogo as crud_catalogo
+from app.crud.catalogo import invalidar_cache_catalogos, obtener_item_id
+from app.models import Catalogo, CatalogoItem
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    invalidar_cache_catalogos()
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    invalidar_cache_catalogos()
+
+
+@pytest.fixture
+def catalogo(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.commit()
+    return cat
+
+
+def test_item_creado_o_renombrado_se_ve_al_confirmar(db, catalogo):
+    item = CatalogoItem(catalogo_id=catalogo.id, nombre="Abierta")
+    db.add(item)
+    db.commit()
+    assert obtener_item_id(db, "Abierta", catalogo.nombre) == item.id
+
+    item.nombre = "Cerrada"
+    db.flush()
+    # Sin confirmar todavía: la caché sigue igual
+    assert obtener_item_id(db, "Abierta", catalogo.nombre) == item.id
+    db.commit()
+    assert obtener_item_id(db, "Abierta", catalogo.nombre) is None
+    assert obtener_item_id(db, "Cerrada", catalogo.nombre) == item.id
+
+    db.delete(item)
+    db.commit()
+    assert obtener_item_id(db, "Cerrada", catalogo.nombre) is None
+
+
+def test_rollback_no_invalida(db, catalogo):
+    item = CatalogoItem(catalogo_id=catalogo.id, nombre="Activo")
+    db.add(item)
+    db.commit()
+    assert obtener_item_id(db, "Activo", catalogo.nombre) == item.id
+
+    db.add(CatalogoItem(catalogo_id=catalogo.id, nombre="Otro"))
+    db.flush()
+    db.rollback()
+    assert crud_catalogo._cache_items
+
+
+def test_cambios_por_sql_se_ven_tras_el_ttl(db, catalogo, monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(crud_catalogo, "time", SimpleNamespace(monotonic=lambda: ahora[0]))
+    item = CatalogoItem(catalogo_id=catalogo.id, nombre="Vigente")
+    db.add(item)
+    db.commit()
+    assert obtener_item_id(db, "Vigente", catalogo.nombre) == item.id
+
+    # Cambio que no pasa por el ORM (seed, otro proceso)
+    db.execute(CatalogoItem.__table__.update().where(CatalogoItem.id == item.id).values(nombre="Nuevo"))
+    assert obtener_item_id(db, "Vigente", catalogo.nombre) == item.id
+    ahora[0] += settings.CATALOGOS_CACHE_TTL + 1
+    assert obtener_item_id(db, "Vigente", catalogo.nombre) is None
+    assert obtener_item_id(db, "Nuevo", catalogo.nombre) == item.id
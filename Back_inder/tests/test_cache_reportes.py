@@ -0,0 +1,161 @@
+"""
+Tests de la caché de reportes invalidada por versiones_datos
+Ejecutar con: python -m pytest tests/test_cache_reportes.py -v
+"""
+import uuid
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.api.v1.reportes import citas_por_mes, dashboard_completo
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.cita import Cita
+from app.services import cache_reportes
+from app.services.cache_reportes import cache, cache_reporte, compactar_contadores, versiones_datos
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    cache.limpiar()
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    cache.limpiar()
+
+
+def _selects(db, funcion):
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2])
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        resultado = funcion()
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    return resultado, len([s for s in sentencias if s.startswith("SELECT")])
+
+
+def test_cache_hasta_que_cambian_los_datos(db):
+    primero, n = _selects(db, lambda: citas_por_mes(db=db, current_user=None))
+    assert n == 7          # versiones + 6 meses
+    db.commit()
+    segundo, n = _selects(db, lambda: citas_por_mes(db=db, current_user=None))
+    assert segundo is primero and n == 1   # solo versiones_datos
+    # Otros parámetros: otra entrada
+    assert len(citas_por_mes(meses=2, db=db, current_user=None)) == 2
+
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Programada")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.flush()
+    version_citas = versiones_datos(db).get("citas", 0)
+    # El último mes que devuelve citas_por_mes es el anterior al actual
+    mes_anterior = date.today().replace(day=1) - timedelta(days=1)
+    db.add(Cita(deportista_id=dep.id, fecha=mes_anterior, hora=time(9, 0),
+                tipo_cita_id=item.id, estado_cita_id=item.id))
+    db.commit()
+    assert versiones_datos(db)["citas"] == version_citas + 1
+
+    tercero = citas_por_mes(db=db, current_user=None)
+    assert tercero is not primero
+    assert tercero[-1]["total"] == primero[-1]["total"] + 1
+    assert tercero[-1]["programada"] == primero[-1].get("programada", 0) + 1
+
+
+def test_dashboard_reutiliza_reportes_en_cache(db):
+    dashboard = dashboard_completo(db=db, current_user=None)
+    db.commit()
+    assert dashboard_completo(db=db, current_user=None) is dashboard
+    assert cache.estadisticas()["aciertos"] >= 1
+
+
+@pytest.fixture
+def tabla_con_version():
+    """Tabla real con el trigger de versión (las escrituras se confirman)."""
+    tabla = f"prueba_version_{uuid.uuid4().hex[:8]}"
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE {tabla} (n int)"))
+        conn.execute(text(
+            f"CREATE TRIGGER trg_version_datos AFTER INSERT OR UPDATE OR DELETE ON {tabla} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_datos()"
+        ))
+    yield tabla
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {tabla}"))
+        conn.execute(text("DELETE FROM cambios_datos WHERE tabla = :t"), {"t": tabla})
+        conn.execute(text("DELETE FROM versiones_datos WHERE tabla = :t"), {"t": tabla})
+
+
+def _version(tabla):
+    with Session(engine) as sesion:
+        return versiones_datos(sesion).get(tabla, 0)
+
+
+def test_escritores_concurrentes_no_se_esperan(tabla_con_version):
+    tabla = tabla_con_version
+    uno, dos = engine.connect(), engine.connect()
+    try:
+        with uno.begin(), dos.begin():
+            uno.execute(text(f"INSERT INTO {tabla} VALUES (1)"))
+            uno.execute(text(f"UPDATE {tabla} SET n = 2"))
+            # Con el UPSERT de 010 esto esperaba el lock de fila de `uno`
+            dos.execute(text("SET LOCAL lock_timeout = '500ms'"))
+            dos.execute(text(f"INSERT INTO {tabla} VALUES (3)"))
+            assert _version(tabla) == 0     # sin confirmar: no se ve
+    finally:
+        uno.close()
+        dos.close()
+    # Una versión por transacción confirmada
+    assert _version(tabla) == 2
+
+    with Session(engine) as sesion:
+        assert compactar_contadores(sesion) >= 1
+    assert _version(tabla) == 2
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM cambios_datos WHERE tabla = :t"), {"t": tabla}).scalar() == 0
+        conn.execute(text(f"INSERT INTO {tabla} VALUES (4)"))
+        conn.commit()
+    assert _version(tabla) == 3
+
+
+def test_transaccion_con_escrituras_sin_confirmar_no_usa_cache(db):
+    llamadas = []
+
+    @cache_reporte("citas")
+    def reporte(db=None):
+        llamadas.append(1)
+        return object()
+
+    primero = reporte(db=db)
+    assert reporte(db=db) is primero and len(llamadas) == 1
+
+    db.add(Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}"))
+    db.flush()
+    assert reporte(db=db) is not primero
+    assert reporte(db=db) is not primero and len(llamadas) == 3
+
+
+def test_solo_tabla_inexistente_desactiva_la_cache(db, monkeypatch):
+    monkeypatch.setattr(cache_reportes, "_sin_contadores", False)
+    monkeypatch.setattr(cache_reportes, "_SQL_VERSIONES", text("SELECT 1 / 0"))
+    assert versiones_datos(db) is None
+    assert cache_reportes._sin_contadores is False
+    # La sesión sigue usable tras el error (savepoint)
+    assert db.execute(text("SELECT 1")).scalar() == 1
+
+    monkeypatch.setattr(cache_reportes, "_SQL_VERSIONES", text("SELECT tabla, version FROM no_existe"))
+    assert versiones_datos(db) is None
+    assert cache_reportes._sin_contadores is True
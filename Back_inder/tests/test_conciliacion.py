@@ -0,0 +1,89 @@
+"""
+Tests del reporte de citas sin historia (anti-join paginado y corte nocturno)
+Ejecutar con: python -m pytest tests/test_conciliacion.py -v
+"""
+import uuid
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.cita import Cita
+from app.models.historia import HistoriaClinica
+from app.services.conciliacion_service import (
+    citas_sin_historia, generar_corte_sin_historia, leer_corte_sin_historia
+)
+
+# Ventana aislada de los datos que pueda tener la BD de pruebas
+DESDE, HASTA = date(1990, 1, 1), date(1990, 12, 31)
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+
+
+@pytest.fixture
+def citas(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    programada = CatalogoItem(catalogo_id=cat.id, nombre="Programada")
+    atendida = CatalogoItem(catalogo_id=cat.id, nombre="Atendida")
+    db.add_all([programada, atendida])
+    db.flush()
+    dep = Deportista(tipo_documento_id=programada.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(1980, 1, 1),
+                     sexo_id=programada.id, estado_id=programada.id)
+    db.add(dep)
+    db.flush()
+
+    def cita(dia, estado=programada):
+        c = Cita(deportista_id=dep.id, fecha=dia, hora=time(9, 0),
+                 tipo_cita_id=programada.id, estado_cita_id=estado.id)
+        db.add(c)
+        return c
+
+    pendientes = [cita(date(1990, 3, d)) for d in (1, 2, 3)]
+    cita(date(1990, 3, 4))                      # tiene historia ese día
+    cita(date(1990, 3, 5), estado=atendida)     # cerrada
+    cita(date(1989, 12, 31))                    # fuera de la ventana
+    db.add(HistoriaClinica(deportista_id=dep.id, fecha_apertura=date(1990, 3, 4), estado_id=programada.id))
+    db.commit()
+    return pendientes
+
+
+def test_anti_join_paginado_con_total_real(db, citas):
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2])
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        pagina = citas_sin_historia(db, DESDE, HASTA, pagina=1, por_pagina=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len([s for s in sentencias if s.startswith("SELECT")]) == 1
+    assert pagina["total"] == 3
+    assert [i["fecha"] for i in pagina["items"]] == ["1990-03-03", "1990-03-02"]
+    assert pagina["items"][0]["deportista"] == "Ana Pérez"
+    assert pagina["items"][0]["estado"] == "Programada"
+
+    assert [i["cita_id"] for i in citas_sin_historia(db, DESDE, HASTA, 2, 2)["items"]] == [str(citas[0].id)]
+    fuera = citas_sin_historia(db, DESDE, HASTA, 3, 2)
+    assert fuera["total"] == 3 and fuera["items"] == []
+
+
+def test_corte_nocturno(db, citas):
+    assert generar_corte_sin_historia(db) >= 4
+    corte = leer_corte_sin_historia(db, DESDE, HASTA, 1, 10)
+    assert corte["total"] == 3 and corte["generado_en"] is not None
+    assert corte["items"] == citas_sin_historia(db, DESDE, HASTA, 1, 10)["items"]
@@ -0,0 +1,35 @@
+"""
+Tests del registro de consultas lentas (huellas, p95 y EXPLAIN muestreado)
+Ejecutar con: python -m pytest tests/test_consultas_lentas.py -v
+"""
+from sqlalchemy import text
+
+from app.core.consultas_lentas import RegistroConsultasLentas, normalizar_sql
+from app.core.database import engine
+
+
+def test_huella_ignora_literales_y_listas():
+    a = normalizar_sql("SELECT * FROM citas WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND nombre = 'Ana'  LIMIT 10")
+    b = normalizar_sql("SELECT * FROM citas WHERE id IN (%(id_1_1)s) AND nombre = 'O''Neil' LIMIT 50")
+    assert a == b == "SELECT * FROM citas WHERE id IN (?+) AND nombre = ? LIMIT ?"
+    assert normalizar_sql("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y')") == "INSERT INTO t (a, b) VALUES (?+)"
+
+
+def test_registra_lentas_con_plan():
+    registro = RegistroConsultasLentas(umbral_ms=40, muestreo_explain=1.0)
+    registro.instrumentar(engine)
+    try:
+        with engine.connect() as conn:
+            for espera in (0.05, 0.06):
+                conn.execute(text(f"SELECT pg_sleep({espera}), :x AS x"), {"x": 1})
+            conn.execute(text("SELECT 1"))   # rápida: no se registra
+    finally:
+        registro.desinstrumentar()   # espera al hilo de EXPLAIN
+
+    top = registro.top("conteo")
+    assert len(top) == 1
+    assert top[0]["total"] == 2 and top[0]["p95_ms"] >= 50
+    assert top[0]["rutas"] == {"sin_ruta": 2}
+    detalle = registro.detalle(top[0]["huella"])
+    assert detalle["plan"][0]["Plan"]["Node Type"] == "Result"
+    assert "Execution Time" in detalle["plan"][0]
@@ -0,0 +1,95 @@
+"""
+Tests del pool de bcrypt: calibración, rehash al iniciar sesión y cola acotada
+Ejecutar con: python -m pytest tests/test_contrasenas.py -v
+"""
+import asyncio
+import threading
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core import contrasenas
+from app.core.config import settings
+from app.core.database import engine
+from app.crud.usuario import autenticar_usuario
+from app.models.usuario import Rol, Usuario
+
+
+@pytest.fixture(autouse=True)
+def bcrypt_rapido():
+    # 4 rondas (el mínimo de bcrypt) para que los tests no tarden
+    contrasenas.configurar(rondas=4, workers=1)
+    yield
+    contrasenas.cerrar_pool()
+    contrasenas._contexto = None
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+
+
+def test_calibracion_acotada():
+    assert contrasenas.calibrar(1) == contrasenas.MIN_RONDAS
+    assert contrasenas.calibrar(10 ** 9) == contrasenas.MAX_RONDAS
+
+
+def test_rehash_solo_hacia_arriba():
+    viejo = contrasenas.hash_password("clave")
+    assert viejo.startswith("$2b$04$")
+
+    contrasenas.configurar(rondas=5, workers=1)
+    valido, nuevo = asyncio.run(contrasenas.verificar("clave", viejo))
+    assert valido and nuevo.startswith("$2b$05$")
+    assert asyncio.run(contrasenas.verificar("otra", viejo)) == (False, None)
+    assert asyncio.run(contrasenas.verificar("clave", None)) == (False, None)
+    assert asyncio.run(contrasenas.verificar("clave", "texto-plano")) == (False, None)
+
+    # Bajar las rondas no reescribe hashes más costosos
+    contrasenas.configurar(rondas=4, workers=1)
+    assert asyncio.run(contrasenas.verificar("clave", nuevo)) == (True, None)
+
+
+def test_cola_llena_responde_503(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_COLA_MAX", 0)
+    contrasenas.configurar(rondas=4, workers=1)
+    liberar = threading.Event()
+    ocupado = contrasenas._enviar(liberar.wait)
+    try:
+        with pytest.raises(HTTPException) as error:
+            contrasenas.hash_password("clave")
+        assert error.value.status_code == 503 and error.value.headers["Retry-After"] == "1"
+    finally:
+        liberar.set()
+        ocupado.result()
+    assert contrasenas.hash_password("clave").startswith("$2b$04$")
+
+
+def test_login_actualiza_hash_viejo(db):
+    rol = Rol(nombre=f"r-{uuid.uuid4().hex[:8]}")
+    db.add(rol)
+    db.flush()
+    usuario = Usuario(username=f"u-{uuid.uuid4().hex[:8]}", nombre_completo="Médico",
+                      hashed_password=contrasenas.hash_password("secreta"), rol_id=rol.id)
+    db.add(usuario)
+    db.commit()
+
+    contrasenas.configurar(rondas=5, workers=1)
+    autenticado = asyncio.run(autenticar_usuario(db, usuario.username, "secreta"))
+    db.refresh(autenticado)
+    assert autenticado.hashed_password.startswith("$2b$05$")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(autenticar_usuario(db, usuario.username, "incorrecta"))
+    assert error.value.status_code == 401
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(autenticar_usuario(db, "no-existe-" + uuid.uuid4().hex, "secreta"))
+    assert error.value.status_code == 401
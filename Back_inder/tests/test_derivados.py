@@ -0,0 +1,145 @@
+"""
+Tests de las miniaturas y vistas previas (imágenes y primera página de PDF)
+Ejecutar con: python -m pytest tests/test_derivados.py -v
+"""
+import threading
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import archivos
+from app.core.config import settings
+from app.services import derivados_service as der
+
+pytestmark = pytest.mark.skipif(not der.PIL_DISPONIBLE, reason="Pillow no instalado")
+
+if der.PIL_DISPONIBLE:
+    from PIL import Image
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    yield
+    der.cerrar_pool()
+
+
+def _imagen(ruta, tamano=(2000, 1000), modo="RGB"):
+    Image.new(modo, tamano, (200, 30, 30, 128) if modo == "RGBA" else (200, 30, 30)).save(ruta)
+    return str(ruta)
+
+
+def _pdf(ruta):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    lienzo = canvas.Canvas(str(ruta), pagesize=A4)
+    lienzo.drawString(100, 750, "Resultado de laboratorio")
+    lienzo.save()
+    return str(ruta)
+
+
+@pytest.mark.parametrize("nombre, modo", [("foto.jpg", "RGB"), ("foto.png", "RGBA")])
+def test_imagen_genera_todos_los_tamanos(tmp_path, nombre, modo):
+    original = _imagen(tmp_path / nombre, modo=modo)
+    der.generar_derivados(original, nombre.rsplit(".", 1)[1])
+
+    for tamano, lado in der.TAMANOS.items():
+        with Image.open(der.ruta_derivado(original, tamano)) as img:
+            assert img.format == "JPEG" and img.mode == "RGB"
+            assert max(img.size) == lado
+            assert img.size[0] == 2 * img.size[1]   # conserva la proporción
+
+
+@pytest.mark.skipif(not der.soporta_derivados("pdf"), reason="sin pymupdf ni pdftoppm")
+def test_pdf_renderiza_primera_pagina(tmp_path):
+    original = _pdf(tmp_path / "examen.pdf")
+    ruta = der.obtener_derivado(original, "PDF", "miniatura")
+    with Image.open(ruta) as img:
+        assert max(img.size) <= der.TAMANOS["miniatura"]
+        assert img.size[1] > img.size[0]   # A4 vertical
+
+
+def test_errores(tmp_path):
+    with pytest.raises(der.DerivadoNoDisponible):
+        der.obtener_derivado(str(tmp_path / "a.dcm"), "dcm", "miniatura")
+    with pytest.raises(der.DerivadoNoDisponible):
+        der.obtener_derivado(str(tmp_path / "a.jpg"), "jpg", "gigante")
+    with pytest.raises(FileNotFoundError):
+        der.obtener_derivado(str(tmp_path / "no-existe.jpg"), "jpg", "miniatura")
+
+    danado = tmp_path / "danado.jpg"
+    danado.write_bytes(b"\xff\xd8\xff\xe0 esto no es un JPEG")
+    with pytest.raises(der.ArchivoIlegible):
+        der.obtener_derivado(str(danado), "jpg", "miniatura")
+    if der.soporta_derivados("pdf"):
+        pdf = tmp_path / "danado.pdf"
+        pdf.write_bytes(b"%PDF-1.4 truncado")
+        with pytest.raises(der.ArchivoIlegible):
+            der.obtener_derivado(str(pdf), "pdf", "miniatura")
+    # Sin restos de escrituras a medias
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_espera_agotada(tmp_path, monkeypatch):
+    original = _imagen(tmp_path / "lenta.jpg")
+    liberar = threading.Event()
+    generar = der._generar
+
+    def lento(*args):
+        liberar.wait(5)
+        return generar(*args)
+
+    monkeypatch.setattr(der, "_generar", lento)
+    monkeypatch.setattr(der, "ESPERA_MAX_SEGUNDOS", 0.05)
+    with pytest.raises(der.DerivadoEnProceso):
+        der.obtener_derivado(original, "jpg", "miniatura")
+    liberar.set()
+
+
+def test_eliminar_derivados(tmp_path):
+    original = _imagen(tmp_path / "foto.jpg")
+    der.generar_derivados(original, "jpg")
+    der.eliminar_derivados(original)
+    assert [p.name for p in tmp_path.iterdir()] == ["foto.jpg"]
+
+
+# ── Endpoint /vista ──────────────────────────────────────────
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DESCARGA_X_ACCEL_PREFIJO", "")
+    registros = {}
+    monkeypatch.setattr(archivos, "obtener_archivo", lambda db, archivo_id: registros.get(archivo_id))
+    app = FastAPI()
+    app.include_router(archivos.router, prefix="/archivos")
+    app.dependency_overrides[archivos.get_db] = lambda: None
+
+    def registrar(ruta, tipo):
+        archivo_id = uuid.uuid4()
+        registros[archivo_id] = SimpleNamespace(ruta_archivo=str(ruta), tipo_archivo=tipo,
+                                                nombre_archivo="adjunto", hash_sha256=None)
+        return f"/archivos/{archivo_id}/vista"
+
+    return TestClient(app), registrar
+
+
+def test_vista_codigos_de_estado(tmp_path, monkeypatch, cliente):
+    cliente, registrar = cliente
+    respuesta = cliente.get(registrar(_imagen(tmp_path / "ok.png"), "png"))
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"] == "image/jpeg"
+
+    danado = tmp_path / "danado.png"
+    danado.write_bytes(b"basura")
+    assert cliente.get(registrar(danado, "png")).status_code == 422
+    assert cliente.get(registrar(tmp_path / "x.dcm", "dcm")).status_code == 415
+    assert cliente.get(registrar(tmp_path / "falta.jpg", "jpg")).status_code == 404
+    assert cliente.get(registrar(tmp_path / "ok.png", "png") + "?tamano=gigante").status_code == 422
+
+    def en_proceso(*args):
+        raise der.DerivadoEnProceso("La vista previa aún se está generando")
+    monkeypatch.setattr(archivos, "obtener_derivado", en_proceso)
+    respuesta = cliente.get(registrar(tmp_path / "ok.png", "png"))
+    assert respuesta.status_code == 503 and respuesta.headers["retry-after"] == "5"
@@ -0,0 +1,122 @@
+"""
+Tests de las descargas con Range / 206, 416, ETag (304) e If-Range
+Ejecutar con: python -m pytest tests/test_descargas.py -v
+"""
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.utils import descargas
+from app.utils.descargas import RangoArchivoResponse, respuesta_descarga
+
+CONTENIDO = bytes(range(256)) * 40   # 10 240 bytes
+HASH = hashlib.sha256(CONTENIDO).hexdigest()
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DESCARGA_X_ACCEL_PREFIJO", "")
+    monkeypatch.setattr(descargas, "TAMANO_BLOQUE", 1000)
+    ruta = tmp_path / "examen.pdf"
+    ruta.write_bytes(CONTENIDO)
+    app = FastAPI()
+
+    @app.api_route("/archivo", methods=["GET", "HEAD"])
+    def archivo(request: Request, debil: bool = False):
+        return respuesta_descarga(request, str(ruta), "examen.pdf", "pdf",
+                                  hash_sha256=None if debil else HASH)
+
+    return TestClient(app)
+
+
+def test_completo_con_etag_fuerte(cliente):
+    respuesta = cliente.get("/archivo")
+    assert respuesta.status_code == 200
+    assert respuesta.content == CONTENIDO
+    assert respuesta.headers["etag"] == f'"{HASH}"'
+    assert respuesta.headers["accept-ranges"] == "bytes"
+    assert respuesta.headers["content-type"] == "application/pdf"
+
+
+@pytest.mark.parametrize("rango, inicio, fin", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=10000-", 10000, 10239),
+    ("bytes=-40", 10200, 10239),
+    ("bytes=10200-99999", 10200, 10239),
+])
+def test_rango_206(cliente, rango, inicio, fin):
+    respuesta = cliente.get("/archivo", headers={"Range": rango})
+    assert respuesta.status_code == 206
+    assert respuesta.content == CONTENIDO[inicio:fin + 1]
+    assert respuesta.headers["content-range"] == f"bytes {inicio}-{fin}/{len(CONTENIDO)}"
+    assert respuesta.headers["content-length"] == str(fin - inicio + 1)
+
+
+@pytest.mark.parametrize("rango", ["bytes=10240-", "bytes=50-10", "bytes=-0"])
+def test_rango_insatisfacible_416(cliente, rango):
+    respuesta = cliente.get("/archivo", headers={"Range": rango})
+    assert respuesta.status_code == 416
+    assert respuesta.headers["content-range"] == f"bytes */{len(CONTENIDO)}"
+
+
+def test_rango_no_soportado_envia_completo(cliente):
+    respuesta = cliente.get("/archivo", headers={"Range": "bytes=0-1,5-6"})
+    assert respuesta.status_code == 200 and respuesta.content == CONTENIDO
+
+
+def test_if_none_match_304(cliente):
+    etag = cliente.get("/archivo").headers["etag"]
+    for valor in (etag, f"W/{etag}", f'"otro", {etag}', "*"):
+        respuesta = cliente.get("/archivo", headers={"If-None-Match": valor})
+        assert respuesta.status_code == 304 and respuesta.content == b""
+    assert cliente.get("/archivo", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_if_range_usa_comparacion_fuerte(cliente):
+    etag = f'"{HASH}"'
+    assert cliente.get("/archivo", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    # Validador débil, distinto o fecha: archivo completo
+    for valor in (f"W/{etag}", '"otro"', "Wed, 21 Oct 2015 07:28:00 GMT"):
+        respuesta = cliente.get("/archivo", headers={"Range": "bytes=0-9", "If-Range": valor})
+        assert respuesta.status_code == 200 and respuesta.content == CONTENIDO
+
+
+def test_if_range_con_etag_debil_del_servidor(cliente):
+    etag = cliente.get("/archivo?debil=true").headers["etag"]
+    assert etag.startswith("W/")
+    for valor in (etag, etag[2:]):
+        respuesta = cliente.get("/archivo?debil=true", headers={"Range": "bytes=0-9", "If-Range": valor})
+        assert respuesta.status_code == 200
+
+
+def test_head_sin_cuerpo(cliente):
+    respuesta = cliente.head("/archivo", headers={"Range": "bytes=0-9"})
+    assert respuesta.status_code == 206
+    assert respuesta.content == b""
+    assert respuesta.headers["content-length"] == "10"
+
+
+def test_zerocopysend(tmp_path):
+    ruta = tmp_path / "a.bin"
+    ruta.write_bytes(CONTENIDO)
+    enviados = []
+
+    async def send(mensaje):
+        if mensaje["type"] == "http.response.zerocopysend":
+            f = mensaje["file"]
+            assert not f.closed
+            f.seek(mensaje["offset"])
+            mensaje = dict(mensaje, datos=f.read(mensaje["count"]))
+        enviados.append(mensaje)
+
+    respuesta = RangoArchivoResponse(str(ruta), 100, 199, 206, {}, "application/octet-stream")
+    scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+    asyncio.run(respuesta(scope, None, send))
+
+    assert enviados[0]["status"] == 206
+    assert enviados[1]["datos"] == CONTENIDO[100:200]
+    assert enviados[1]["file"].closed
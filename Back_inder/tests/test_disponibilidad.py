@@ -0,0 +1,103 @@
+"""
+Tests de la disponibilidad de médicos (grilla generate_series LEFT JOIN citas)
+Ejecutar con: python -m pytest tests/test_disponibilidad.py -v
+"""
+import uuid
+from datetime import date, time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.v1.citas import disponibilidad
+from app.core.database import engine
+from app.crud.cita import disponibilidad_medicos, slots_agenda
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.cita import Cita
+from app.models.usuario import Rol, Usuario
+
+LUNES = date(2024, 3, 4)
+MARTES = date(2024, 3, 5)
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+
+
+@pytest.fixture
+def agenda(db):
+    """Dos médicos; el primero con citas el lunes a las 07:00, 07:15 (mismo slot) y 09:30."""
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Programada")
+    rol = Rol(nombre=f"r-{uuid.uuid4().hex[:8]}")
+    db.add_all([item, rol])
+    db.flush()
+    medicos = [Usuario(username=f"m-{uuid.uuid4().hex[:8]}", nombre_completo=f"Médico {i}",
+                       hashed_password="x", rol_id=rol.id) for i in range(2)]
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add_all(medicos + [dep])
+    db.flush()
+    for hora in (time(7, 0), time(7, 15), time(9, 30)):
+        db.add(Cita(deportista_id=dep.id, medico_id=medicos[0].id, fecha=LUNES, hora=hora,
+                    tipo_cita_id=item.id, estado_cita_id=item.id))
+    # Fuera de la jornada: no cae en ningún slot
+    db.add(Cita(deportista_id=dep.id, medico_id=medicos[0].id, fecha=LUNES, hora=time(18, 0),
+                tipo_cita_id=item.id, estado_cita_id=item.id))
+    db.flush()
+    return medicos
+
+
+def test_grilla_de_slots():
+    slots = slots_agenda()
+    assert len(slots) == 20
+    assert slots[0] == "07:00" and slots[1] == "07:30" and slots[-1] == "16:30"
+
+
+def test_bitmap_marca_slots_ocupados(db, agenda):
+    ocupado, libre = agenda
+    filas = {(str(f.medico_id), f.fecha): f
+             for f in disponibilidad_medicos(db, [ocupado.id, libre.id], LUNES, MARTES)}
+
+    # Una fila por médico y día aunque no haya citas
+    assert len(filas) == 4
+    lunes = filas[(str(ocupado.id), LUNES)]
+    slots = slots_agenda()
+    assert lunes.bitmap == (1 << slots.index("07:00")) | (1 << slots.index("09:30"))
+    assert lunes.ocupados == 2
+    assert filas[(str(ocupado.id), MARTES)].bitmap == 0
+    assert all(filas[(str(libre.id), dia)].bitmap == 0 for dia in (LUNES, MARTES))
+
+
+def test_endpoint_cuenta_libres_y_restringe_por_rol(db, agenda):
+    ocupado, libre = agenda
+    admin = SimpleNamespace(id=uuid.uuid4(), rol=SimpleNamespace(nombre="admin"))
+    respuesta = disponibilidad(medico_ids=[ocupado.id, libre.id, ocupado.id],
+                               fecha_inicio=LUNES, fecha_fin=MARTES, db=db, current_user=admin)
+
+    por_medico = {m["medico_id"]: m for m in respuesta["medicos"]}
+    assert len(por_medico) == 2
+    assert por_medico[str(ocupado.id)]["ocupados"] == 2
+    assert por_medico[str(ocupado.id)]["libres"] == 2 * 20 - 2
+    assert por_medico[str(libre.id)]["dias"] == {str(LUNES): 0, str(MARTES): 0}
+
+    medico = SimpleNamespace(id=libre.id, rol=SimpleNamespace(nombre="medico"))
+    with pytest.raises(HTTPException) as error:
+        disponibilidad(medico_ids=[ocupado.id], fecha_inicio=LUNES, fecha_fin=LUNES,
+                       db=db, current_user=medico)
+    assert error.value.status_code == 403
+    with pytest.raises(HTTPException) as error:
+        disponibilidad(medico_ids=[libre.id], fecha_inicio=MARTES, fecha_fin=LUNES,
+                       db=db, current_user=medico)
+    assert error.value.status_code == 422
@@ -0,0 +1,161 @@
+"""
+Tests de los PDF preparados (cifrados) para la descarga segura
+Ejecutar con: python -m pytest tests/test_documentos_preparados.py -v
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api.v1 import descarga_segura
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.historia import HistoriaClinica
+from app.services import documentos_preparados_service as preparados
+from app.services import tokens_descarga_service as tokens
+
+pytestmark = pytest.mark.skipif(not preparados.CIFRADO_DISPONIBLE, reason="cryptography no instalado")
+
+
+@pytest.fixture(autouse=True)
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(preparados, "PREPARADOS_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    tokens.estado.limpiar()
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    tokens.estado.limpiar()
+
+
+def _esperar(token_id):
+    with preparados._pendientes_lock:
+        futuro = preparados._pendientes.get(token_id)
+    if futuro is not None:
+        futuro.result(timeout=10)
+
+
+def test_cifrado_y_datos_asociados(directorio):
+    historia_id = uuid.uuid4()
+    assert preparados.encolar("abc123", historia_id, lambda: b"%PDF-1.4 confidencial")
+    _esperar("abc123")
+
+    guardado = (directorio / "abc123.enc").read_bytes()
+    assert b"confidencial" not in guardado
+    assert preparados.obtener("abc123", historia_id) == b"%PDF-1.4 confidencial"
+    # Otro token u otra historia no pueden usar el archivo
+    os.rename(directorio / "abc123.enc", directorio / "def456.enc")
+    assert preparados.obtener("def456", historia_id) is None
+    assert preparados.obtener("abc123", historia_id) is None
+
+
+def test_purga_por_antiguedad(directorio):
+    assert preparados.encolar("viejo", uuid.uuid4(), lambda: b"%PDF")
+    assert preparados.encolar("nuevo", uuid.uuid4(), lambda: b"%PDF")
+    _esperar("viejo")
+    _esperar("nuevo")
+    hace_tres_horas = time.time() - 3 * 3600
+    os.utime(directorio / "viejo.enc", (hace_tres_horas, hace_tres_horas))
+
+    assert preparados.purgar_vencidos(timedelta(hours=2)) == 1
+    assert [p.name for p in directorio.iterdir()] == ["nuevo.enc"]
+
+
+@pytest.fixture
+def historia(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Activo")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento="1075123", nombres="Ana",
+                     apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.flush()
+    historia = HistoriaClinica(deportista_id=dep.id, fecha_apertura=date(2024, 1, 1), estado_id=item.id)
+    db.add(historia)
+    db.commit()
+    return historia
+
+
+def _token_descarga(db, historia):
+    """token_descarga ya verificado (el de /verificar) para la historia."""
+    token, firmado = tokens.emitir_enlace(historia.id, "1075123")
+    return tokens.emitir_descarga(firmado)
+
+
+def test_descarga_envia_el_preparado(db, historia, monkeypatch, directorio):
+    monkeypatch.setattr(descarga_segura, "renderizar_pdf", lambda historia_id: b"%PDF-preparado")
+    token = descarga_segura.generar_token_descarga(str(historia.id), db)["token"]
+    token_id = tokens.decodificar(token).id
+    _esperar(token_id)
+    assert (directorio / f"{token_id}.enc").exists()
+
+    def sin_render(historia_id):
+        raise AssertionError("no debía renderizar en vivo")
+    monkeypatch.setattr(descarga_segura, "renderizar_pdf", sin_render)
+
+    verificado = descarga_segura.verificar_token(
+        descarga_segura.VerificarTokenRequest(token=token, cedula="1075123"), db)
+    respuesta = descarga_segura.descargar_con_token(verificado["token_descarga"], db)
+
+    async def leer():
+        return b"".join([parte async for parte in respuesta.body_iterator])
+    assert asyncio.run(leer()) == b"%PDF-preparado"
+    assert "historia_clinica_1075123.pdf" in respuesta.headers["content-disposition"]
+    # Un solo uso: el archivo se borra al descargar
+    assert not (directorio / f"{token_id}.enc").exists()
+
+
+def test_descarga_no_bloquea_el_event_loop(db, historia, monkeypatch):
+    entro, liberar = threading.Event(), threading.Event()
+
+    def preparado_lento(token_id, historia_id, espera=preparados.ESPERA_SEGUNDOS):
+        entro.set()
+        liberar.wait(5)
+        return b"%PDF-preparado"
+    monkeypatch.setattr(preparados, "obtener", preparado_lento)
+
+    app = FastAPI()
+    app.include_router(descarga_segura.router)
+    app.dependency_overrides[descarga_segura.get_db] = lambda: db
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    respuestas = {}
+    with TestClient(app) as cliente:   # un solo event loop para todas las peticiones
+        descarga = threading.Thread(target=lambda: respuestas.update(
+            descarga=cliente.get(f"/descarga-segura/descargar/{_token_descarga(db, historia)}")))
+        descarga.start()
+        assert entro.wait(5)
+        # Con la descarga esperando el PDF, el loop sigue atendiendo
+        ping = threading.Thread(target=lambda: respuestas.update(ping=cliente.get("/ping")))
+        ping.start()
+        ping.join(2)
+        atendido = "ping" in respuestas
+        liberar.set()
+        descarga.join(5)
+        ping.join(5)
+
+    assert atendido
+    assert respuestas["descarga"].status_code == 200
+    assert respuestas["descarga"].content == b"%PDF-preparado"
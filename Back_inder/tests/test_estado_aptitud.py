@@ -0,0 +1,103 @@
+"""
+Tests del estado de aptitud vigente por deportista (trigger, migración 013)
+Ejecutar con: python -m pytest tests/test_estado_aptitud.py -v
+"""
+import uuid
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.api.v1.reportes import deportistas_no_aptos
+from app.core.database import engine
+from app.crud.deportista import listar_deportistas
+from app.models import AptitudMedica, Catalogo, CatalogoItem, Deportista, EstadoAptitudDeportista
+from app.models.historia import HistoriaClinica
+from app.services.cache_reportes import cache
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    cache.limpiar()
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    cache.limpiar()
+
+
+@pytest.fixture
+def deportista(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Activo")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Luis", apellidos="Gómez", fecha_nacimiento=date(1995, 5, 5),
+                     sexo_id=item.id, estado_id=item.id, tipo_deporte="Atletismo")
+    db.add(dep)
+    db.flush()
+    return dep
+
+
+def _valoracion(db, dep, dia, resultado):
+    historia = HistoriaClinica(deportista_id=dep.id, fecha_apertura=dia, estado_id=dep.estado_id)
+    db.add(historia)
+    db.flush()
+    aptitud = AptitudMedica(historia_clinica_id=historia.id, resultado=resultado,
+                            tipo_aptitud="Competencia", observaciones="Control")
+    db.add(aptitud)
+    db.flush()
+    return historia, aptitud
+
+
+def _estado(db, dep):
+    db.expire_all()
+    return db.get(EstadoAptitudDeportista, dep.id)
+
+
+def test_gana_la_ultima_valoracion(db, deportista):
+    _valoracion(db, deportista, date(2024, 1, 10), "no_apto")
+    assert _estado(db, deportista).no_apto is True
+
+    historia, aptitud = _valoracion(db, deportista, date(2024, 3, 1), "Apto")
+    estado = _estado(db, deportista)
+    assert (estado.no_apto, estado.aptitud_id, estado.fecha) == (False, aptitud.id, date(2024, 3, 1))
+
+    # Una valoración anterior no desplaza a la vigente
+    _valoracion(db, deportista, date(2023, 6, 1), "No apto")
+    assert _estado(db, deportista).aptitud_id == aptitud.id
+
+
+def test_borrar_recalcula_el_estado(db, deportista):
+    _valoracion(db, deportista, date(2024, 1, 10), "no_apto")
+    historia, aptitud = _valoracion(db, deportista, date(2024, 3, 1), "apto")
+
+    db.delete(aptitud)
+    db.flush()
+    assert _estado(db, deportista).no_apto is True
+
+    db.query(HistoriaClinica).filter(HistoriaClinica.deportista_id == deportista.id).delete()
+    db.flush()
+    assert _estado(db, deportista) is None
+
+
+def test_reporte_y_filtro_de_listado(db, deportista):
+    _valoracion(db, deportista, date(2024, 1, 10), "no_apto")
+    db.commit()
+
+    reporte = deportistas_no_aptos(db=db, current_user=None)
+    fila = next(i for i in reporte["items"] if i["documento"] == deportista.numero_documento)
+    assert fila["disciplina"] == "Atletismo"
+    assert fila["tipo_aptitud"] == "Competencia"
+    assert fila["observaciones"] == "Control"
+
+    ids = lambda aptitud: {d.id for d in listar_deportistas(db, aptitud)}
+    assert deportista.id in ids("no_apto")
+    assert deportista.id not in ids("apto")
+    assert deportista.id not in ids("sin_valoracion")
@@ -0,0 +1,72 @@
+"""
+Tests de la exportación incremental a Parquet
+Ejecutar con: python -m pytest tests/test_exportacion.py -v
+"""
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.services.exportacion_service import exportar, leer_marcas, seudonimo
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+
+
+def _deportista(db, creado: datetime) -> Deportista:
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Femenino")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(1999, 5, 17),
+                     sexo_id=item.id, estado_id=item.id, email="ana@example.com", created_at=creado)
+    db.add(dep)
+    db.flush()
+    return dep
+
+
+def _filas(destino, tabla):
+    return pq.read_table(str(destino / tabla)).to_pylist()
+
+
+def test_exporta_seudonimizado_e_incremental(db, tmp_path):
+    ahora = datetime.utcnow()
+    primero = _deportista(db, ahora - timedelta(minutes=10))
+
+    r1 = exportar(db, destino=str(tmp_path), tablas=["deportistas"], hasta=ahora - timedelta(minutes=5))
+    filas = {f["deportista_id"]: f for f in _filas(tmp_path, "deportistas")}
+    fila = filas[seudonimo(primero.id)]
+    assert fila["anio_nacimiento"] == 1999 and fila["sexo"] == "Femenino"
+    assert "nombres" not in fila and "email" not in fila
+    assert str(primero.id) not in filas
+    assert all(a.startswith("deportistas/anio=") for a in r1["deportistas"]["archivos"])
+    assert leer_marcas(str(tmp_path))["deportistas"] == ahora - timedelta(minutes=5)
+
+    # Segunda corrida: solo lo creado después de la marca
+    segundo = _deportista(db, ahora - timedelta(minutes=2))
+    r2 = exportar(db, destino=str(tmp_path), tablas=["deportistas"], hasta=ahora)
+    assert r2["deportistas"]["filas"] == 1
+    ids = [f["deportista_id"] for f in _filas(tmp_path, "deportistas")]
+    assert ids.count(seudonimo(primero.id)) == 1
+    assert ids.count(seudonimo(segundo.id)) == 1
+
+
+def test_tabla_desconocida(db, tmp_path):
+    with pytest.raises(ValueError):
+        exportar(db, destino=str(tmp_path), tablas=["usuarios"])
@@ -0,0 +1,104 @@
+"""
+Tests de la exportación de reportes a CSV / XLSX en streaming
+Ejecutar con: python -m pytest tests/test_exportacion_reportes.py -v
+"""
+import csv
+import io
+import uuid
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
+
+from app.api.v1.reportes import _filas_sin_historia, deportistas_por_disciplina
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.services.cache_reportes import cache
+from app.utils import exportacion_tabular
+from app.utils.exportacion_tabular import generar_csv, generar_xlsx
+
+NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    cache.limpiar()
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    cache.limpiar()
+
+
+def _filas(n):
+    return ({"n": i, "texto": f"fila <{i}> & ñ", "fecha": date(2024, 1, 1)} for i in range(n))
+
+
+def test_csv_por_bloques(monkeypatch):
+    monkeypatch.setattr(exportacion_tabular, "FILAS_POR_BLOQUE", 10)
+    bloques = list(generar_csv(["n", "texto", "fecha"], _filas(25)))
+    assert len(bloques) == 3
+    filas = list(csv.reader(io.StringIO(b"".join(bloques).decode("utf-8-sig"))))
+    assert filas[0] == ["n", "texto", "fecha"]
+    assert filas[25] == ["24", "fila <24> & ñ", "2024-01-01"]
+
+
+def test_xlsx_por_bloques(monkeypatch):
+    monkeypatch.setattr(exportacion_tabular, "FILAS_POR_BLOQUE", 10)
+    bloques = list(generar_xlsx(["n", "texto", "fecha"], _filas(25)))
+    assert len(bloques) > 3
+
+    libro = zipfile.ZipFile(io.BytesIO(b"".join(bloques)))
+    assert libro.testzip() is None
+    filas = ET.fromstring(libro.read("xl/worksheets/sheet1.xml")).findall(".//x:row", NS)
+    assert len(filas) == 26
+    encabezado = [c.find(".//x:t", NS).text for c in filas[0]]
+    assert encabezado == ["n", "texto", "fecha"]
+    n, texto, fecha = filas[25]
+    assert n.find("x:v", NS).text == "24"
+    assert texto.find(".//x:t", NS).text == "fila <24> & ñ"
+    assert fecha.get("s") == "1" and fecha.find("x:v", NS).text == "45292"   # 2024-01-01
+
+
+def test_texto_que_parece_formula_se_exporta_como_texto():
+    peligrosos = ['=HYPERLINK("http://x", "clic")', "+1+1", "-2+3", "@SUM(A1)", "\t=1", "\r=1"]
+    filas = [{"texto": v, "n": -5} for v in peligrosos] + [{"texto": "Esguince - grado 2", "n": 1}]
+
+    csv_filas = list(csv.reader(io.StringIO(
+        b"".join(generar_csv(["texto", "n"], filas)).decode("utf-8-sig"), newline="")))
+    assert [f[0] for f in csv_filas[1:]] == ["'" + v for v in peligrosos] + ["Esguince - grado 2"]
+    assert {f[1] for f in csv_filas[1:-1]} == {"-5"}   # los números no se tocan
+
+    libro = zipfile.ZipFile(io.BytesIO(b"".join(generar_xlsx(["texto", "n"], filas))))
+    xlsx_filas = ET.fromstring(libro.read("xl/worksheets/sheet1.xml")).findall(".//x:row", NS)
+    assert xlsx_filas[1][0].find(".//x:t", NS).text == "'" + peligrosos[0]
+    assert xlsx_filas[1][1].find("x:v", NS).text == "-5"
+
+
+def test_filas_en_streaming_y_formato_en_endpoint(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Activo")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.flush()
+
+    filas = {f["id"]: f for f in _filas_sin_historia(db)}
+    assert filas[str(dep.id)]["nombre"] == "Ana Pérez"
+
+    # Sin format: el JSON de siempre (también llamado como función desde el dashboard)
+    assert isinstance(deportistas_por_disciplina(db=db, current_user=None), list)
+    respuesta = deportistas_por_disciplina(db=db, current_user=None, formato="xlsx")
+    assert isinstance(respuesta, StreamingResponse)
+    assert "deportistas-por-disciplina" in respuesta.headers["content-disposition"]
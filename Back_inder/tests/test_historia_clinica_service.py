@@ -0,0 +1,115 @@
+"""
+Tests del servicio en proceso de historia clínica (unidad de trabajo)
+Ejecutar con: python -m pytest tests/test_historia_clinica_service.py -v
+"""
+import uuid
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.api.v1 import antecedentes as api_antecedentes
+from app.core.database import engine
+from app.crud.catalogo import invalidar_cache_catalogos
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.historia import HistoriaClinica
+from app.services.historia_clinica_service import HistoriaClinicaService, _OperacionesHistoria
+from app.services.revisiones_service import listar_revisiones
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    invalidar_cache_catalogos()
+
+
+@pytest.fixture
+def historia_id(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Abierta")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.flush()
+    h = HistoriaClinica(deportista_id=dep.id, fecha_apertura=date.today(), estado_id=item.id)
+    db.add(h)
+    db.commit()
+    return h.id
+
+
+def test_unidad_de_trabajo_en_proceso(db, historia_id):
+    servicio = HistoriaClinicaService(db)
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2].split()[0].upper())
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        with servicio.unidad_de_trabajo(historia_id) as uow:
+            alergia_id = uow.crear("alergias", tipo_alergia="Polen", reaccion="Rinitis")
+            for i in range(10):
+                uow.crear("medicaciones", nombre_medicamento=f"Med {i}")
+            uow.crear("diagnosticos", nombre_enfermedad="Esguince")
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    # alergias, medicaciones, diagnosticos + revisión y cabeza JSON
+    assert sentencias.count("INSERT") == 5
+    assert [a["id"] for a in servicio.obtener_alergias(historia_id)] == [alergia_id]
+    assert len(servicio.obtener_medicaciones(historia_id)) == 10
+    assert len(listar_revisiones(db, historia_id)) == 1
+
+    servicio.crear_diagnostico(historia_id, nombre_enfermedad="Tendinitis")
+    assert len(servicio.obtener_historia_completa(historia_id)["diagnosticos"]) == 2
+
+    # Una excepción dentro del bloque descarta todo lo encolado
+    with pytest.raises(RuntimeError):
+        with servicio.unidad_de_trabajo(historia_id) as uow:
+            uow.eliminar("alergias", alergia_id)
+            raise RuntimeError("cancelado")
+    assert len(servicio.obtener_alergias(historia_id)) == 1
+
+
+def test_interfaz_abstracta():
+    with pytest.raises(TypeError):
+        _OperacionesHistoria()
+
+    class SoloLectura(_OperacionesHistoria):
+        def obtener_secciones(self, historia_clinica_id, secciones=None):
+            return {}
+
+    with pytest.raises(TypeError):
+        SoloLectura()
+
+
+def test_endpoints_pasan_por_el_servicio(db, historia_id, monkeypatch):
+    usados = []
+    aplicar = HistoriaClinicaService._aplicar
+    monkeypatch.setattr(HistoriaClinicaService, "_aplicar",
+                        lambda self, *args: usados.append(self) or aplicar(self, *args))
+    app = FastAPI()
+    app.include_router(api_antecedentes.router)
+    app.dependency_overrides[api_antecedentes.get_db] = lambda: db
+    cliente = TestClient(app)
+
+    respuesta = cliente.post(f"/antecedentes/historia/{historia_id}/lote", json={"operaciones": [
+        {"seccion": "alergias", "accion": "crear", "datos": {"tipo_alergia": "Polen"}},
+    ]})
+    assert respuesta.status_code == 200 and len(usados) == 1
+    assert isinstance(usados[0], HistoriaClinicaService) and usados[0].db is db
+
+    respuesta = cliente.get(f"/antecedentes/historia/{historia_id}/secciones?sections=alergias")
+    assert respuesta.status_code == 200
+    assert [a["tipo_alergia"] for a in respuesta.json()["alergias"]] == ["Polen"]
@@ -0,0 +1,125 @@
+"""
+Tests del guardado por lotes de POST /historias_clinicas/completa
+Ejecutar con: python -m pytest tests/test_historia_lote.py -v
+"""
+import uuid
+from datetime import date, time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.catalogo import invalidar_cache_catalogos
+from app.crud.historia import buscar_historias_en_snapshot
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.antecedentes import Alergias, Diagnosticos, Medicaciones, LesioneDeportivas
+from app.models.cita import Cita
+from app.models.historia import HistoriaClinica
+from app.models.usuario import Usuario, Rol
+from app.api.v1.historias import HistoriaClinicaCompletaRequest, crear_historia_clinica_completa
+
+
+@pytest.fixture
+def db():
+    # Todo dentro de una transacción externa que se revierte al final
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    invalidar_cache_catalogos()
+
+
+@pytest.fixture
+def datos(db):
+    cat = Catalogo(nombre=f"estados-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    programada = CatalogoItem(catalogo_id=cat.id, nombre="Programada")
+    atendida = CatalogoItem(catalogo_id=cat.id, nombre="Atendida")
+    db.add_all([programada, atendida])
+    db.flush()
+    rol = Rol(nombre=f"rol-{uuid.uuid4().hex[:8]}")
+    db.add(rol)
+    db.flush()
+    medico = Usuario(username=f"u-{uuid.uuid4().hex[:8]}", nombre_completo="Médico",
+                     hashed_password="x", rol_id=rol.id)
+    dep = Deportista(tipo_documento_id=programada.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=programada.id, estado_id=programada.id)
+    db.add_all([medico, dep])
+    db.flush()
+    cita = Cita(deportista_id=dep.id, fecha=date.today(), hora=time(9, 0),
+                tipo_cita_id=programada.id, estado_cita_id=programada.id)
+    db.add(cita)
+    db.commit()
+    return SimpleNamespace(dep=dep, medico=medico, cita=cita, programada=programada, atendida=atendida)
+
+
+def test_guarda_consulta_con_un_insert_por_tabla(db, datos):
+    data = HistoriaClinicaCompletaRequest(
+        deportista_id=datos.dep.id,
+        fecha_apertura=date.today(),
+        estado_id=datos.programada.id,
+        alergias=[{"tipo_alergia": f"Alergia {i}", "reaccion": "Urticaria"} for i in range(40)],
+        medicaciones=[{"nombre_medicamento": f"Med {i}", "dosis": "1", "duracion": "5 días"} for i in range(40)],
+        lesiones_deportivas=[{"descripcion": "Esguince", "fecha_ultima_lesion": "2024-03-01"}],
+        diagnosticos=[{"codigo_cie11": "FA00", "nombre_diagnostico": f"Dx {i}"} for i in range(40)],
+        signos_vitales={"presion_arterial": "120/80", "peso": 70, "altura": 175},
+        motivo_consulta_enfermedad={"motivo_consulta": "Dolor", "tipo_consulta": "Control"},
+        exploracion_fisica_sistemas={"sistema_cardiovascular": "Normal"},
+    )
+
+    medico = SimpleNamespace(id=datos.medico.id)
+    sentencias = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement.split()[0].upper())
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        respuesta = crear_historia_clinica_completa(data, db, medico)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    # historia + 7 tablas hijas + revisión y cabeza JSON; 1 SELECT de catálogo y 1 UPDATE de la cita
+    assert sentencias.count("INSERT") == 10
+    assert sentencias.count("SELECT") == 1
+    assert sentencias.count("UPDATE") == 1
+
+    historia_id = uuid.UUID(respuesta["historia_clinica_id"])
+    assert db.get(HistoriaClinica, historia_id).medico_id == datos.medico.id
+    assert db.query(Alergias).filter_by(historia_clinica_id=historia_id).count() == 40
+    assert db.query(Medicaciones).filter_by(historia_clinica_id=historia_id).count() == 40
+    assert db.query(Diagnosticos).filter_by(historia_clinica_id=historia_id).count() == 40
+    assert db.query(LesioneDeportivas).filter_by(historia_clinica_id=historia_id).one().tipo_lesion == "Esguince"
+    assert historia_id in buscar_historias_en_snapshot(db, codigo_cie11="FA00", tipo_cita="Control")
+    db.refresh(datos.cita)
+    assert datos.cita.estado_cita_id == datos.atendida.id
+
+    # Segunda consulta: el id de "Atendida" ya está en caché
+    data = HistoriaClinicaCompletaRequest(deportista_id=datos.dep.id, fecha_apertura=date.today(),
+                                          estado_id=datos.programada.id)
+    sentencias.clear()
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        crear_historia_clinica_completa(data, db, medico)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert "SELECT" not in sentencias
+
+
+def test_error_revierte_toda_la_consulta(db, datos):
+    data = HistoriaClinicaCompletaRequest(
+        deportista_id=uuid.uuid4(),  # no existe: viola la FK
+        fecha_apertura=date.today(),
+        estado_id=datos.programada.id,
+        alergias=[{"tipo_alergia": "Polen"}],
+    )
+    with pytest.raises(Exception):
+        crear_historia_clinica_completa(data, db, SimpleNamespace(id=datos.medico.id))
+    assert db.query(Alergias).filter_by(tipo_alergia="Polen").count() == 0
@@ -0,0 +1,89 @@
+"""
+Tests de la proyección y búsqueda sobre historias_clinicas_json (JSONB)
+Ejecutar con: python -m pytest tests/test_historia_snapshot.py -v
+"""
+import json
+import uuid
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.crud.historia import obtener_historia_datos_completos, buscar_historias_en_snapshot
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.historia import HistoriaClinica, HistoriaClinicaJSON
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+
+
+@pytest.fixture
+def historia_id(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Activo")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.flush()
+    h = HistoriaClinica(deportista_id=dep.id, fecha_apertura=date.today(), estado_id=item.id)
+    db.add(h)
+    db.flush()
+    db.add(HistoriaClinicaJSON(historia_clinica_id=h.id, deportista_id=dep.id, version=1, datos_completos={
+        "tipo_cita": "Control",
+        "signos_vitales": [{"peso_kg": 70.5, "presion_arterial": "120/80"}],
+        "diagnosticos": [{"codigo_cie11": "FA00", "nombre_enfermedad": "Artrosis"},
+                         {"codigo_cie11": "NC51", "nombre_enfermedad": "Esguince"}],
+        "plan_tratamiento": [{"indicaciones_medicas": "x" * 50000}],
+    }))
+    db.flush()
+    return h.id
+
+
+def test_proyeccion_por_rutas(db, historia_id):
+    datos = obtener_historia_datos_completos(
+        db, historia_id, ["tipo_cita", "signos_vitales.0", "diagnosticos.1.codigo_cie11", "no_existe"]
+    )
+    assert datos == {
+        "tipo_cita": "Control",
+        "signos_vitales.0": {"peso_kg": 70.5, "presion_arterial": "120/80"},
+        "diagnosticos.1.codigo_cie11": "NC51",
+        "no_existe": None,
+    }
+    plan = obtener_historia_datos_completos(db, historia_id)["plan_tratamiento"]
+    assert len(plan[0]["indicaciones_medicas"]) == 50000
+    with pytest.raises(ValueError):
+        obtener_historia_datos_completos(db, historia_id, ["diagnosticos;drop"])
+
+
+def test_busqueda_usa_indices(db, historia_id):
+    assert buscar_historias_en_snapshot(db, codigo_cie11="NC51") == [historia_id]
+    assert buscar_historias_en_snapshot(db, codigo_cie11="NC51", tipo_cita="Control") == [historia_id]
+    assert buscar_historias_en_snapshot(db, codigo_cie11="NC51", tipo_cita="Valoración") == []
+
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = db.execute(text(
+        "EXPLAIN (FORMAT JSON) SELECT historia_clinica_id FROM historias_clinicas_json "
+        "WHERE datos_completos -> 'diagnosticos' @> CAST(:filtro AS jsonb)"
+    ), {"filtro": json.dumps([{"codigo_cie11": "NC51"}])}).scalar()
+    assert "ix_historias_json_diagnosticos" in json.dumps(plan)
+
+    plan = db.execute(text(
+        "EXPLAIN (FORMAT JSON) SELECT historia_clinica_id FROM historias_clinicas_json "
+        "WHERE datos_completos ->> 'tipo_cita' = 'Control'"
+    )).scalar()
+    assert "ix_historias_json_tipo_cita" in json.dumps(plan)
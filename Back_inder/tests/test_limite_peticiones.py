@@ -0,0 +1,180 @@
+"""
+Tests del límite de peticiones (token bucket) y su 429 + Retry-After
+Ejecutar con: python -m pytest tests/test_limite_peticiones.py -v
+"""
+import asyncio
+import logging
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.v1 import auth
+from app.core import limite_peticiones
+from app.core.limite_peticiones import AlmacenMemoria, AlmacenRedis, LimitePeticionesMiddleware, Regla
+from app.schemas.usuario import LoginRequest
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    limite_peticiones.almacen.limpiar()
+    yield
+    limite_peticiones.almacen.limpiar()
+
+
+def test_balde_con_recarga():
+    ahora = [100.0]
+    almacen = AlmacenMemoria(reloj=lambda: ahora[0])
+    regla = Regla(capacidad=3, por_segundo=1)
+
+    assert [almacen.consumir("k", regla) for _ in range(3)] == [0, 0, 0]
+    assert almacen.consumir("k", regla) == pytest.approx(1.0)
+    ahora[0] += 0.5
+    assert almacen.consumir("k", regla) == pytest.approx(0.5)
+    ahora[0] += 0.5
+    assert almacen.consumir("k", regla) == 0
+    # Otra clave tiene su propio balde
+    assert almacen.consumir("otra", regla) == 0
+
+
+def test_claves_acotadas():
+    almacen = AlmacenMemoria(max_claves=2)
+    for clave in ("a", "b", "c"):
+        almacen.consumir(clave, Regla(1, 1))
+    assert list(almacen._baldes) == ["b", "c"]
+
+
+def test_middleware_429_con_retry_after(monkeypatch):
+    monkeypatch.setitem(limite_peticiones.REGLAS, "consulta_ip", Regla(2, 0.1))
+    app = FastAPI()
+
+    @app.get("/api/v1/cie11/buscar")
+    def buscar():
+        return {"ok": True}
+
+    @app.get("/api/v1/deportistas")
+    def privada():
+        return {"ok": True}
+
+    app.add_middleware(LimitePeticionesMiddleware)
+    cliente = TestClient(app)
+
+    assert [cliente.get("/api/v1/cie11/buscar").status_code for _ in range(2)] == [200, 200]
+    respuesta = cliente.get("/api/v1/cie11/buscar")
+    assert respuesta.status_code == 429
+    assert respuesta.headers["retry-after"] == "10"
+    assert respuesta.headers["access-control-allow-origin"] == "*"
+    # Rutas sin regla no se limitan
+    assert all(cliente.get("/api/v1/deportistas").status_code == 200 for _ in range(5))
+
+
+def test_login_no_llega_a_bcrypt_tras_el_limite(monkeypatch):
+    llamadas = []
+
+    def autenticar(db, username, password):
+        llamadas.append(username)
+        raise HTTPException(status_code=401, detail="Usuario o contraseña incorrectos")
+
+    monkeypatch.setattr(auth, "autenticar_usuario", autenticar)
+    monkeypatch.setitem(limite_peticiones.REGLAS, "login_global", Regla(100, 10))
+    datos = LoginRequest(username="Medico1", password="x")
+    for _ in range(limite_peticiones.REGLAS["login_usuario"].capacidad):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(auth.login(datos, db=None))
+        assert error.value.status_code == 401
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.login(LoginRequest(username=" medico1 ", password="x"), db=None))
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) > 0
+    assert len(llamadas) == limite_peticiones.REGLAS["login_usuario"].capacidad
+
+
+class _RedisCaido:
+    """Cliente redis falso: el script falla mientras `caido` sea True."""
+
+    class RedisError(Exception):
+        pass
+
+    def __init__(self):
+        self.caido = True
+        self.llamadas = 0
+        self.Redis = SimpleNamespace(from_url=lambda url, **kw: self)
+
+    def register_script(self, lua):
+        def script(keys, args):
+            self.llamadas += 1
+            if self.caido:
+                raise self.RedisError("Timeout reading from socket")
+            return "0"
+        return script
+
+
+def test_redis_caido_avisa_una_vez_y_reintenta_tras_la_espera(monkeypatch, caplog):
+    falso = _RedisCaido()
+    monkeypatch.setattr(limite_peticiones, "redis", falso, raising=False)
+    ahora = [0.0]
+    almacen = AlmacenRedis("redis://falso", reloj=lambda: ahora[0])
+    regla = Regla(capacidad=2, por_segundo=1)
+
+    with caplog.at_level(logging.INFO, logger=limite_peticiones.__name__):
+        # El respaldo en memoria sigue limitando
+        assert [almacen.consumir("k", regla) for _ in range(2)] == [0, 0]
+        assert almacen.consumir("k", regla) > 0
+        # Durante la espera no se vuelve a intentar Redis (ni su timeout)
+        assert falso.llamadas == 1
+        ahora[0] += limite_peticiones.REINTENTO_REDIS_SEGUNDOS
+        almacen.consumir("k", regla)
+        assert falso.llamadas == 2
+
+        falso.caido = False
+        ahora[0] += limite_peticiones.REINTENTO_REDIS_SEGUNDOS
+        assert almacen.consumir("k", regla) == 0
+        assert almacen.consumir("k", regla) == 0
+        assert falso.llamadas == 4
+
+    avisos = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(avisos) == 1
+    assert "Redis disponible de nuevo" in caplog.text
+
+
+def test_almacen_bloqueante_no_detiene_el_event_loop(monkeypatch):
+    entro, liberar = threading.Event(), threading.Event()
+
+    class AlmacenLento(AlmacenMemoria):
+        bloqueante = True
+
+        def consumir(self, clave, regla):
+            entro.set()
+            liberar.wait(5)
+            return super().consumir(clave, regla)
+
+    monkeypatch.setattr(limite_peticiones, "almacen", AlmacenLento())
+    app = FastAPI()
+
+    @app.get("/api/v1/cie11/buscar")
+    def buscar():
+        return {"ok": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(LimitePeticionesMiddleware)
+    respuestas = {}
+    with TestClient(app) as cliente:   # un solo event loop para todas las peticiones
+        lenta = threading.Thread(target=lambda: respuestas.update(lenta=cliente.get("/api/v1/cie11/buscar")))
+        lenta.start()
+        assert entro.wait(5)
+        ping = threading.Thread(target=lambda: respuestas.update(ping=cliente.get("/ping")))
+        ping.start()
+        ping.join(2)
+        atendido = "ping" in respuestas
+        liberar.set()
+        lenta.join(5)
+        ping.join(5)
+
+    assert atendido
+    assert respuestas["lenta"].status_code == 200
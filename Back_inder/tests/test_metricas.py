@@ -0,0 +1,80 @@
+"""
+Tests de la instrumentación por ruta (MetricasMiddleware + eventos SQL)
+Ejecutar con: python -m pytest tests/test_metricas.py -v
+"""
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.database import engine
+from app.core.dependencies import get_current_user
+from app.crud.usuario import crear_token
+from app.main import app as app_principal
+from app.core.metricas import MetricasMiddleware, RegistroMetricas, instrumentar_engine
+
+
+def _llamar(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("127.0.0.1", 1),
+        "headers": [(b"host", b"test")],
+    }
+    mensajes = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        mensajes.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return mensajes[0]
+
+
+def test_registra_sql_y_latencia_por_plantilla_de_ruta():
+    instrumentar_engine(engine)
+    registro = RegistroMetricas()
+    app = FastAPI()
+    app.add_middleware(MetricasMiddleware, registro=registro, cabecera_debug=True)
+
+    @app.get("/items/{n}")
+    def items(n: int):
+        # N+1 simulado: una consulta por elemento
+        with engine.connect() as conn:
+            return [conn.execute(text("SELECT generate_series(1, 3)")).scalars().all() for _ in range(n)]
+
+    inicio = _llamar(app, "/items/4")
+    _llamar(app, "/items/1")
+    assert _llamar(app, "/no-existe")["status"] == 404
+
+    cabeceras = dict(inicio["headers"])
+    assert cabeceras[b"x-debug-metricas"].startswith(b"sql=4; ")
+    assert b"filas=12;" in cabeceras[b"x-debug-metricas"]
+
+    salida = registro.exportar()
+    assert 'inder_sql_sentencias_total{metodo="GET",ruta="/items/{n}"} 5' in salida
+    assert 'inder_sql_filas_total{metodo="GET",ruta="/items/{n}"} 15' in salida
+    assert 'inder_http_duracion_segundos_count{metodo="GET",ruta="/items/{n}"} 2' in salida
+    assert 'inder_sql_sentencias_por_peticion_bucket{metodo="GET",ruta="/items/{n}",le="2"} 1' in salida
+    assert 'inder_http_peticiones_total{metodo="GET",ruta="sin_ruta",estado="404"} 1' in salida
+
+
+def test_metrics_solo_para_admin():
+    cliente = TestClient(app_principal)
+    assert cliente.get("/metrics").status_code == 401
+    assert cliente.get("/health").status_code == 200
+
+    cabeceras = {"Authorization": f"Bearer {crear_token({'sub': 'prueba'})}"}
+    try:
+        app_principal.dependency_overrides[get_current_user] = lambda: SimpleNamespace(rol=SimpleNamespace(nombre="medico"))
+        assert cliente.get("/metrics", headers=cabeceras).status_code == 403
+        app_principal.dependency_overrides[get_current_user] = lambda: SimpleNamespace(rol=SimpleNamespace(nombre="admin"))
+        respuesta = cliente.get("/metrics", headers=cabeceras)
+        assert respuesta.status_code == 200
+        assert "inder_http_duracion_segundos" in respuesta.text
+    finally:
+        app_principal.dependency_overrides.clear()
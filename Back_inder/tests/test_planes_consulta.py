@@ -0,0 +1,179 @@
+"""
+Tests de regresión de planes de consulta.
+
+Siembra un volumen representativo de citas e historias dentro de una transacción
+(se revierte al final), ejecuta EXPLAIN sobre los predicados más usados por la
+agenda, los listados y los reportes, y verifica que usan los índices declarados
+en los modelos / migrations/005_indices_consultas_frecuentes.sql.
+
+Ejecutar con: python -m pytest tests/test_planes_consulta.py -v
+"""
+import json
+import random
+import uuid
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.core.database import Base, engine
+from app.core.migraciones import listar_migraciones
+import app.models  # noqa: F401
+
+N_MEDICOS = 20
+N_DEPORTISTAS = 400
+N_CITAS = 8000
+N_HISTORIAS = 3000
+
+
+def _tablas(nombres):
+    return [Base.metadata.tables[n] for n in nombres]
+
+
+def _nodos(plan):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+
+def _indices_usados(conn, sql, params):
+    fila = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql), params).scalar()
+    plan = (fila if isinstance(fila, list) else json.loads(fila))[0]["Plan"]
+    return {n["Index Name"] for n in _nodos(plan) if "Index Name" in n}
+
+
+@pytest.fixture(scope="module")
+def conn():
+    """Conexión con datos sembrados; todo se revierte al terminar."""
+    connection = engine.connect()
+    trans = connection.begin()
+
+    # Índices de los modelos, por si la BD de pruebas es anterior a la migración 005
+    for tabla in _tablas(["citas", "historias_clinicas", "diagnosticos", "catalogo_items", "deportistas"]):
+        for indice in tabla.indexes:
+            indice.create(connection, checkfirst=True)
+
+    random.seed(27)
+    cat_id = uuid.uuid4()
+    connection.execute(text("INSERT INTO catalogos (id, nombre) VALUES (:id, :n)"),
+                       {"id": cat_id, "n": f"plan-{cat_id.hex[:8]}"})
+    items = [{"id": uuid.uuid4(), "catalogo_id": cat_id, "nombre": f"item {i}", "activo": True} for i in range(2000)]
+    connection.execute(Base.metadata.tables["catalogo_items"].insert(), items)
+    item_ids = [i["id"] for i in items]
+
+    rol_id = uuid.uuid4()
+    connection.execute(text("INSERT INTO roles (id, nombre) VALUES (:id, :n)"),
+                       {"id": rol_id, "n": f"plan-{rol_id.hex[:8]}"})
+    medicos = [{"id": uuid.uuid4(), "username": f"plan-{uuid.uuid4().hex[:12]}", "nombre_completo": "Médico",
+                "hashed_password": "x", "rol_id": rol_id} for _ in range(N_MEDICOS)]
+    connection.execute(Base.metadata.tables["usuarios"].insert(), medicos)
+
+    deportistas = [{
+        "id": uuid.uuid4(), "tipo_documento_id": item_ids[0], "numero_documento": uuid.uuid4().hex[:20],
+        "nombres": "Dep", "apellidos": str(i), "fecha_nacimiento": date(2000, 1, 1),
+        "sexo_id": item_ids[1], "estado_id": random.choice(item_ids[:10]),
+        "tipo_deporte": f"deporte {i % 40}",
+    } for i in range(N_DEPORTISTAS)]
+    connection.execute(Base.metadata.tables["deportistas"].insert(), deportistas)
+
+    inicio = date(2024, 1, 1)
+    citas = [{
+        "id": uuid.uuid4(),
+        "deportista_id": random.choice(deportistas)["id"],
+        "medico_id": random.choice(medicos)["id"],
+        "fecha": inicio + timedelta(days=random.randrange(730)),
+        "hora": time(7 + random.randrange(10), random.choice([0, 30])),
+        "tipo_cita_id": random.choice(item_ids[:5]),
+        "estado_cita_id": random.choice(item_ids[5:12]),
+    } for _ in range(N_CITAS)]
+    connection.execute(Base.metadata.tables["citas"].insert(), citas)
+
+    historias = [{
+        "id": uuid.uuid4(),
+        "deportista_id": random.choice(deportistas)["id"],
+        "medico_id": random.choice(medicos)["id"],
+        "fecha_apertura": inicio + timedelta(days=random.randrange(730)),
+        "estado_id": item_ids[2],
+        "created_at": datetime(2024, 1, 1),
+    } for _ in range(N_HISTORIAS)]
+    connection.execute(Base.metadata.tables["historias_clinicas"].insert(), historias)
+    connection.execute(Base.metadata.tables["diagnosticos"].insert(), [
+        {"id": uuid.uuid4(), "historia_clinica_id": h["id"], "nombre_enfermedad": "Dx"} for h in historias
+    ])
+
+    for tabla in ("catalogo_items", "usuarios", "deportistas", "citas", "historias_clinicas", "diagnosticos"):
+        connection.execute(text(f"ANALYZE {tabla}"))
+
+    connection.info["muestra"] = {
+        "medico_id": medicos[0]["id"], "deportista_id": deportistas[0]["id"],
+        "historia_id": historias[0]["id"], "estado_id": item_ids[5], "catalogo_id": cat_id,
+        "fecha": inicio + timedelta(days=100),
+    }
+    yield connection
+    trans.rollback()
+    connection.close()
+
+
+class TestPlanesConsulta:
+
+    def test_agenda_medico(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, """
+            SELECT * FROM citas WHERE medico_id = :medico_id AND fecha = :fecha ORDER BY hora
+        """, m)
+        assert "ix_citas_medico_fecha_hora" in usados
+
+    def test_citas_por_deportista(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, """
+            SELECT * FROM citas WHERE deportista_id = :deportista_id ORDER BY fecha DESC
+        """, m)
+        assert "ix_citas_deportista_fecha" in usados
+
+    def test_citas_por_rango_de_fechas(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, """
+            SELECT * FROM citas WHERE fecha BETWEEN :fecha AND CAST(:fecha AS date) + 2 ORDER BY fecha, hora
+        """, m)
+        assert usados & {"ix_citas_fecha_hora", "ix_citas_estado_fecha"}
+
+    def test_historias_por_deportista(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, """
+            SELECT * FROM historias_clinicas WHERE deportista_id = :deportista_id ORDER BY fecha_apertura DESC
+        """, m)
+        assert "ix_historias_deportista_fecha" in usados
+
+    def test_historias_por_medico_en_periodo(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, """
+            SELECT COUNT(*) FROM historias_clinicas
+            WHERE medico_id = :medico_id AND fecha_apertura BETWEEN :fecha AND CAST(:fecha AS date) + 30
+        """, m)
+        assert "ix_historias_medico_fecha" in usados
+
+    def test_diagnosticos_por_historia(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, "SELECT * FROM diagnosticos WHERE historia_clinica_id = :historia_id", m)
+        assert "idx_diagnosticos_historia" in usados
+
+    def test_item_catalogo_por_nombre(self, conn):
+        m = conn.info["muestra"]
+        usados = _indices_usados(conn, """
+            SELECT id FROM catalogo_items WHERE catalogo_id = :catalogo_id AND nombre = 'item 7'
+        """, m)
+        assert "ix_catalogo_items_catalogo_nombre" in usados
+
+
+def test_indices_de_modelos_estan_en_migracion():
+    """Todo Index declarado en los modelos debe crearse también en alguna migración."""
+    sql = "\n".join(m.ruta.read_text(encoding="utf-8") for m in listar_migraciones())
+    faltantes = [
+        indice.name
+        for tabla in Base.metadata.tables.values()
+        for indice in tabla.indexes
+        if indice.name.startswith(("ix_", "idx_"))
+        and not indice.name.startswith(("ix_usuarios_", "ix_tokens_descarga_"))
+        and f" {indice.name} " not in sql
+    ]
+    assert faltantes == []
@@ -0,0 +1,62 @@
+"""
+Tests de la caché del usuario autenticado (principal)
+Ejecutar con: python -m pytest tests/test_principal.py -v
+"""
+import uuid
+
+import pytest
+
+from app.core import principal as cache
+from app.core.database import SessionLocal
+from app.models.usuario import Usuario, Rol, Permiso
+
+
+@pytest.fixture
+def usuario():
+    db = SessionLocal()
+    rol = Rol(nombre=f"rol-{uuid.uuid4().hex[:8]}")
+    db.add(rol)
+    db.flush()
+    db.add(Permiso(rol_id=rol.id, modulo="historia", accion="ver"))
+    u = Usuario(username=f"u-{uuid.uuid4().hex[:8]}", nombre_completo="Médico Prueba",
+                hashed_password="x", rol_id=rol.id)
+    db.add(u)
+    db.commit()
+    yield u
+    db.delete(u)
+    db.delete(rol)
+    db.commit()
+    db.close()
+    cache.invalidar_todo()
+
+
+def test_reutiliza_principal_por_token(usuario):
+    payload = {"sub": str(usuario.id), "iat": 1000}
+    primero = cache.cargar_principal(payload)
+    assert primero.tiene_permiso("historia", "ver")
+    assert not primero.tiene_permiso("historia", "eliminar")
+    assert primero.usuario.rol.nombre == primero.rol
+    assert cache.obtener_principal(payload) is primero
+    # Otro token del mismo usuario es otra entrada
+    assert cache.obtener_principal({"sub": str(usuario.id), "iat": 2000}) is None
+
+
+def test_invalidacion_y_ttl(usuario, monkeypatch):
+    payload = {"sub": str(usuario.id), "iat": 1000}
+    p = cache.cargar_principal(payload)
+
+    cache.invalidar_rol(p.rol_id)
+    assert cache.obtener_principal(payload) is None
+
+    cache.cargar_principal(payload)
+    cache.invalidar_usuario(usuario.id)
+    assert cache.obtener_principal(payload) is None
+
+    monkeypatch.setattr(cache.settings, "PRINCIPAL_CACHE_TTL", -1)
+    cache.cargar_principal(payload)
+    assert cache.obtener_principal(payload) is None
+
+
+def test_sub_invalido():
+    assert cache.cargar_principal({"sub": "no-es-uuid"}) is None
+    assert cache.cargar_principal({}) is None
@@ -0,0 +1,171 @@
+"""
+Tests del historial versionado de la historia clínica
+Ejecutar con: python -m pytest tests/test_revisiones.py -v
+"""
+import uuid
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.api.v1.historias import HistoriaClinicaCompletaRequest, crear_historia_clinica_completa
+from app.core import migraciones
+from app.core.database import engine
+from app.crud import antecedentes
+from app.crud.historia import buscar_historias_en_snapshot
+from app.crud.catalogo import invalidar_cache_catalogos
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.antecedentes import Alergias, Diagnosticos, SignosVitales
+from app.models.historia import HistoriaClinica, HistoriaClinicaJSON, HistoriaRevision
+from app.models.usuario import Usuario, Rol
+from app.schemas.antecedentes import DiagnosticosCreate, SignosVitalesCreate
+from app.services import revisiones_service
+from app.services.revisiones_service import (
+    SECCIONES, TIPO_CITA, leer_documento, listar_revisiones, obtener_version,
+)
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    invalidar_cache_catalogos()
+
+
+@pytest.fixture
+def historia_id(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Abierta")
+    rol = Rol(nombre=f"rol-{uuid.uuid4().hex[:8]}")
+    db.add_all([item, rol])
+    db.flush()
+    medico = Usuario(username=f"u-{uuid.uuid4().hex[:8]}", nombre_completo="Médico",
+                     hashed_password="x", rol_id=rol.id)
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add_all([medico, dep])
+    db.commit()
+    respuesta = crear_historia_clinica_completa(
+        HistoriaClinicaCompletaRequest(
+            deportista_id=dep.id, fecha_apertura=date.today(), estado_id=item.id,
+            diagnosticos=[{"codigo_cie11": "FA00", "nombre_diagnostico": "Artrosis"}],
+            signos_vitales={"peso": 70, "altura": 175},
+        ),
+        db, SimpleNamespace(id=medico.id),
+    )
+    return uuid.UUID(respuesta["historia_clinica_id"])
+
+
+def test_deltas_por_seccion_y_reconstruccion(db, historia_id):
+    v1 = obtener_version(db, historia_id, 1)["datos"]
+    assert [d["nombre_enfermedad"] for d in v1["diagnosticos"]] == ["Artrosis"]
+
+    diagnostico = antecedentes.crear_diagnostico(db, DiagnosticosCreate(historia_clinica_id=historia_id, nombre_enfermedad="Esguince"))
+    antecedentes.actualizar_signos_vitales(
+        db, historia_id, SignosVitalesCreate(historia_clinica_id=historia_id, peso_kg=72, estatura_cm=175)
+    )
+    # Sin cambios reales: no genera versión
+    antecedentes.actualizar_signos_vitales(
+        db, historia_id, SignosVitalesCreate(historia_clinica_id=historia_id, peso_kg=72, estatura_cm=175)
+    )
+    antecedentes.eliminar_diagnostico(db, diagnostico.id)
+
+    revisiones = listar_revisiones(db, historia_id)
+    assert [r["version"] for r in revisiones] == [4, 3, 2, 1]
+    assert revisiones[1]["secciones"] == ["signos_vitales"]
+
+    # Los deltas solo guardan la sección modificada
+    delta = db.query(HistoriaRevision).filter_by(historia_clinica_id=historia_id, version=3).one()
+    assert not delta.es_checkpoint and list(delta.datos) == ["signos_vitales"]
+
+    v2 = obtener_version(db, historia_id, 2)["datos"]
+    assert [d["nombre_enfermedad"] for d in v2["diagnosticos"]] == ["Artrosis", "Esguince"]
+    assert float(v2["signos_vitales"][0]["peso_kg"]) == 70
+
+    cabeza = obtener_version(db, historia_id)
+    assert cabeza["version"] == 4
+    assert cabeza["datos"] == obtener_version(db, historia_id, 4)["datos"]
+    assert [d["nombre_enfermedad"] for d in cabeza["datos"]["diagnosticos"]] == ["Artrosis"]
+
+
+def test_checkpoint_periodico(db, historia_id, monkeypatch):
+    monkeypatch.setattr(revisiones_service, "CHECKPOINT_CADA", 3)
+    for i in range(5):
+        antecedentes.crear_diagnostico(db, DiagnosticosCreate(historia_clinica_id=historia_id, nombre_enfermedad=f"D{i}"))
+
+    checkpoints = [r["version"] for r in listar_revisiones(db, historia_id) if r["es_checkpoint"]]
+    assert checkpoints == [6, 3, 1]
+    v5 = obtener_version(db, historia_id, 5)["datos"]
+    assert [d["nombre_enfermedad"] for d in v5["diagnosticos"]] == ["Artrosis", "D0", "D1", "D2", "D3"]
+
+
+def test_version_1_igual_a_las_tablas_y_buscable(db, historia_id):
+    # El checkpoint de /completa (RETURNING) coincide con lo que se relee de las tablas
+    v1 = obtener_version(db, historia_id, 1)["datos"]
+    assert v1 == leer_documento(db, historia_id)
+    assert set(SECCIONES) <= set(v1)
+
+    antecedentes.crear_diagnostico(db, DiagnosticosCreate(historia_clinica_id=historia_id, nombre_enfermedad="Esguince"))
+    assert listar_revisiones(db, historia_id)[0]["secciones"] == ["diagnosticos"]
+    assert historia_id in buscar_historias_en_snapshot(db, codigo_cie11="FA00")
+
+
+def test_sin_cabeza_la_version_1_lleva_todas_las_secciones(db, historia_id):
+    # Historia abierta sin /completa: ya tiene una alergia y no tiene cabeza JSON
+    base = db.get(HistoriaClinica, historia_id)
+    otra = HistoriaClinica(deportista_id=base.deportista_id, fecha_apertura=date.today(),
+                           estado_id=base.estado_id)
+    db.add(otra)
+    db.flush()
+    db.add(Alergias(historia_clinica_id=otra.id, tipo_alergia="Polen"))
+    db.commit()
+
+    antecedentes.crear_diagnostico(db, DiagnosticosCreate(historia_clinica_id=otra.id, nombre_enfermedad="Esguince"))
+    revision = db.query(HistoriaRevision).filter_by(historia_clinica_id=otra.id).one()
+    assert revision.version == 1 and revision.es_checkpoint
+    assert [a["tipo_alergia"] for a in revision.datos["alergias"]] == ["Polen"]
+    assert [d["nombre_enfermedad"] for d in revision.datos["diagnosticos"]] == ["Esguince"]
+    assert revision.datos == leer_documento(db, otra.id)
+
+
+def test_migracion_016_convierte_cabezas_del_formulario_anterior(db, historia_id):
+    base = db.get(HistoriaClinica, historia_id)
+    otra = HistoriaClinica(deportista_id=base.deportista_id, fecha_apertura=date.today(),
+                           estado_id=base.estado_id)
+    db.add(otra)
+    db.flush()
+    db.add(Diagnosticos(historia_clinica_id=otra.id, codigo_cie11="NC51", nombre_enfermedad="Esguince"))
+    db.add(SignosVitales(historia_clinica_id=otra.id, peso_kg=70.5, estatura_cm=175))
+    db.add(HistoriaClinicaJSON(historia_clinica_id=otra.id, deportista_id=otra.deportista_id, datos_completos={
+        "tipoCita": "Control", "diagnosticos": [{"codigo": "NC51", "nombre": "Esguince"}],
+    }))
+    db.commit()
+
+    ruta = next(m.ruta for m in migraciones.listar_migraciones() if m.version == "016")
+    actualizar = next(s for s in migraciones.dividir_sentencias(ruta.read_text(encoding="utf-8"))
+                      if s.startswith("UPDATE"))
+    db.execute(text(actualizar + " AND h.historia_clinica_id = :hid"), {"hid": otra.id})
+    db.expire_all()
+
+    cabeza = obtener_version(db, otra.id)
+    assert cabeza["version"] is None
+    assert cabeza["datos"] == {**leer_documento(db, otra.id), TIPO_CITA: "Control"}
+    assert buscar_historias_en_snapshot(db, codigo_cie11="NC51", tipo_cita="Control") == [otra.id]
+
+    # La primera edición crea la versión 1 completa y solo marca la sección tocada
+    antecedentes.actualizar_signos_vitales(
+        db, otra.id, SignosVitalesCreate(historia_clinica_id=otra.id, peso_kg=72, estatura_cm=175)
+    )
+    revision = db.query(HistoriaRevision).filter_by(historia_clinica_id=otra.id).one()
+    assert revision.es_checkpoint and revision.secciones == ["signos_vitales"]
+    assert revision.datos[TIPO_CITA] == "Control"
@@ -0,0 +1,202 @@
+"""
+Tests de la lectura compuesta de secciones (GET /antecedentes/secciones)
+y de la escritura por lotes (POST /antecedentes/historia/{id}/lote)
+Ejecutar con: python -m pytest tests/test_secciones.py -v
+"""
+import uuid
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.api.v1 import antecedentes as api_antecedentes
+from app.api.v1.historias import HistoriaClinicaCompletaRequest, crear_historia_clinica_completa
+from app.core.database import engine
+from app.crud.antecedentes import obtener_secciones, aplicar_operaciones_secciones, SeccionYaRegistrada
+from app.crud.catalogo import invalidar_cache_catalogos
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.services.revisiones_service import listar_revisiones
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    invalidar_cache_catalogos()
+
+
+def _historia(db, item, dep, n_diagnosticos):
+    respuesta = crear_historia_clinica_completa(
+        HistoriaClinicaCompletaRequest(
+            deportista_id=dep.id, fecha_apertura=date.today(), estado_id=item.id,
+            diagnosticos=[{"nombre_diagnostico": f"Dx {i}"} for i in range(n_diagnosticos)],
+            signos_vitales={"peso": 70},
+        ),
+        db, SimpleNamespace(id=None),
+    )
+    return uuid.UUID(respuesta["historia_clinica_id"])
+
+
+def _deportista(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Abierta")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.commit()
+    return item, dep
+
+
+def test_varias_historias_una_consulta_por_seccion(db):
+    item, dep = _deportista(db)
+    h1 = _historia(db, item, dep, 3)
+    h2 = _historia(db, item, dep, 1)
+
+    consultas = []
+    contar = lambda *args: consultas.append(args[2])
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        datos = obtener_secciones(db, [h1, h2], ["diagnosticos", "signos_vitales", "alergias"])
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert len([c for c in consultas if c.startswith("SELECT")]) == 3
+    assert [d["nombre_enfermedad"] for d in datos[h1]["diagnosticos"]] == ["Dx 0", "Dx 1", "Dx 2"]
+    assert len(datos[h2]["diagnosticos"]) == 1
+    assert float(datos[h2]["signos_vitales"][0]["peso_kg"]) == 70
+    assert datos[h1]["alergias"] == []
+
+    todas = obtener_secciones(db, [h1])[h1]
+    assert "motivo_consulta_enfermedad" in todas and len(todas) == 16
+    with pytest.raises(ValueError):
+        obtener_secciones(db, [h1], ["no_existe"])
+
+
+def test_lote_de_operaciones_en_una_transaccion(db):
+    item, dep = _deportista(db)
+    hid = _historia(db, item, dep, 2)
+    dx = obtener_secciones(db, [hid], ["diagnosticos"])[hid]["diagnosticos"]
+
+    operaciones = [{"seccion": "alergias", "accion": "crear", "datos": {"tipo_alergia": f"A{i}"}} for i in range(30)]
+    operaciones += [
+        {"seccion": "diagnosticos", "accion": "actualizar", "id": dx[0]["id"], "datos": {"nombre_enfermedad": "Editado"}},
+        {"seccion": "diagnosticos", "accion": "eliminar", "id": dx[1]["id"]},
+    ]
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2].split()[0].upper())
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        resultado = aplicar_operaciones_secciones(db, hid, operaciones)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    # alergias + revisión: 2 INSERT; edición y cabeza JSON: 2 UPDATE; 1 DELETE
+    assert sentencias.count("INSERT") == 2
+    assert sentencias.count("UPDATE") == 2
+    assert sentencias.count("DELETE") == 1
+    assert len(resultado["resultados"]) == 32 and resultado["version"] == 2
+    assert listar_revisiones(db, hid)[0]["secciones"] == ["alergias", "diagnosticos"]
+    datos = obtener_secciones(db, [hid], ["alergias", "diagnosticos"])[hid]
+    assert [a["id"] for a in datos["alergias"]] == [r["id"] for r in resultado["resultados"][:30]]
+    assert [d["nombre_enfermedad"] for d in datos["diagnosticos"]] == ["Editado"]
+
+    # Un id ajeno a la historia rechaza el lote completo sin escribir nada
+    with pytest.raises(ValueError):
+        aplicar_operaciones_secciones(db, hid, [
+            {"seccion": "alergias", "accion": "crear", "datos": {"tipo_alergia": "Polen"}},
+            {"seccion": "alergias", "accion": "eliminar", "id": uuid.uuid4()},
+        ])
+    with pytest.raises(ValueError):
+        aplicar_operaciones_secciones(db, hid, [{"seccion": "alergias", "accion": "crear", "datos": {"id": "x"}}])
+    assert len(obtener_secciones(db, [hid], ["alergias"])[hid]["alergias"]) == 30
+
+
+def test_lote_valida_los_datos_contra_las_columnas(db):
+    item, dep = _deportista(db)
+    hid = _historia(db, item, dep, 1)
+
+    invalidos = [
+        {"seccion": "alergias", "accion": "crear", "datos": {"descripcion": "sin tipo"}},
+        {"seccion": "alergias", "accion": "crear", "datos": {"tipo_alergia": "x" * 256}},
+        {"seccion": "lesiones_deportivas", "accion": "crear",
+         "datos": {"tipo_lesion": "Esguince", "fecha_lesion": "ayer"}},
+        {"seccion": "signos_vitales", "accion": "actualizar", "id": uuid.uuid4(),
+         "datos": {"frecuencia_cardiaca_lpm": "rápida"}},
+        {"seccion": "diagnosticos", "accion": "actualizar", "id": uuid.uuid4(),
+         "datos": {"nombre_enfermedad": None}},
+    ]
+    for op in invalidos:
+        with pytest.raises(ValueError, match="datos no válidos"):
+            aplicar_operaciones_secciones(db, hid, [op])
+
+    # Los valores se convierten al tipo de la columna
+    resultado = aplicar_operaciones_secciones(db, hid, [{
+        "seccion": "lesiones_deportivas", "accion": "crear",
+        "datos": {"tipo_lesion": "Esguince", "fecha_lesion": "2024-03-01"},
+    }])
+    lesion = obtener_secciones(db, [hid], ["lesiones_deportivas"])[hid]["lesiones_deportivas"][0]
+    assert lesion["id"] == resultado["resultados"][0]["id"]
+    assert lesion["fecha_lesion"] == date(2024, 3, 1)
+
+
+def test_lote_secciones_de_fila_unica(db):
+    item, dep = _deportista(db)
+    hid = _historia(db, item, dep, 1)
+    signos = obtener_secciones(db, [hid], ["signos_vitales"])[hid]["signos_vitales"]
+    assert len(signos) == 1
+
+    crear = {"seccion": "signos_vitales", "accion": "crear", "datos": {"peso_kg": 71}}
+    with pytest.raises(SeccionYaRegistrada):
+        aplicar_operaciones_secciones(db, hid, [crear])
+    with pytest.raises(SeccionYaRegistrada):
+        aplicar_operaciones_secciones(db, hid, [
+            {"seccion": "plan_tratamiento", "accion": "crear", "datos": {"plan_seguimiento": "A"}},
+            {"seccion": "plan_tratamiento", "accion": "crear", "datos": {"plan_seguimiento": "B"}},
+        ])
+
+    # Reemplazar la fila en el mismo lote sí es válido
+    aplicar_operaciones_secciones(db, hid, [
+        {"seccion": "signos_vitales", "accion": "eliminar", "id": signos[0]["id"]}, crear,
+    ])
+    signos = obtener_secciones(db, [hid], ["signos_vitales"])[hid]["signos_vitales"]
+    assert [float(s["peso_kg"]) for s in signos] == [71]
+
+
+def test_lote_endpoint_codigos_de_estado(db):
+    item, dep = _deportista(db)
+    hid = _historia(db, item, dep, 1)
+    app = FastAPI()
+    app.include_router(api_antecedentes.router)
+    app.dependency_overrides[api_antecedentes.get_db] = lambda: db
+    cliente = TestClient(app)
+    url = f"/antecedentes/historia/{hid}/lote"
+
+    def enviar(*operaciones):
+        return cliente.post(url, json={"operaciones": list(operaciones)}).status_code
+
+    assert enviar({"seccion": "alergias", "accion": "crear", "datos": {"tipo_alergia": 5}}) == 400
+    assert enviar({"seccion": "signos_vitales", "accion": "crear", "datos": {}}) == 409
+    # id repetido: IntegrityError de la BD
+    alergia_id = str(uuid.uuid4())
+    assert enviar({"seccion": "alergias", "accion": "crear", "id": alergia_id,
+                   "datos": {"tipo_alergia": "Polen"}}) == 200
+    assert enviar({"seccion": "alergias", "accion": "crear", "id": alergia_id,
+                   "datos": {"tipo_alergia": "Ácaros"}}) == 409
+    # Desborda NUMERIC(5, 2): DataError de la BD
+    signos_id = obtener_secciones(db, [hid], ["signos_vitales"])[hid]["signos_vitales"][0]["id"]
+    assert enviar({"seccion": "signos_vitales", "accion": "actualizar", "id": str(signos_id),
+                   "datos": {"peso_kg": 12345}}) == 400
@@ -0,0 +1,95 @@
+"""
+Tests de tendencias de signos vitales (IMC, medias móviles, z, rangos)
+Ejecutar con: python -m pytest tests/test_tendencias_signos.py -v
+"""
+import uuid
+from datetime import date
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista
+from app.models.antecedentes import SignosVitales
+from app.models.historia import HistoriaClinica
+from app.services.tendencias_signos_service import resumen_por_disciplina, tendencia_deportista
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+
+
+@pytest.fixture
+def cohorte(db):
+    """Tres deportistas de una disciplina propia; el primero con tres visitas."""
+    disciplina = f"disc-{uuid.uuid4().hex[:8]}"
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Activo")
+    db.add(item)
+    db.flush()
+
+    def deportista(nombre, visitas):
+        dep = Deportista(tipo_documento_id=item.id, numero_documento=uuid.uuid4().hex[:10],
+                         nombres=nombre, apellidos="Test", fecha_nacimiento=date(2000, 1, 1),
+                         sexo_id=item.id, estado_id=item.id, tipo_deporte=disciplina)
+        db.add(dep)
+        db.flush()
+        for dia, peso, fc in visitas:
+            h = HistoriaClinica(deportista_id=dep.id, fecha_apertura=dia, estado_id=item.id)
+            db.add(h)
+            db.flush()
+            db.add(SignosVitales(historia_clinica_id=h.id, estatura_cm=200, peso_kg=peso,
+                                 frecuencia_cardiaca_lpm=fc))
+        db.flush()
+        return dep
+
+    ana = deportista("Ana", [(date(2024, 1, 1), 80, 60), (date(2024, 2, 1), 84, 62), (date(2024, 3, 1), 88, 120)])
+    deportista("Bea", [(date(2024, 1, 5), 80, 60)])
+    deportista("Cris", [(date(2024, 1, 6), 80, 64)])
+    return disciplina, ana
+
+
+def test_tendencia_deportista(db, cohorte):
+    disciplina, ana = cohorte
+    r = tendencia_deportista(db, ana.id, ventana=2)
+
+    assert r["disciplina"] == disciplina and r["cohorte"]["deportistas"] == 3
+    fechas = [m["fecha"] for m in r["mediciones"]]
+    assert fechas == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    # IMC calculado: peso / 2.0²
+    assert [m["valores"]["imc"] for m in r["mediciones"]] == [20.0, 21.0, 22.0]
+    # Media móvil de 2 solo con mediciones propias
+    assert [m["media_movil"]["peso_kg"] for m in r["mediciones"]] == [80.0, 82.0, 86.0]
+    assert r["mediciones"][2]["fuera_de_rango"] == ["frecuencia_cardiaca_lpm"]
+    assert r["mediciones"][0]["fuera_de_rango"] == []
+    # Cohorte sobre la última medición: pesos 88, 80, 80
+    peso = r["cohorte"]["variables"]["peso_kg"]
+    assert peso["n"] == 3 and peso["media"] == pytest.approx(82.67, abs=0.01)
+    assert r["mediciones"][2]["z"]["peso_kg"] == pytest.approx(1.15, abs=0.01)
+
+
+def test_resumen_por_disciplina(db, cohorte):
+    disciplina, ana = cohorte
+    r = resumen_por_disciplina(db, disciplina=disciplina)
+
+    (fila,) = r["disciplinas"]
+    assert fila["deportistas"] == 3
+    assert fila["variables"]["frecuencia_cardiaca_lpm"]["fuera_de_rango"] == 1
+    assert fila["variables"]["temperatura_celsius"]["n"] == 0
+    (alerta,) = r["alertas"]
+    assert alerta["deportista_id"] == str(ana.id)
+    assert alerta["fuera_de_rango"] == {"frecuencia_cardiaca_lpm": 120.0}
+    assert alerta["mediciones"] == 3 and alerta["imc_cambio"] == 2.0
+
+
+def test_sin_mediciones(db):
+    assert resumen_por_disciplina(db, disciplina=f"nada-{uuid.uuid4().hex}")["disciplinas"] == []
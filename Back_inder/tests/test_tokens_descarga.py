@@ -0,0 +1,169 @@
+"""
+Tests de los tokens firmados de descarga segura
+Ejecutar con: python -m pytest tests/test_tokens_descarga.py -v
+"""
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.api.v1 import descarga_segura
+from app.api.v1.descarga_segura import VerificarTokenRequest, generar_token_descarga, verificar_token
+from app.core.database import engine
+from app.models import Catalogo, CatalogoItem, Deportista, TokenDescarga
+from app.models.historia import HistoriaClinica
+from app.services import tokens_descarga_service as tokens
+
+
+@pytest.fixture
+def db():
+    conexion = engine.connect()
+    transaccion = conexion.begin()
+    sesion = Session(bind=conexion, join_transaction_mode="create_savepoint")
+    tokens.estado.limpiar()
+    yield sesion
+    sesion.close()
+    transaccion.rollback()
+    conexion.close()
+    tokens.estado.limpiar()
+
+
+@pytest.fixture
+def historia(db):
+    cat = Catalogo(nombre=f"c-{uuid.uuid4().hex[:8]}")
+    db.add(cat)
+    db.flush()
+    item = CatalogoItem(catalogo_id=cat.id, nombre="Activo")
+    db.add(item)
+    db.flush()
+    dep = Deportista(tipo_documento_id=item.id, numero_documento="1.075.123",
+                     nombres="Ana", apellidos="Pérez", fecha_nacimiento=date(2000, 1, 1),
+                     sexo_id=item.id, estado_id=item.id)
+    db.add(dep)
+    db.flush()
+    h = HistoriaClinica(deportista_id=dep.id, fecha_apertura=date(2024, 1, 1), estado_id=item.id)
+    db.add(h)
+    db.commit()
+    return h
+
+
+def _verificar(db, token, cedula):
+    return verificar_token(VerificarTokenRequest(token=token, cedula=cedula), db)
+
+
+def _generar(db, historia):
+    return generar_token_descarga(str(historia.id), db)["token"]
+
+
+def test_firma_tipo_y_vigencia():
+    historia_id = uuid.uuid4()
+    token, firmado = tokens.emitir_enlace(historia_id, "1075 123")
+    assert tokens.decodificar(token).historia_id == historia_id
+    assert tokens.cedula_coincide(firmado, "1.075.123")
+    assert not tokens.cedula_coincide(firmado, "1075124")
+
+    alterado = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    with pytest.raises(tokens.TokenInvalido):
+        tokens.decodificar(alterado)
+    with pytest.raises(tokens.TokenInvalido):
+        tokens.decodificar(token, tokens.DESCARGA)
+
+    vencido = tokens._firmar(historia_id, tokens.ENLACE, 0, 1, firmado.hash_cedula, b"\0" * 6)
+    with pytest.raises(tokens.TokenExpirado):
+        tokens.decodificar(vencido)
+
+
+def test_verificacion_sin_consultas(db, historia):
+    token = _generar(db, historia)
+    tokens.estado.sincronizar(db, forzar=True)
+
+    sentencias = []
+    contar = lambda *args: sentencias.append(args[2])
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        respuesta = _verificar(db, token, "1075123")
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert sentencias == []
+    descarga = tokens.decodificar(respuesta["token_descarga"], tokens.DESCARGA)
+    assert descarga.id == tokens.decodificar(token).id
+    assert respuesta["historia_clinica_id"] == str(historia.id)
+
+
+def test_intentos_y_revocaciones(db, historia):
+    token = _generar(db, historia)
+    for restantes in (2, 1, 0):
+        with pytest.raises(HTTPException) as error:
+            _verificar(db, token, "999")
+        assert error.value.status_code == 401 and f"restantes: {restantes}" in error.value.detail
+    with pytest.raises(HTTPException) as error:
+        _verificar(db, token, "1075123")
+    assert error.value.status_code == 429
+
+    # Un enlace nuevo revoca los anteriores, también en otro proceso (réplica releída)
+    nuevo = _generar(db, historia)
+    tokens.estado.limpiar()
+    with pytest.raises(HTTPException) as error:
+        _verificar(db, token, "1075123")
+    assert error.value.status_code == 404
+    assert _verificar(db, nuevo, "1075123")["success"]
+
+    # Tras descargar el token queda revocado
+    tokens.revocar(db, tokens.decodificar(nuevo))
+    with pytest.raises(HTTPException) as error:
+        _verificar(db, nuevo, "1075123")
+    assert error.value.status_code == 404
+
+
+def test_purga_de_filas_vencidas(db, historia):
+    token = _generar(db, historia)
+    tokens.registrar_fallo(db, tokens.decodificar(token))
+    db.query(TokenDescarga).filter(TokenDescarga.historia_id == historia.id).update(
+        {"fecha_expiracion": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    assert tokens.purgar_vencidos(db) >= 2
+    assert db.query(TokenDescarga).filter(TokenDescarga.historia_id == historia.id).count() == 0
+
+
+def test_fallos_de_cedula_no_bloquean_el_event_loop(db, historia, monkeypatch):
+    token = _generar(db, historia)
+    entro, liberar = threading.Event(), threading.Event()
+    registrar = tokens.registrar_fallo
+
+    def registro_lento(*args):
+        entro.set()
+        liberar.wait(5)
+        return registrar(*args)
+    monkeypatch.setattr(tokens, "registrar_fallo", registro_lento)
+
+    app = FastAPI()
+    app.include_router(descarga_segura.router)
+    app.dependency_overrides[descarga_segura.get_db] = lambda: db
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    respuestas = {}
+    with TestClient(app) as cliente:   # un solo event loop para todas las peticiones
+        fallo = threading.Thread(target=lambda: respuestas.update(fallo=cliente.post(
+            "/descarga-segura/verificar", json={"token": token, "cedula": "999"})))
+        fallo.start()
+        assert entro.wait(5)
+        # Con el UPSERT del intento fallido en curso, el loop sigue atendiendo
+        ping = threading.Thread(target=lambda: respuestas.update(ping=cliente.get("/ping")))
+        ping.start()
+        ping.join(2)
+        atendido = "ping" in respuestas
+        liberar.set()
+        fallo.join(5)
+        ping.join(5)
+
+    assert atendido
+    assert respuestas["fallo"].status_code == 401
@@ -67,8 +67,8 @@ export function DescargarHistoria({ token }: DescargarHistoriaProps) {
         throw new Error(data.detail || data.mensaje || 'Error en la verificación');
       }
 
-      // Paso 2: Descargar el PDF
-      const pdfResponse = await fetch(`${API_BASE_URL}/descarga-segura/descargar/${token}`, {
+      // Paso 2: Descargar el PDF con el token de descarga (un solo uso)
+      const pdfResponse = await fetch(`${API_BASE_URL}/descarga-segura/descargar/${data.token_descarga}`, {
         method: 'GET',
       });
 